@@ -3,6 +3,9 @@ from datetime import datetime
 import yfinance as yf
 import pandas as pd
 
+import indicator_kernels
+from analysis_context import get_analysis_context
+
 try:
     import pandas_ta as ta
     _HAS_PANDAS_TA = True
@@ -606,6 +609,98 @@ def calcular_indicadores(data):
     return data
 
 
+def _precios_numericos(data):
+    """OHLCV numericos como en `calcular_indicadores`; solo copia si alguna columna no es float."""
+    convertir = [
+        col
+        for col in ("Open", "High", "Low", "Close", "Volume")
+        if col in data.columns and not pd.api.types.is_float_dtype(data[col].dtype)
+    ]
+    if not convertir:
+        return data
+    data = data.copy()
+    for col in convertir:
+        data[col] = pd.to_numeric(data[col], errors="coerce")
+    return data
+
+
+def _rsi_como_pandas(valores):
+    # Igual que `_rsi`: si la perdida media llega a 0 la serie pasa a object con pd.NA en esas velas.
+    if _HAS_PANDAS_TA:
+        return valores
+    huecos = np.isnan(valores[1:])
+    if not huecos.any():
+        return valores
+    rsi = valores.astype(object)
+    rsi[1:][huecos] = pd.NA
+    return rsi
+
+
+def calcular_indicadores_np(data):
+    """Mismas columnas y dtypes que `calcular_indicadores`, calculadas sobre arrays float64.
+
+    Con NaN en precios se usa la ruta pandas.
+    """
+    data = _precios_numericos(data)
+    values = data["Close"].to_numpy(dtype="float64")
+    if np.isnan(values).any():
+        return calcular_indicadores(data)
+    columns = indicator_kernels.compute(values)
+    columns["RSI"] = _rsi_como_pandas(columns["RSI"])
+    overlap = [col for col in columns if col in data.columns]
+    base = data.drop(columns=overlap) if overlap else data
+    return pd.concat([base, pd.DataFrame(columns, index=data.index)], axis=1)
+
+
+def calcular_indicadores_batch(frames):
+    """`calcular_indicadores_np` (mas TR/ATR) para varios simbolos en una sola pasada vectorizada.
+
+    Los frames del mismo largo se apilan en matrices simbolos x velas de Close/High/Low; cada resultado
+    vuelve como un DataFrame propio en el mismo orden. Frames con NaN o sin High/Low usan la ruta individual.
+    """
+    frames = list(frames)
+    resultados = [None] * len(frames)
+    grupos = {}
+    for pos, data in enumerate(frames):
+        if not {"High", "Low", "Close"}.issubset(data.columns) or not len(data):
+            resultados[pos] = calcular_indicadores_np(data)
+            continue
+        data = frames[pos] = _precios_numericos(data)
+        # Frames todo float64 (klines de Binance) salen de un solo bloque; el resto columna a columna.
+        valores = None
+        if all(pd.api.types.is_float_dtype(dtype) for dtype in data.dtypes):
+            valores = data.to_numpy(dtype="float64")
+            posiciones = [data.columns.get_loc(col) for col in ("Close", "High", "Low")]
+            precios = valores[:, posiciones].T
+        else:
+            precios = np.vstack([data[col].to_numpy(dtype="float64") for col in ("Close", "High", "Low")])
+        if np.isnan(precios).any():
+            resultados[pos] = calcular_indicadores_np(data)
+            continue
+        grupos.setdefault(len(data), []).append((pos, valores, precios))
+
+    for miembros in grupos.values():
+        matriz = np.stack([precios for _, _, precios in miembros], axis=1)
+        columnas = indicator_kernels.compute(matriz[0], matriz[1], matriz[2])
+        nombres = list(columnas)
+        bloque = np.stack([columnas[col] for col in nombres], axis=-1)
+        for fila, (pos, valores, _) in enumerate(miembros):
+            data = frames[pos]
+            conservar = [i for i, col in enumerate(data.columns) if col not in columnas]
+            if valores is not None:
+                resultados[pos] = pd.DataFrame(
+                    np.concatenate([valores[:, conservar], bloque[fila]], axis=1),
+                    index=data.index,
+                    columns=[data.columns[i] for i in conservar] + nombres,
+                    copy=False,
+                )
+            else:
+                vista = pd.DataFrame(bloque[fila], index=data.index, columns=nombres, copy=False)
+                resultados[pos] = pd.concat([data.iloc[:, conservar], vista], axis=1)
+            resultados[pos]["RSI"] = _rsi_como_pandas(columnas["RSI"][fila])
+    return resultados
+
+
 def contexto_mercado(data):
     """
     Analiza el contexto general del mercado
@@ -927,23 +1022,23 @@ def calcular_score_azul(data: pd.DataFrame, interval: str = "15m") -> dict:
     v1.4 - Nucleo Azul con estructura dependiente del timeframe.
     """
 
-    data = data.copy()
+    ctx = get_analysis_context(data)
     interval_norm = _normalize_interval_token(interval)
     structure_window = _structure_window_for_interval(interval_norm)
     recent_window = min(structure_window, max(6, len(data) // 2)) if len(data) >= 8 else structure_window
 
     score_alcista = 0
     score_bajista = 0
-    atr_base = max(_atr14(data), 1e-9)
-    recent = data.tail(recent_window)
-    prior = data.tail(recent_window * 2).iloc[:-recent_window]
-
-    if not recent.empty and not prior.empty:
-        recent_high = _to_float_or_nan(pd.to_numeric(recent["High"], errors="coerce").max())
-        recent_low = _to_float_or_nan(pd.to_numeric(recent["Low"], errors="coerce").min())
-        prior_high = _to_float_or_nan(pd.to_numeric(prior["High"], errors="coerce").max())
-        prior_low = _to_float_or_nan(pd.to_numeric(prior["Low"], errors="coerce").min())
-        last_two_closes = pd.to_numeric(data["Close"].tail(2), errors="coerce")
+    atr_base = max(ctx.atr14(), 1e-9)
+    recent_start = max(0, len(data) - recent_window)
+    prior_start = max(0, len(data) - recent_window * 2)
+
+    if len(data) and recent_start > prior_start:
+        recent_high = ctx.swing_high(recent_start, None)
+        recent_low = ctx.swing_low(recent_start, None)
+        prior_high = ctx.swing_high(prior_start, recent_start)
+        prior_low = ctx.swing_low(prior_start, recent_start)
+        last_two_closes = ctx.numeric("Close").tail(2)
         structure_tol = atr_base * 0.12
         acceptance_tol = atr_base * 0.10
 
@@ -994,17 +1089,9 @@ def calcular_score_azul(data: pd.DataFrame, interval: str = "15m") -> dict:
         elif rsi < 45:
             score_bajista += 1
 
-    data["TR"] = np.maximum(
-        data["High"] - data["Low"],
-        np.maximum(
-            abs(data["High"] - data["Close"].shift()),
-            abs(data["Low"] - data["Close"].shift())
-        )
-    )
-    data["ATR"] = data["TR"].rolling(14).mean()
-
-    atr_actual = data["ATR"].iloc[-1]
-    atr_media = data["ATR"].rolling(50).mean().iloc[-1]
+    atr = ctx.atr_series(14)
+    atr_actual = atr.iloc[-1]
+    atr_media = atr.rolling(50).mean().iloc[-1]
     vol_ratio = atr_actual / atr_media if atr_media != 0 else 1
 
     if vol_ratio > 1.3:
@@ -1146,43 +1233,18 @@ from typing import Dict, Any, Optional
 
 
 def _atr14(df: pd.DataFrame) -> float:
-    """ATR(14) simple para umbrales adaptativos."""
-    d = df.copy()
-    required = {"High", "Low", "Close"}
-    if not required.issubset(set(d.columns)):
-        return 1e-9
-    for col in ("High", "Low", "Close"):
-        d[col] = pd.to_numeric(d[col], errors="coerce")
-    tr = np.maximum(
-        d["High"] - d["Low"],
-        np.maximum(
-            (d["High"] - d["Close"].shift()).abs(),
-            (d["Low"] - d["Close"].shift()).abs()
-        )
-    )
-    atr = pd.Series(tr).rolling(14).mean()
-    if atr.empty or pd.isna(atr.iloc[-1]):
-        return 1e-9
-    val = _to_float_or_nan(atr.iloc[-1])
-    if pd.isna(val):
-        return 1e-9
-    return max(val, 1e-9)
+    """ATR(14) simple para umbrales adaptativos (memorizado en el contexto del frame)."""
+    return get_analysis_context(df).atr14()
 
 
 def _nivel_resistencia(df: pd.DataFrame, n: int = 50) -> float:
     """Resistencia simple: máximo reciente."""
-    if "High" not in df.columns:
-        return float("nan")
-    high = pd.to_numeric(df["High"], errors="coerce")
-    return _to_float_or_nan(high.tail(n).max())
+    return get_analysis_context(df).resistencia(n)
 
 
 def _nivel_soporte(df: pd.DataFrame, n: int = 50) -> float:
     """Soporte simple: mínimo reciente."""
-    if "Low" not in df.columns:
-        return float("nan")
-    low = pd.to_numeric(df["Low"], errors="coerce")
-    return _to_float_or_nan(low.tail(n).min())
+    return get_analysis_context(df).soporte(n)
 
 
 def _dorado_setup_defaults() -> Dict[str, Any]:
@@ -1480,10 +1542,7 @@ def detectar_cambio_tendencial(
         out["label"] = _regime_label(out["phase"], out["new_direction"])
         return out
 
-    d4 = datos_4h.copy()
-    for col in required_cols:
-        d4[col] = pd.to_numeric(d4[col], errors="coerce")
-    d4 = d4.dropna(subset=["High", "Low", "Close", "EMA_20", "EMA_50", "EMA_200"])
+    d4 = get_analysis_context(datos_4h).dropna(required_cols)
 
     structure_window = _structure_window_for_interval("4h")
     if len(d4) < 18:
@@ -1665,16 +1724,13 @@ def calcular_micro_score_dorado(df: pd.DataFrame, direccion: str) -> Optional[Di
     if direccion not in ("ALCISTA", "BAJISTA"):
         return None
 
-    d = df.copy()
-    for col in ("High", "Low", "Close", "EMA_20", "EMA_50", "RSI"):
-        if col in d.columns:
-            d[col] = pd.to_numeric(d[col], errors="coerce")
-    close = _to_float_or_nan(d["Close"].iloc[-1] if "Close" in d.columns and len(d) else float("nan"))
-    ema20 = _to_float_or_nan(d["EMA_20"].iloc[-1] if "EMA_20" in d.columns and len(d) else float("nan"))
-    ema50 = _to_float_or_nan(d["EMA_50"].iloc[-1] if "EMA_50" in d.columns and len(d) else float("nan"))
+    ctx = get_analysis_context(df)
+    close = ctx.last("Close")
+    ema20 = ctx.last("EMA_20")
+    ema50 = ctx.last("EMA_50")
     if pd.isna(close) or pd.isna(ema20) or pd.isna(ema50):
         return None
-    atr = _atr14(d)
+    atr = ctx.atr14()
     if pd.isna(atr) or atr <= 0:
         return None
 
@@ -1697,8 +1753,8 @@ def calcular_micro_score_dorado(df: pd.DataFrame, direccion: str) -> Optional[Di
         razones.append("Precio razonablemente cerca de EMAs (retroceso aceptable).")
 
     # 2) Zona técnica simple (proximidad a soporte/resistencia reciente)
-    soporte = _nivel_soporte(d, n=50)
-    resistencia = _nivel_resistencia(d, n=50)
+    soporte = ctx.soporte(50)
+    resistencia = ctx.resistencia(50)
     if pd.isna(soporte) or pd.isna(resistencia):
         return None
 
@@ -1747,9 +1803,7 @@ def calcular_micro_score_dorado(df: pd.DataFrame, direccion: str) -> Optional[Di
     # Si el mercado esta muy volatil, exigimos mas (evita falsas "ventajas")
     # Si esta normal, umbral estandar
     # Si esta calmado, permitimos ventaja parcial pero aun estricta
-    tr = (d["High"] - d["Low"]).abs()
-    atr50 = float(tr.rolling(50).mean().iloc[-1]) if len(d) >= 50 else float(tr.mean())
-    atr50 = max(atr50, 1e-9)
+    atr50 = max(ctx.range_mean(50), 1e-9)
     vol_ratio = atr / atr50
 
     if vol_ratio > 1.3:
@@ -1772,7 +1826,7 @@ def calcular_micro_score_dorado(df: pd.DataFrame, direccion: str) -> Optional[Di
         close=close,
         ema20=ema20,
         ema50=ema50,
-        ema200=_to_float_or_nan(d["EMA_200"].iloc[-1] if "EMA_200" in d.columns and len(d) else float("nan")),
+        ema200=ctx.last("EMA_200"),
         atr=atr,
         soporte=soporte,
         resistencia=resistencia,
@@ -1858,13 +1912,10 @@ def calcular_micro_score_rojo(
     """
 
     direccion = (direccion or "").upper().strip()
-    d = df.copy()
-    for col in ("High", "Low", "Close", "EMA_20", "RSI"):
-        if col in d.columns:
-            d[col] = pd.to_numeric(d[col], errors="coerce")
+    ctx = get_analysis_context(df)
 
-    close = _to_float_or_nan(d["Close"].iloc[-1] if "Close" in d.columns and len(d) else float("nan"))
-    ema20 = _to_float_or_nan(d["EMA_20"].iloc[-1] if "EMA_20" in d.columns and len(d) else float("nan"))
+    close = ctx.last("Close")
+    ema20 = ctx.last("EMA_20")
     if pd.isna(close) or pd.isna(ema20):
         return {
             "micro_score": 0,
@@ -1873,15 +1924,13 @@ def calcular_micro_score_rojo(
         }
 
     # ATR para umbrales adaptativos
-    atr = _atr14(d)
+    atr = ctx.atr14()
     if pd.isna(atr) or atr <= 0:
         atr = 1e-9
-
-    # 1) Volatilidad extrema (ATR ratio)
-    # Reutilizamos ATR(14) y un proxy con ATR(50) calculado rápido
-    tr = (d["High"] - d["Low"]).abs()
-    atr50 = float(tr.rolling(50).mean().iloc[-1]) if len(d) >= 50 else float(tr.mean())
-    atr50 = max(atr50, 1e-9)
+
+    # 1) Volatilidad extrema (ATR ratio)
+    # Reutilizamos ATR(14) y un proxy con ATR(50) calculado rápido
+    atr50 = max(ctx.range_mean(50), 1e-9)
     vol_ratio = atr / atr50
 
     score = 0
@@ -1904,8 +1953,8 @@ def calcular_micro_score_rojo(
         razones.append("Precio extendido respecto a EMA20.")
 
     # 3) Cercan?a a zona estructural Ã¢â‚¬Å“duraÃ¢â‚¬Â
-    soporte = _nivel_soporte(d, n=50)
-    resistencia = _nivel_resistencia(d, n=50)
+    soporte = ctx.soporte(50)
+    resistencia = ctx.resistencia(50)
 
     dist_soporte = abs(close - soporte) / atr
     dist_resistencia = abs(resistencia - close) / atr
@@ -1931,9 +1980,9 @@ def calcular_micro_score_rojo(
 
     # 5) Divergencia RSI (simple proxy)
     # Si RSI está cayendo mientras precio sube (o viceversa) en últimas velas
-    if "RSI" in d.columns and len(d) >= 6:
-        rsi_last = d["RSI"].tail(6).values
-        close_last = d["Close"].tail(6).values
+    if "RSI" in ctx.columns and ctx.size >= 6:
+        rsi_last = ctx.numeric("RSI").tail(6).values
+        close_last = ctx.numeric("Close").tail(6).values
         # Pendiente simple
         rsi_slope = float(rsi_last[-1] - rsi_last[0])
         price_slope = float(close_last[-1] - close_last[0])
@@ -0,0 +1,210 @@
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+_NAN = float("nan")
+
+
+def _to_float_or_nan(value: Any) -> float:
+    try:
+        out = float(value)
+    except Exception:
+        return _NAN
+    return out
+
+
+class AnalysisContext:
+    """Derivados de un frame de indicadores (ATR, niveles, swings, metricas de vela) calculados una sola vez.
+
+    Se obtiene con `get_analysis_context(df)`: mientras el mismo objeto DataFrame siga vivo, todas las
+    funciones de analisis comparten el mismo contexto (se rehace si cambian filas, columnas, el ultimo indice o
+    el ultimo Close); el resto de los valores del frame no debe modificarse despues de analizarlo.
+    """
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        self._frame_ref = weakref.ref(df)
+        self._memo: Dict[Hashable, Any] = {}
+        self.size = len(df)
+        self.columns = frozenset(df.columns)
+        self.stamp = _frame_stamp(df)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        df = self._frame_ref()
+        if df is None:
+            raise ReferenceError("El frame del contexto de analisis ya no existe.")
+        return df
+
+    def _cached(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        try:
+            return self._memo[key]
+        except KeyError:
+            value = fn()
+            self._memo[key] = value
+            return value
+
+    def numeric(self, col: str) -> pd.Series:
+        """Columna como float64 (pd.to_numeric coerce solo si hace falta)."""
+
+        def _build() -> pd.Series:
+            series = self.frame[col]
+            if pd.api.types.is_float_dtype(series.dtype):
+                return series
+            return pd.to_numeric(series, errors="coerce").astype("float64")
+
+        return self._cached(("numeric", col), _build)
+
+    def value(self, col: str, pos: int = -1) -> float:
+        """Valor de `col` en `iloc[pos]` (NaN si no existe)."""
+        if col not in self.columns or not -self.size <= pos < self.size:
+            return _NAN
+        return self._cached(("value", col, pos), lambda: _to_float_or_nan(self.numeric(col).iloc[pos]))
+
+    def last(self, col: str) -> float:
+        return self.value(col, -1)
+
+    def true_range(self) -> pd.Series:
+        def _build() -> pd.Series:
+            high, low, close = self.numeric("High"), self.numeric("Low"), self.numeric("Close")
+            prev_close = close.shift()
+            return np.maximum(high - low, np.maximum((high - prev_close).abs(), (low - prev_close).abs()))
+
+        return self._cached("true_range", _build)
+
+    def atr_series(self, length: int = 14) -> pd.Series:
+        """Media movil del true range; reutiliza TR/ATR ya calculados en el frame (StreamingIndicators)."""
+
+        def _build() -> pd.Series:
+            if length == 14 and {"TR", "ATR"}.issubset(self.columns):
+                return self.frame["ATR"]
+            return self.true_range().rolling(length).mean()
+
+        return self._cached(("atr_series", length), _build)
+
+    def atr14(self) -> float:
+        """ATR(14) de `analysis._atr14`: nunca menor que 1e-9."""
+
+        def _build() -> float:
+            if "ATR" in self.columns and self.size > 14:
+                val = _to_float_or_nan(self.frame["ATR"].iloc[-1])
+                if not pd.isna(val):
+                    return max(val, 1e-9)
+            if not {"High", "Low", "Close"}.issubset(self.columns):
+                return 1e-9
+            atr = self.true_range().rolling(14).mean()
+            if atr.empty:
+                return 1e-9
+            val = _to_float_or_nan(atr.iloc[-1])
+            if pd.isna(val):
+                return 1e-9
+            return max(val, 1e-9)
+
+        return self._cached("atr14", _build)
+
+    def bar_range(self) -> pd.Series:
+        return self._cached("bar_range", lambda: (self.numeric("High") - self.numeric("Low")).abs())
+
+    def range_mean(self, length: int) -> float:
+        """Media de High-Low de las ultimas `length` velas (toda la serie si hay menos)."""
+
+        def _build() -> float:
+            rng = self.bar_range()
+            if self.size >= length:
+                return _to_float_or_nan(rng.rolling(length).mean().iloc[-1])
+            return _to_float_or_nan(rng.mean())
+
+        return self._cached(("range_mean", length), _build)
+
+    def swing_high(self, start: Optional[int] = None, stop: Optional[int] = None) -> float:
+        """Maximo de High en `iloc[start:stop]` (NaN si el tramo esta vacio)."""
+        if "High" not in self.columns:
+            return _NAN
+        return self._cached(
+            ("swing_high", start, stop),
+            lambda: _to_float_or_nan(self.numeric("High").iloc[start:stop].max()),
+        )
+
+    def swing_low(self, start: Optional[int] = None, stop: Optional[int] = None) -> float:
+        """Minimo de Low en `iloc[start:stop]` (NaN si el tramo esta vacio)."""
+        if "Low" not in self.columns:
+            return _NAN
+        return self._cached(
+            ("swing_low", start, stop),
+            lambda: _to_float_or_nan(self.numeric("Low").iloc[start:stop].min()),
+        )
+
+    def resistencia(self, n: int = 50) -> float:
+        return self.swing_high(-n if n > 0 else self.size, None)
+
+    def soporte(self, n: int = 50) -> float:
+        return self.swing_low(-n if n > 0 else self.size, None)
+
+    def candle(self, pos: int = -1) -> Dict[str, float]:
+        """Rango, cuerpo y mechas de la vela `iloc[pos]` (NaN -> 0.0)."""
+
+        def _build() -> Dict[str, float]:
+            values = {}
+            for col in ("High", "Low", "Open", "Close"):
+                val = _to_float_or_nan(self.numeric(col).iloc[pos]) if col in self.columns else _NAN
+                values[col] = 0.0 if pd.isna(val) else val
+            high, low, open_, close = values["High"], values["Low"], values["Open"], values["Close"]
+            return {
+                "range": max(1e-9, high - low),
+                "body": abs(close - open_),
+                "upper_wick": max(0.0, high - max(open_, close)),
+                "lower_wick": max(0.0, min(open_, close) - low),
+                "open": open_,
+                "close": close,
+            }
+
+        return dict(self._cached(("candle", pos), _build))
+
+    def derived(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Memoriza un derivado calculado fuera de este modulo (p.ej. el escaneo de price action)."""
+        return self._cached(("derived", key), fn)
+
+    def dropna(self, cols: Iterable[str]) -> pd.DataFrame:
+        """Copia con `cols` numericas y sin filas incompletas; el mismo objeto en cada llamada."""
+        key: Tuple[str, ...] = tuple(sorted(cols))
+
+        def _build() -> pd.DataFrame:
+            out = self.frame.copy()
+            for col in key:
+                out[col] = self.numeric(col)
+            return out.dropna(subset=list(key))
+
+        return self._cached(("dropna", key), _build)
+
+
+def _frame_stamp(df: pd.DataFrame) -> Tuple[Any, ...]:
+    """Huella barata del frame: forma, ultimo indice y ultimo Close (NaN se normaliza para poder comparar)."""
+    if df.empty:
+        return (0, len(df.columns))
+    last_close = _to_float_or_nan(df["Close"].iat[-1]) if "Close" in df.columns else _NAN
+    return (len(df), len(df.columns), df.index[-1], None if np.isnan(last_close) else last_close)
+
+
+_CONTEXTS: Dict[int, Tuple["weakref.ref[pd.DataFrame]", AnalysisContext]] = {}
+_CONTEXTS_LOCK = threading.RLock()
+
+
+def _forget(frame_id: int, ref: "weakref.ref[pd.DataFrame]") -> None:
+    with _CONTEXTS_LOCK:
+        entry = _CONTEXTS.get(frame_id)
+        if entry is not None and entry[0] is ref:
+            del _CONTEXTS[frame_id]
+
+
+def get_analysis_context(df: pd.DataFrame) -> AnalysisContext:
+    frame_id = id(df)
+    with _CONTEXTS_LOCK:
+        entry = _CONTEXTS.get(frame_id)
+        if entry is not None and entry[0]() is df and entry[1].stamp == _frame_stamp(df):
+            return entry[1]
+        ctx = AnalysisContext(df)
+        ref = weakref.ref(df, lambda r, frame_id=frame_id: _forget(frame_id, r))
+        _CONTEXTS[frame_id] = (ref, ctx)
+        return ctx
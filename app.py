@@ -8,7 +8,6 @@ from estrella_ui import render_estado_estrella
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pytz
-import requests
 import pandas as pd
 from analysis import interpretar_bollinger
 import time
@@ -44,6 +43,11 @@ from sessions import (
 from analysis import advertencia_por_memoria
 from memoria import influencia_de_memoria, recuerdos_relevantes, clasificar_errores
 from live_binance import BinanceLiveStore, fetch_klines, start_stream, WEBSOCKETS_AVAILABLE
+from resampling import resample_ohlcv
+import http_pool
+from streaming_indicators import StreamingIndicators
+from state_journal import journal_path_for, read_state as read_scanner_state_journal
+from state_store import read_records as read_scanner_records_db
 try:
     from streamlit_autorefresh import st_autorefresh
     _HAS_AUTOREFRESH = True
@@ -1298,6 +1302,7 @@ def _color_desde_esfera(esfera_txt: str) -> str:
 USERS_DB_PATH = os.getenv("USERS_DB_PATH", os.path.join(os.path.dirname(__file__), "usuarios_db.json"))
 SCANNER_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "scanner_config.json")
 SCANNER_STATE_PATH = os.path.join(os.path.dirname(__file__), "scanner_state.json")
+SCANNER_STATE_DB_PATH = os.path.splitext(SCANNER_STATE_PATH)[0] + ".sqlite3"
 SCANNER_HEALTH_PATH = os.path.join(os.path.dirname(__file__), "scanner_health.json")
 AUTH_COOKIE_PREFIX = os.getenv("AUTH_COOKIE_PREFIX", "estrella_trader")
 # Cambia esta clave en producción con variable de entorno AUTH_COOKIE_PASSWORD.
@@ -1430,12 +1435,25 @@ def _safe_float_num(value, default=0.0) -> float:
         return default
 
 
+def _mtime_estado_sqlite() -> float:
+    # Con WAL las escrituras recientes viven en el -wal hasta el checkpoint.
+    stamps = [os.path.getmtime(p) for p in (SCANNER_STATE_DB_PATH, SCANNER_STATE_DB_PATH + "-wal") if os.path.exists(p)]
+    return max(stamps) if stamps else 0.0
+
+
 def _leer_scanner_state() -> dict:
     try:
-        if not os.path.exists(SCANNER_STATE_PATH):
+        db_mtime = _mtime_estado_sqlite()
+        json_paths = [p for p in (SCANNER_STATE_PATH, str(journal_path_for(SCANNER_STATE_PATH))) if os.path.exists(p)]
+        json_mtime = max((os.path.getmtime(p) for p in json_paths), default=0.0)
+        if db_mtime and db_mtime >= json_mtime:
+            # El panel solo usa los registros y sus alertas abiertas: no se leen el historial de calidad ni meta.
+            records = read_scanner_records_db(SCANNER_STATE_DB_PATH, fields=("open_alerts",))
+            return _normalizar_scanner_state({"symbols": records})
+        if not json_paths:
             return {}
-        with open(SCANNER_STATE_PATH, "r", encoding="utf-8-sig") as f:
-            payload = json.load(f)
+        # Snapshot + journal de cambios (backend `journal`); sin journal es el JSON tal cual.
+        payload = read_scanner_state_journal(SCANNER_STATE_PATH)
         if isinstance(payload, dict):
             return _normalizar_scanner_state(payload)
     except Exception:
@@ -1834,7 +1852,7 @@ def _detectar_chat_id_telegram_desde_start(user_id: str):
         return False, "TELEGRAM_BOT_TOKEN no esta configurado en el servidor.", ""
 
     try:
-        resp = requests.get(
+        resp = http_pool.get(
             f"https://api.telegram.org/bot{token}/getUpdates",
             params={"timeout": 0},
             timeout=20,
@@ -2477,7 +2495,7 @@ def obtener_datos_twelvedata(symbol, interval, outputsize, api_key):
             "format": "JSON",
             "apikey": api_key,
         }
-        resp = requests.get("https://api.twelvedata.com/time_series", params=params, timeout=10)
+        resp = http_pool.get("https://api.twelvedata.com/time_series", params=params, timeout=10)
         resp.raise_for_status()
         payload = resp.json()
         values = payload.get("values")
@@ -2505,7 +2523,7 @@ def obtener_datos_twelvedata(symbol, interval, outputsize, api_key):
 def obtener_precio_live_twelvedata(symbol, api_key):
     try:
         params = {"symbol": symbol, "apikey": api_key, "format": "JSON"}
-        resp = requests.get("https://api.twelvedata.com/price", params=params, timeout=10)
+        resp = http_pool.get("https://api.twelvedata.com/price", params=params, timeout=10)
         resp.raise_for_status()
         payload = resp.json()
         price = payload.get("price")
@@ -2569,19 +2587,7 @@ def obtener_datos_procesados_cache(
         try:
             datos_1h = obtener_datos(ticker=ticker, periodo=periodo, intervalo="1h")
             if datos_1h is not None and not datos_1h.empty:
-                datos_1h = datos_1h.sort_index().copy()
-                agg = {
-                    "Open": "first",
-                    "High": "max",
-                    "Low": "min",
-                    "Close": "last",
-                }
-                if "Volume" in datos_1h.columns:
-                    agg["Volume"] = "sum"
-                datos_local = datos_1h.resample("4h").agg(agg)
-                datos_local = datos_local.dropna(subset=["Open", "High", "Low", "Close"])
-                if "Volume" not in datos_local.columns:
-                    datos_local["Volume"] = 0.0
+                datos_local = resample_ohlcv(datos_1h, base_interval="1h", target_interval="4h")
         except Exception:
             datos_local = pd.DataFrame()
 
@@ -3478,7 +3484,14 @@ try:
     st.session_state["binance_live_effective"] = bool(use_binance_live)
 
     if use_binance_live:
-        datos = calcular_indicadores(datos)
+        # En cada rerun solo se procesan las velas nuevas; la vela en formacion es vista previa.
+        live_params = (binance_symbol, binance_interval)
+        indicators = st.session_state.get("binance_live_indicators")
+        if indicators is None or st.session_state.get("binance_live_indicators_params") != live_params:
+            indicators = StreamingIndicators()
+            st.session_state["binance_live_indicators"] = indicators
+            st.session_state["binance_live_indicators_params"] = live_params
+        datos = indicators.apply(datos)
         datos["dist_ema200"] = ((datos["Close"] - datos["EMA_200"]) / datos["EMA_200"]) * 100
         datos = ajustar_timezone(datos, zona)
 
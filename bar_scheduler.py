@@ -0,0 +1,58 @@
+import heapq
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from resampling import interval_minutes
+
+
+def target_close_interval(target: Dict[str, str]) -> str:
+    """Intervalo cuyo cierre dispara la evaluacion de un scan target (estructural = 4H)."""
+    if str(target.get("mode", "")).strip().lower() == "estructural":
+        return "4h"
+    return str(target.get("interval", "15m")).strip().lower()
+
+
+def next_bar_close(interval: str, now: float) -> float:
+    minutes = interval_minutes(interval) or 1
+    step = minutes * 60
+    return (int(now // step) + 1) * float(step)
+
+
+class BarCloseScheduler:
+    """Heap de proximos cierres de vela (epoch UTC + gracia) por scan target."""
+
+    def __init__(
+        self,
+        targets: Iterable[Dict[str, str]],
+        grace_seconds: float = 10.0,
+        now: Optional[float] = None,
+    ) -> None:
+        self.grace_seconds = max(0.0, float(grace_seconds))
+        self._intervals: Dict[str, str] = {}
+        self._heap: List[Tuple[float, str]] = []
+        start = time.time() if now is None else float(now)
+        for target in targets:
+            key = str(target.get("key", "")).strip()
+            if not key or key in self._intervals:
+                continue
+            self._intervals[key] = target_close_interval(target)
+            self._schedule(key, start)
+
+    def _schedule(self, key: str, after: float) -> None:
+        due = next_bar_close(self._intervals[key], after - self.grace_seconds) + self.grace_seconds
+        heapq.heappush(self._heap, (due, key))
+
+    def next_due(self) -> float:
+        if not self._heap:
+            return float("inf")
+        return self._heap[0][0]
+
+    def pop_due(self, now: Optional[float] = None) -> Set[str]:
+        current = time.time() if now is None else float(now)
+        due: Set[str] = set()
+        while self._heap and self._heap[0][0] <= current:
+            _, key = heapq.heappop(self._heap)
+            due.add(key)
+        for key in due:
+            self._schedule(key, current)
+        return due
@@ -0,0 +1,280 @@
+"""Tiempos y pico de memoria de las rutas calientes de analisis y del ciclo completo del scanner, en JSON.
+
+Uso: python benchmarks/bench_hot_paths.py [--symbols 8 50 200] [--repeat 5] [--candles DIR] [--out res.json]
+       [--compare base.json --max-regression 1.25]
+
+Sin `--candles` usa velas sinteticas con semilla fija; con `--candles` reparte las velas grabadas (formato
+candle_store) entre los simbolos. El ciclo corre `run_scan_cycle` con proveedores y envios simulados.
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import scanner_replay  # noqa: E402
+import scanner_worker as sw  # noqa: E402
+from analysis import (  # noqa: E402
+    calcular_indicadores,
+    calcular_score_azul,
+    construir_estado_final,
+    construir_estado_final_estructural,
+)
+from candle_store import CandleStore  # noqa: E402
+
+ROWS = {"15m": 720, "1h": 560, "4h": 520, "1d": 500}
+FREQ = {"15m": "15min", "1h": "1h", "4h": "4h", "1d": "1D"}
+END = pd.Timestamp("2024-03-01", tz="UTC")
+
+
+def _synthetic_frame(interval: str, seed: int) -> pd.DataFrame:
+    rows = ROWS[interval]
+    rng = np.random.default_rng(seed)
+    close = 30000.0 + np.cumsum(rng.normal(0.0, 25.0, rows))
+    open_ = close + rng.normal(0.0, 8.0, rows)
+    index = pd.date_range(end=END - pd.Timedelta(FREQ[interval]), periods=rows, freq=FREQ[interval], tz="UTC")
+    return pd.DataFrame(
+        {
+            "Open": open_,
+            "High": np.maximum(open_, close) + rng.uniform(1.0, 40.0, rows),
+            "Low": np.minimum(open_, close) - rng.uniform(1.0, 40.0, rows),
+            "Close": close,
+            "Volume": rng.uniform(1.0, 50.0, rows),
+        },
+        index=index,
+    )
+
+
+def _recorded_symbols(candles_dir: Path) -> List[str]:
+    names = sorted(path.name.split("__")[1] for path in candles_dir.glob("binance__*__15m.npz"))
+    if not names:
+        raise SystemExit(f"Sin velas binance 15m en {candles_dir}")
+    return names
+
+
+def _fixture(store_dir: Path, count: int, candles_dir: Path | None) -> Dict[str, Any]:
+    """Simbolos SYN### en CRYPTO_MAP apuntando a velas sinteticas o grabadas (ciclicas si faltan)."""
+    recorded = _recorded_symbols(candles_dir) if candles_dir else []
+    store = CandleStore(store_dir, max_rows=10**6)
+    symbols: Dict[str, Dict[str, str]] = {}
+    for pos in range(count):
+        label = f"SYN{pos:03d}"
+        if recorded:
+            binance = recorded[pos % len(recorded)]
+        else:
+            binance = f"{label}USDT"
+            for offset, interval in enumerate(ROWS):
+                store.save("binance", binance, interval, _synthetic_frame(interval, seed=pos * 10 + offset))
+        symbols[label] = {"ticker": f"{label}-USD", "binance": binance, "td": ""}
+    return {"symbols": symbols, "dir": candles_dir or store_dir}
+
+
+def _frames(fixture: Dict[str, Any], interval: str) -> List[pd.DataFrame]:
+    store = CandleStore(Path(fixture["dir"]), max_rows=10**6)
+    out = []
+    for row in fixture["symbols"].values():
+        df = store.load("binance", row["binance"], interval)
+        out.append(df.tail(ROWS[interval]) if not df.empty else _synthetic_frame(interval, seed=len(out)))
+    return out
+
+
+def _measure(fn: Callable[[Any], Any], make_input: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    # Entradas nuevas en cada repeticion: el contexto de analisis por frame no debe servir resultados de la anterior.
+    times: List[float] = []
+    for _ in range(repeat):
+        payload = make_input()
+        started = time.perf_counter()
+        fn(payload)
+        times.append((time.perf_counter() - started) * 1000.0)
+    payload = make_input()
+    tracemalloc.start()
+    try:
+        fn(payload)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "ms_best": round(min(times), 3),
+        "ms_median": round(statistics.median(times), 3),
+        "peak_kib": round(peak / 1024.0, 1),
+    }
+
+
+def _cycle_cfg(fixture: Dict[str, Any]) -> Dict[str, Any]:
+    cfg = sw._default_config()
+    cfg.update(
+        {
+            "auto_multi_interval": False,
+            "analysis_mode": "tendencial",
+            "interval": "15m",
+            "scan_structural_1d_4h": False,
+            "scan_gold": False,
+            "crypto_symbols": list(fixture["symbols"]),
+        }
+    )
+    return scanner_replay._replay_cfg(cfg)
+
+
+def _bench_cycle(fixture: Dict[str, Any], repeat: int) -> Dict[str, Dict[str, Any]]:
+    cfg = _cycle_cfg(fixture)
+    candles = scanner_replay.RecordedCandles(Path(fixture["dir"]), sw.TD_INTERVAL_MAP)
+    last_close = max(int(candles.frame(item, "15m")[2][-1]) for item in sw._build_watchlist(cfg))
+    now = datetime.fromtimestamp(last_close / 1e9, tz=timezone.utc) + timedelta(seconds=15)
+    original = sw._apply_precision_filters
+    # `_apply_precision_filters` se mide dentro del ciclo: ahi incluye MTF y contexto estructural reales.
+    filter_ms: List[float] = []
+    # Pico por llamada sobre la memoria al entrar; reset_peak borra el pico del ciclo, asi que se acumula aparte.
+    peaks = {"cycle": 0, "filters": 0}
+
+    def timed_filters(**kwargs):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            peaks["cycle"] = max(peaks["cycle"], peak)
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            return original(**kwargs)
+        finally:
+            filter_ms[-1] += (time.perf_counter() - started) * 1000.0
+            if tracing:
+                _, peak = tracemalloc.get_traced_memory()
+                peaks["cycle"] = max(peaks["cycle"], peak)
+                peaks["filters"] = max(peaks["filters"], peak - current)
+
+    def run_cycle(_payload):
+        sw._RECORD_EVAL_CACHE.clear()
+        filter_ms.append(0.0)
+        sw.run_scan_cycle(cfg, {"symbols": {}})
+
+    sw._apply_precision_filters = timed_filters
+    try:
+        with scanner_replay._replay_hooks(sw, candles, {}):
+            sw.set_virtual_clock(now)
+            run_cycle(None)  # calentamiento: carga y deriva las velas grabadas una vez
+            filter_ms.clear()
+            cycle = _measure(run_cycle, lambda: None, repeat)
+    finally:
+        sw._apply_precision_filters = original
+    timed = filter_ms[:repeat]
+    cycle["peak_kib"] = max(cycle["peak_kib"], round(peaks["cycle"] / 1024.0, 1))
+    precision = {
+        "ms_best": round(min(timed), 3),
+        "ms_median": round(statistics.median(timed), 3),
+        "peak_kib": round(peaks["filters"] / 1024.0, 1),
+    }
+    return {"_apply_precision_filters": precision, "run_scan_cycle": cycle}
+
+
+def _bench_scale(count: int, repeat: int, candles_dir: Path | None) -> List[Dict[str, Any]]:
+    saved_map = dict(sw.CRYPTO_MAP)
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture = _fixture(Path(tmp), count, candles_dir)
+        sw.CRYPTO_MAP.update(fixture["symbols"])
+        try:
+            raw_15m = _frames(fixture, "15m")
+            raw_1d = _frames(fixture, "1d")
+            raw_4h = _frames(fixture, "4h")
+            ind_15m = [calcular_indicadores(df) for df in raw_15m]
+            ind_1d = [calcular_indicadores(df) for df in raw_1d]
+            ind_4h = [calcular_indicadores(df) for df in raw_4h]
+
+            def copies(frames: List[pd.DataFrame]) -> Callable[[], List[pd.DataFrame]]:
+                return lambda: [df.copy() for df in frames]
+
+            paths: Dict[str, Dict[str, Any]] = {
+                "calcular_indicadores": _measure(lambda fs: [calcular_indicadores(df) for df in fs], copies(raw_15m), repeat),
+                "calcular_score_azul": _measure(lambda fs: [calcular_score_azul(df, "15m") for df in fs], copies(ind_15m), repeat),
+                "construir_estado_final": _measure(
+                    lambda fs: [construir_estado_final(df, impacto_memoria=0, analysis_interval="15m") for df in fs],
+                    copies(ind_15m),
+                    repeat,
+                ),
+                "construir_estado_final_estructural": _measure(
+                    lambda pairs: [construir_estado_final_estructural(d1, d4, impacto_memoria=0) for d1, d4 in pairs],
+                    lambda: [(d1.copy(), d4.copy()) for d1, d4 in zip(ind_1d, ind_4h)],
+                    repeat,
+                ),
+                "_detect_price_action": _measure(lambda fs: [sw._detect_price_action(df, "ALCISTA") for df in fs], copies(ind_15m), repeat),
+            }
+            paths.update(_bench_cycle(fixture, max(1, repeat // 2)))
+        finally:
+            sw.CRYPTO_MAP.clear()
+            sw.CRYPTO_MAP.update(saved_map)
+    return [{"name": name, "symbols": count, **stats} for name, stats in paths.items()]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _compare(results: List[Dict[str, Any]], baseline_path: Path, max_regression: float) -> int:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    previous = {(row["name"], row["symbols"]): row for row in baseline.get("results", [])}
+    worst = 0.0
+    print(f"{'path':<36} {'symbols':>7} {'base_ms':>10} {'ms':>10} {'ratio':>7}", file=sys.stderr)
+    for row in results:
+        old = previous.get((row["name"], row["symbols"]))
+        if not old or not old.get("ms_best"):
+            continue
+        ratio = row["ms_best"] / old["ms_best"]
+        worst = max(worst, ratio)
+        print(f"{row['name']:<36} {row['symbols']:>7} {old['ms_best']:>10.3f} {row['ms_best']:>10.3f} {ratio:>6.2f}x", file=sys.stderr)
+    return 1 if max_regression > 0 and worst > max_regression else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--symbols", type=int, nargs="+", default=[8, 50, 200])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--candles", default="", help="Directorio candle_store con velas grabadas (vacio = sinteticas).")
+    parser.add_argument("--out", default="", help="Archivo JSON de salida (vacio = stdout).")
+    parser.add_argument("--compare", default="", help="JSON previo para comparar ms_best.")
+    parser.add_argument("--max-regression", type=float, default=0.0, help="Ratio maximo tolerado vs --compare (0 = no falla).")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    candles_dir = Path(args.candles).resolve() if args.candles else None
+    results: List[Dict[str, Any]] = []
+    for count in args.symbols:
+        results.extend(_bench_scale(count, max(1, args.repeat), candles_dir))
+    payload = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_utc": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "fixture": "recorded" if candles_dir else "synthetic",
+            "rows": ROWS,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    text = json.dumps(payload, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return _compare(results, Path(args.compare), args.max_regression) if args.compare else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
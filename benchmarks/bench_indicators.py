@@ -0,0 +1,92 @@
+"""Compara `calcular_indicadores` (pandas) con `calcular_indicadores_np` (kernel NumPy) y el lote multi-simbolo.
+
+Uso: python benchmarks/bench_indicators.py [--rows 720 50000] [--symbols 8 100] [--repeat 20]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from analysis import calcular_indicadores, calcular_indicadores_batch, calcular_indicadores_np  # noqa: E402
+
+COLUMNS = ("EMA_20", "EMA_50", "EMA_200", "RSI", "BBL", "BBM", "BBU")
+
+
+def _synthetic_frame(rows: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 30000.0 + np.cumsum(rng.normal(0.0, 25.0, rows))
+    index = pd.date_range("2020-01-01", periods=rows, freq="15min", tz="UTC")
+    return pd.DataFrame(
+        {
+            "Open": close + rng.normal(0.0, 5.0, rows),
+            "High": close + rng.uniform(1.0, 40.0, rows),
+            "Low": close - rng.uniform(1.0, 40.0, rows),
+            "Close": close,
+            "Volume": rng.uniform(1.0, 50.0, rows),
+        },
+        index=index,
+    )
+
+
+def _best_ms(fn, df: pd.DataFrame, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(df)
+        best = min(best, (time.perf_counter() - started) * 1000.0)
+    return best
+
+
+def _best_batch_ms(fn, frames, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(frames)
+        best = min(best, (time.perf_counter() - started) * 1000.0)
+    return best
+
+
+def _max_abs_diff(a: pd.DataFrame, b: pd.DataFrame) -> float:
+    worst = 0.0
+    for col in COLUMNS:
+        left = pd.to_numeric(a[col], errors="coerce").to_numpy(dtype="float64")
+        right = pd.to_numeric(b[col], errors="coerce").to_numpy(dtype="float64")
+        mask = ~(np.isnan(left) | np.isnan(right))
+        if mask.any():
+            worst = max(worst, float(np.max(np.abs(left[mask] - right[mask]))))
+    return worst
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[720, 50000])
+    parser.add_argument("--symbols", type=int, nargs="+", default=[8, 100])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'pandas_ms':>10} {'numpy_ms':>10} {'speedup':>8} {'max_abs_diff':>13}")
+    for rows in args.rows:
+        df = _synthetic_frame(rows)
+        pandas_ms = _best_ms(calcular_indicadores, df, args.repeat)
+        numpy_ms = _best_ms(calcular_indicadores_np, df, args.repeat)
+        diff = _max_abs_diff(calcular_indicadores(df), calcular_indicadores_np(df))
+        print(f"{rows:>8} {pandas_ms:>10.3f} {numpy_ms:>10.3f} {pandas_ms / max(numpy_ms, 1e-9):>7.1f}x {diff:>13.2e}")
+
+    rows = min(args.rows)
+    print(f"\n{'symbols':>8} {'per_symbol_ms':>14} {'batch_ms':>10} {'speedup':>8} {'max_abs_diff':>13}")
+    for count in args.symbols:
+        frames = [_synthetic_frame(rows, seed=seed) for seed in range(count)]
+        per_symbol_ms = _best_batch_ms(lambda fs: [calcular_indicadores_np(df) for df in fs], frames, args.repeat)
+        batch_ms = _best_batch_ms(calcular_indicadores_batch, frames, args.repeat)
+        diff = max(_max_abs_diff(a, b) for a, b in zip(calcular_indicadores_batch(frames), map(calcular_indicadores_np, frames)))
+        print(f"{count:>8} {per_symbol_ms:>14.3f} {batch_ms:>10.3f} {per_symbol_ms / max(batch_ms, 1e-9):>7.1f}x {diff:>13.2e}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
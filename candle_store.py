@@ -0,0 +1,138 @@
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+_SAFE_NAME_PATTERN = re.compile(r"[^A-Za-z0-9_-]+")
+
+
+def _safe_name(value: str) -> str:
+    return _SAFE_NAME_PATTERN.sub("_", str(value or "").strip()) or "_"
+
+
+class CandleStore:
+    """Velas OHLCV persistidas en disco: un archivo .npz por fuente/simbolo/intervalo."""
+
+    def __init__(self, root: Path, max_rows: int = 1000) -> None:
+        self.root = Path(root)
+        self.max_rows = max(1, int(max_rows))
+        self._lock = threading.Lock()
+        self._path_locks: Dict[str, threading.Lock] = {}
+        self._stats: Dict[str, int] = {}
+        self.reset_stats()
+
+    def path_for(self, source: str, symbol: str, interval: str) -> Path:
+        return self.root / f"{_safe_name(source)}__{_safe_name(symbol)}__{_safe_name(interval)}.npz"
+
+    def lock_for(self, source: str, symbol: str, interval: str) -> threading.Lock:
+        key = self.path_for(source, symbol, interval).name
+        with self._lock:
+            lock = self._path_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._path_locks[key] = lock
+            return lock
+
+    def load(self, source: str, symbol: str, interval: str) -> pd.DataFrame:
+        path = self.path_for(source, symbol, interval)
+        if not path.exists():
+            return pd.DataFrame()
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                tz = str(data["tz"]) if "tz" in data.files else ""
+                index = pd.DatetimeIndex(pd.to_datetime(data["ts"].astype("int64"), unit="ns"))
+                if tz:
+                    index = index.tz_localize("UTC").tz_convert(tz)
+                df = pd.DataFrame({col: data[col] for col in OHLCV_COLUMNS if col in data.files}, index=index)
+            return df
+        except Exception as exc:
+            logger.warning("Candle store ilegible (%s): %s", path.name, exc)
+            return pd.DataFrame()
+
+    def save(self, source: str, symbol: str, interval: str, df: pd.DataFrame) -> None:
+        if df is None or df.empty:
+            return
+        path = self.path_for(source, symbol, interval)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            index = pd.DatetimeIndex(df.index)
+            tz = str(index.tz) if index.tz is not None else ""
+            if tz:
+                index = index.tz_convert("UTC").tz_localize(None)
+            arrays = {
+                "ts": index.values.astype("datetime64[ns]").astype("int64"),
+                "tz": np.array(tz),
+            }
+            for col in OHLCV_COLUMNS:
+                if col in df.columns:
+                    arrays[col] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as fh:
+                np.savez(fh, **arrays)
+            os.replace(tmp_path, path)
+        except Exception as exc:
+            logger.warning("No se pudo guardar candle store (%s): %s", path.name, exc)
+            try:
+                tmp_path.unlink()
+            except Exception:
+                pass
+
+    def merge(self, stored: pd.DataFrame, fresh: pd.DataFrame) -> pd.DataFrame:
+        if stored is None or stored.empty:
+            merged = fresh.copy()
+        elif fresh is None or fresh.empty:
+            merged = stored.copy()
+        else:
+            # La ultima vela guardada pudo estar en formacion: la version nueva manda.
+            merged = pd.concat([stored, fresh])
+            merged = merged[~merged.index.duplicated(keep="last")]
+        merged = merged.sort_index()
+        cols = [col for col in OHLCV_COLUMNS if col in merged.columns]
+        return merged[cols].tail(self.max_rows)
+
+    def record_fetch(self, incremental: bool, bars: int) -> None:
+        with self._lock:
+            key = "incremental_requests" if incremental else "full_requests"
+            self._stats[key] = int(self._stats.get(key, 0)) + 1
+            self._stats["bars_fetched"] = int(self._stats.get("bars_fetched", 0)) + max(0, int(bars))
+
+    def reset_stats(self) -> Dict[str, int]:
+        with self._lock:
+            previous = dict(self._stats)
+            self._stats = {"incremental_requests": 0, "full_requests": 0, "bars_fetched": 0}
+        return previous
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+_STORES: Dict[str, CandleStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_store(root: Path, max_rows: int = 1000) -> CandleStore:
+    key = f"{Path(root).resolve()}|{int(max_rows)}"
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = CandleStore(root, max_rows=max_rows)
+            _STORES[key] = store
+        return store
+
+
+def last_open_time(df: Optional[pd.DataFrame]) -> Optional[pd.Timestamp]:
+    if df is None or df.empty:
+        return None
+    try:
+        return pd.Timestamp(df.index[-1])
+    except Exception:
+        return None
@@ -0,0 +1,227 @@
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Conexion corta (un host caido no debe frenar el ciclo); la lectura la fija cada llamada como antes.
+DEFAULT_CONNECT_TIMEOUT_SEC = 3.05
+DEFAULT_READ_TIMEOUT_SEC = 15.0
+DEFAULT_POOL_HOSTS = 8
+DEFAULT_POOL_MAXSIZE = 16
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_SEC = 0.2
+RETRY_STATUSES = (500, 502, 503, 504)
+RETRY_AFTER_MAX_SEC = 5.0
+
+Timeout = Union[None, float, Tuple[float, float]]
+
+
+def _netloc(scheme: str, host: str, port: Optional[int]) -> str:
+    host = str(host or "").lower()
+    if port is None or (scheme, int(port)) in (("http", 80), ("https", 443)):
+        return host
+    return f"{host}:{int(port)}"
+
+
+def _new_host_stats() -> Dict[str, Any]:
+    return {"requests": 0, "connections": 0, "errors": 0}
+
+
+class _CappedRetry(Retry):
+    """Retry que respeta Retry-After sin dormir mas de `RETRY_AFTER_MAX_SEC` (un 503 con horas no frena el ciclo)."""
+
+    def get_retry_after(self, response: Any) -> Optional[float]:
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(float(retry_after), RETRY_AFTER_MAX_SEC)
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter que anota por host cuantas peticiones pasan y cuantas salen por un socket no visto antes."""
+
+    def __init__(self, owner: "HttpPool", **kwargs: Any) -> None:
+        self._owner = owner
+        super().__init__(**kwargs)
+
+    def send(self, request: requests.PreparedRequest, *args: Any, **kwargs: Any) -> requests.Response:
+        parts = urlsplit(request.url or "")
+        netloc = _netloc(parts.scheme, parts.hostname or "", parts.port)
+        self._owner._count(netloc, "requests")
+        try:
+            response = super().send(request, *args, **kwargs)
+        except Exception:
+            self._owner._count(netloc, "errors")
+            raise
+        # El cuerpo aun no se leyo: la respuesta conserva la conexion (y su socket) que uso.
+        conn = getattr(response.raw, "connection", None)
+        sock = getattr(conn, "sock", None)
+        if sock is not None:
+            self._owner._count_socket(netloc, sock)
+        return response
+
+
+class HttpPool:
+    """Sesion `requests` compartida: un pool keep-alive por host, timeouts (conexion, lectura) y reintentos.
+
+    Se reintentan errores de conexion (cualquier metodo: la peticion no llego a salir) y 5xx solo en GET,
+    con backoff y respetando Retry-After hasta `RETRY_AFTER_MAX_SEC`. Los 429 vuelven al que llama, que ya tiene
+    su propio backoff (worker) o pacing (TelegramTransport). Con `enabled=False` cada llamada abre su conexion
+    como antes.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        pool_hosts: int = DEFAULT_POOL_HOSTS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        retries: int = DEFAULT_RETRIES,
+        backoff_sec: float = DEFAULT_BACKOFF_SEC,
+        connect_timeout_sec: float = DEFAULT_CONNECT_TIMEOUT_SEC,
+        read_timeout_sec: float = DEFAULT_READ_TIMEOUT_SEC,
+    ) -> None:
+        self.enabled = bool(enabled)
+        self.pool_hosts = max(1, int(pool_hosts))
+        self.pool_maxsize = max(1, int(pool_maxsize))
+        self.retries = max(0, int(retries))
+        self.backoff_sec = max(0.0, float(backoff_sec))
+        self.connect_timeout_sec = max(0.1, float(connect_timeout_sec))
+        self.read_timeout_sec = max(0.1, float(read_timeout_sec))
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+        self._sockets: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self._session: Optional[requests.Session] = None
+        if self.enabled:
+            retry = _CappedRetry(
+                total=self.retries,
+                connect=self.retries,
+                read=self.retries,
+                status=self.retries,
+                backoff_factor=self.backoff_sec,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset({"GET", "HEAD"}),
+                raise_on_status=False,
+                respect_retry_after_header=True,
+            )
+            adapter = _CountingAdapter(
+                self,
+                pool_connections=self.pool_hosts,
+                pool_maxsize=self.pool_maxsize,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+
+    def _count(self, netloc: str, key: str) -> None:
+        with self._lock:
+            self._hosts.setdefault(netloc, _new_host_stats())[key] += 1
+
+    def _count_socket(self, netloc: str, sock: Any) -> None:
+        with self._lock:
+            if sock in self._sockets:
+                return
+            self._sockets.add(sock)
+            self._hosts.setdefault(netloc, _new_host_stats())["connections"] += 1
+
+    def _timeout(self, timeout: Timeout) -> Tuple[float, float]:
+        if isinstance(timeout, tuple):
+            return timeout
+        read = self.read_timeout_sec if timeout is None else max(0.1, float(timeout))
+        return (min(self.connect_timeout_sec, read), read)
+
+    def request(self, method: str, url: str, timeout: Timeout = None, **kwargs: Any) -> requests.Response:
+        """`requests.request` sobre el pool; `timeout` numerico es el de lectura (la conexion usa el corto)."""
+        if self._session is None:
+            return requests.request(method, url, timeout=timeout or self.read_timeout_sec, **kwargs)
+        return self._session.request(method, url, timeout=self._timeout(timeout), **kwargs)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Por host: peticiones, conexiones nuevas y % de peticiones que reusaron una conexion abierta."""
+        with self._lock:
+            hosts = {netloc: dict(bucket) for netloc, bucket in self._hosts.items()}
+        total_requests = 0
+        total_connections = 0
+        for bucket in hosts.values():
+            bucket["reused"] = max(0, bucket["requests"] - bucket["connections"])
+            bucket["reuse_pct"] = round(100.0 * bucket["reused"] / bucket["requests"], 2) if bucket["requests"] else 0.0
+            total_requests += bucket["requests"]
+            total_connections += bucket["connections"]
+        reused = max(0, total_requests - total_connections)
+        return {
+            "enabled": self.enabled,
+            "requests": total_requests,
+            "connections": total_connections,
+            "reuse_pct": round(100.0 * reused / total_requests, 2) if total_requests else 0.0,
+            "hosts": hosts,
+        }
+
+
+_POOL: Optional[Tuple[Tuple[Any, ...], HttpPool]] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool() -> HttpPool:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            pool = HttpPool()
+            _POOL = (_pool_key(pool), pool)
+        return _POOL[1]
+
+
+def _pool_key(pool: HttpPool) -> Tuple[Any, ...]:
+    return (
+        pool.enabled,
+        pool.pool_hosts,
+        pool.pool_maxsize,
+        pool.retries,
+        pool.backoff_sec,
+        pool.connect_timeout_sec,
+        pool.read_timeout_sec,
+    )
+
+
+def configure(**kwargs: Any) -> HttpPool:
+    """Reemplaza el pool compartido si cambian los parametros (cierra las conexiones del anterior)."""
+    global _POOL
+    pool = HttpPool(**kwargs)
+    key = _pool_key(pool)
+    with _POOL_LOCK:
+        if _POOL is not None and _POOL[0] == key:
+            pool.close()
+            return _POOL[1]
+        previous = _POOL
+        _POOL = (key, pool)
+    if previous is not None:
+        previous[1].close()
+    return pool
+
+
+def request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    return get_pool().request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    return get_pool().get(url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> requests.Response:
+    return get_pool().post(url, **kwargs)
+
+
+def stats() -> Dict[str, Any]:
+    return get_pool().stats()
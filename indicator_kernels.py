@@ -0,0 +1,117 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+# Limite de ln((1 - alpha) ** -n) por tramo de EMA: e**600 deja margen hasta 1e308 para precios normales.
+_EMA_MAX_LOG_GROWTH = 600.0
+
+
+def ema(values: np.ndarray, alpha: float) -> np.ndarray:
+    """y[t] = (1 - alpha) * y[t-1] + alpha * x[t], y[0] = x[0] (igual que `ewm(adjust=False)`).
+
+    Cada tramo se resuelve con un cumsum: y[i] = d^(i+1) * (prev + alpha * sum_j x[j] * d^-(j+1)).
+    Con una matriz (simbolos x velas) cada fila es una serie independiente.
+    """
+    x = np.ascontiguousarray(values, dtype="float64")
+    out = np.empty_like(x)
+    size = x.shape[-1]
+    if not size:
+        return out
+    decay = 1.0 - float(alpha)
+    block = size
+    if decay < 1.0:
+        block = max(1, min(block, int(_EMA_MAX_LOG_GROWTH / -np.log(decay))))
+    grow = decay ** -np.arange(1, block + 1, dtype="float64")
+    prev = x[..., :1]
+    for start in range(0, size, block):
+        chunk = x[..., start : start + block]
+        stop = start + chunk.shape[-1]
+        g = grow[: chunk.shape[-1]]
+        out[..., start:stop] = (prev + np.cumsum(alpha * chunk * g, axis=-1)) / g
+        prev = out[..., stop - 1 : stop]
+    return out
+
+
+def rsi(close: np.ndarray, length: int = 14) -> np.ndarray:
+    """RSI de Wilder como `analysis._rsi`, con NaN (no pd.NA) donde la perdida media es 0."""
+    c = np.ascontiguousarray(close, dtype="float64")
+    out = np.full(c.shape, np.nan)
+    if c.shape[-1] < 2:
+        return out
+    delta = np.diff(c, axis=-1)
+    alpha = 1.0 / length
+    avg_gain = ema(np.maximum(delta, 0.0), alpha)
+    avg_loss = ema(np.maximum(-delta, 0.0), alpha)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = np.where(avg_loss != 0.0, avg_gain / avg_loss, np.nan)
+    out[..., 1:] = 100.0 - (100.0 / (1.0 + rs))
+    return out
+
+
+def _window_sum(x: np.ndarray, length: int) -> np.ndarray:
+    """Suma de cada ventana completa sumando `length` desplazamientos contiguos (sin cumsum global)."""
+    n = x.shape[-1] - length + 1
+    total = x[..., :n].copy()
+    for shift in range(1, length):
+        total += x[..., shift : shift + n]
+    return total
+
+
+def rolling_mean(values: np.ndarray, length: int) -> np.ndarray:
+    x = np.ascontiguousarray(values, dtype="float64")
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= length:
+        out[..., length - 1 :] = _window_sum(x, length) / length
+    return out
+
+
+def bollinger(close: np.ndarray, length: int = 20, std: float = 2.0) -> Dict[str, np.ndarray]:
+    c = np.ascontiguousarray(close, dtype="float64")
+    mid = np.full(c.shape, np.nan)
+    dev = np.full(c.shape, np.nan)
+    if c.shape[-1] >= length:
+        n = c.shape[-1] - length + 1
+        mean = _window_sum(c, length) / length
+        sq = np.zeros(mean.shape)
+        for shift in range(length):
+            diff = c[..., shift : shift + n] - mean
+            sq += diff * diff
+        mid[..., length - 1 :] = mean
+        dev[..., length - 1 :] = np.sqrt(sq / length)
+    return {"BBL": mid - std * dev, "BBM": mid, "BBU": mid + std * dev}
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    h = np.ascontiguousarray(high, dtype="float64")
+    l = np.ascontiguousarray(low, dtype="float64")
+    c = np.ascontiguousarray(close, dtype="float64")
+    out = np.full(c.shape, np.nan)
+    if c.shape[-1] >= 2:
+        prev = c[..., :-1]
+        hi, lo = h[..., 1:], l[..., 1:]
+        out[..., 1:] = np.maximum(hi - lo, np.maximum(np.abs(hi - prev), np.abs(lo - prev)))
+    return out
+
+
+def compute(
+    close: np.ndarray,
+    high: Optional[np.ndarray] = None,
+    low: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """Columnas de `calcular_indicadores` (y TR/ATR si hay High/Low) desde arrays float64 sin NaN.
+
+    Acepta vectores (una serie) o matrices alineadas simbolos x velas; el resultado conserva la forma.
+    """
+    c = np.ascontiguousarray(close, dtype="float64")
+    out = {
+        "EMA_20": ema(c, 2.0 / 21.0),
+        "EMA_50": ema(c, 2.0 / 51.0),
+        "EMA_200": ema(c, 2.0 / 201.0),
+        "RSI": rsi(c, 14),
+    }
+    out.update(bollinger(c, 20, 2.0))
+    if high is not None and low is not None:
+        tr = true_range(high, low, c)
+        out["TR"] = tr
+        out["ATR"] = rolling_mean(tr, 14)
+    return out
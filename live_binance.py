@@ -1,16 +1,29 @@
 import asyncio
 import json
 import logging
+import os
 import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import Optional, Tuple
-import urllib.error
-import urllib.request
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 import pandas as pd
+import requests
+
+import http_pool
 
 logger = logging.getLogger(__name__)
 
+# Bases de REST y WebSocket; se pueden apuntar a un stand-in local (market_standin.py) para pruebas de carga.
+DEFAULT_REST_BASE = os.getenv("BINANCE_REST_BASE", "https://api.binance.com").rstrip("/")
+DEFAULT_WS_BASE = os.getenv("BINANCE_WS_BASE", "wss://stream.binance.com:9443").rstrip("/")
+REST_BASE = DEFAULT_REST_BASE
+WS_BASE = DEFAULT_WS_BASE
+# Limites de Binance: velas por pedido REST y streams por conexion combinada.
+REST_MAX_LIMIT = 1000
+MAX_STREAMS_PER_SOCKET = 1024
+
 WEBSOCKETS_AVAILABLE = False
 try:
     import websockets  # type: ignore
@@ -91,16 +104,36 @@ class BinanceLiveStore:
             return int(self.ws_reconnects)
 
 
-def fetch_klines(symbol: str, interval: str, limit: int = 500) -> Tuple[pd.DataFrame, Optional[str]]:
+def set_base_urls(rest_base: str = "", ws_base: str = "") -> None:
+    """Cambia las bases de Binance (vacio = valor de entorno o la API real)."""
+    global REST_BASE, WS_BASE
+    REST_BASE = (str(rest_base or "").strip() or DEFAULT_REST_BASE).rstrip("/")
+    WS_BASE = (str(ws_base or "").strip() or DEFAULT_WS_BASE).rstrip("/")
+
+
+def fetch_klines(
+    symbol: str,
+    interval: str,
+    limit: int = 500,
+    start_time: Optional[int] = None,
+) -> Tuple[pd.DataFrame, Optional[str]]:
     try:
         url = (
-            "https://api.binance.com/api/v3/klines"
+            f"{REST_BASE}/api/v3/klines"
             f"?symbol={symbol.upper()}&interval={interval}&limit={limit}"
         )
-        with urllib.request.urlopen(url, timeout=10) as resp:
-            raw = resp.read()
+        if start_time is not None:
+            url += f"&startTime={int(start_time)}"
+        resp = http_pool.get(url, timeout=10)
+        if resp.status_code >= 400:
+            err = f"Binance REST HTTP {resp.status_code} {resp.reason}"
+            body = resp.text or ""
+            if body:
+                err += f" | {body[:220]}"
+            logger.warning(err)
+            return pd.DataFrame(), err
 
-        data = json.loads(raw.decode("utf-8"))
+        data = json.loads(resp.content.decode("utf-8"))
         rows = []
         for k in data:
             ts = datetime.fromtimestamp(k[0] / 1000, tz=timezone.utc)
@@ -117,18 +150,7 @@ def fetch_klines(symbol: str, interval: str, limit: int = 500) -> Tuple[pd.DataF
 
         df = pd.DataFrame(rows).set_index("ts")
         return df, None
-    except urllib.error.HTTPError as exc:
-        body = ""
-        try:
-            body = exc.read().decode("utf-8", errors="ignore")
-        except Exception:
-            body = ""
-        err = f"Binance REST HTTP {exc.code} {exc.reason}"
-        if body:
-            err += f" | {body[:220]}"
-        logger.warning(err)
-        return pd.DataFrame(), err
-    except urllib.error.URLError as exc:
+    except requests.RequestException as exc:
         err = f"Binance REST URL error: {exc}"
         logger.warning(err)
         return pd.DataFrame(), err
@@ -142,7 +164,7 @@ async def _ws_consume(symbol: str, interval: str, store: BinanceLiveStore, stop_
     if websockets is None:
         return
 
-    url = f"wss://stream.binance.com:9443/ws/{symbol.lower()}@kline_{interval}"
+    url = f"{WS_BASE}/ws/{symbol.lower()}@kline_{interval}"
     while not stop_event.is_set():
         try:
             async with websockets.connect(url, ping_interval=20, ping_timeout=20) as ws:
@@ -170,3 +192,278 @@ def start_stream(symbol: str, interval: str, store: BinanceLiveStore) -> Tuple[t
     thread = threading.Thread(target=runner, name="binance-ws", daemon=True)
     thread.start()
     return thread, stop_event
+
+
+class BinanceKlineFeed:
+    """WebSockets combinados (symbol@kline_interval, hasta 1024 streams por conexion) que mantienen velas en memoria.
+
+    REST (`rest_fetch`) solo se usa para sembrar cada par y para reparar huecos tras reconexiones.
+    """
+
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        intervals: Iterable[str],
+        max_bars: int = 1000,
+        stale_sec: float = 90.0,
+        rest_fetch: Optional[Callable[..., Tuple[pd.DataFrame, Optional[str]]]] = None,
+    ) -> None:
+        self.pairs: List[Tuple[str, str]] = sorted(
+            {(str(s).upper(), str(i)) for s in symbols for i in intervals if str(s).strip() and str(i).strip()}
+        )
+        self.max_bars = max(10, int(max_bars))
+        self.stale_sec = float(stale_sec)
+        self._rest_fetch = rest_fetch or fetch_klines
+        self._lock = threading.Lock()
+        self._pair_locks: Dict[Tuple[str, str], threading.Lock] = {pair: threading.Lock() for pair in self.pairs}
+        self._bars: Dict[Tuple[str, str], "OrderedDict[int, Tuple[float, float, float, float, float]]"] = {
+            pair: OrderedDict() for pair in self.pairs
+        }
+        self.chunks: List[List[Tuple[str, str]]] = [
+            self.pairs[i : i + MAX_STREAMS_PER_SOCKET] for i in range(0, len(self.pairs), MAX_STREAMS_PER_SOCKET)
+        ]
+        self._seeded: set = set()
+        # Par -> velas pedidas al sembrar; si alguien pide mas se vuelve a sembrar con ese largo.
+        self._seed_limit: Dict[Tuple[str, str], int] = {}
+        # Par -> open_ms de la ultima vela recibida antes de la desconexion (desde ahi se repara por REST).
+        self._needs_repair: Dict[Tuple[str, str], Optional[int]] = {}
+        self._connected: set = set()
+        self._ever_connected: set = set()
+        self._last_message_monotonic = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._stats: Dict[str, Any] = {
+            "connects": 0,
+            "reconnects": 0,
+            "messages": 0,
+            "closed_bars": 0,
+            "rest_seeds": 0,
+            "rest_repairs": 0,
+            "rest_reseeds": 0,
+            "rest_errors": 0,
+            "served": 0,
+            "last_lag_ms": 0.0,
+            "max_lag_ms": 0.0,
+            "last_message_utc": "",
+            "last_error": "",
+        }
+
+    def stream_urls(self) -> List[str]:
+        urls = []
+        for chunk in self.chunks:
+            streams = "/".join(f"{symbol.lower()}@kline_{interval}" for symbol, interval in chunk)
+            urls.append(f"{WS_BASE}/stream?streams={streams}")
+        return urls
+
+    def start(self) -> bool:
+        if websockets is None or not self.pairs:
+            return False
+        if self._thread is not None and self._thread.is_alive():
+            return True
+        self._stop_event.clear()
+
+        def runner() -> None:
+            asyncio.run(self._consume())
+
+        self._thread = threading.Thread(target=runner, name="binance-ws-feed", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def is_live(self) -> bool:
+        with self._lock:
+            if len(self._connected) < len(self.chunks):
+                return False
+            return (time.monotonic() - self._last_message_monotonic) <= self.stale_sec
+
+    def apply_kline(self, k: dict, event_ms: Optional[int] = None) -> None:
+        try:
+            pair = (str(k.get("s", "")).upper(), str(k.get("i", "")))
+            open_ms = int(k.get("t"))
+            row = (float(k.get("o")), float(k.get("h")), float(k.get("l")), float(k.get("c")), float(k.get("v")))
+        except Exception:
+            return
+        with self._lock:
+            bars = self._bars.get(pair)
+            if bars is None:
+                return
+            out_of_order = bool(bars) and open_ms not in bars and open_ms < next(reversed(bars))
+            bars[open_ms] = row
+            if out_of_order:
+                self._bars[pair] = bars = OrderedDict(sorted(bars.items()))
+            while len(bars) > self.max_bars:
+                bars.popitem(last=False)
+            self._stats["messages"] += 1
+            if bool(k.get("x", False)):
+                self._stats["closed_bars"] += 1
+            self._last_message_monotonic = time.monotonic()
+            self._stats["last_message_utc"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            if event_ms:
+                lag_ms = max(0.0, datetime.now(timezone.utc).timestamp() * 1000.0 - float(event_ms))
+                self._stats["last_lag_ms"] = round(lag_ms, 1)
+                self._stats["max_lag_ms"] = round(max(float(self._stats["max_lag_ms"]), lag_ms), 1)
+
+    def _merge_rest(self, pair: Tuple[str, str], df: pd.DataFrame) -> None:
+        with self._lock:
+            bars = self._bars[pair]
+            for ts, row in df.iterrows():
+                open_ms = int(pd.Timestamp(ts).timestamp() * 1000)
+                bars[open_ms] = (
+                    float(row["Open"]),
+                    float(row["High"]),
+                    float(row["Low"]),
+                    float(row["Close"]),
+                    float(row.get("Volume", 0.0)),
+                )
+            self._bars[pair] = OrderedDict(sorted(bars.items())[-self.max_bars :])
+
+    def _fetch_or_count_error(self, symbol: str, interval: str, limit: int, start_time: Optional[int] = None) -> Optional[pd.DataFrame]:
+        if start_time is None:
+            df, err = self._rest_fetch(symbol, interval, limit=limit)
+        else:
+            df, err = self._rest_fetch(symbol, interval, limit=limit, start_time=start_time)
+        if df is None or df.empty:
+            with self._lock:
+                self._stats["rest_errors"] += 1
+                self._stats["last_error"] = str(err or "sin datos")
+            return None
+        return df
+
+    def _repair_gap(self, pair: Tuple[str, str], last_open_ms: int, limit: int) -> Optional[bool]:
+        """Pagina REST desde `last_open_ms` hasta empalmar con lo recibido por WS tras reconectar.
+
+        Devuelve None si falla un pedido y False si el hueco no entra en `max_bars` (hay que resembrar).
+        """
+        symbol, interval = pair
+        with self._lock:
+            target = next((open_ms for open_ms in self._bars[pair] if open_ms > last_open_ms), None)
+        start = last_open_ms
+        fetched = 0
+        while True:
+            df = self._fetch_or_count_error(symbol, interval, limit, start_time=start)
+            if df is None:
+                return None
+            self._merge_rest(pair, df)
+            fetched += len(df)
+            last_ms = int(pd.Timestamp(df.index[-1]).timestamp() * 1000)
+            if len(df) < limit or (target is not None and last_ms >= target):
+                return True
+            if fetched >= self.max_bars or last_ms <= start:
+                return False
+            start = last_ms
+
+    def _ensure_ready(self, pair: Tuple[str, str], limit: Optional[int] = None) -> bool:
+        symbol, interval = pair
+        limit = max(1, min(int(limit or self.max_bars), self.max_bars, REST_MAX_LIMIT))
+        with self._pair_locks[pair]:
+            with self._lock:
+                seeded = pair in self._seeded
+                repair = pair in self._needs_repair
+                last_open_ms = self._needs_repair.get(pair)
+                deeper = limit > self._seed_limit.get(pair, 0)
+            if seeded and not repair and not deeper:
+                return True
+            if seeded and repair and last_open_ms is not None:
+                repaired = self._repair_gap(pair, last_open_ms, limit)
+                if repaired is None:
+                    return False
+                if repaired:
+                    with self._lock:
+                        self._stats["rest_repairs"] += 1
+                        self._needs_repair.pop(pair, None)
+                    if not deeper:
+                        return True
+                else:
+                    # Hueco mayor que la ventana: lo guardado queda viejo y se vuelve a sembrar desde cero.
+                    with self._lock:
+                        self._bars[pair] = OrderedDict()
+                        self._stats["rest_reseeds"] += 1
+            df = self._fetch_or_count_error(symbol, interval, limit)
+            if df is None:
+                return False
+            self._merge_rest(pair, df)
+            with self._lock:
+                self._stats["rest_seeds"] += 1
+                self._seeded.add(pair)
+                self._seed_limit[pair] = max(limit, self._seed_limit.get(pair, 0))
+                self._needs_repair.pop(pair, None)
+            return True
+
+    def get_df(self, symbol: str, interval: str, limit: Optional[int] = None) -> Optional[pd.DataFrame]:
+        pair = (str(symbol).upper(), str(interval))
+        if pair not in self._bars or not self.is_live():
+            return None
+        if not self._ensure_ready(pair, limit):
+            return None
+        with self._lock:
+            items = list(self._bars[pair].items())
+            self._stats["served"] += 1
+        if not items:
+            return None
+        index = pd.to_datetime([open_ms for open_ms, _ in items], unit="ms", utc=True)
+        return pd.DataFrame(
+            [row for _, row in items],
+            index=index,
+            columns=["Open", "High", "Low", "Close", "Volume"],
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        live = self.is_live()
+        with self._lock:
+            payload = dict(self._stats)
+            payload["pairs"] = len(self.pairs)
+            payload["seeded_pairs"] = len(self._seeded)
+            payload["pending_repairs"] = len(self._needs_repair)
+            payload["sockets"] = len(self.chunks)
+            payload["connected_sockets"] = len(self._connected)
+            payload["connected"] = len(self._connected) == len(self.chunks)
+        payload["live"] = live
+        return payload
+
+    def _set_connected(self, connected: bool, error: str = "", chunk: int = 0) -> None:
+        with self._lock:
+            if connected:
+                self._connected.add(chunk)
+                self._stats["connects"] += 1
+                if chunk in self._ever_connected:
+                    self._stats["reconnects"] += 1
+                self._ever_connected.add(chunk)
+                self._last_message_monotonic = time.monotonic()
+            else:
+                self._connected.discard(chunk)
+                # Lo recibido tras reconectar puede tener huecos: se reparan por REST al pedir cada par,
+                # desde la ultima vela vista antes del corte (las velas nuevas del WS no mueven ese punto).
+                for pair in self.chunks[chunk] if chunk < len(self.chunks) else []:
+                    if pair not in self._seeded:
+                        continue
+                    bars = self._bars[pair]
+                    self._needs_repair.setdefault(pair, next(reversed(bars)) if bars else None)
+            if error:
+                self._stats["last_error"] = error
+
+    async def _consume(self) -> None:
+        if websockets is None:
+            return
+        await asyncio.gather(*(self._consume_socket(chunk, url) for chunk, url in enumerate(self.stream_urls())))
+
+    async def _consume_socket(self, chunk: int, url: str) -> None:
+        while not self._stop_event.is_set():
+            try:
+                async with websockets.connect(url, ping_interval=20, ping_timeout=20) as ws:
+                    self._set_connected(True, chunk=chunk)
+                    async for message in ws:
+                        if self._stop_event.is_set():
+                            break
+                        payload = json.loads(message)
+                        data = payload.get("data", payload)
+                        k = data.get("k") if isinstance(data, dict) else None
+                        if k:
+                            self.apply_kline(k, event_ms=data.get("E"))
+                self._set_connected(False, chunk=chunk)
+            except Exception as exc:
+                err = f"Binance WS feed error (socket {chunk}): {exc}"
+                logger.warning(err)
+                self._set_connected(False, error=err, chunk=chunk)
+                await asyncio.sleep(2)
@@ -0,0 +1,783 @@
+"""Stand-in local de Binance, TwelveData y Telegram (y SMTP) con velas sinteticas para pruebas de carga.
+
+Uso: python market_standin.py --symbols 500 [--port 8765] [--ws-port 8766] [--latency-ms 20]
+       [--error-rate 0.01] [--rate-limit 50] [--smtp-port 8025] [--write-config scanner_config.standin.json]
+
+Las velas son caminatas aleatorias deterministas por simbolo e intervalo (misma semilla y origen =
+mismas velas). `--write-config` deja una config del worker con `endpoints` apuntando aqui y los
+simbolos sinteticos en `extra_crypto_map`.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import base64
+import random
+import socketserver
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+WEBSOCKETS_AVAILABLE = False
+try:
+    import websockets  # type: ignore
+
+    WEBSOCKETS_AVAILABLE = True
+except Exception:
+    websockets = None
+
+INTERVAL_MS = {
+    "1m": 60_000,
+    "5m": 300_000,
+    "15m": 900_000,
+    "30m": 1_800_000,
+    "1h": 3_600_000,
+    "4h": 14_400_000,
+    "1d": 86_400_000,
+}
+TD_INTERVALS = {"1min": "1m", "5min": "5m", "15min": "15m", "30min": "30m", "1h": "1h", "4h": "4h", "1day": "1d"}
+CHUNK_BARS = 1024
+DEFAULT_HISTORY_BARS = 1000
+SERVICES = ("binance", "twelvedata", "telegram")
+
+
+def synthetic_symbols(count: int) -> Dict[str, Dict[str, str]]:
+    """Simbolos SYN#### con el formato de `extra_crypto_map` del worker."""
+    return {
+        f"SYN{pos:04d}": {"ticker": f"SYN{pos:04d}-USD", "binance": f"SYN{pos:04d}USDT", "td": f"SYN{pos:04d}/USD"}
+        for pos in range(max(0, int(count)))
+    }
+
+
+class SyntheticMarket:
+    """Caminata aleatoria por (simbolo, intervalo) anclada en `origin_ms`, generada por bloques deterministas."""
+
+    def __init__(self, seed: int = 7, origin_ms: Optional[int] = None, clock: Callable[[], float] = time.time) -> None:
+        self.seed = int(seed)
+        self.clock = clock
+        self.origin_ms = int(origin_ms) if origin_ms is not None else None
+        self._walks: Dict[Tuple[str, str], List[np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def now_ms(self) -> int:
+        return int(self.clock() * 1000)
+
+    def _origin(self, step: int) -> int:
+        if self.origin_ms is None:
+            # Sin origen fijo: historia de DEFAULT_HISTORY_BARS velas de 1d antes del arranque.
+            self.origin_ms = (self.now_ms() // INTERVAL_MS["1d"] - DEFAULT_HISTORY_BARS) * INTERVAL_MS["1d"]
+        return self.origin_ms - self.origin_ms % step
+
+    def _chunk(self, symbol: str, interval: str, chunk: int, last_close: float) -> np.ndarray:
+        key = zlib.crc32(f"{symbol.upper()}|{interval}".encode("utf-8"))
+        rng = np.random.default_rng([self.seed, key, chunk])
+        scale = 0.004 * (INTERVAL_MS[interval] / INTERVAL_MS["15m"]) ** 0.5
+        close = last_close * np.exp(np.cumsum(rng.normal(0.0, scale, CHUNK_BARS)))
+        open_ = np.concatenate(([last_close], close[:-1]))
+        high = np.maximum(open_, close) * (1.0 + rng.uniform(0.0, scale, CHUNK_BARS))
+        low = np.minimum(open_, close) * (1.0 - rng.uniform(0.0, scale, CHUNK_BARS))
+        volume = rng.lognormal(3.0, 0.6, CHUNK_BARS)
+        return np.column_stack((open_, high, low, close, volume))
+
+    def _bars(self, symbol: str, interval: str, upto: int) -> np.ndarray:
+        key = (symbol.upper(), interval)
+        with self._lock:
+            chunks = self._walks.setdefault(key, [])
+            while len(chunks) * CHUNK_BARS <= upto:
+                if chunks:
+                    last_close = float(chunks[-1][-1, 3])
+                else:
+                    last_close = 10.0 + zlib.crc32(symbol.upper().encode("utf-8")) % 50000
+                chunks.append(self._chunk(symbol, interval, len(chunks), last_close))
+            return np.concatenate(chunks[: upto // CHUNK_BARS + 1])
+
+    def klines(
+        self,
+        symbol: str,
+        interval: str,
+        limit: int = 500,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """Velas con `open_ms` hasta la vela en curso (incluida), como `/api/v3/klines`."""
+        step = INTERVAL_MS.get(interval)
+        if step is None:
+            raise ValueError(f"Intervalo no soportado: {interval}")
+        origin = self._origin(step)
+        now = self.now_ms() if end_ms is None else min(int(end_ms), self.now_ms())
+        last = (now - origin) // step
+        if last < 0:
+            return pd.DataFrame(columns=["open_ms", "Open", "High", "Low", "Close", "Volume"])
+        limit = max(1, min(int(limit), 1000))
+        if start_ms is not None:
+            first = max(0, -(-(int(start_ms) - origin) // step))
+            last = min(last, first + limit - 1)
+        else:
+            first = max(0, last - limit + 1)
+        if first > last:
+            return pd.DataFrame(columns=["open_ms", "Open", "High", "Low", "Close", "Volume"])
+        values = self._bars(symbol, interval, int(last))[first : last + 1]
+        out = pd.DataFrame(values, columns=["Open", "High", "Low", "Close", "Volume"])
+        out.insert(0, "open_ms", origin + np.arange(first, last + 1, dtype="int64") * step)
+        return out
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst if burst is not None else rate))
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> float:
+        """0.0 si hay cupo; si no, segundos hasta la siguiente ficha."""
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return 0.0
+            return (1.0 - self.tokens) / self.rate
+
+
+class MarketStandIn:
+    """Servidor HTTP (y WebSocket si hay `websockets`) en hilos de fondo."""
+
+    def __init__(
+        self,
+        market: Optional[SyntheticMarket] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        ws_port: Optional[int] = None,
+        latency_ms: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_per_sec: float = 0.0,
+        ws_push_sec: float = 1.0,
+        seed: int = 7,
+        telegram_chat_per_sec: float = 0.0,
+        telegram_group_per_min: float = 0.0,
+        photo_upload_ms: float = 0.0,
+    ) -> None:
+        self.market = market or SyntheticMarket(seed=seed)
+        self.host = host
+        self.port = int(port)
+        self.ws_port = ws_port
+        self.latency_ms = max(0.0, float(latency_ms))
+        self.error_rate = min(1.0, max(0.0, float(error_rate)))
+        self.ws_push_sec = max(0.05, float(ws_push_sec))
+        self._buckets = {service: _TokenBucket(rate_limit_per_sec) for service in SERVICES}
+        # Limites de Telegram por chat (1/s) y por grupo (20/min), aparte del global del servicio.
+        self.telegram_chat_per_sec = max(0.0, float(telegram_chat_per_sec))
+        self.telegram_group_per_min = max(0.0, float(telegram_group_per_min))
+        self._chat_buckets: Dict[str, _TokenBucket] = {}
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {
+            service: {"requests": 0, "errors": 0, "rate_limited": 0} for service in SERVICES + ("ws",)
+        }
+        self.stats["ws"].update({"connections": 0, "messages": 0})
+        self._file_ids = 0
+        self._issued_file_ids: set = set()
+        # Demora extra de sendPhoto con URL (Telegram descarga la imagen antes de responder).
+        self.photo_upload_ms = max(0.0, float(photo_upload_ms))
+        self._http: Optional[ThreadingHTTPServer] = None
+        self._threads: List[threading.Thread] = []
+        self._ws_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ws_stop: Optional[asyncio.Event] = None
+        self._ws_ready = threading.Event()
+
+    @property
+    def rest_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.ws_port}" if self.ws_port else ""
+
+    def endpoints(self) -> Dict[str, str]:
+        """Bloque `endpoints` de la config del worker."""
+        return {
+            "binance_rest": self.rest_url,
+            "binance_ws": self.ws_url,
+            "twelvedata": self.rest_url,
+            "telegram": self.rest_url,
+        }
+
+    def count(self, service: str, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[service][key] = int(self.stats[service].get(key, 0)) + amount
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._stats_lock:
+            return {service: dict(values) for service, values in self.stats.items()}
+
+    def fault(self, service: str) -> Tuple[str, float]:
+        """Latencia simulada y decision de falla: ("", 0) / ("rate", retry_sec) / ("error", 0)."""
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+        wait = self._buckets[service].take()
+        if wait > 0:
+            return "rate", wait
+        if self.error_rate > 0:
+            with self._rng_lock:
+                failed = self._rng.random() < self.error_rate
+            if failed:
+                return "error", 0.0
+        return "", 0.0
+
+    def chat_fault(self, chat_id: str) -> float:
+        """Segundos de espera si el chat supero su limite (0.0 = hay cupo)."""
+        rate = self.telegram_group_per_min / 60.0 if chat_id.startswith("-") else self.telegram_chat_per_sec
+        if rate <= 0 or not chat_id:
+            return 0.0
+        with self._stats_lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = _TokenBucket(rate, burst=1.0)
+                self._chat_buckets[chat_id] = bucket
+        return bucket.take()
+
+    def next_file_id(self) -> str:
+        with self._stats_lock:
+            self._file_ids += 1
+            file_id = f"standin-photo-{self._file_ids}"
+            self._issued_file_ids.add(file_id)
+            return file_id
+
+    def known_file_id(self, file_id: str) -> bool:
+        with self._stats_lock:
+            return file_id in self._issued_file_ids
+
+    def start(self) -> "MarketStandIn":
+        self._http = ThreadingHTTPServer((self.host, self.port), _handler_for(self))
+        self._http.daemon_threads = True
+        self.port = int(self._http.server_address[1])
+        thread = threading.Thread(target=self._http.serve_forever, name="standin-http", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        if self.ws_port is not None:
+            if websockets is None:
+                logging.warning("websockets no disponible; stand-in sin WebSocket.")
+                self.ws_port = None
+            else:
+                thread = threading.Thread(target=lambda: asyncio.run(self._serve_ws()), name="standin-ws", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+                self._ws_ready.wait(timeout=10)
+        return self
+
+    def stop(self) -> None:
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+        if self._ws_loop is not None and self._ws_stop is not None:
+            self._ws_loop.call_soon_threadsafe(self._ws_stop.set)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def __enter__(self) -> "MarketStandIn":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    async def _serve_ws(self) -> None:
+        self._ws_loop = asyncio.get_running_loop()
+        self._ws_stop = asyncio.Event()
+        async with websockets.serve(self._ws_handler, self.host, int(self.ws_port or 0)) as server:
+            sockets = list(getattr(server, "sockets", None) or [])
+            if sockets:
+                self.ws_port = int(sockets[0].getsockname()[1])
+            self._ws_ready.set()
+            await self._ws_stop.wait()
+
+    async def _ws_handler(self, ws: Any, path: Optional[str] = None) -> None:
+        if path is None:
+            request = getattr(ws, "request", None)
+            path = getattr(request, "path", "") if request is not None else getattr(ws, "path", "")
+        parts = urlsplit(str(path or ""))
+        if parts.path.startswith("/ws/"):
+            names, combined = [parts.path[len("/ws/") :]], False
+        else:
+            names, combined = parse_qs(parts.query).get("streams", [""])[0].split("/"), True
+        streams = []
+        for name in names:
+            symbol, _, interval = name.partition("@kline_")
+            if symbol and interval in INTERVAL_MS:
+                streams.append((name, symbol.upper(), interval))
+        self.count("ws", "connections")
+        sent_open: Dict[str, int] = {}
+        try:
+            while True:
+                for name, symbol, interval in streams:
+                    for event in self._kline_events(symbol, interval, sent_open.get(name)):
+                        sent_open[name] = int(event["k"]["t"])
+                        await ws.send(json.dumps({"stream": name, "data": event} if combined else event))
+                        self.count("ws", "messages")
+                await asyncio.sleep(self.ws_push_sec)
+        except websockets.ConnectionClosed:
+            return
+
+    def _kline_events(self, symbol: str, interval: str, last_open: Optional[int]) -> List[Dict[str, Any]]:
+        step = INTERVAL_MS[interval]
+        frame = self.market.klines(symbol, interval, limit=2)
+        events = []
+        for pos, row in enumerate(frame.itertuples(index=False)):
+            closed = pos < len(frame) - 1
+            # La vela previa solo se reenvia cerrada (x=True) una vez, al abrir la siguiente.
+            if closed and (last_open is None or int(row.open_ms) != last_open):
+                continue
+            events.append(
+                {
+                    "e": "kline",
+                    "E": self.market.now_ms(),
+                    "s": symbol,
+                    "k": {
+                        "t": int(row.open_ms),
+                        "T": int(row.open_ms) + step - 1,
+                        "s": symbol,
+                        "i": interval,
+                        "o": f"{row.Open:.8f}",
+                        "h": f"{row.High:.8f}",
+                        "l": f"{row.Low:.8f}",
+                        "c": f"{row.Close:.8f}",
+                        "v": f"{row.Volume:.4f}",
+                        "x": closed,
+                    },
+                }
+            )
+        return events
+
+
+def _handler_for(standin: MarketStandIn) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Cabeceras y cuerpo salen en dos writes: sin TCP_NODELAY una conexion keep-alive espera el ACK retrasado (~40 ms).
+        disable_nagle_algorithm = True
+
+        def log_message(self, fmt: str, *args: Any) -> None:
+            logging.debug("stand-in %s", fmt % args)
+
+        def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _params(self) -> Dict[str, str]:
+            parts = urlsplit(self.path)
+            params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length > 0 else b""
+            content_type = self.headers.get("Content-Type", "")
+            if body and content_type.startswith("application/x-www-form-urlencoded"):
+                params.update({key: values[-1] for key, values in parse_qs(body.decode("utf-8")).items()})
+            elif body and content_type.startswith("application/json"):
+                try:
+                    params.update({str(k): str(v) for k, v in json.loads(body.decode("utf-8")).items()})
+                except Exception:
+                    pass
+            return params
+
+        def do_GET(self) -> None:
+            self._route()
+
+        def do_POST(self) -> None:
+            self._route()
+
+        def _route(self) -> None:
+            path = urlsplit(self.path).path
+            params = self._params()
+            if path == "/stats":
+                self._send(200, standin.snapshot())
+            elif path == "/api/v3/klines":
+                self._binance(params)
+            elif path == "/time_series":
+                self._twelvedata(params)
+            elif path.startswith("/bot"):
+                self._telegram(path.rsplit("/", 1)[-1], params)
+            else:
+                self._send(404, {"error": f"ruta desconocida: {path}"})
+
+        def _binance(self, params: Dict[str, str]) -> None:
+            standin.count("binance", "requests")
+            fault, wait = standin.fault("binance")
+            if fault == "rate":
+                standin.count("binance", "rate_limited")
+                self._send(429, {"code": -1003, "msg": "Too many requests."}, {"Retry-After": str(max(1, round(wait)))})
+                return
+            if fault == "error":
+                standin.count("binance", "errors")
+                self._send(503, {"code": -1001, "msg": "Internal error; unable to process your request."})
+                return
+            interval = params.get("interval", "")
+            if interval not in INTERVAL_MS or not params.get("symbol"):
+                self._send(400, {"code": -1120, "msg": "Invalid interval."})
+                return
+            frame = standin.market.klines(
+                params["symbol"],
+                interval,
+                limit=int(params.get("limit", 500) or 500),
+                start_ms=int(params["startTime"]) if params.get("startTime") else None,
+                end_ms=int(params["endTime"]) if params.get("endTime") else None,
+            )
+            step = INTERVAL_MS[interval]
+            rows = [
+                [
+                    int(row.open_ms),
+                    f"{row.Open:.8f}",
+                    f"{row.High:.8f}",
+                    f"{row.Low:.8f}",
+                    f"{row.Close:.8f}",
+                    f"{row.Volume:.4f}",
+                    int(row.open_ms) + step - 1,
+                    "0",
+                    0,
+                    "0",
+                    "0",
+                    "0",
+                ]
+                for row in frame.itertuples(index=False)
+            ]
+            self._send(200, rows)
+
+        def _twelvedata(self, params: Dict[str, str]) -> None:
+            standin.count("twelvedata", "requests")
+            fault, _ = standin.fault("twelvedata")
+            # TwelveData responde 200 con `status: error` tambien para limite y fallas.
+            if fault == "rate":
+                standin.count("twelvedata", "rate_limited")
+                self._send(200, {"code": 429, "message": "You have run out of API credits for the current minute.", "status": "error"})
+                return
+            if fault == "error":
+                standin.count("twelvedata", "errors")
+                self._send(200, {"code": 500, "message": "Internal error.", "status": "error"})
+                return
+            interval = TD_INTERVALS.get(params.get("interval", ""))
+            symbol = params.get("symbol", "").replace("/", "")
+            if interval is None or not symbol:
+                self._send(200, {"code": 400, "message": "Invalid interval or symbol.", "status": "error"})
+                return
+            start_ms = None
+            if params.get("start_date"):
+                start = pd.Timestamp(params["start_date"])
+                start_ms = int((start.tz_localize("UTC") if start.tzinfo is None else start).value // 10**6)
+            frame = standin.market.klines(symbol, interval, limit=int(params.get("outputsize", 30) or 30), start_ms=start_ms)
+            stamps = pd.to_datetime(frame["open_ms"], unit="ms").dt.strftime("%Y-%m-%d %H:%M:%S")
+            values = [
+                {
+                    "datetime": stamp,
+                    "open": f"{row.Open:.5f}",
+                    "high": f"{row.High:.5f}",
+                    "low": f"{row.Low:.5f}",
+                    "close": f"{row.Close:.5f}",
+                    "volume": f"{row.Volume:.0f}",
+                }
+                for stamp, row in zip(stamps, frame.itertuples(index=False))
+            ]
+            meta = {"symbol": params.get("symbol", ""), "interval": params.get("interval", ""), "type": "Digital Currency"}
+            self._send(200, {"meta": meta, "values": values[::-1], "status": "ok"})
+
+        def _telegram(self, method: str, params: Dict[str, str]) -> None:
+            standin.count("telegram", "requests")
+            fault, wait = standin.fault("telegram")
+            if not fault and method in ("sendMessage", "sendPhoto"):
+                chat_wait = standin.chat_fault(str(params.get("chat_id", "") or ""))
+                if chat_wait > 0:
+                    fault, wait = "rate", chat_wait
+                    standin.count("telegram", "chat_limited")
+            if fault == "rate":
+                standin.count("telegram", "rate_limited")
+                retry_after = max(1, round(wait))
+                self._send(
+                    429,
+                    {
+                        "ok": False,
+                        "error_code": 429,
+                        "description": f"Too Many Requests: retry after {retry_after}",
+                        "parameters": {"retry_after": retry_after},
+                    },
+                    {"Retry-After": str(retry_after)},
+                )
+                return
+            if fault == "error":
+                standin.count("telegram", "errors")
+                self._send(502, {"ok": False, "error_code": 502, "description": "Bad Gateway"})
+                return
+            now = int(standin.market.clock())
+            chat_id = str(params.get("chat_id", "") or "")
+            chat = {"id": int(chat_id) if chat_id.lstrip("-").isdigit() else 0, "type": "private"}
+            message = {"message_id": now % 10**9, "date": now, "chat": chat}
+            if method == "sendMessage":
+                self._send(200, {"ok": True, "result": dict(message, text=params.get("text", ""))})
+            elif method == "sendPhoto":
+                photo = str(params.get("photo", "") or "")
+                if photo and "://" not in photo:
+                    if not standin.known_file_id(photo):
+                        standin.count("telegram", "errors")
+                        self._send(400, {"ok": False, "error_code": 400, "description": "Bad Request: wrong file identifier/HTTP URL specified"})
+                        return
+                    file_id = photo
+                    standin.count("telegram", "photo_reused")
+                else:
+                    if standin.photo_upload_ms > 0:
+                        time.sleep(standin.photo_upload_ms / 1000.0)
+                    file_id = standin.next_file_id()
+                    standin.count("telegram", "photo_uploads")
+                photo = [{"file_id": file_id, "file_unique_id": hashlib.sha1(file_id.encode("utf-8")).hexdigest()[:16], "width": 1280, "height": 720}]
+                self._send(200, {"ok": True, "result": dict(message, photo=photo)})
+            elif method == "getUpdates":
+                self._send(200, {"ok": True, "result": []})
+            else:
+                self._send(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+
+    return Handler
+
+
+class SmtpStandIn:
+    """Servidor SMTP minimo (EHLO, AUTH PLAIN/LOGIN, MAIL/RCPT/DATA, RSET, NOOP, QUIT) sin TLS.
+
+    `latency_ms` se aplica a cada respuesta (un RTT por comando), `auth_ms` al login y
+    `drop_after` cierra la conexion tras N mensajes (simula el corte del servidor).
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        user: str = "bot@standin.test",
+        password: str = "secret",
+        latency_ms: float = 0.0,
+        auth_ms: float = 0.0,
+        drop_after: int = 0,
+    ) -> None:
+        self.host = host
+        self.port = int(port)
+        self.user = user
+        self.password = password
+        self.latency_ms = max(0.0, float(latency_ms))
+        self.auth_ms = max(0.0, float(auth_ms))
+        self.drop_after = max(0, int(drop_after))
+        self.messages: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"connections": 0, "logins": 0, "auth_failed": 0, "messages": 0, "dropped": 0}
+        self._server: Optional[socketserver.ThreadingTCPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] = int(self.stats.get(key, 0)) + amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def deliver(self, sender: str, rcpts: List[str], data: bytes) -> None:
+        with self._lock:
+            self.messages.append({"from": sender, "to": list(rcpts), "data": data})
+            self.stats["messages"] += 1
+
+    def start(self) -> "SmtpStandIn":
+        self._server = socketserver.ThreadingTCPServer((self.host, self.port), _smtp_handler_for(self))
+        self._server.daemon_threads = True
+        self.port = int(self._server.server_address[1])
+        self._thread = threading.Thread(target=self._server.serve_forever, name="standin-smtp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self) -> "SmtpStandIn":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def _smtp_handler_for(standin: SmtpStandIn) -> type:
+    class Handler(socketserver.StreamRequestHandler):
+        disable_nagle_algorithm = True
+
+        def _reply(self, *lines: str) -> None:
+            if standin.latency_ms > 0:
+                time.sleep(standin.latency_ms / 1000.0)
+            out = [f"{line[:3]}{'-' if pos < len(lines) - 1 else ' '}{line[4:]}" for pos, line in enumerate(lines)]
+            self.wfile.write(("\r\n".join(out) + "\r\n").encode("utf-8"))
+
+        def _readline(self) -> str:
+            return self.rfile.readline(65536).decode("utf-8", errors="replace").rstrip("\r\n")
+
+        def _auth(self, arg: str) -> bool:
+            if standin.auth_ms > 0:
+                time.sleep(standin.auth_ms / 1000.0)
+            mech, _, initial = arg.partition(" ")
+            try:
+                if mech.upper() == "PLAIN":
+                    if not initial:
+                        self._reply("334 ")
+                        initial = self._readline()
+                    _, user, password = base64.b64decode(initial).decode("utf-8").split("\0", 2)
+                elif mech.upper() == "LOGIN":
+                    self._reply("334 VXNlcm5hbWU6")
+                    user = base64.b64decode(self._readline()).decode("utf-8")
+                    self._reply("334 UGFzc3dvcmQ6")
+                    password = base64.b64decode(self._readline()).decode("utf-8")
+                else:
+                    return False
+            except Exception:
+                return False
+            return user == standin.user and password == standin.password
+
+        def handle(self) -> None:
+            standin.count("connections")
+            self._reply("220 standin ESMTP")
+            authed = False
+            sender = ""
+            rcpts: List[str] = []
+            sent = 0
+            while True:
+                line = self._readline()
+                if not line:
+                    return
+                verb, _, arg = line.partition(" ")
+                verb = verb.upper()
+                if verb in ("EHLO", "HELO"):
+                    self._reply("250 standin", "250 AUTH PLAIN LOGIN", "250 8BITMIME")
+                elif verb == "AUTH":
+                    if self._auth(arg):
+                        authed = True
+                        standin.count("logins")
+                        self._reply("235 2.7.0 Authentication successful")
+                    else:
+                        standin.count("auth_failed")
+                        self._reply("535 5.7.8 Username and Password not accepted")
+                elif verb == "MAIL":
+                    if not authed:
+                        self._reply("530 5.7.0 Authentication Required")
+                        continue
+                    sender, rcpts = arg.split(":", 1)[-1].strip().split(" ")[0].strip("<>"), []
+                    self._reply("250 2.1.0 OK")
+                elif verb == "RCPT":
+                    rcpts.append(arg.split(":", 1)[-1].strip().strip("<>"))
+                    self._reply("250 2.1.5 OK")
+                elif verb == "DATA":
+                    self._reply("354 Go ahead")
+                    chunks = []
+                    while True:
+                        raw = self.rfile.readline(65536)
+                        if not raw or raw in (b".\r\n", b".\n"):
+                            break
+                        chunks.append(raw[1:] if raw.startswith(b"..") else raw)
+                    standin.deliver(sender, rcpts, b"".join(chunks))
+                    sent += 1
+                    self._reply("250 2.0.0 OK queued")
+                    if standin.drop_after and sent >= standin.drop_after:
+                        standin.count("dropped")
+                        return
+                elif verb in ("RSET", "NOOP"):
+                    sender, rcpts = "", []
+                    self._reply("250 2.0.0 OK")
+                elif verb == "QUIT":
+                    self._reply("221 2.0.0 Bye")
+                    return
+                else:
+                    self._reply("502 5.5.1 Unrecognized command")
+
+    return Handler
+
+
+def worker_config(standin: MarketStandIn, symbols: int, base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    cfg = dict(base or {})
+    extra = synthetic_symbols(symbols)
+    cfg["endpoints"] = standin.endpoints()
+    cfg["extra_crypto_map"] = extra
+    cfg["crypto_symbols"] = list(extra)
+    cfg["scan_gold"] = False
+    return cfg
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ws-port", type=int, default=8766, help="Puerto WebSocket (-1 = sin WebSocket).")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraccion de respuestas con error (0-1).")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests/s por servicio antes de 429 (0 = sin limite).")
+    parser.add_argument("--telegram-chat-rate", type=float, default=0.0, help="Mensajes/s por chat antes de 429 (Telegram: 1).")
+    parser.add_argument("--telegram-group-rate", type=float, default=0.0, help="Mensajes/min por grupo antes de 429 (Telegram: 20).")
+    parser.add_argument("--photo-upload-ms", type=float, default=0.0, help="Demora extra de sendPhoto con URL.")
+    parser.add_argument("--smtp-port", type=int, default=-1, help="Puerto del SMTP stand-in (-1 = sin SMTP).")
+    parser.add_argument("--ws-push-sec", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--write-config", default="", help="Escribe una config del worker apuntando al stand-in.")
+    parser.add_argument("--base-config", default="", help="Config JSON a extender con --write-config.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    standin = MarketStandIn(
+        host=args.host,
+        port=args.port,
+        ws_port=None if args.ws_port < 0 else args.ws_port,
+        latency_ms=args.latency_ms,
+        error_rate=args.error_rate,
+        rate_limit_per_sec=args.rate_limit,
+        ws_push_sec=args.ws_push_sec,
+        seed=args.seed,
+        telegram_chat_per_sec=args.telegram_chat_rate,
+        telegram_group_per_min=args.telegram_group_rate,
+        photo_upload_ms=args.photo_upload_ms,
+    ).start()
+    smtp = None
+    if args.smtp_port >= 0:
+        smtp = SmtpStandIn(host=args.host, port=args.smtp_port, latency_ms=args.latency_ms).start()
+        logging.info("SMTP stand-in en %s:%s (usuario %s)", smtp.host, smtp.port, smtp.user)
+    if args.write_config:
+        base = json.loads(Path(args.base_config).read_text(encoding="utf-8")) if args.base_config else {}
+        path = Path(args.write_config).resolve()
+        path.write_text(json.dumps(worker_config(standin, args.symbols, base), indent=2) + "\n", encoding="utf-8")
+        logging.info("Config del worker escrita en %s", path)
+    logging.info("Stand-in en %s (ws=%s), %s simbolos sinteticos", standin.rest_url, standin.ws_url or "-", args.symbols)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin.stop()
+        if smtp is not None:
+            smtp.stop()
+            logging.info("SMTP stand-in detenido: %s", json.dumps(smtp.snapshot()))
+        logging.info("Stand-in detenido: %s", json.dumps(standin.snapshot()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
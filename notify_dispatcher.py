@@ -0,0 +1,274 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SendFn = Callable[[], Tuple[bool, str]]
+
+
+@dataclass
+class NotificationJob:
+    """Un envio (canal + destinatario). `send` devuelve (ok, error) como los `_send_*` del worker.
+
+    Mayor `priority` sale antes de la cola (premium = 1).
+    """
+
+    channel: str
+    send: SendFn
+    target: str = ""
+    meta: Dict[str, Any] = field(default_factory=dict)
+    priority: int = 0
+    ok: bool = False
+    error: str = ""
+    latency_ms: float = 0.0
+    done: bool = False
+
+
+class NotificationBatch:
+    """Envios de una alerta. `followup(batch)` corre al terminar todos y puede devolver envios extra
+    (p.ej. el toast de Windows, que depende de si algun premium recibio la alerta)."""
+
+    def __init__(
+        self,
+        key: str,
+        jobs: List[NotificationJob],
+        followup: Optional[Callable[["NotificationBatch"], List[NotificationJob]]] = None,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.key = key
+        self.jobs = list(jobs)
+        self.followup = followup
+        self.context = context if context is not None else {}
+        self.queued_at = time.time()
+        self.finished_at = 0.0
+        self._remaining = len(self.jobs)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _job_finished(self) -> bool:
+        with self._lock:
+            self._remaining -= 1
+            return self._remaining <= 0
+
+    def _finish(self) -> List[NotificationJob]:
+        extra: List[NotificationJob] = []
+        if self.followup is not None:
+            try:
+                extra = list(self.followup(self) or [])
+            except Exception as exc:
+                logger.exception("Followup de notificacion %s fallo: %s", self.key, exc)
+        for job in extra:
+            run_job(job)
+        self.jobs.extend(extra)
+        self.finished_at = time.time()
+        self._done.set()
+        return extra
+
+
+def run_job(job: NotificationJob) -> NotificationJob:
+    started = time.perf_counter()
+    try:
+        ok, err = job.send()
+    except Exception as exc:
+        ok, err = False, str(exc)
+    job.latency_ms = (time.perf_counter() - started) * 1000.0
+    job.ok = bool(ok)
+    job.error = "" if ok else str(err or "")
+    job.done = True
+    return job
+
+
+def run_batch(batch: NotificationBatch) -> NotificationBatch:
+    """Ejecuta el batch en el hilo actual (modo sincrono / cola llena)."""
+    for job in list(batch.jobs):
+        run_job(job)
+    batch._finish()
+    return batch
+
+
+_STOP_PRIORITY = 1 << 30
+
+
+def _new_channel_stats() -> Dict[str, Any]:
+    return {"sent": 0, "failed": 0, "busy_ms": 0.0, "window_done": 0}
+
+
+class NotificationDispatcher:
+    """Cola acotada de envios + pool de hilos.
+
+    Cada batch se reparte en envios individuales (por usuario/canal) que los hilos toman en paralelo,
+    por prioridad y luego en orden de llegada. Al completarse el ultimo se corre el followup y el batch
+    queda en `drain()`. El dispatcher nunca toca el estado del scanner: aplicar resultados es trabajo de
+    quien llama a `drain()`.
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 256, name: str = "notify") -> None:
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+        self.name = name
+        self._queue: "queue.PriorityQueue[Tuple[int, int, Optional[NotificationBatch], Optional[NotificationJob]]]" = (
+            queue.PriorityQueue(self.queue_size)
+        )
+        self._seq = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._completed: Deque[NotificationBatch] = deque()
+        self._in_flight: Dict[int, NotificationBatch] = {}
+        self._channels: Dict[str, Dict[str, Any]] = {}
+        self._window_started = time.monotonic()
+        self._stats: Dict[str, Any] = {
+            "batches_submitted": 0,
+            "batches_completed": 0,
+            "jobs_submitted": 0,
+            "jobs_completed": 0,
+            "overflow": 0,
+            "split_batches": 0,
+            "queue_peak": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{self.name}-{pos}", daemon=True) for pos in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        """Espera a que se vacie la cola (hasta `timeout`) y detiene los hilos. False si quedaron envios."""
+        flushed = self.wait_idle(timeout)
+        for _ in self._threads:
+            self._queue.put((_STOP_PRIORITY, next(self._seq), None, None))
+        for thread in self._threads:
+            thread.join(timeout=max(0.1, timeout))
+        self._threads = []
+        return flushed
+
+    def submit(self, batch: NotificationBatch) -> bool:
+        """Encola el batch completo o nada. False si no hay hilos o la cola no tiene espacio.
+
+        Un batch con mas envios que `queue_size` nunca cabria entero: se encola por partes y el hilo que
+        llama espera a que los hilos vacien la cola para poner el resto.
+        """
+        if not self.running:
+            return False
+        oversized = len(batch.jobs) > self.queue_size
+        with self._lock:
+            # Solo el hilo del scanner encola: el espacio medido aqui no puede achicarse antes del put.
+            if not oversized and self._queue.qsize() + len(batch.jobs) > self.queue_size:
+                self._stats["overflow"] += 1
+                return False
+            self._in_flight[id(batch)] = batch
+            self._stats["batches_submitted"] += 1
+            self._stats["jobs_submitted"] += len(batch.jobs)
+            if oversized:
+                self._stats["split_batches"] += 1
+        if not batch.jobs:
+            self._complete(batch)
+            return True
+        for job in batch.jobs:
+            self._queue.put((-int(job.priority), next(self._seq), batch, job), block=oversized)
+        with self._lock:
+            self._stats["queue_peak"] = max(self._stats["queue_peak"], self._queue.qsize())
+        return True
+
+    def _run(self) -> None:
+        while True:
+            _, _, batch, job = self._queue.get()
+            if batch is None or job is None:
+                self._queue.task_done()
+                return
+            try:
+                run_job(job)
+                self._observe(job)
+                if batch._job_finished():
+                    for extra in batch._finish():
+                        self._observe(extra)
+                    self._complete(batch)
+            except Exception as exc:
+                logger.exception("Error en hilo de notificaciones: %s", exc)
+            finally:
+                self._queue.task_done()
+
+    def _observe(self, job: NotificationJob) -> None:
+        with self._lock:
+            bucket = self._channels.setdefault(job.channel, _new_channel_stats())
+            bucket["sent" if job.ok else "failed"] += 1
+            bucket["busy_ms"] += job.latency_ms
+            bucket["window_done"] += 1
+            self._stats["jobs_completed"] += 1
+
+    def _complete(self, batch: NotificationBatch) -> None:
+        if not batch.done:
+            batch._finish()
+        with self._lock:
+            self._in_flight.pop(id(batch), None)
+            self._completed.append(batch)
+            self._stats["batches_completed"] += 1
+
+    def drain(self) -> List[NotificationBatch]:
+        """Batches terminados desde la ultima llamada, en orden de finalizacion."""
+        with self._lock:
+            done = list(self._completed)
+            self._completed.clear()
+        return done
+
+    def pending_keys(self) -> List[str]:
+        with self._lock:
+            return [batch.key for batch in self._in_flight.values()]
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + max(0.0, float(timeout))
+        while True:
+            with self._lock:
+                pending = list(self._in_flight.values())
+            if not pending:
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            pending[0].wait(remaining)
+
+    def stats(self, reset_window: bool = True) -> Dict[str, Any]:
+        """Profundidad de cola + envios por canal; `per_sec` se mide desde la ultima ventana."""
+        now = time.monotonic()
+        with self._lock:
+            elapsed = max(1e-6, now - self._window_started)
+            channels = {}
+            for channel, bucket in self._channels.items():
+                channels[channel] = {
+                    "sent": int(bucket["sent"]),
+                    "failed": int(bucket["failed"]),
+                    "busy_ms": round(float(bucket["busy_ms"]), 3),
+                    "per_sec": round(bucket["window_done"] / elapsed, 3),
+                }
+                if reset_window:
+                    bucket["window_done"] = 0
+            if reset_window:
+                self._window_started = now
+            return {
+                "workers": len(self._threads),
+                "queue_size": self.queue_size,
+                "queue_depth": self._queue.qsize(),
+                "in_flight": len(self._in_flight),
+                **dict(self._stats),
+                "channels": channels,
+            }
@@ -0,0 +1,211 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Codigos de resultado; mismas etiquetas que `_evaluate_open_alert_outcome` en scanner_worker.
+STATUS_NAMES = ("open", "win", "loss", "timeout")
+OPEN, WIN, LOSS, TIMEOUT = range(4)
+QUALITY_HISTORY_LIMIT = 120
+_MAX_CELLS = 4_000_000
+_DIRECTION_SIGN = {"ALCISTA": 1, "BAJISTA": -1}
+
+
+def _column(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.zeros(len(df))
+    # Igual que `_safe_float` en vivo: NaN cuenta como 0.0.
+    return np.nan_to_num(pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64"), nan=0.0)
+
+
+def label_outcomes(
+    high: np.ndarray,
+    low: np.ndarray,
+    entry_pos: np.ndarray,
+    direction: np.ndarray,
+    tp_price: np.ndarray,
+    sl_price: np.ndarray,
+    max_bars: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """Primer toque de TP/SL para cada senal sobre las velas posteriores a `entry_pos`, sin bucle por vela.
+
+    Replica la regla en vivo: velas `entry+1 .. entry+max_bars`, TP y SL en la misma vela cuenta
+    como loss, y sin toque dentro de la ventana es timeout. Si la historia termina antes, queda
+    `open`. `direction` es +1 (alcista) / -1 (bajista). Devuelve `status` (codigo), `bars` y `same_bar`.
+    """
+    high = np.asarray(high, dtype="float64")
+    low = np.asarray(low, dtype="float64")
+    entry_pos = np.asarray(entry_pos, dtype="int64")
+    direction = np.asarray(direction, dtype="int64")
+    tp_price = np.asarray(tp_price, dtype="float64")
+    sl_price = np.asarray(sl_price, dtype="float64")
+    max_bars = np.maximum(1, np.asarray(max_bars, dtype="int64"))
+    count = len(entry_pos)
+    status = np.full(count, OPEN, dtype="int8")
+    bars = np.zeros(count, dtype="int64")
+    same_bar = np.zeros(count, dtype=bool)
+    if count == 0 or len(high) == 0:
+        return {"status": status, "bars": bars, "same_bar": same_bar}
+
+    width = int(max_bars.max())
+    offsets = np.arange(1, width + 1)
+    step = max(1, _MAX_CELLS // width)
+    for start in range(0, count, step):
+        rows = slice(start, start + step)
+        idx = entry_pos[rows, None] + offsets
+        in_window = (idx < len(high)) & (offsets <= max_bars[rows, None])
+        idx = np.minimum(idx, len(high) - 1)
+        h = high[idx]
+        l = low[idx]
+        tp = tp_price[rows, None]
+        sl = sl_price[rows, None]
+        long_side = direction[rows, None] > 0
+        short_side = direction[rows, None] < 0
+        win = (long_side & (h >= tp)) | (short_side & (l <= tp))
+        win &= tp > 0
+        loss = (long_side & (l <= sl) & (sl < tp)) | (short_side & (h >= sl) & (sl > tp))
+        win &= in_window
+        loss &= in_window
+
+        touched = win | loss
+        first = touched.argmax(axis=1)
+        hit = touched.any(axis=1)
+        pick = np.arange(len(first))
+        first_loss = loss[pick, first]
+        available = in_window.sum(axis=1)
+        window = max_bars[rows]
+
+        chunk_status = np.where(
+            hit,
+            np.where(first_loss, LOSS, WIN),
+            np.where(available >= window, TIMEOUT, OPEN),
+        )
+        status[rows] = chunk_status
+        bars[rows] = np.where(hit, first + 1, np.minimum(available, window))
+        same_bar[rows] = hit & first_loss & win[pick, first]
+    return {"status": status, "bars": bars, "same_bar": same_bar}
+
+
+def label_signals(df: pd.DataFrame, signals: pd.DataFrame) -> pd.DataFrame:
+    """Etiqueta senales (`bar`, `direction`, `tp_price`, `sl_price`, `max_bars`) contra velas OHLC.
+
+    `bar` es la vela de entrada: timestamp del indice de `df` o posicion entera. Agrega
+    `status`, `bars_elapsed`, `outcome_note`, `close_price` y `closed_bar_utc`.
+    """
+    out = signals.copy()
+    size = 0 if df is None else len(df)
+    if out.empty or size == 0:
+        for col, value in (("status", "open"), ("bars_elapsed", 0), ("outcome_note", ""), ("close_price", 0.0), ("closed_bar_utc", "")):
+            out[col] = value
+        return out
+
+    raw_bar = out["bar"]
+    if pd.api.types.is_integer_dtype(raw_bar.dtype):
+        entry = raw_bar.to_numpy(dtype="int64")
+    else:
+        index = pd.DatetimeIndex(df.index)
+        stamps = pd.DatetimeIndex(pd.to_datetime(raw_bar, utc=index.tz is not None))
+        entry = index.get_indexer(stamps)
+    if (entry < 0).any() or (entry >= size).any():
+        raise ValueError("Senales con vela de entrada fuera del historico.")
+
+    sign = out["direction"].astype(str).str.upper().str.strip().map(_DIRECTION_SIGN).fillna(0).to_numpy(dtype="int64")
+    max_bars = out["max_bars"].to_numpy(dtype="int64") if "max_bars" in out.columns else np.full(len(out), 12)
+    result = label_outcomes(
+        _column(df, "High"),
+        _column(df, "Low"),
+        entry,
+        sign,
+        pd.to_numeric(out["tp_price"], errors="coerce").fillna(0.0).to_numpy(dtype="float64"),
+        pd.to_numeric(out["sl_price"], errors="coerce").fillna(0.0).to_numpy(dtype="float64"),
+        max_bars,
+    )
+    status = result["status"]
+    close_pos = np.minimum(entry + result["bars"], size - 1)
+    notes = np.array(["", "tp_alcanzado", "sl_alcanzado", "ventana_expirada"], dtype=object)[status]
+    notes[result["same_bar"]] = "tp_y_sl_misma_vela"
+
+    out["status"] = np.array(STATUS_NAMES, dtype=object)[status]
+    out["bars_elapsed"] = result["bars"]
+    out["outcome_note"] = notes
+    out["close_price"] = np.round(_column(df, "Close")[close_pos], 10)
+    out["closed_bar_utc"] = [
+        pd.Timestamp(df.index[pos]).strftime("%Y-%m-%dT%H:%M:%SZ") if isinstance(df.index, pd.DatetimeIndex) else ""
+        for pos in close_pos
+    ]
+    out.loc[status == OPEN, "close_price"] = 0.0
+    out.loc[status == OPEN, "closed_bar_utc"] = ""
+    return out
+
+
+def _stats(wins: int, losses: int, timeouts: int, rr_values: List[float], updated_utc: str) -> Dict[str, Any]:
+    resolved = wins + losses + timeouts
+    rr_avg = sum(rr_values) / len(rr_values) if rr_values else 0.0
+    return {
+        "total": resolved,
+        "wins": wins,
+        "losses": losses,
+        "timeouts": timeouts,
+        "replaced": 0,
+        "resolved": resolved,
+        "accuracy_pct": round(wins / resolved * 100.0, 2) if resolved else 0.0,
+        "timeout_pct": round(timeouts / resolved * 100.0, 2) if resolved else 0.0,
+        "noise_pct": round((losses + timeouts) / resolved * 100.0, 2) if resolved else 0.0,
+        "updated_utc": updated_utc,
+        "rr_avg": round(rr_avg, 3),
+        "rr_samples": len(rr_values),
+    }
+
+
+def _group_stats(labelled: pd.DataFrame, updated_utc: str) -> Dict[str, Any]:
+    status = labelled["status"]
+    rr = pd.to_numeric(labelled["rr_estimado"], errors="coerce") if "rr_estimado" in labelled.columns else pd.Series(dtype="float64")
+    return _stats(
+        int((status == "win").sum()),
+        int((status == "loss").sum()),
+        int((status == "timeout").sum()),
+        [float(x) for x in rr.dropna() if x > 0],
+        updated_utc,
+    )
+
+
+def quality_seed(labelled: pd.DataFrame, history_limit: int = QUALITY_HISTORY_LIMIT) -> Dict[str, Any]:
+    """`quality_stats`, `quality_stats_by_setup` y `quality_history` con el formato del estado del worker."""
+    updated_utc = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    resolved = labelled[labelled["status"].isin(["win", "loss", "timeout"])] if not labelled.empty else labelled
+    seed: Dict[str, Any] = {
+        "quality_stats": _group_stats(resolved, updated_utc) if not resolved.empty else _stats(0, 0, 0, [], updated_utc),
+        "quality_stats_by_setup": {},
+        "quality_history": [],
+    }
+    if resolved.empty:
+        return seed
+    if "setup_bucket" in resolved.columns:
+        buckets = resolved["setup_bucket"].astype(str).str.strip().str.lower()
+        for bucket, group in resolved.groupby(buckets, sort=True):
+            if bucket and bucket != "sin_setup":
+                seed["quality_stats_by_setup"][bucket] = _group_stats(group, updated_utc)
+    events = resolved.tail(max(0, int(history_limit))).copy()
+    if "bar" in events.columns and not pd.api.types.is_integer_dtype(events["bar"].dtype):
+        events["opened_bar_utc"] = pd.to_datetime(events["bar"], utc=True).dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+        events = events.drop(columns=["bar"])
+    seed["quality_history"] = [
+        {key: (value.item() if isinstance(value, np.generic) else value) for key, value in row.items()}
+        for row in events.to_dict("records")
+    ]
+    return seed
+
+
+def seed_record(record: Dict[str, Any], seed: Dict[str, Any]) -> bool:
+    """Carga la semilla en un registro sin resultados resueltos; no pisa estadisticas en vivo.
+
+    Sobre el estado del worker se aplica con `scanner_worker._seed_record_quality`, que ademas avanza `quality_epoch`.
+    """
+    stats = record.get("quality_stats", {})
+    if isinstance(stats, dict) and int(stats.get("resolved", 0) or 0) > 0:
+        return False
+    record["quality_stats"] = dict(seed.get("quality_stats", {}))
+    record["quality_stats_by_setup"] = {key: dict(value) for key, value in seed.get("quality_stats_by_setup", {}).items()}
+    record["quality_history"] = [dict(event) for event in seed.get("quality_history", [])][-QUALITY_HISTORY_LIMIT:]
+    return True
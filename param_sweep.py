@@ -0,0 +1,310 @@
+import argparse
+import copy
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import outcome_labeller
+import scanner_replay
+
+DEFAULT_GRID: Dict[str, List[Any]] = {
+    "min_confidence_score": [75, 80, 85, 90],
+    "min_rr": [1.5, 1.8, 2.2],
+    "min_mtf_confirmations": [1, 2, 3],
+    "persistence_bars": [1, 2, 3],
+    "quality_window_bars": [8, 12, 24],
+}
+# Solo estos umbrales cambian el resultado de `_apply_precision_filters`; persistencia y ventana se
+# aplican despues sobre las mismas velas.
+GATE_KEYS = ("min_confidence_score", "min_rr", "min_mtf_confirmations")
+SWEEP_COLUMNS = (
+    "record_key",
+    "rank",
+    *DEFAULT_GRID,
+    "alerts",
+    "resolved",
+    "wins",
+    "losses",
+    "timeouts",
+    "accuracy_pct",
+    "noise_pct",
+    "rr_avg",
+)
+
+
+def _resolve_grid(grid: Optional[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    out = {key: list(values) for key, values in DEFAULT_GRID.items()}
+    for key, values in (grid or {}).items():
+        if key not in out:
+            raise ValueError(f"Parametro de sweep desconocido: {key}")
+        values = values if isinstance(values, list) else [values]
+        if not values:
+            raise ValueError(f"Sin valores para {key}.")
+        out[key] = list(values)
+    return out
+
+
+def _gate_points(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    return [dict(zip(GATE_KEYS, values)) for values in itertools.product(*(grid[key] for key in GATE_KEYS))]
+
+
+def _record_cfg(cfg: Dict[str, Any], item: Any, target: Dict[str, str]) -> Dict[str, Any]:
+    out = copy.deepcopy(cfg)
+    out["auto_multi_interval"] = False
+    out["analysis_mode"] = "tendencial"
+    out["interval"] = target["interval"]
+    out["scan_structural_1d_4h"] = False
+    crypto = item.kind == "crypto"
+    out["scan_crypto"] = crypto
+    out["scan_gold"] = not crypto
+    out["crypto_symbols" if crypto else "gold_symbols"] = [item.label]
+    # La calibracion en vivo moveria los umbrales segun el propio replay; el sweep mide umbrales fijos.
+    precision = dict(out.get("precision_filters", {}) if isinstance(out.get("precision_filters"), dict) else {})
+    precision["quality_calibration_enabled"] = False
+    out["precision_filters"] = precision
+    return out
+
+
+def capture_gates(
+    cfg: Dict[str, Any],
+    candles_dir: Path,
+    gate_points: List[Dict[str, Any]],
+    start: Any = None,
+    end: Any = None,
+    worker: Optional[ModuleType] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Replay unico por registro: en cada vela evaluada se aplican todos los puntos de `gate_points`.
+
+    Estado, indicadores, MTF y contexto estructural se calculan una vez por vela y se comparten entre
+    puntos. Devuelve por registro un frame con `bar`, plan operativo y matrices `ready` / `persistence`.
+    """
+    sw = scanner_replay._worker_module(worker)
+    original = sw._apply_precision_filters
+    rows: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def capture(**kwargs):
+        result = original(**kwargs)
+        estado = kwargs["estado"]
+        bar_utc = str(estado.get("indice_alerta_utc", "")).strip()
+        if not bar_utc:
+            return result
+        base_cfg = kwargs.get("precision_cfg") or {}
+        ready = np.zeros(len(gate_points), dtype=bool)
+        persistence = np.ones(len(gate_points), dtype="int64")
+        for pos, point in enumerate(gate_points):
+            point_cfg = dict(base_cfg, **point)
+            point_cfg["persistence_bars"] = 1
+            out = original(**dict(kwargs, estado=dict(estado), precision_cfg=point_cfg, record=None))
+            ready[pos] = bool(out.get("signal_ready", False))
+            persistence[pos] = max(1, int(out.get("persistence_bars", 1) or 1))
+        plan = result.get("operational_plan", {}) if isinstance(result.get("operational_plan"), dict) else {}
+        rows.setdefault(kwargs.get("record_key", ""), {})[bar_utc] = {
+            "bar": bar_utc,
+            "direction": str(estado.get("direccion_v13", "")).upper().strip(),
+            "entry_price": sw._safe_float(estado.get("precio_alerta"), 0.0),
+            "tp_price": sw._safe_float(plan.get("tp_price"), 0.0),
+            "sl_price": sw._safe_float(plan.get("sl_price"), 0.0),
+            "rr_estimado": sw._safe_float((estado.get("dorado_v13") or {}).get("rr_estimado"), sw._safe_float(plan.get("rr_ratio"), 0.0)),
+            "setup_bucket": str(result.get("setup_bucket", "sin_setup")).strip().lower() or "sin_setup",
+            "cooldown_minutes": int(result.get("cooldown_minutes", 60) or 60),
+            "ready": ready,
+            "persistence": persistence,
+        }
+        return result
+
+    sw._apply_precision_filters = capture
+    try:
+        scanner_replay.run_replay(cfg, candles_dir, start=start, end=end, worker=sw)
+    finally:
+        sw._apply_precision_filters = original
+    return {key: pd.DataFrame(list(by_bar.values())) for key, by_bar in rows.items()}
+
+
+def _alert_bars(bars: pd.DataFrame, gate: int, persistence_bars: int) -> np.ndarray:
+    """Posiciones donde `_should_alert` dispararia: racha suficiente, flanco de subida y cooldown cumplido."""
+    ready = np.array([row[gate] for row in bars["ready"]], dtype=bool)
+    needed = np.maximum(persistence_bars, np.array([row[gate] for row in bars["persistence"]], dtype="int64"))
+    streak = np.zeros(len(ready), dtype="int64")
+    run = 0
+    for pos, flag in enumerate(ready):
+        run = run + 1 if flag else 0
+        streak[pos] = run
+    active = ready & (streak >= needed)
+    rising = active & ~np.concatenate(([False], active[:-1]))
+    times = pd.to_datetime(bars["bar"], utc=True).to_numpy(dtype="datetime64[s]").astype("int64")
+    cooldown = bars["cooldown_minutes"].to_numpy(dtype="int64") * 60
+    out: List[int] = []
+    last: Optional[int] = None
+    for pos in np.flatnonzero(rising):
+        if last is None or times[pos] - last >= max(60, int(cooldown[pos])):
+            out.append(int(pos))
+            last = int(times[pos])
+    return np.array(out, dtype="int64")
+
+
+def score_record(
+    record_key: str,
+    bars: pd.DataFrame,
+    candles: pd.DataFrame,
+    grid: Dict[str, List[Any]],
+    gate_points: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """Metricas de calidad de cada punto del grid reutilizando la captura de `capture_gates`."""
+    out: List[Dict[str, Any]] = []
+    if bars.empty or candles.empty:
+        return out
+    labels: Dict[int, pd.DataFrame] = {}
+    for window in grid["quality_window_bars"]:
+        signals = bars[["bar", "direction", "tp_price", "sl_price", "rr_estimado", "setup_bucket"]].copy()
+        signals["bar"] = pd.to_datetime(signals["bar"], utc=True)
+        signals["max_bars"] = int(window)
+        labels[int(window)] = outcome_labeller.label_signals(candles, signals)
+
+    for gate, point in enumerate(gate_points):
+        for persistence_bars in grid["persistence_bars"]:
+            alerts = _alert_bars(bars, gate, int(persistence_bars))
+            for window in grid["quality_window_bars"]:
+                labelled = labels[int(window)].iloc[alerts]
+                stats = outcome_labeller.quality_seed(labelled, history_limit=0)["quality_stats"]
+                out.append(
+                    {
+                        "record_key": record_key,
+                        **point,
+                        "persistence_bars": persistence_bars,
+                        "quality_window_bars": window,
+                        "alerts": len(alerts),
+                        "resolved": stats["resolved"],
+                        "wins": stats["wins"],
+                        "losses": stats["losses"],
+                        "timeouts": stats["timeouts"],
+                        "accuracy_pct": stats["accuracy_pct"],
+                        "noise_pct": stats["noise_pct"],
+                        "rr_avg": stats["rr_avg"],
+                    }
+                )
+    return out
+
+
+def rank_table(rows: List[Dict[str, Any]], min_resolved: int = 8) -> pd.DataFrame:
+    """Ordena por registro: primero puntos con `min_resolved` resueltas, luego accuracy, ruido y rr_avg."""
+    if not rows:
+        return pd.DataFrame(columns=list(SWEEP_COLUMNS))
+    table = pd.DataFrame(rows)
+    table["_enough"] = table["resolved"] >= int(min_resolved)
+    table = table.sort_values(
+        ["record_key", "_enough", "accuracy_pct", "noise_pct", "rr_avg", "alerts"],
+        ascending=[True, False, False, True, False, False],
+        kind="mergesort",
+    )
+    table["rank"] = table.groupby("record_key").cumcount() + 1
+    return table[list(SWEEP_COLUMNS)].reset_index(drop=True)
+
+
+def _quiet_worker() -> None:
+    # Cada proceso corre un replay completo; solo se dejan pasar avisos.
+    logging.disable(logging.INFO)
+
+
+def _sweep_record(task: Tuple[Dict[str, Any], str, str, Dict[str, str], Any, Any, Dict[str, List[Any]]]) -> List[Dict[str, Any]]:
+    cfg, candles_dir, state_key, target, start, end, grid = task
+    import scanner_worker as sw
+
+    item = next(item for item in sw._build_watchlist(cfg) if item.state_key == state_key)
+    record_cfg = _record_cfg(cfg, item, target)
+    gate_points = _gate_points(grid)
+    try:
+        captured = capture_gates(record_cfg, Path(candles_dir), gate_points, start=start, end=end, worker=sw)
+    except ValueError as exc:
+        logging.warning("Sweep %s|%s omitido: %s", state_key, target["interval"], exc)
+        return []
+    candles = scanner_replay.RecordedCandles(Path(candles_dir), sw.TD_INTERVAL_MAP).frame(item, target["interval"])[0]
+    rows: List[Dict[str, Any]] = []
+    for record_key, bars in captured.items():
+        rows.extend(score_record(record_key, bars, candles, grid, gate_points))
+    return rows
+
+
+def run_sweep(
+    cfg: Dict[str, Any],
+    candles_dir: Path,
+    grid: Optional[Dict[str, Any]] = None,
+    start: Any = None,
+    end: Any = None,
+    workers: int = 0,
+    min_resolved: int = 8,
+) -> pd.DataFrame:
+    """Barre el grid de `precision_filters` por simbolo/temporalidad en un pool de procesos (0 = todos los nucleos)."""
+    import scanner_worker as sw
+
+    resolved_grid = _resolve_grid(grid)
+    targets = [target for target in sw._resolve_scan_targets(cfg) if target.get("mode") != "estructural"]
+    tasks = [
+        (cfg, str(candles_dir), item.state_key, target, start, end, resolved_grid)
+        for item in sw._build_watchlist(cfg)
+        for target in targets
+    ]
+    workers = int(workers or 0) or (os.cpu_count() or 1)
+    rows: List[Dict[str, Any]] = []
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            rows.extend(_sweep_record(task))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_quiet_worker) as pool:
+            for chunk in pool.map(_sweep_record, tasks):
+                rows.extend(chunk)
+    return rank_table(rows, min_resolved=min_resolved)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Sweep de umbrales de precision_filters sobre velas grabadas.")
+    parser.add_argument("--config", default="scanner_config.json", help="Ruta a scanner_config.json")
+    parser.add_argument("--candles", default="candle_store", help="Directorio de velas grabadas (formato candle_store).")
+    parser.add_argument("--from", dest="start", default="", help="Inicio (UTC, ISO).")
+    parser.add_argument("--to", dest="end", default="", help="Fin (UTC, ISO).")
+    parser.add_argument("--grid", default="", help="JSON con listas por parametro (reemplaza las del grid por defecto).")
+    parser.add_argument("--workers", type=int, default=0, help="Procesos (0 = todos los nucleos).")
+    parser.add_argument("--min-resolved", type=int, default=8, help="Resueltas minimas para rankear primero.")
+    parser.add_argument("--out", default="param_sweep.csv", help="CSV de salida con el ranking por registro.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    import scanner_worker as sw
+
+    cfg = sw.load_config(Path(args.config).resolve())
+    grid = json.loads(Path(args.grid).read_text(encoding="utf-8")) if args.grid else None
+    started = time.perf_counter()
+    try:
+        table = run_sweep(cfg, Path(args.candles), grid=grid, start=args.start or None, end=args.end or None, workers=args.workers, min_resolved=args.min_resolved)
+    except ValueError as exc:
+        logging.error("Sweep: %s", exc)
+        return 1
+    table.to_csv(args.out, index=False)
+    logging.info("Sweep: %s filas, %s registros en %.1fs -> %s", len(table), table["record_key"].nunique(), time.perf_counter() - started, args.out)
+    for _, row in table[table["rank"] == 1].iterrows():
+        logging.info(
+            "%s: conf=%s rr=%s mtf=%s persistencia=%s ventana=%s -> accuracy=%.1f%% ruido=%.1f%% rr_avg=%.2f (%s resueltas)",
+            row["record_key"],
+            row["min_confidence_score"],
+            row["min_rr"],
+            row["min_mtf_confirmations"],
+            row["persistence_bars"],
+            row["quality_window_bars"],
+            row["accuracy_pct"],
+            row["noise_pct"],
+            row["rr_avg"],
+            row["resolved"],
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,222 @@
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+# (patron, sesgo, score, descripcion) en orden de prioridad: el primero que se cumple en una vela gana.
+PATTERNS: Tuple[Tuple[str, str, int, str], ...] = (
+    ("ruptura_falsa_alcista", "ALCISTA", 10, "Ruptura falsa bajista detectada con recuperacion del soporte."),
+    ("ruptura_falsa_bajista", "BAJISTA", 10, "Ruptura falsa alcista detectada con rechazo bajo resistencia."),
+    ("barrida_liquidez_alcista", "ALCISTA", 10, "Barrida de liquidez bajista con cierre de recuperacion."),
+    ("barrida_liquidez_bajista", "BAJISTA", 10, "Barrida de liquidez alcista con cierre de rechazo."),
+    ("doble_techo", "BAJISTA", 9, "Doble techo detectado con rechazo en la segunda visita."),
+    ("doble_suelo", "ALCISTA", 9, "Doble suelo detectado con recuperacion tras la segunda visita."),
+    ("retest_alcista", "ALCISTA", 8, "Retest alcista validando la zona de ruptura."),
+    ("retest_bajista", "BAJISTA", 8, "Retest bajista validando la zona perdida."),
+    ("envolvente_alcista", "ALCISTA", 10, "Vela envolvente alcista detectada."),
+    ("envolvente_bajista", "BAJISTA", 10, "Vela envolvente bajista detectada."),
+    ("rechazo_alcista", "ALCISTA", 8, "Vela de rechazo alcista (mecha inferior dominante)."),
+    ("rechazo_bajista", "BAJISTA", 8, "Vela de rechazo bajista (mecha superior dominante)."),
+)
+PATTERN_NAMES = tuple(name for name, _, _, _ in PATTERNS)
+MIN_BARS = 3
+NO_PATTERN_SCORE = 2
+_BIAS_SIGN = {"ALCISTA": 1, "BAJISTA": -1}
+
+
+def _numeric(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    series = df[col]
+    if not pd.api.types.is_float_dtype(series.dtype):
+        series = pd.to_numeric(series, errors="coerce")
+    return series.to_numpy(dtype="float64")
+
+
+def _shift(values: np.ndarray, periods: int) -> np.ndarray:
+    out = np.full(len(values), np.nan)
+    if periods < len(values):
+        out[periods:] = values[: len(values) - periods]
+    return out
+
+
+def _valid(values: np.ndarray) -> np.ndarray:
+    return ~np.isnan(values)
+
+
+def _window_extreme(values: np.ndarray, length: int, lag: int, reduce) -> np.ndarray:
+    """Max/min ignorando NaN de `values[t-lag-length+1 : t-lag+1]` (NaN si el tramo esta vacio o todo NaN)."""
+    out = np.full(len(values), np.nan)
+    if len(values) >= length:
+        windows = np.lib.stride_tricks.sliding_window_view(values, length)
+        out[length - 1 :] = reduce.reduce(windows, axis=1)
+    return _shift(out, lag)
+
+
+def _range_mean(high: np.ndarray, low: np.ndarray, length: int = 14) -> np.ndarray:
+    # Igual que AnalysisContext.range_mean sobre cada prefijo: rolling con historia completa, media simple antes.
+    rng = np.abs(high - low)
+    out = np.array(pd.Series(rng).rolling(length).mean(), dtype="float64")
+    head = rng[: length - 1]
+    filled = np.where(np.isnan(head), 0.0, head)
+    for pos in range(len(head)):
+        count = int((~np.isnan(head[: pos + 1])).sum())
+        out[pos] = filled[: pos + 1].sum() / count if count else np.nan
+    return np.maximum(0.0, np.nan_to_num(out, nan=0.0))
+
+
+def scan_price_action(df: pd.DataFrame) -> Dict[str, Any]:
+    """Banderas de todos los patrones de price action para cada vela del frame en una pasada.
+
+    La vela `t` se evalua solo con `df.iloc[: t + 1]`, igual que la ruta en vivo sobre la ultima vela,
+    asi que las mismas arrays sirven para replay y calibracion. Devuelve `flags` (bool por patron),
+    `pattern` (indice en PATTERNS, -1 sin patron), `score` (score base, sin alinear con la direccion),
+    `bias` (+1 alcista, -1 bajista, 0 neutral) y `atr`.
+    """
+    size = 0 if df is None else len(df)
+    open_ = _numeric(df, "Open") if size else np.empty(0)
+    high = _numeric(df, "High") if size else np.empty(0)
+    low = _numeric(df, "Low") if size else np.empty(0)
+    close = _numeric(df, "Close") if size else np.empty(0)
+    pos = np.arange(size)
+    atr = _range_mean(high, low) if size else np.empty(0)
+
+    o, h, l, c = (np.nan_to_num(arr, nan=0.0) for arr in (open_, high, low, close))
+    bar_range = np.maximum(1e-9, h - l)
+    body = np.abs(c - o)
+    upper_wick = np.maximum(0.0, h - np.maximum(o, c))
+    lower_wick = np.maximum(0.0, np.minimum(o, c) - l)
+    prev_o, prev_c = _shift(o, 1), _shift(c, 1)
+
+    prev_close = _shift(close, 1)
+    detect = (pos >= MIN_BARS - 1) & (atr > 0)
+
+    base_high = _window_extreme(high, 5, 2, np.fmax)
+    base_low = _window_extreme(low, 5, 2, np.fmin)
+    closes_ok = _valid(prev_close) & _valid(close) & _valid(base_high) & _valid(base_low)
+    tol = np.maximum(atr * 0.12, 1e-9)
+    breakout = detect & (pos >= 6) & closes_ok
+    false_bull = breakout & (prev_close < base_low - tol) & (close > base_low + (tol * 0.1))
+    false_bear = breakout & (prev_close > base_high + tol) & (close < base_high - (tol * 0.1))
+
+    sweep_high = _window_extreme(high, 5, 1, np.fmax)
+    sweep_low = _window_extreme(low, 5, 1, np.fmin)
+    sweep = detect & (pos >= 5) & _valid(sweep_high) & _valid(sweep_low) & _valid(low) & _valid(high) & _valid(close)
+    wick_floor = np.maximum(body * 1.5, bar_range * 0.35)
+    sweep_bull = sweep & (low < sweep_low - tol) & (close >= sweep_low) & (lower_wick >= wick_floor)
+    sweep_bear = sweep & (high > sweep_high + tol) & (close <= sweep_high) & (upper_wick >= wick_floor)
+
+    first_high = _window_extreme(high, 4, 4, np.fmax)
+    second_high = _window_extreme(high, 4, 0, np.fmax)
+    first_low = _window_extreme(low, 4, 4, np.fmin)
+    second_low = _window_extreme(low, 4, 0, np.fmin)
+    double = detect & (pos >= 7) & _valid(open_) & _valid(close)
+    double &= _valid(first_high) & _valid(second_high) & _valid(first_low) & _valid(second_low)
+    peak_tol = np.maximum(atr * 0.35, (np.abs(first_high + second_high) / 2.0) * 0.002)
+    trough_tol = np.maximum(atr * 0.35, (np.abs(first_low + second_low) / 2.0) * 0.002)
+    double_top = (
+        double
+        & (np.abs(first_high - second_high) <= peak_tol)
+        & (close < open_)
+        & (close <= np.minimum(first_high, second_high) - np.maximum(atr * 0.25, peak_tol * 0.5))
+    )
+    double_bottom = (
+        double
+        & (np.abs(first_low - second_low) <= trough_tol)
+        & (close > open_)
+        & (close >= np.maximum(first_low, second_low) + np.maximum(atr * 0.25, trough_tol * 0.5))
+    )
+
+    retest_tol = np.maximum(atr * 0.15, 1e-9)
+    retest = breakout & _valid(low) & _valid(high)
+    retest_bull = retest & (prev_close > base_high + retest_tol) & (low <= base_high + retest_tol) & (close >= base_high)
+    retest_bear = retest & (prev_close < base_low - retest_tol) & (high >= base_low - retest_tol) & (close <= base_low)
+
+    candles = pos >= MIN_BARS - 1
+    engulf_bull = candles & (c > o) & (prev_c < prev_o) & (o <= prev_c) & (c >= prev_o)
+    engulf_bear = candles & (c < o) & (prev_c > prev_o) & (o >= prev_c) & (c <= prev_o)
+    reject_bull = candles & (lower_wick >= (body * 2.0)) & (upper_wick <= body * 1.2) & (c >= (o - 1e-9))
+    reject_bear = candles & (upper_wick >= (body * 2.0)) & (lower_wick <= body * 1.2) & (c <= (o + 1e-9))
+
+    flags = dict(
+        zip(
+            PATTERN_NAMES,
+            (
+                false_bull,
+                false_bear,
+                sweep_bull,
+                sweep_bear,
+                double_top,
+                double_bottom,
+                retest_bull,
+                retest_bear,
+                engulf_bull,
+                engulf_bear,
+                reject_bull,
+                reject_bear,
+            ),
+        )
+    )
+    stacked = np.vstack([flags[name] for name in PATTERN_NAMES]) if size else np.zeros((len(PATTERNS), 0), dtype=bool)
+    found = stacked.any(axis=0)
+    pattern = np.where(found, stacked.argmax(axis=0), -1)
+    scores = np.array([score for _, _, score, _ in PATTERNS] + [NO_PATTERN_SCORE])
+    biases = np.array([_BIAS_SIGN.get(bias, 0) for _, bias, _, _ in PATTERNS] + [0])
+    score = np.where(candles, scores[pattern], 0)
+    return {
+        "size": size,
+        "flags": flags,
+        "pattern": pattern,
+        "score": score,
+        "bias": biases[pattern] * found,
+        "atr": atr,
+    }
+
+
+def scores_for_direction(scan: Dict[str, Any], direction: str) -> np.ndarray:
+    """Score de cada vela como lo reporta la ruta en vivo: 0 si el patron va contra `direction`."""
+    sign = _BIAS_SIGN.get(str(direction or "").upper().strip(), 0)
+    against = (scan["bias"] != 0) & (scan["bias"] != sign)
+    return np.where(against, 0, scan["score"])
+
+
+def _result(pattern: str, bias: str, score: int, description: str, direction: str) -> Dict[str, Any]:
+    direction_norm = str(direction or "").upper().strip()
+    bias_norm = str(bias or "NEUTRAL").upper().strip() or "NEUTRAL"
+    aligned = bias_norm == direction_norm and bias_norm in {"ALCISTA", "BAJISTA"}
+    final_score = int(score or 0)
+    if bias_norm in {"ALCISTA", "BAJISTA"} and not aligned:
+        final_score = 0
+    return {
+        "pattern": pattern,
+        "bias": bias_norm,
+        "score": final_score,
+        "aligned": aligned,
+        "description": description,
+    }
+
+
+def price_action_at(scan: Dict[str, Any], pos: int, direction: str) -> Dict[str, Any]:
+    """Resultado de price action de la vela `pos` (negativo cuenta desde el final) alineado con `direction`."""
+    size = int(scan.get("size", 0))
+    if pos < 0:
+        pos += size
+    if not 0 <= pos < size or pos < MIN_BARS - 1:
+        return {
+            "pattern": "sin_patron",
+            "bias": "NEUTRAL",
+            "score": 0,
+            "aligned": False,
+            "description": "Sin suficientes velas para confirmar price action.",
+        }
+    idx = int(scan["pattern"][pos])
+    if idx < 0:
+        return {
+            "pattern": "sin_patron",
+            "bias": "NEUTRAL",
+            "score": NO_PATTERN_SCORE,
+            "aligned": False,
+            "description": "Sin patron de confirmacion fuerte.",
+        }
+    pattern, bias, score, description = PATTERNS[idx]
+    return _result(pattern, bias, score, description, direction)
@@ -0,0 +1,98 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+import pandas as pd
+
+INTERVAL_MINUTES = {
+    "1m": 1,
+    "5m": 5,
+    "15m": 15,
+    "30m": 30,
+    "1h": 60,
+    "4h": 240,
+    "1d": 1440,
+}
+
+_OHLCV_AGG = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Volume": "sum",
+}
+
+
+def interval_minutes(interval: str) -> Optional[int]:
+    return INTERVAL_MINUTES.get(str(interval or "").strip().lower())
+
+
+def can_derive(base_interval: str, target_interval: str) -> bool:
+    base = interval_minutes(base_interval)
+    target = interval_minutes(target_interval)
+    if not base or not target or target <= base:
+        return False
+    return target % base == 0
+
+
+def resample_ohlcv(
+    df: pd.DataFrame,
+    base_interval: str,
+    target_interval: str,
+    now: Optional[datetime] = None,
+) -> pd.DataFrame:
+    """Agrega velas `base_interval` a `target_interval` alineadas a epoch UTC (limites de Binance).
+
+    Se descarta el primer bucket si el historico empieza a mitad de vela y el ultimo si ya
+    debio cerrar pero le faltan velas base. Un ultimo bucket aun abierto se conserva, para
+    que `_prepare_df_for_closed_candle` lo trate igual que la vela en formacion de un proveedor.
+    """
+    if df is None or df.empty or not can_derive(base_interval, target_interval):
+        return pd.DataFrame()
+
+    base_min = int(interval_minutes(base_interval) or 0)
+    target_min = int(interval_minutes(target_interval) or 0)
+    per_bucket = target_min // base_min
+
+    data = df.sort_index()
+    data = data[~data.index.duplicated(keep="last")]
+    index = pd.DatetimeIndex(data.index)
+    tz = index.tz
+    if tz is None:
+        index = index.tz_localize("UTC")
+    else:
+        index = index.tz_convert("UTC")
+    data = data.set_axis(index)
+
+    agg = {col: rule for col, rule in _OHLCV_AGG.items() if col in data.columns}
+    rule = f"{target_min}min"
+    grouped = data.resample(rule, origin="epoch", label="left", closed="left")
+    out = grouped.agg(agg)
+    counts = grouped["Close"].count()
+    out = out[counts > 0]
+    counts = counts[counts > 0]
+    out = out.dropna(subset=[col for col in ("Open", "High", "Low", "Close") if col in out.columns])
+    counts = counts.loc[out.index]
+    if out.empty:
+        return out
+
+    if int(counts.iloc[0]) < per_bucket:
+        out = out.iloc[1:]
+        counts = counts.iloc[1:]
+    if out.empty:
+        return out
+
+    now_utc = now or datetime.now(timezone.utc)
+    last_start = pd.Timestamp(out.index[-1])
+    last_end = last_start + pd.Timedelta(minutes=target_min)
+    if int(counts.iloc[-1]) < per_bucket and now_utc >= last_end.to_pydatetime():
+        last_base_end = pd.Timestamp(index[-1]) + pd.Timedelta(minutes=base_min)
+        if last_base_end < last_end:
+            out = out.iloc[:-1]
+
+    if "Volume" not in out.columns:
+        out["Volume"] = 0.0
+    if tz is None:
+        out.index = out.index.tz_localize(None)
+    else:
+        out.index = out.index.tz_convert(tz)
+    return out
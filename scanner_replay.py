@@ -0,0 +1,281 @@
+import copy
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from bar_scheduler import BarCloseScheduler
+from candle_store import CandleStore
+from resampling import can_derive, interval_minutes, resample_ohlcv
+
+QUALITY_COUNTERS = ("total", "wins", "losses", "timeouts", "replaced", "resolved")
+
+
+def _worker_module(worker: Optional[ModuleType]) -> ModuleType:
+    if worker is not None:
+        return worker
+    import scanner_worker
+
+    return scanner_worker
+
+
+def _parse_utc(value: Any) -> Optional[pd.Timestamp]:
+    if value is None or str(value).strip() == "":
+        return None
+    ts = pd.Timestamp(str(value).strip())
+    if ts.tzinfo is None:
+        return ts.tz_localize("UTC")
+    return ts.tz_convert("UTC")
+
+
+class RecordedCandles:
+    """Velas grabadas (formato candle_store) servidas hasta la hora virtual: solo velas ya cerradas."""
+
+    def __init__(self, root: Path, td_interval_map: Dict[str, str]) -> None:
+        self.store = CandleStore(Path(root), max_rows=10**9)
+        self.td_interval_map = dict(td_interval_map)
+        self._frames: Dict[Tuple[str, str], Tuple[pd.DataFrame, str, np.ndarray]] = {}
+        self.bars_served = 0
+
+    def _candidates(self, item: Any, interval: str) -> List[Tuple[str, str, str]]:
+        out: List[Tuple[str, str, str]] = []
+        if getattr(item, "binance_symbol", ""):
+            out.append(("binance", item.binance_symbol, interval))
+        td_interval = self.td_interval_map.get(interval)
+        if getattr(item, "td_symbol", "") and td_interval:
+            out.append(("twelvedata", item.td_symbol, td_interval))
+        return out
+
+    def frame(self, item: Any, interval: str) -> Tuple[pd.DataFrame, str, np.ndarray]:
+        key = (item.state_key, str(interval))
+        cached = self._frames.get(key)
+        if cached is not None:
+            return cached
+        df, source = pd.DataFrame(), ""
+        for candidate in self._candidates(item, interval):
+            df = self.store.load(*candidate)
+            if not df.empty:
+                source = candidate[0]
+                break
+        if df.empty:
+            df, source = self._derive(item, interval)
+        closes = np.empty(0, dtype="int64")
+        if not df.empty:
+            df = df[~df.index.duplicated(keep="last")].sort_index()
+            index = pd.DatetimeIndex(df.index)
+            if index.tz is None:
+                index = index.tz_localize("UTC")
+            step_ns = int((interval_minutes(interval) or 0) * 60 * 10**9)
+            closes = index.tz_convert("UTC").tz_localize(None).values.astype("datetime64[ns]").astype("int64") + step_ns
+        self._frames[key] = (df, source, closes)
+        return self._frames[key]
+
+    def _derive(self, item: Any, interval: str) -> Tuple[pd.DataFrame, str]:
+        # Intervalos no grabados (1h, 4h...) salen del intervalo grabado mas grueso que los divida.
+        bases = [base for base in self.td_interval_map if base != interval and can_derive(base, interval)]
+        for base in sorted(bases, key=lambda value: interval_minutes(value) or 0, reverse=True):
+            for candidate in self._candidates(item, base):
+                df = self.store.load(*candidate)
+                if df.empty:
+                    continue
+                # Hora lejana: un ultimo bucket incompleto se descarta en vez de servirse como cerrado.
+                derived = resample_ohlcv(df, base, interval, now=datetime.max.replace(tzinfo=timezone.utc))
+                if not derived.empty:
+                    return derived, candidate[0]
+        return pd.DataFrame(), ""
+
+    def span(self, items: List[Any], intervals: List[str]) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        first: Optional[int] = None
+        last: Optional[int] = None
+        for item in items:
+            for interval in intervals:
+                _, _, closes = self.frame(item, interval)
+                if not len(closes):
+                    continue
+                first = int(closes[0]) if first is None else min(first, int(closes[0]))
+                last = int(closes[-1]) if last is None else max(last, int(closes[-1]))
+        if first is None or last is None:
+            return None, None
+        return pd.Timestamp(first, tz="UTC"), pd.Timestamp(last, tz="UTC")
+
+    def closed_until(self, item: Any, interval: str, now: datetime) -> Tuple[pd.DataFrame, str]:
+        df, source, closes = self.frame(item, interval)
+        if df.empty:
+            return df, source
+        now_ns = pd.Timestamp(now).tz_convert("UTC").value
+        end = int(np.searchsorted(closes, now_ns, side="right"))
+        return df.iloc[:end], source
+
+
+@contextmanager
+def _replay_hooks(worker: ModuleType, candles: RecordedCandles, sent: Dict[str, int]) -> Iterator[None]:
+    def fetch_data(item, period, interval, cfg=None):
+        df, source = candles.closed_until(item, interval, worker._utcnow())
+        if df.empty:
+            return None, "", "Sin velas grabadas para replay."
+        df = worker._trim_df_for_interval(df, interval=interval, cfg=cfg if isinstance(cfg, dict) else {})
+        candles.bars_served += len(df)
+        return df, source, ""
+
+    def stub_sender(channel: str):
+        def _send(*args, **kwargs):
+            sent[channel] = int(sent.get(channel, 0)) + 1
+            return True, ""
+
+        return _send
+
+    hooks = {
+        "_fetch_data": fetch_data,
+        "_send_email_alert": stub_sender("email"),
+        "_send_telegram_alert": stub_sender("telegram"),
+        "_send_windows_toast": stub_sender("windows"),
+        "_discover_telegram_chats_from_updates": lambda state, user_records=None: ([], {}, ""),
+        "_load_user_records": lambda *args, **kwargs: [],
+    }
+    saved = {name: getattr(worker, name) for name in hooks}
+    saved_feed = worker._BINANCE_FEED
+    saved_cache = dict(worker._RECORD_EVAL_CACHE)
+    worker._RECORD_EVAL_CACHE.clear()
+    worker._BINANCE_FEED = None
+    for name, fn in hooks.items():
+        setattr(worker, name, fn)
+    try:
+        yield
+    finally:
+        for name, fn in saved.items():
+            setattr(worker, name, fn)
+        worker._BINANCE_FEED = saved_feed
+        worker._RECORD_EVAL_CACHE.clear()
+        worker._RECORD_EVAL_CACHE.update(saved_cache)
+        worker.set_virtual_clock(None)
+
+
+def _replay_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    out = copy.deepcopy(cfg)
+    # Sin red ni escrituras: las velas salen del directorio grabado.
+    out["candle_store"] = {"enabled": False}
+    out["binance_stream"] = {"enabled": False}
+    # RecordedCandles ya deriva los intervalos sobre toda la grabacion; remuestrear otra vez por ciclo sobra.
+    out["resampling"] = {"enabled": False}
+    streaming = out.get("streaming_indicators")
+    if isinstance(streaming, dict):
+        streaming["snapshot_dir"] = ""
+    return out
+
+
+def _quality_totals(per_record: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    totals: Dict[str, Any] = {key: 0 for key in QUALITY_COUNTERS}
+    for stats in per_record.values():
+        for key in QUALITY_COUNTERS:
+            totals[key] += int(stats.get(key, 0) or 0)
+    resolved = totals["resolved"]
+    totals["accuracy_pct"] = round(totals["wins"] / resolved * 100.0, 2) if resolved else 0.0
+    totals["noise_pct"] = round((totals["losses"] + totals["timeouts"]) / resolved * 100.0, 2) if resolved else 0.0
+    return totals
+
+
+def run_replay(
+    cfg: Dict[str, Any],
+    candles_dir: Path,
+    start: Any = None,
+    end: Any = None,
+    state: Optional[Dict[str, Any]] = None,
+    worker: Optional[ModuleType] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Pasa velas grabadas por `run_scan_cycle` cierre a cierre con reloj virtual y notificaciones simuladas.
+
+    Devuelve (estado final, reporte con throughput y quality_stats por registro).
+    """
+    sw = _worker_module(worker)
+    cfg = _replay_cfg(sw._apply_resource_profile(cfg))
+    candles = RecordedCandles(Path(candles_dir), sw.TD_INTERVAL_MAP)
+    targets = sw._resolve_scan_targets(cfg)
+    data_start, data_end = candles.span(sw._build_watchlist(cfg), list(sw.TD_INTERVAL_MAP))
+    start_ts = _parse_utc(start) or data_start
+    end_ts = _parse_utc(end) or data_end
+    if start_ts is None or end_ts is None:
+        raise ValueError(f"Sin velas grabadas en {candles_dir}.")
+
+    state = state if isinstance(state, dict) else {"symbols": {}}
+    grace = int(sw._resolve_precision_cfg(cfg).get("closed_candle_grace_sec", 10))
+    # Empieza un segundo antes para que el primer cierre dentro del rango tambien se evalue.
+    scheduler = BarCloseScheduler(targets, grace_seconds=grace, now=start_ts.timestamp() - 1.0)
+    end_epoch = end_ts.timestamp() + grace
+    sent: Dict[str, int] = {}
+    totals = {"cycles": 0, "records": 0, "errors": 0, "alerts_triggered": 0}
+    started = time.perf_counter()
+    with _replay_hooks(sw, candles, sent):
+        while scheduler.next_due() <= end_epoch:
+            now = scheduler.next_due()
+            sw.set_virtual_clock(datetime.fromtimestamp(now, tz=pytz.UTC))
+            due = scheduler.pop_due(now)
+            state, metrics = sw.run_scan_cycle(cfg, state, due_targets=due)
+            totals["cycles"] += 1
+            totals["records"] += int(metrics.get("records_total", 0) or 0)
+            totals["errors"] += int(metrics.get("records_error", 0) or 0)
+            totals["alerts_triggered"] += int(metrics.get("alerts_triggered", 0) or 0)
+    wall_sec = max(time.perf_counter() - started, 1e-9)
+
+    per_record = {
+        key: dict(record.get("quality_stats", {}))
+        for key, record in sorted(state.get("symbols", {}).items())
+        if isinstance(record, dict) and isinstance(record.get("quality_stats"), dict)
+    }
+    report = {
+        "from": start_ts.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "to": end_ts.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "cycles": totals["cycles"],
+        "records": totals["records"],
+        "record_errors": totals["errors"],
+        "bars_served": candles.bars_served,
+        "alerts_triggered": totals["alerts_triggered"],
+        "notifications": sent,
+        "wall_sec": round(wall_sec, 3),
+        "bars_per_sec": round(totals["cycles"] / wall_sec, 2),
+        "records_per_sec": round(totals["records"] / wall_sec, 2),
+        "quality_stats": per_record,
+        "quality_totals": _quality_totals(per_record),
+    }
+    return state, report
+
+
+def main_from_args(args: Any, worker: Optional[ModuleType] = None) -> int:
+    sw = _worker_module(worker)
+    cfg = sw.load_config(Path(args.config).resolve())
+    try:
+        state, report = run_replay(
+            cfg,
+            Path(args.replay),
+            start=getattr(args, "replay_from", None),
+            end=getattr(args, "replay_to", None),
+            worker=sw,
+        )
+    except ValueError as exc:
+        logging.error("Replay: %s", exc)
+        return 1
+    logging.info(
+        "Replay %s -> %s: %s ciclos, %s registros en %.1fs (%.1f velas/s, %.1f registros/s), alertas=%s",
+        report["from"],
+        report["to"],
+        report["cycles"],
+        report["records"],
+        report["wall_sec"],
+        report["bars_per_sec"],
+        report["records_per_sec"],
+        report["alerts_triggered"],
+    )
+    output = getattr(args, "replay_report", "") or ""
+    if output:
+        sw._write_json(Path(output).resolve(), {"report": report, "state": state})
+    json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+    sys.stdout.write("\n")
+    return 0
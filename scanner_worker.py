@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import copy
 import ctypes
 import gc
 import hashlib
@@ -10,14 +11,17 @@ import os
 import re
 import smtplib
 import subprocess
+import sys
+import threading
 import time
-from functools import lru_cache
+from functools import lru_cache, partial
 from logging.handlers import RotatingFileHandler
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
 from email.message import EmailMessage
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Tuple
 from uuid import uuid4
 
 import pandas as pd
@@ -26,11 +30,27 @@ import requests
 
 from analysis import (
     calcular_indicadores,
+    calcular_indicadores_batch,
+    calcular_indicadores_np,
     construir_estado_final,
     construir_estado_final_estructural,
     obtener_datos,
 )
-from live_binance import fetch_klines
+from analysis_context import get_analysis_context
+from candle_store import CandleStore, get_store as get_candle_store, last_open_time
+import http_pool
+import outcome_labeller
+from live_binance import BinanceKlineFeed, fetch_klines, set_base_urls as set_binance_base_urls
+from notify_dispatcher import NotificationBatch, NotificationDispatcher, NotificationJob, run_batch
+from price_action import price_action_at, scan_price_action
+from bar_scheduler import BarCloseScheduler
+from resampling import can_derive, interval_minutes, resample_ohlcv
+from state_journal import StateJournal, write_json_atomic
+from state_store import StateStore
+from streaming_indicators import get_engine as get_indicator_engine
+from streaming_indicators import reset_stats as reset_indicator_stats, stats as indicator_stats
+from smtp_transport import SmtpTransport
+from telegram_transport import TelegramTransport
 
 
 ROOT = Path(__file__).resolve().parent
@@ -39,12 +59,18 @@ DEFAULT_STATE_PATH = ROOT / "scanner_state.json"
 DEFAULT_LOG_PATH = ROOT / "scanner.log"
 DEFAULT_HEALTH_PATH = ROOT / "scanner_health.json"
 USERS_DB_PATH = Path(os.getenv("USERS_DB_PATH", str(ROOT / "usuarios_db.json"))).resolve()
+# Bases HTTP de proveedores; `endpoints.*` en config (o estas variables) apuntan a un stand-in local.
+DEFAULT_TWELVEDATA_BASE = os.getenv("TWELVEDATA_BASE_URL", "https://api.twelvedata.com").rstrip("/")
+DEFAULT_TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+TWELVEDATA_BASE = DEFAULT_TWELVEDATA_BASE
+TELEGRAM_API_BASE = DEFAULT_TELEGRAM_API_BASE
 LOCK_PATH = ROOT / "scanner_worker.lock"
 WINDOWS_MUTEX_ALREADY_EXISTS = 183
 _SINGLE_INSTANCE_MUTEX_HANDLE: int | None = None
 TELEGRAM_AUTO_CHAT_IDS_KEY = "telegram_auto_chat_ids"
 TELEGRAM_LAST_UPDATE_ID_KEY = "telegram_last_update_id"
 TELEGRAM_USER_CHAT_LINKS_KEY = "telegram_user_chat_links"
+TELEGRAM_PHOTO_FILE_IDS_KEY = "telegram_photo_file_ids"
 
 NY_TZ = pytz.timezone("America/New_York")
 BOGOTA_TZ = pytz.timezone("America/Bogota")
@@ -55,6 +81,35 @@ GUIDE_SL_MAX_PCT = 1.0
 GUIDE_TP_R_MULT = 2.0
 SCANNER_CONFIG_VERSION = 2
 
+PROVIDER_CONCURRENCY_DEFAULTS = {
+    "binance": 8,
+    "twelvedata": 2,
+    "yfinance": 2,
+}
+_PROVIDER_SEMAPHORES: Dict[str, Tuple[int, threading.BoundedSemaphore]] = {}
+_PROVIDER_SEMAPHORES_LOCK = threading.Lock()
+_BINANCE_FEED: BinanceKlineFeed | None = None
+_NOTIFY_DISPATCHER: NotificationDispatcher | None = None
+# Cupos free reservados por envios en cola: (user_id, market_key) -> dia UTC.
+_FREE_ALERT_RESERVATIONS: Dict[Tuple[str, str], str] = {}
+NOTIFY_BROADCAST_TARGET = "__broadcast__"
+_TELEGRAM_TRANSPORT: Tuple[Tuple[float, ...], TelegramTransport] | None = None
+_TELEGRAM_TRANSPORT_LOCK = threading.Lock()
+_SMTP_TRANSPORT: Tuple[Tuple[Any, ...], SmtpTransport] | None = None
+_SMTP_TRANSPORT_LOCK = threading.Lock()
+# file_id de la primera subida de cada imagen de moneda: simbolo -> {url, file_id, cached_utc}.
+# Los hilos de envio solo tocan esta copia; el estado se sincroniza en el hilo del ciclo.
+_TELEGRAM_PHOTO_CACHE: Dict[str, Dict[str, str]] = {}
+_TELEGRAM_PHOTO_CACHE_LOCK = threading.Lock()
+_TELEGRAM_PHOTO_STATS: Dict[str, int] = {"hits": 0, "uploads": 0, "invalidated": 0}
+# Ultima evaluacion por registro (estado + filtros) para reutilizar si la vela cerrada no cambio.
+_RECORD_EVAL_CACHE: Dict[str, Dict[str, Any]] = {}
+# Reloj virtual del replay (scanner_replay.py); None = hora real.
+_VIRTUAL_NOW: datetime | None = None
+# Agregado global de calidad: aporte por registro y sumas corrientes, al dia con `state["quality_epoch"]`.
+_QUALITY_AGGREGATE_CACHE: Dict[str, Any] = {}
+QUALITY_HISTORY_LIMIT = 120
+
 TD_INTERVAL_MAP = {
     "1m": "1min",
     "5m": "5min",
@@ -104,6 +159,7 @@ TOKEN_PATTERN = re.compile(r"\b\d{6,}:[A-Za-z0-9_-]{20,}\b")
 EMAIL_PATTERN = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
 CHAT_ID_PATTERN = re.compile(r"(?:(?<=^)|(?<=[\s,;]))-?\d{8,}(?=\s*:)")
 TELEGRAM_START_CODE_PATTERN = re.compile(r"\bet[a-f0-9]{16}\b")
+SAFE_FILENAME_PATTERN = re.compile(r"[^A-Za-z0-9_-]+")
 
 
 @dataclass(frozen=True)
@@ -319,6 +375,66 @@ def _default_config() -> Dict[str, Any]:
         "scan_crypto": True,
         "scan_gold": True,
         "resource_profile": "default",
+        "candle_store": {
+            "enabled": True,
+            "dir": "candle_store",
+            "max_rows": 1000,
+        },
+        "binance_stream": {
+            "enabled": True,
+            "max_bars": 1000,
+            "stale_sec": 90,
+        },
+        "endpoints": {
+            "binance_rest": "",
+            "binance_ws": "",
+            "twelvedata": "",
+            "telegram": "",
+        },
+        "http_pool": {
+            "enabled": True,
+            "pool_maxsize": 16,
+            "retries": 2,
+            "backoff_sec": 0.2,
+            "connect_timeout_sec": 3.05,
+        },
+        "eval_cache": {
+            "enabled": True,
+        },
+        "indicator_kernel": "numpy",
+        "streaming_indicators": {
+            "enabled": True,
+            "max_rows": 1000,
+            "snapshot_dir": "indicator_snapshots",
+        },
+        # Excluyente con streaming_indicators (activo por defecto): se enciende al apagar streaming.
+        "batch_indicators": {
+            "enabled": False,
+            "min_frames": 2,
+        },
+        "scheduler": {
+            "mode": "bar_close",
+            "outcome_interval_sec": 300,
+        },
+        "state_store": {
+            # `sqlite` es opt-in: al activarlo, el primer ciclo importa `scanner_state.json` una sola vez.
+            "backend": "json",
+            "sqlite_path": "",
+            "journal_compact_mb": 4,
+            "journal_compact_every": 500,
+        },
+        "resampling": {
+            "enabled": True,
+            "base_intervals": ["15m", "1h"],
+            "kinds": ["crypto"],
+            "min_rows": 200,
+            "base_rows": 1000,
+        },
+        "parallel_fetch": {
+            "enabled": True,
+            "max_workers": 6,
+            "provider_limits": dict(PROVIDER_CONCURRENCY_DEFAULTS),
+        },
         "runtime_limits": {
             "max_rows_default": 720,
             "max_rows_by_interval": {
@@ -373,12 +489,19 @@ def _default_config() -> Dict[str, Any]:
             },
         },
         "crypto_symbols": list(CRYPTO_MAP.keys()),
+        "extra_crypto_map": {},
         "gold_symbols": list(GOLD_MAP.keys()),
         "notification": {
             "subject_prefix": "",
             "email": {
                 "enabled": True,
                 "to": [],
+                "session": {
+                    "enabled": True,
+                    "idle_timeout_sec": 60,
+                    "max_sessions": 4,
+                    "max_messages_per_session": 100,
+                },
             },
             "telegram": {
                 "enabled": True,
@@ -386,10 +509,24 @@ def _default_config() -> Dict[str, Any]:
                 "parse_mode": "",
                 "send_coin_image": True,
                 "coin_image_urls": {},
+                "rate_limit": {
+                    "enabled": True,
+                    "global_per_sec": 25,
+                    "chat_per_sec": 1,
+                    "group_per_min": 20,
+                    "max_wait_sec": 30,
+                    "max_retries": 3,
+                },
             },
             "windows": {
                 "enabled": True,
             },
+            "dispatcher": {
+                "enabled": True,
+                "workers": 8,
+                "queue_size": 512,
+                "flush_timeout_sec": 30,
+            },
         },
     }
 
@@ -643,8 +780,8 @@ def _read_json(path: Path, fallback: Dict[str, Any]) -> Dict[str, Any]:
     return fallback
 
 
-def _write_json(path: Path, payload: Dict[str, Any]) -> None:
-    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+def _write_json(path: Path, payload: Dict[str, Any]) -> int:
+    return write_json_atomic(path, payload)
 
 
 def _migrate_precision_filters_v2(raw_precision_cfg: Any) -> Tuple[Dict[str, Any], bool]:
@@ -715,9 +852,52 @@ def load_config(config_path: Path) -> Dict[str, Any]:
     return migrated
 
 
-def load_state(state_path: Path) -> Dict[str, Any]:
+def _resolve_state_store_cfg(cfg: Dict[str, Any], state_path: Path) -> Dict[str, Any]:
+    raw = cfg.get("state_store", {})
+    if not isinstance(raw, dict):
+        raw = {}
+    backend = str(raw.get("backend", "json")).strip().lower()
+    if backend not in {"json", "journal", "sqlite"}:
+        backend = "json"
+    sqlite_path = str(raw.get("sqlite_path", "") or "").strip()
+    path = Path(sqlite_path) if sqlite_path else state_path.with_suffix(".sqlite3")
+    if not path.is_absolute():
+        path = state_path.parent / path
+    return {
+        "backend": backend,
+        "sqlite_path": path,
+        "journal_compact_bytes": int(max(0.0, _safe_float(raw.get("journal_compact_mb", 4), 4.0)) * 1024 * 1024),
+        "journal_compact_every": max(1, int(_safe_float(raw.get("journal_compact_every", 500), 500.0))),
+    }
+
+
+def _open_state_store(cfg: Dict[str, Any], state_path: Path) -> StateStore | StateJournal | None:
+    store_cfg = _resolve_state_store_cfg(cfg, state_path)
+    if store_cfg["backend"] == "journal":
+        logging.info("Estado con journal: %s", state_path)
+        return StateJournal(
+            state_path,
+            compact_bytes=store_cfg["journal_compact_bytes"],
+            compact_every=store_cfg["journal_compact_every"],
+        )
+    if store_cfg["backend"] != "sqlite":
+        return None
+    try:
+        store = StateStore(store_cfg["sqlite_path"])
+    except Exception as exc:
+        logging.error("No se pudo abrir el estado SQLite %s (%s); se usa %s", store_cfg["sqlite_path"], exc, state_path)
+        return None
+    logging.info("Estado en SQLite: %s", store_cfg["sqlite_path"])
+    return store
+
+
+def load_state(state_path: Path, store: StateStore | StateJournal | None = None) -> Dict[str, Any]:
     fallback = {"symbols": {}, "free_daily_market_alerts": {}}
-    state = _read_json(state_path, fallback)
+    if store is not None and not store.is_empty():
+        state = store.load()
+    else:
+        # Sin base/journal previo se parte del JSON; el primer save_state lo importa completo.
+        state = _read_json(state_path, fallback)
     if not isinstance(state.get("symbols"), dict):
         state["symbols"] = {}
     if not isinstance(state.get("free_daily_market_alerts"), dict):
@@ -726,15 +906,25 @@ def load_state(state_path: Path) -> Dict[str, Any]:
         state[TELEGRAM_AUTO_CHAT_IDS_KEY] = []
     if not isinstance(state.get(TELEGRAM_USER_CHAT_LINKS_KEY), dict):
         state[TELEGRAM_USER_CHAT_LINKS_KEY] = {}
+    if not isinstance(state.get(TELEGRAM_PHOTO_FILE_IDS_KEY), dict):
+        state[TELEGRAM_PHOTO_FILE_IDS_KEY] = {}
     try:
         state[TELEGRAM_LAST_UPDATE_ID_KEY] = int(state.get(TELEGRAM_LAST_UPDATE_ID_KEY, 0) or 0)
     except Exception:
         state[TELEGRAM_LAST_UPDATE_ID_KEY] = 0
+    state["quality_epoch"] = int(_safe_float(state.get("quality_epoch", 0), 0.0))
     return _normalize_state_open_alerts(_prune_legacy_forex_from_state(state))
 
 
-def save_state(state_path: Path, state: Dict[str, Any]) -> None:
-    _write_json(state_path, state)
+def save_state(state_path: Path, state: Dict[str, Any], store: StateStore | StateJournal | None = None) -> Dict[str, Any]:
+    started = time.perf_counter()
+    if store is not None:
+        stats = dict(store.save(state))
+    else:
+        stats = {"records_written": len(state.get("symbols", {}) or {}), "bytes_written": _write_json(state_path, state)}
+    stats["backend"] = "sqlite" if isinstance(store, StateStore) else ("journal" if store is not None else "json")
+    stats["latency_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+    return stats
 
 
 def _iso_utc_now() -> str:
@@ -801,6 +991,33 @@ def _new_channel_health_stats() -> Dict[str, Any]:
     }
 
 
+def _new_fetch_cache_stats() -> Dict[str, Any]:
+    return {
+        "hits": 0,
+        "misses": 0,
+        "entries": 0,
+        "hit_rate_pct": 0.0,
+    }
+
+
+def _new_candle_store_stats() -> Dict[str, Any]:
+    return {
+        "enabled": False,
+        "incremental_requests": 0,
+        "full_requests": 0,
+        "bars_fetched": 0,
+    }
+
+
+def _new_streaming_indicators_stats() -> Dict[str, Any]:
+    return {
+        "enabled": False,
+        "engines": 0,
+        "incremental_bars": 0,
+        "reseeds": 0,
+    }
+
+
 def _new_cycle_metrics() -> Dict[str, Any]:
     return {
         "started_utc": _iso_utc_now(),
@@ -810,12 +1027,35 @@ def _new_cycle_metrics() -> Dict[str, Any]:
         "rss_peak_mb": 0.0,
         "watchlist_size": 0,
         "scan_targets": 0,
+        "outcome_only": False,
         "records_total": 0,
         "records_success": 0,
         "records_error": 0,
         "alerts_triggered": 0,
         "alerts_sent": 0,
         "alerts_failed": 0,
+        "fetch_cache": _new_fetch_cache_stats(),
+        "candle_store": _new_candle_store_stats(),
+        "streaming_indicators": _new_streaming_indicators_stats(),
+        "eval_cache": {
+            "reused": 0,
+            "estado_reused": 0,
+            "recomputed": 0,
+        },
+        "notify_dispatcher": {
+            "enabled": False,
+            "queued": 0,
+            "inline": 0,
+            "applied": 0,
+            "deferred": 0,
+        },
+        "parallel_fetch": {
+            "enabled": False,
+            "workers": 0,
+            "records": 0,
+            "batched_frames": 0,
+            "wall_ms": 0.0,
+        },
         "latency_ms": {
             "record_eval": _new_latency_stats(),
             "notification": _new_latency_stats(),
@@ -860,11 +1100,13 @@ def _default_health_state() -> Dict[str, Any]:
             "alerts_sent": 0,
             "alerts_failed": 0,
             "errors_total": 0,
+            "state_bytes_written": 0,
         },
         "latency_ms": {
             "cycle": _new_latency_stats(),
             "record_eval": _new_latency_stats(),
             "notification": _new_latency_stats(),
+            "state_save": _new_latency_stats(),
         },
         "notifications": {
             "telegram": _new_channel_health_stats(),
@@ -965,7 +1207,7 @@ def _update_health_from_cycle(
     if not isinstance(latencies, dict):
         latencies = {}
         payload["latency_ms"] = latencies
-    for key in ("cycle", "record_eval", "notification"):
+    for key in ("cycle", "record_eval", "notification", "state_save"):
         if not isinstance(latencies.get(key), dict):
             latencies[key] = _new_latency_stats()
 
@@ -979,6 +1221,14 @@ def _update_health_from_cycle(
     _merge_latency_stats(latencies["cycle"], cycle_latency)
     _merge_latency_stats(latencies["record_eval"], cycle_metrics.get("latency_ms", {}).get("record_eval", {}))
     _merge_latency_stats(latencies["notification"], cycle_metrics.get("latency_ms", {}).get("notification", {}))
+    state_save = cycle_metrics.get("state_store", {})
+    if isinstance(state_save, dict) and "latency_ms" in state_save:
+        save_ms = float(state_save.get("latency_ms", 0.0) or 0.0)
+        _merge_latency_stats(
+            latencies["state_save"],
+            {"count": 1, "total_ms": save_ms, "avg_ms": save_ms, "max_ms": save_ms, "last_ms": save_ms},
+        )
+        counters["state_bytes_written"] = int(counters.get("state_bytes_written", 0) or 0) + int(state_save.get("bytes_written", 0) or 0)
 
     notif = payload.get("notifications", {})
     if not isinstance(notif, dict):
@@ -1005,12 +1255,52 @@ def _update_health_from_cycle(
         "alerts_triggered": int(cycle_metrics.get("alerts_triggered", 0) or 0),
         "alerts_sent": int(cycle_metrics.get("alerts_sent", 0) or 0),
         "alerts_failed": int(cycle_metrics.get("alerts_failed", 0) or 0),
+        "fetch_cache": dict(cycle_metrics.get("fetch_cache", {}))
+        if isinstance(cycle_metrics.get("fetch_cache", {}), dict)
+        else _new_fetch_cache_stats(),
+        "candle_store": dict(cycle_metrics.get("candle_store", {}))
+        if isinstance(cycle_metrics.get("candle_store", {}), dict)
+        else _new_candle_store_stats(),
+        "streaming_indicators": dict(cycle_metrics.get("streaming_indicators", {}))
+        if isinstance(cycle_metrics.get("streaming_indicators", {}), dict)
+        else _new_streaming_indicators_stats(),
+        "parallel_fetch": dict(cycle_metrics.get("parallel_fetch", {}))
+        if isinstance(cycle_metrics.get("parallel_fetch", {}), dict)
+        else {},
+        "binance_stream": dict(cycle_metrics.get("binance_stream", {}))
+        if isinstance(cycle_metrics.get("binance_stream", {}), dict)
+        else {},
+        "eval_cache": dict(cycle_metrics.get("eval_cache", {}))
+        if isinstance(cycle_metrics.get("eval_cache", {}), dict)
+        else {},
+        "state_store": dict(cycle_metrics.get("state_store", {}))
+        if isinstance(cycle_metrics.get("state_store", {}), dict)
+        else {},
+        "notify_dispatcher": dict(cycle_metrics.get("notify_dispatcher", {}))
+        if isinstance(cycle_metrics.get("notify_dispatcher", {}), dict)
+        else {},
+        "telegram_transport": dict(cycle_metrics.get("telegram_transport", {}))
+        if isinstance(cycle_metrics.get("telegram_transport", {}), dict)
+        else {},
+        "telegram_photo_cache": dict(cycle_metrics.get("telegram_photo_cache", {}))
+        if isinstance(cycle_metrics.get("telegram_photo_cache", {}), dict)
+        else {},
+        "smtp_transport": dict(cycle_metrics.get("smtp_transport", {}))
+        if isinstance(cycle_metrics.get("smtp_transport", {}), dict)
+        else {},
+        "http_pool": dict(cycle_metrics.get("http_pool", {}))
+        if isinstance(cycle_metrics.get("http_pool", {}), dict)
+        else {},
         "rss_start_mb": round(float(cycle_metrics.get("rss_start_mb", 0.0) or 0.0), 2),
         "rss_end_mb": round(float(cycle_metrics.get("rss_end_mb", 0.0) or 0.0), 2),
         "rss_peak_mb": round(float(cycle_metrics.get("rss_peak_mb", 0.0) or 0.0), 2),
         "cycle_ok": bool(cycle_ok),
     }
     payload["last_cycle"] = last_cycle
+    if last_cycle["binance_stream"]:
+        payload["binance_stream"] = dict(last_cycle["binance_stream"])
+    if last_cycle["http_pool"]:
+        payload["http_pool"] = dict(last_cycle["http_pool"])
 
     errors = payload.get("recent_errors", [])
     if not isinstance(errors, list):
@@ -1272,8 +1562,8 @@ def _discover_telegram_chats_from_updates(
         params["offset"] = last_update_id + 1
 
     try:
-        resp = requests.get(
-            f"https://api.telegram.org/bot{token}/getUpdates",
+        resp = http_pool.get(
+            f"{TELEGRAM_API_BASE}/bot{token}/getUpdates",
             params=params,
             timeout=20,
         )
@@ -1349,7 +1639,7 @@ def _premium_activo_usuario(record: Dict[str, Any]) -> bool:
     until_dt = _parse_iso_utc(until)
     if until_dt is None:
         return bool(record.get("es_premium", False))
-    return datetime.now(pytz.UTC) <= until_dt
+    return _utcnow() <= until_dt
 
 
 def _load_user_records(users_db_path: Path = USERS_DB_PATH) -> List[Dict[str, Any]]:
@@ -1392,7 +1682,7 @@ def _load_user_targets(
 
 
 def _utc_day_key() -> str:
-    return datetime.now(pytz.UTC).strftime("%Y-%m-%d")
+    return _utcnow().strftime("%Y-%m-%d")
 
 
 def _free_user_can_receive_market_alert(state: Dict[str, Any], user_id: str, market_key: str) -> bool:
@@ -1407,7 +1697,8 @@ def _free_user_can_receive_market_alert(state: Dict[str, Any], user_id: str, mar
         free_state[user_id] = user_state
 
     last_day = str(user_state.get(market_key, "") or "").strip()
-    return last_day != _utc_day_key()
+    today = _utc_day_key()
+    return last_day != today and _FREE_ALERT_RESERVATIONS.get((user_id, market_key)) != today
 
 
 def _mark_free_user_market_alert(state: Dict[str, Any], user_id: str, market_key: str) -> None:
@@ -1416,7 +1707,7 @@ def _mark_free_user_market_alert(state: Dict[str, Any], user_id: str, market_key
         state["free_daily_market_alerts"] = {}
         free_state = state["free_daily_market_alerts"]
 
-    user_state = free_state.get(user_id, {})
+    user_state = free_state.setdefault(user_id, {})
     if not isinstance(user_state, dict):
         user_state = {}
         free_state[user_id] = user_state
@@ -1428,7 +1719,7 @@ def _market_open(kind: str) -> bool:
     if kind == "crypto":
         return True
 
-    now_ny = datetime.now(NY_TZ)
+    now_ny = _utcnow().astimezone(NY_TZ)
     weekday = now_ny.weekday()
     hhmm = now_ny.hour * 60 + now_ny.minute
     close_min = 17 * 60
@@ -1442,7 +1733,12 @@ def _market_open(kind: str) -> bool:
     return True
 
 
-def _fetch_twelvedata(symbol: str, interval: str, api_key: str) -> Tuple[pd.DataFrame | None, str]:
+def _fetch_twelvedata(
+    symbol: str,
+    interval: str,
+    api_key: str,
+    start_date: str = "",
+) -> Tuple[pd.DataFrame | None, str]:
     try:
         params = {
             "symbol": symbol,
@@ -1451,7 +1747,9 @@ def _fetch_twelvedata(symbol: str, interval: str, api_key: str) -> Tuple[pd.Data
             "format": "JSON",
             "apikey": api_key,
         }
-        resp = requests.get("https://api.twelvedata.com/time_series", params=params, timeout=15)
+        if start_date:
+            params["start_date"] = start_date
+        resp = http_pool.get(f"{TWELVEDATA_BASE}/time_series", params=params, timeout=15)
         resp.raise_for_status()
         payload = resp.json()
         values = payload.get("values")
@@ -1478,18 +1776,386 @@ def _fetch_twelvedata(symbol: str, interval: str, api_key: str) -> Tuple[pd.Data
         return None, str(exc)
 
 
+def _provider_semaphore(cfg: Dict[str, Any], provider: str) -> threading.BoundedSemaphore:
+    limit = PROVIDER_CONCURRENCY_DEFAULTS.get(provider, 2)
+    raw = cfg.get("parallel_fetch", {})
+    limits = raw.get("provider_limits", {}) if isinstance(raw, dict) else {}
+    if isinstance(limits, dict):
+        try:
+            limit = int(limits.get(provider, limit))
+        except Exception:
+            pass
+    limit = max(1, limit)
+    with _PROVIDER_SEMAPHORES_LOCK:
+        current = _PROVIDER_SEMAPHORES.get(provider)
+        if current is None or current[0] != limit:
+            current = (limit, threading.BoundedSemaphore(limit))
+            _PROVIDER_SEMAPHORES[provider] = current
+        return current[1]
+
+
+def _candle_store_from_cfg(cfg: Dict[str, Any]) -> CandleStore | None:
+    raw = cfg.get("candle_store", {})
+    if not isinstance(raw, dict) or not bool(raw.get("enabled", True)):
+        return None
+    root = Path(str(raw.get("dir", "") or "candle_store"))
+    if not root.is_absolute():
+        root = ROOT / root
+    try:
+        max_rows = int(raw.get("max_rows", 1000))
+    except Exception:
+        max_rows = 1000
+    return get_candle_store(root, max_rows=max_rows)
+
+
+def _resolve_streaming_indicators_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    raw = cfg.get("streaming_indicators", {})
+    if not isinstance(raw, dict):
+        raw = {}
+    try:
+        max_rows = int(raw.get("max_rows", 1000))
+    except Exception:
+        max_rows = 1000
+    snapshot_dir = str(raw.get("snapshot_dir", "") or "").strip()
+    if snapshot_dir and not Path(snapshot_dir).is_absolute():
+        snapshot_dir = str(ROOT / snapshot_dir)
+    return {
+        "enabled": bool(raw.get("enabled", True)),
+        "max_rows": max(50, max_rows),
+        "snapshot_dir": snapshot_dir,
+    }
+
+
+def _indicator_kernel(cfg: Dict[str, Any] | None) -> Callable[[pd.DataFrame], pd.DataFrame]:
+    kernel = str((cfg or {}).get("indicator_kernel", "numpy")).strip().lower()
+    return calcular_indicadores_np if kernel == "numpy" else calcular_indicadores
+
+
+def _resolve_batch_indicators_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    raw = cfg.get("batch_indicators", {})
+    if not isinstance(raw, dict):
+        raw = {}
+    try:
+        min_frames = int(raw.get("min_frames", 2))
+    except Exception:
+        min_frames = 2
+    # El lote usa el kernel NumPy; con streaming activo cada simbolo ya avanza vela a vela.
+    active = (
+        bool(raw.get("enabled", False))
+        and _indicator_kernel(cfg) is calcular_indicadores_np
+        and not _resolve_streaming_indicators_cfg(cfg)["enabled"]
+    )
+    return {"enabled": active, "min_frames": max(2, min_frames)}
+
+
+def _indicator_engine_key(item: MarketItem, interval: str, source: str = "", period: str = "") -> str:
+    """Un motor por simbolo, intervalo y serie de velas.
+
+    Binance y TwelveData piden por cantidad de velas y comparten la serie entre periodos; yfinance descarga por
+    periodo y cada periodo es otra serie (con un motor compartido se resembraria en cada llamada).
+    """
+    series = str(source or "")
+    if series.split("_")[0] not in {"binance", "twelvedata"}:
+        series = f"{series}@{period}"
+    return f"{item.market}|{item.ticker}|{interval}|{series}"
+
+
+def _calcular_indicadores_streaming(
+    frame: pd.DataFrame,
+    key: str,
+    streaming_cfg: Dict[str, Any] | None,
+    kernel: Callable[[pd.DataFrame], pd.DataFrame] = calcular_indicadores,
+    closed_only: bool = False,
+) -> pd.DataFrame:
+    if not key or not isinstance(streaming_cfg, dict) or not streaming_cfg.get("enabled"):
+        return kernel(frame)
+    engine = get_indicator_engine(key, max_rows=int(streaming_cfg.get("max_rows", 1000)))
+    snapshot_dir = str(streaming_cfg.get("snapshot_dir", "") or "")
+    snapshot_path = Path(snapshot_dir) / f"{SAFE_FILENAME_PATTERN.sub('_', key)}.npz" if snapshot_dir else None
+    with engine.lock:
+        if snapshot_path is not None and not engine.seeded:
+            engine.load(snapshot_path)
+        before = engine.last_index
+        df_ind = engine.apply(frame, closed_only=closed_only)
+        if snapshot_path is not None and engine.seeded and engine.last_index != before:
+            engine.save(snapshot_path)
+    return df_ind
+
+
+def _context_indicators(
+    item: MarketItem,
+    interval: str,
+    period: str,
+    candles: Dict[str, Any],
+    cfg: Dict[str, Any] | None,
+    closed_only: bool,
+) -> pd.DataFrame:
+    """Indicadores de `candles["df_ready"]` (MTF/estructural) con el mismo motor incremental que el registro de esa serie."""
+    cfg_safe = cfg if isinstance(cfg, dict) else {}
+    return _calcular_indicadores_streaming(
+        candles["df_ready"],
+        _indicator_engine_key(item, interval, candles["source"], period),
+        _resolve_streaming_indicators_cfg(cfg_safe),
+        _indicator_kernel(cfg_safe),
+        closed_only=closed_only,
+    )
+
+
+def _stored_gap_bars(stored: pd.DataFrame, interval: str) -> int:
+    last_ts = last_open_time(stored)
+    delta = _interval_to_timedelta(interval)
+    if last_ts is None or delta is None:
+        return 10**9
+    if last_ts.tzinfo is None:
+        last_ts = last_ts.tz_localize("UTC")
+    elapsed = _utcnow() - last_ts.to_pydatetime()
+    return max(0, int(elapsed / delta)) + 1
+
+
+def _fetch_binance_klines_stored(
+    store: CandleStore,
+    symbol: str,
+    interval: str,
+    limit: int = 500,
+) -> Tuple[pd.DataFrame | None, str | None]:
+    with store.lock_for("binance", symbol, interval):
+        return _fetch_binance_klines_stored_locked(store, symbol, interval, limit=limit)
+
+
+def _fetch_binance_klines_stored_locked(
+    store: CandleStore,
+    symbol: str,
+    interval: str,
+    limit: int = 500,
+) -> Tuple[pd.DataFrame | None, str | None]:
+    stored = store.load("binance", symbol, interval)
+    if not stored.empty and _stored_gap_bars(stored, interval) < limit:
+        last_ts = last_open_time(stored)
+        start_ms = int(last_ts.timestamp() * 1000)
+        fresh, err = fetch_klines(symbol, interval, limit=limit, start_time=start_ms)
+        if fresh is not None and not fresh.empty and len(fresh) < limit:
+            store.record_fetch(incremental=True, bars=len(fresh))
+            merged = store.merge(stored, fresh)
+            store.save("binance", symbol, interval, merged)
+            return merged, None
+        if fresh is None or fresh.empty:
+            logging.debug("[%s %s] Fetch incremental Binance fallo (%s), descarga completa", symbol, interval, err)
+
+    fresh, err = fetch_klines(symbol, interval, limit=limit)
+    if fresh is None or fresh.empty:
+        return fresh, err
+    store.record_fetch(incremental=False, bars=len(fresh))
+    merged = store.merge(pd.DataFrame(), fresh)
+    store.save("binance", symbol, interval, merged)
+    return merged, err
+
+
+def _fetch_twelvedata_stored(
+    store: CandleStore,
+    symbol: str,
+    interval: str,
+    api_key: str,
+    outputsize: int = 500,
+) -> Tuple[pd.DataFrame | None, str]:
+    with store.lock_for("twelvedata", symbol, interval):
+        return _fetch_twelvedata_stored_locked(store, symbol, interval, api_key, outputsize=outputsize)
+
+
+def _fetch_twelvedata_stored_locked(
+    store: CandleStore,
+    symbol: str,
+    interval: str,
+    api_key: str,
+    outputsize: int = 500,
+) -> Tuple[pd.DataFrame | None, str]:
+    stored = store.load("twelvedata", symbol, interval)
+    start_date = ""
+    last_ts = last_open_time(stored)
+    if last_ts is not None:
+        start_date = last_ts.strftime("%Y-%m-%d %H:%M:%S")
+
+    fresh, err = _fetch_twelvedata(symbol, interval, api_key, start_date=start_date)
+    if fresh is None or fresh.empty:
+        return fresh, err
+    # TwelveData devuelve las ultimas `outputsize` velas del rango: si llena la ventana,
+    # hay hueco respecto a lo guardado y se reemplaza en vez de unir.
+    incremental = bool(start_date) and len(fresh) < outputsize
+    store.record_fetch(incremental=incremental, bars=len(fresh))
+    merged = store.merge(stored if incremental else pd.DataFrame(), fresh)
+    store.save("twelvedata", symbol, interval, merged)
+    return merged, err
+
+
+def _resolve_binance_stream_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    raw = cfg.get("binance_stream", {})
+    if not isinstance(raw, dict):
+        raw = {}
+    try:
+        max_bars = int(raw.get("max_bars", 1000))
+    except Exception:
+        max_bars = 1000
+    try:
+        stale_sec = float(raw.get("stale_sec", 90))
+    except Exception:
+        stale_sec = 90.0
+    return {
+        "enabled": bool(raw.get("enabled", True)),
+        "max_bars": max(50, max_bars),
+        "stale_sec": max(5.0, stale_sec),
+    }
+
+
+def _resolve_endpoints_cfg(cfg: Dict[str, Any]) -> Dict[str, str]:
+    raw = cfg.get("endpoints", {})
+    if not isinstance(raw, dict):
+        raw = {}
+    return {key: str(raw.get(key, "") or "").strip().rstrip("/") for key in ("binance_rest", "binance_ws", "twelvedata", "telegram")}
+
+
+def _apply_endpoints_cfg(cfg: Dict[str, Any]) -> Dict[str, str]:
+    global TWELVEDATA_BASE, TELEGRAM_API_BASE
+    endpoints = _resolve_endpoints_cfg(cfg)
+    set_binance_base_urls(endpoints["binance_rest"], endpoints["binance_ws"])
+    TWELVEDATA_BASE = endpoints["twelvedata"] or DEFAULT_TWELVEDATA_BASE
+    TELEGRAM_API_BASE = endpoints["telegram"] or DEFAULT_TELEGRAM_API_BASE
+    custom = {key: value for key, value in endpoints.items() if value}
+    if custom:
+        logging.info("Endpoints personalizados: %s", ", ".join(f"{key}={value}" for key, value in sorted(custom.items())))
+    return endpoints
+
+
+def _resolve_http_pool_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    raw = cfg.get("http_pool", {})
+    if not isinstance(raw, dict):
+        raw = {}
+    try:
+        pool_maxsize = int(raw.get("pool_maxsize", http_pool.DEFAULT_POOL_MAXSIZE))
+    except Exception:
+        pool_maxsize = http_pool.DEFAULT_POOL_MAXSIZE
+    try:
+        retries = int(raw.get("retries", http_pool.DEFAULT_RETRIES))
+    except Exception:
+        retries = http_pool.DEFAULT_RETRIES
+    try:
+        backoff_sec = float(raw.get("backoff_sec", http_pool.DEFAULT_BACKOFF_SEC))
+    except Exception:
+        backoff_sec = http_pool.DEFAULT_BACKOFF_SEC
+    try:
+        connect_timeout_sec = float(raw.get("connect_timeout_sec", http_pool.DEFAULT_CONNECT_TIMEOUT_SEC))
+    except Exception:
+        connect_timeout_sec = http_pool.DEFAULT_CONNECT_TIMEOUT_SEC
+    return {
+        "enabled": bool(raw.get("enabled", True)),
+        "pool_maxsize": max(1, min(64, pool_maxsize)),
+        "retries": max(0, min(5, retries)),
+        "backoff_sec": max(0.0, min(5.0, backoff_sec)),
+        "connect_timeout_sec": max(0.5, min(30.0, connect_timeout_sec)),
+    }
+
+
+def _apply_http_pool_cfg(cfg: Dict[str, Any]) -> http_pool.HttpPool:
+    pool = http_pool.configure(**_resolve_http_pool_cfg(cfg))
+    if not pool.enabled:
+        logging.info("Pool HTTP desactivado: cada peticion abre su propia conexion.")
+    return pool
+
+
+def _crypto_map(cfg: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+    # `extra_crypto_map` agrega simbolos fuera de CRYPTO_MAP ({"SYM": {"ticker", "binance", "td"}}).
+    extra = cfg.get("extra_crypto_map", {})
+    if not isinstance(extra, dict) or not extra:
+        return CRYPTO_MAP
+    merged = dict(CRYPTO_MAP)
+    for symbol, row in extra.items():
+        if isinstance(row, dict) and str(row.get("ticker", "")).strip():
+            merged[str(symbol)] = {key: str(row.get(key, "") or "") for key in ("ticker", "binance", "td")}
+    return merged
+
+
+def _binance_feed_intervals(cfg: Dict[str, Any]) -> List[str]:
+    intervals: set = set()
+    for target in _resolve_scan_targets(cfg):
+        if str(target.get("mode", "")).strip().lower() == "estructural":
+            intervals.update({"1d", "4h"})
+        else:
+            intervals.add(str(target.get("interval", "")).strip().lower())
+    mtf_map = _resolve_precision_cfg(cfg).get("mtf_intervals", {})
+    if isinstance(mtf_map, dict):
+        for base in list(intervals):
+            extra = mtf_map.get(base, [])
+            if isinstance(extra, list):
+                intervals.update(str(x).strip().lower() for x in extra)
+    return sorted(i for i in intervals if i in TD_INTERVAL_MAP)
+
+
+def _start_binance_feed(cfg: Dict[str, Any]) -> BinanceKlineFeed | None:
+    global _BINANCE_FEED
+    stream_cfg = _resolve_binance_stream_cfg(cfg)
+    if not stream_cfg["enabled"]:
+        return None
+    cfg = _apply_resource_profile(cfg)
+    symbols = [item.binance_symbol for item in _build_watchlist(cfg) if item.kind == "crypto" and item.binance_symbol]
+    intervals = _binance_feed_intervals(cfg)
+    if not symbols or not intervals:
+        return None
+    candle_store = _candle_store_from_cfg(cfg)
+
+    def rest_fetch(symbol: str, interval: str, limit: int = 500, start_time: int | None = None):
+        with _provider_semaphore(cfg, "binance"):
+            if start_time is None and candle_store is not None:
+                return _fetch_binance_klines_stored(candle_store, symbol, interval, limit=limit)
+            return fetch_klines(symbol, interval, limit=limit, start_time=start_time)
+
+    feed = BinanceKlineFeed(
+        symbols,
+        intervals,
+        max_bars=int(stream_cfg["max_bars"]),
+        stale_sec=float(stream_cfg["stale_sec"]),
+        rest_fetch=rest_fetch,
+    )
+    if not feed.start():
+        logging.warning("Binance WS feed no disponible (websockets no instalado); se usa REST.")
+        return None
+    logging.info("Binance WS feed iniciado: %s pares (%s simbolos x %s)", len(feed.pairs), len(symbols), ",".join(intervals))
+    _BINANCE_FEED = feed
+    return feed
+
+
+def _stop_binance_feed() -> None:
+    global _BINANCE_FEED
+    if _BINANCE_FEED is not None:
+        _BINANCE_FEED.stop()
+    _BINANCE_FEED = None
+
+
 def _fetch_data(
     item: MarketItem,
     period: str,
     interval: str,
     cfg: Dict[str, Any] | None = None,
+    limit: int = 500,
+    trim: bool = True,
 ) -> Tuple[pd.DataFrame | None, str, str]:
     cfg_safe = cfg if isinstance(cfg, dict) else {}
+    candle_store = _candle_store_from_cfg(cfg_safe)
+
+    def _trim(df: pd.DataFrame | None) -> pd.DataFrame | None:
+        return _trim_df_for_interval(df, interval=interval, cfg=cfg_safe) if trim else df
+
     if item.kind == "crypto" and item.binance_symbol:
-        binance_df, binance_err = fetch_klines(item.binance_symbol, interval, limit=500)
+        feed = _BINANCE_FEED
+        feed_df = feed.get_df(item.binance_symbol, interval, limit=limit) if feed is not None else None
+        if feed_df is not None and not feed_df.empty:
+            return _trim(feed_df), "binance", ""
+        with _provider_semaphore(cfg_safe, "binance"):
+            if candle_store is not None:
+                binance_df, binance_err = _fetch_binance_klines_stored(
+                    candle_store, item.binance_symbol, interval, limit=limit
+                )
+            else:
+                binance_df, binance_err = fetch_klines(item.binance_symbol, interval, limit=limit)
         if binance_df is not None and not binance_df.empty:
-            binance_df = _trim_df_for_interval(binance_df, interval=interval, cfg=cfg_safe)
-            return binance_df, "binance", ""
+            return _trim(binance_df), "binance", ""
         logging.warning(
             "[%s] Binance spot fallo (%s), usando fallback de datos",
             item.state_key,
@@ -1501,10 +2167,13 @@ def _fetch_data(
     td_key_valid = td_key_upper not in {"", "TU_API_KEY", "YOUR_API_KEY", "CHANGE_ME"}
     td_interval = TD_INTERVAL_MAP.get(interval)
     if td_key_valid and td_interval and item.td_symbol:
-        td_df, td_err = _fetch_twelvedata(item.td_symbol, td_interval, td_key)
+        with _provider_semaphore(cfg_safe, "twelvedata"):
+            if candle_store is not None:
+                td_df, td_err = _fetch_twelvedata_stored(candle_store, item.td_symbol, td_interval, td_key)
+            else:
+                td_df, td_err = _fetch_twelvedata(item.td_symbol, td_interval, td_key)
         if td_df is not None and not td_df.empty:
-            td_df = _trim_df_for_interval(td_df, interval=interval, cfg=cfg_safe)
-            return td_df, "twelvedata", ""
+            return _trim(td_df), "twelvedata", ""
         logging.warning(
             "[%s] TwelveData fallo (%s), usando yfinance fallback",
             item.state_key,
@@ -1512,15 +2181,28 @@ def _fetch_data(
         )
 
     try:
-        yf_df = obtener_datos(item.ticker, periodo=period, intervalo=interval)
-        yf_df = _trim_df_for_interval(yf_df, interval=interval, cfg=cfg_safe)
-        return yf_df, "yfinance", ""
+        with _provider_semaphore(cfg_safe, "yfinance"):
+            yf_df = obtener_datos(item.ticker, periodo=period, intervalo=interval)
+        return _trim(yf_df), "yfinance", ""
     except Exception as exc:
         return None, "", str(exc)
 
 
+def _utcnow() -> datetime:
+    virtual = _VIRTUAL_NOW
+    return virtual if virtual is not None else datetime.now(pytz.UTC)
+
+
+def set_virtual_clock(now: datetime | None) -> None:
+    """Fija la hora que ven mercado abierto, cierre de vela, cooldowns y conteos diarios (None = hora real)."""
+    global _VIRTUAL_NOW
+    if now is not None and now.tzinfo is None:
+        now = pytz.UTC.localize(now)
+    _VIRTUAL_NOW = now.astimezone(pytz.UTC) if now is not None else None
+
+
 def _now_iso_utc() -> str:
-    return datetime.now(pytz.UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return _utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
 def _index_to_iso_utc(value: Any) -> str:
@@ -1698,9 +2380,9 @@ def _atr_ratio_from_df(df: pd.DataFrame) -> float:
     if df is None or df.empty or len(df) < 15:
         return 1.0
     try:
-        tr = (df["High"] - df["Low"]).abs()
-        atr14 = _safe_float(tr.rolling(14).mean().iloc[-1], default=0.0)
-        atr50 = _safe_float(tr.rolling(50).mean().iloc[-1], default=0.0) if len(df) >= 50 else _safe_float(tr.mean(), 0.0)
+        ctx = get_analysis_context(df)
+        atr14 = _safe_float(ctx.range_mean(14), default=0.0)
+        atr50 = _safe_float(ctx.range_mean(50), default=0.0)
         if atr14 <= 0 or atr50 <= 0:
             return 1.0
         return max(0.01, atr14 / atr50)
@@ -1708,20 +2390,6 @@ def _atr_ratio_from_df(df: pd.DataFrame) -> float:
         return 1.0
 
 
-def _atr14_from_df(df: pd.DataFrame) -> float:
-    if df is None or df.empty:
-        return 0.0
-    try:
-        tr = (df["High"] - df["Low"]).abs()
-        if len(df) >= 14:
-            val = _safe_float(tr.rolling(14).mean().iloc[-1], 0.0)
-        else:
-            val = _safe_float(tr.mean(), 0.0)
-        return max(0.0, val)
-    except Exception:
-        return 0.0
-
-
 def _is_last_candle_closed(df: pd.DataFrame, interval: str, grace_seconds: int = 10) -> bool:
     if df is None or df.empty:
         return False
@@ -1735,7 +2403,7 @@ def _is_last_candle_closed(df: pd.DataFrame, interval: str, grace_seconds: int =
         else:
             ts = ts.tz_convert("UTC")
         close_at = ts + delta + timedelta(seconds=max(0, int(grace_seconds)))
-        return datetime.now(pytz.UTC) >= close_at.to_pydatetime()
+        return _utcnow() >= close_at.to_pydatetime()
     except Exception:
         return True
 
@@ -1759,306 +2427,193 @@ def _prepare_df_for_closed_candle(
     return df.iloc[:-1], True, True
 
 
-def _candle_metrics(row: pd.Series) -> Dict[str, float]:
-    high = _safe_float(row.get("High"))
-    low = _safe_float(row.get("Low"))
-    open_ = _safe_float(row.get("Open"))
-    close = _safe_float(row.get("Close"))
-    total_range = max(1e-9, high - low)
-    body = abs(close - open_)
-    upper_wick = max(0.0, high - max(open_, close))
-    lower_wick = max(0.0, min(open_, close) - low)
-    return {
-        "range": total_range,
-        "body": body,
-        "upper_wick": upper_wick,
-        "lower_wick": lower_wick,
-        "open": open_,
-        "close": close,
-    }
-
-
-def _price_action_result(
-    pattern: str,
-    bias: str,
-    score: int,
-    description: str,
-    direction: str,
-) -> Dict[str, Any]:
-    direction_norm = str(direction or "").upper().strip()
-    bias_norm = str(bias or "NEUTRAL").upper().strip() or "NEUTRAL"
-    aligned = bias_norm == direction_norm and bias_norm in {"ALCISTA", "BAJISTA"}
-    final_score = int(score or 0)
-    if bias_norm in {"ALCISTA", "BAJISTA"} and not aligned:
-        final_score = 0
-    return {
-        "pattern": pattern,
-        "bias": bias_norm,
-        "score": final_score,
-        "aligned": aligned,
-        "description": description,
-    }
+def _new_fetch_cache() -> Dict[str, Any]:
+    return {"entries": {}, "hits": 0, "misses": 0, "inflight": {}, "lock": threading.Lock()}
 
 
-def _detect_false_breakout_pattern(df: pd.DataFrame, atr: float, direction: str) -> Dict[str, Any] | None:
-    if df is None or df.empty or len(df) < 7 or atr <= 0:
-        return None
-    base = df.iloc[-7:-2]
-    if base.empty:
-        return None
+def _fetch_cache_stats(fetch_cache: Dict[str, Any] | None) -> Dict[str, Any]:
+    stats = _new_fetch_cache_stats()
+    if not isinstance(fetch_cache, dict):
+        return stats
+    hits = int(fetch_cache.get("hits", 0) or 0)
+    misses = int(fetch_cache.get("misses", 0) or 0)
+    entries = fetch_cache.get("entries", {})
+    lookups = hits + misses
+    stats["hits"] = hits
+    stats["misses"] = misses
+    stats["entries"] = len({id(v) for v in entries.values()}) if isinstance(entries, dict) else 0
+    stats["hit_rate_pct"] = round(hits / lookups * 100.0, 2) if lookups > 0 else 0.0
+    return stats
 
-    resistance = _safe_float(pd.to_numeric(base["High"], errors="coerce").max(), default=float("nan"))
-    support = _safe_float(pd.to_numeric(base["Low"], errors="coerce").min(), default=float("nan"))
-    if pd.isna(resistance) or pd.isna(support):
-        return None
 
-    prev = df.iloc[-2]
-    last = df.iloc[-1]
-    prev_close = _safe_float(prev.get("Close"), default=float("nan"))
-    last_close = _safe_float(last.get("Close"), default=float("nan"))
-    tol = max(atr * 0.12, 1e-9)
-    if pd.isna(prev_close) or pd.isna(last_close):
-        return None
+def _resolve_resampling_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    raw = cfg.get("resampling", {})
+    if not isinstance(raw, dict):
+        raw = {}
+    bases = raw.get("base_intervals", ["15m", "1h"])
+    kinds = raw.get("kinds", ["crypto"])
+    try:
+        min_rows = int(raw.get("min_rows", 200))
+    except Exception:
+        min_rows = 200
+    try:
+        base_rows = int(raw.get("base_rows", 1000))
+    except Exception:
+        base_rows = 1000
+    return {
+        "enabled": bool(raw.get("enabled", True)),
+        "base_intervals": [str(x).strip().lower() for x in bases] if isinstance(bases, list) else [],
+        "kinds": [str(x).strip().lower() for x in kinds] if isinstance(kinds, list) else [],
+        "min_rows": max(1, min_rows),
+        # Binance entrega hasta 1000 velas por peticion.
+        "base_rows": min(1000, max(500, base_rows)),
+    }
 
-    if prev_close < support - tol and last_close > support + (tol * 0.1):
-        return _price_action_result(
-            pattern="ruptura_falsa_alcista",
-            bias="ALCISTA",
-            score=10,
-            description="Ruptura falsa bajista detectada con recuperacion del soporte.",
-            direction=direction,
-        )
-    if prev_close > resistance + tol and last_close < resistance - (tol * 0.1):
-        return _price_action_result(
-            pattern="ruptura_falsa_bajista",
-            bias="BAJISTA",
-            score=10,
-            description="Ruptura falsa alcista detectada con rechazo bajo resistencia.",
-            direction=direction,
-        )
-    return None
 
+def _resample_base_rows(item: MarketItem, interval: str, cfg: Dict[str, Any]) -> int:
+    """Velas a bajar de una temporalidad base (0 si no lo es): 500 solo dan 125 velas 1h desde 15m."""
+    res_cfg = _resolve_resampling_cfg(cfg)
+    if not res_cfg["enabled"] or str(item.kind).lower() not in res_cfg["kinds"]:
+        return 0
+    if str(interval).strip().lower() not in res_cfg["base_intervals"]:
+        return 0
+    if _resource_profile_active(cfg, "render_512mb"):
+        return 0
+    return int(res_cfg["base_rows"])
 
-def _detect_liquidity_sweep_pattern(df: pd.DataFrame, atr: float, direction: str) -> Dict[str, Any] | None:
-    if df is None or df.empty or len(df) < 6 or atr <= 0:
-        return None
-    base = df.iloc[-6:-1]
-    if base.empty:
-        return None
 
-    support = _safe_float(pd.to_numeric(base["Low"], errors="coerce").min(), default=float("nan"))
-    resistance = _safe_float(pd.to_numeric(base["High"], errors="coerce").max(), default=float("nan"))
-    if pd.isna(support) or pd.isna(resistance):
+def _fetch_data_resampled(
+    item: MarketItem,
+    interval: str,
+    cfg: Dict[str, Any],
+    fetch_cache: Dict[str, Any] | None,
+    require_closed_candle: bool,
+    grace_seconds: int,
+) -> Tuple[pd.DataFrame | None, str, str] | None:
+    res_cfg = _resolve_resampling_cfg(cfg)
+    if not res_cfg["enabled"] or str(item.kind).lower() not in res_cfg["kinds"]:
         return None
-
-    last = df.iloc[-1]
-    last_m = _candle_metrics(last)
-    low = _safe_float(last.get("Low"), default=float("nan"))
-    high = _safe_float(last.get("High"), default=float("nan"))
-    close = _safe_float(last.get("Close"), default=float("nan"))
-    tol = max(atr * 0.12, 1e-9)
-    wick_floor = max(last_m["body"] * 1.5, last_m["range"] * 0.35)
-    if pd.isna(low) or pd.isna(high) or pd.isna(close):
+    # Las bases se bajan nativas: derivarlas acortaria la serie de la que salen las mayores.
+    if str(interval).strip().lower() in res_cfg["base_intervals"]:
         return None
-
-    if low < support - tol and close >= support and last_m["lower_wick"] >= wick_floor:
-        return _price_action_result(
-            pattern="barrida_liquidez_alcista",
-            bias="ALCISTA",
-            score=10,
-            description="Barrida de liquidez bajista con cierre de recuperacion.",
-            direction=direction,
-        )
-    if high > resistance + tol and close <= resistance and last_m["upper_wick"] >= wick_floor:
-        return _price_action_result(
-            pattern="barrida_liquidez_bajista",
-            bias="BAJISTA",
-            score=10,
-            description="Barrida de liquidez alcista con cierre de rechazo.",
-            direction=direction,
+    bases = [b for b in res_cfg["base_intervals"] if can_derive(b, interval)]
+    # La base mas grande produce mas velas derivadas con el mismo historico.
+    for base in sorted(bases, key=lambda b: interval_minutes(b) or 0, reverse=True):
+        base_candles = _fetch_candles_cached(
+            item,
+            period=_period_for_interval(base),
+            interval=base,
+            cfg=cfg,
+            fetch_cache=fetch_cache,
+            require_closed_candle=require_closed_candle,
+            grace_seconds=grace_seconds,
         )
+        base_df = base_candles.get("df_base")
+        if base_df is None:
+            base_df = base_candles["df"]
+        if base_df is None or base_df.empty:
+            continue
+        derived = resample_ohlcv(base_df, base_interval=base, target_interval=interval, now=_utcnow())
+        if len(derived) < res_cfg["min_rows"]:
+            continue
+        derived = _trim_df_for_interval(derived, interval=interval, cfg=cfg)
+        return derived, f"{base_candles['source']}_resample_{base}", ""
     return None
 
 
-def _detect_double_structure_pattern(df: pd.DataFrame, atr: float, direction: str) -> Dict[str, Any] | None:
-    if df is None or df.empty or len(df) < 8 or atr <= 0:
-        return None
-    window = df.tail(8)
-    split = len(window) // 2
-    if split < 3:
-        return None
-
-    highs = pd.to_numeric(window["High"], errors="coerce")
-    lows = pd.to_numeric(window["Low"], errors="coerce")
-    opens = pd.to_numeric(window["Open"], errors="coerce")
-    closes = pd.to_numeric(window["Close"], errors="coerce")
-    first_high = _safe_float(highs.iloc[:split].max(), default=float("nan"))
-    second_high = _safe_float(highs.iloc[split:].max(), default=float("nan"))
-    first_low = _safe_float(lows.iloc[:split].min(), default=float("nan"))
-    second_low = _safe_float(lows.iloc[split:].min(), default=float("nan"))
-    last_open = _safe_float(opens.iloc[-1], default=float("nan"))
-    last_close = _safe_float(closes.iloc[-1], default=float("nan"))
-    if any(pd.isna(v) for v in (first_high, second_high, first_low, second_low, last_open, last_close)):
-        return None
-
-    peak_tol = max(atr * 0.35, (abs(first_high + second_high) / 2.0) * 0.002)
-    trough_tol = max(atr * 0.35, (abs(first_low + second_low) / 2.0) * 0.002)
-    if abs(first_high - second_high) <= peak_tol and last_close < last_open:
-        if last_close <= min(first_high, second_high) - max(atr * 0.25, peak_tol * 0.5):
-            return _price_action_result(
-                pattern="doble_techo",
-                bias="BAJISTA",
-                score=9,
-                description="Doble techo detectado con rechazo en la segunda visita.",
-                direction=direction,
-            )
-    if abs(first_low - second_low) <= trough_tol and last_close > last_open:
-        if last_close >= max(first_low, second_low) + max(atr * 0.25, trough_tol * 0.5):
-            return _price_action_result(
-                pattern="doble_suelo",
-                bias="ALCISTA",
-                score=9,
-                description="Doble suelo detectado con recuperacion tras la segunda visita.",
-                direction=direction,
-            )
-    return None
-
-
-def _detect_retest_pattern(df: pd.DataFrame, atr: float, direction: str) -> Dict[str, Any] | None:
-    if df is None or df.empty or len(df) < 7 or atr <= 0:
-        return None
-    base = df.iloc[-7:-2]
-    if base.empty:
-        return None
-
-    resistance = _safe_float(pd.to_numeric(base["High"], errors="coerce").max(), default=float("nan"))
-    support = _safe_float(pd.to_numeric(base["Low"], errors="coerce").min(), default=float("nan"))
-    if pd.isna(resistance) or pd.isna(support):
-        return None
-
-    prev = df.iloc[-2]
-    last = df.iloc[-1]
-    prev_close = _safe_float(prev.get("Close"), default=float("nan"))
-    last_close = _safe_float(last.get("Close"), default=float("nan"))
-    last_low = _safe_float(last.get("Low"), default=float("nan"))
-    last_high = _safe_float(last.get("High"), default=float("nan"))
-    tol = max(atr * 0.15, 1e-9)
-    if any(pd.isna(v) for v in (prev_close, last_close, last_low, last_high)):
-        return None
-
-    if prev_close > resistance + tol and last_low <= resistance + tol and last_close >= resistance:
-        return _price_action_result(
-            pattern="retest_alcista",
-            bias="ALCISTA",
-            score=8,
-            description="Retest alcista validando la zona de ruptura.",
-            direction=direction,
-        )
-    if prev_close < support - tol and last_high >= support - tol and last_close <= support:
-        return _price_action_result(
-            pattern="retest_bajista",
-            bias="BAJISTA",
-            score=8,
-            description="Retest bajista validando la zona perdida.",
-            direction=direction,
+def _fetch_candles_cached(
+    item: MarketItem,
+    period: str,
+    interval: str,
+    cfg: Dict[str, Any] | None = None,
+    fetch_cache: Dict[str, Any] | None = None,
+    require_closed_candle: bool = True,
+    grace_seconds: int = 10,
+) -> Dict[str, Any]:
+    key = (item.state_key, str(interval), str(period), bool(require_closed_candle), int(grace_seconds))
+    # Binance y TwelveData piden por cantidad de velas (no por periodo): su respuesta
+    # se comparte entre callers que solo difieren en `period`.
+    shared_key = (key[0], key[1], "*", key[3], key[4])
+    entries: Dict[Tuple[Any, ...], Dict[str, Any]] | None = None
+    lock: threading.Lock | None = None
+    done: threading.Event | None = None
+    if isinstance(fetch_cache, dict):
+        lock = fetch_cache.setdefault("lock", threading.Lock())
+        entries = fetch_cache.setdefault("entries", {})
+        inflight = fetch_cache.setdefault("inflight", {})
+        # Si otro hilo ya descarga el mismo simbolo/intervalo, se espera su resultado.
+        while True:
+            with lock:
+                cached = entries.get(key) or entries.get(shared_key)
+                if cached is not None:
+                    fetch_cache["hits"] = int(fetch_cache.get("hits", 0) or 0) + 1
+                    return cached
+                pending = inflight.get(shared_key)
+                if pending is None:
+                    done = threading.Event()
+                    inflight[shared_key] = done
+                    fetch_cache["misses"] = int(fetch_cache.get("misses", 0) or 0) + 1
+                    break
+            pending.wait()
+
+    payload: Dict[str, Any] = {
+        "df": None,
+        "source": "",
+        "error": "",
+        "df_ready": pd.DataFrame(),
+        "ready_ok": False,
+        "open_candle_trimmed": False,
+    }
+    try:
+        resampled = _fetch_data_resampled(
+            item,
+            interval=interval,
+            cfg=cfg if isinstance(cfg, dict) else {},
+            fetch_cache=fetch_cache,
+            require_closed_candle=require_closed_candle,
+            grace_seconds=grace_seconds,
         )
-    return None
+        base_rows = _resample_base_rows(item, interval, cfg if isinstance(cfg, dict) else {})
+        if resampled is not None:
+            df, source, err = resampled
+        elif base_rows:
+            # Serie completa para derivar temporalidades mayores; el analisis de la base usa el recorte de siempre.
+            df_base, source, err = _fetch_data(item, period=period, interval=interval, cfg=cfg, limit=base_rows, trim=False)
+            df = _trim_df_for_interval(df_base, interval=interval, cfg=cfg if isinstance(cfg, dict) else {})
+            if df_base is not None and df is not None and len(df_base) > len(df):
+                payload["df_base"] = df_base
+        else:
+            df, source, err = _fetch_data(item, period=period, interval=interval, cfg=cfg)
+        payload["df"] = df
+        payload["source"] = source
+        payload["error"] = err
+        if df is not None and not df.empty:
+            df_ready, ready_ok, trimmed = _prepare_df_for_closed_candle(
+                df,
+                interval=interval,
+                require_closed_candle=require_closed_candle,
+                grace_seconds=grace_seconds,
+            )
+            payload["df_ready"] = df_ready
+            payload["ready_ok"] = bool(ready_ok)
+            payload["open_candle_trimmed"] = bool(trimmed)
+    finally:
+        if entries is not None and lock is not None and done is not None:
+            with lock:
+                entries[key] = payload
+                if str(payload["source"]).split("_")[0] in {"binance", "twelvedata"}:
+                    entries[shared_key] = payload
+                fetch_cache["inflight"].pop(shared_key, None)
+            done.set()
+    return payload
 
 
 def _detect_price_action(df: pd.DataFrame, direction: str) -> Dict[str, Any]:
-    if df is None or df.empty or len(df) < 3:
-        return {
-            "pattern": "sin_patron",
-            "bias": "NEUTRAL",
-            "score": 0,
-            "aligned": False,
-            "description": "Sin suficientes velas para confirmar price action.",
-        }
-    prev = df.iloc[-2]
-    last = df.iloc[-1]
-    prev_m = _candle_metrics(prev)
-    last_m = _candle_metrics(last)
-    atr = _atr14_from_df(df)
-
-    prev_bull = prev_m["close"] > prev_m["open"]
-    prev_bear = prev_m["close"] < prev_m["open"]
-    last_bull = last_m["close"] > last_m["open"]
-    last_bear = last_m["close"] < last_m["open"]
-
-    bullish_engulfing = (
-        last_bull
-        and prev_bear
-        and last_m["open"] <= prev_m["close"]
-        and last_m["close"] >= prev_m["open"]
-    )
-    bearish_engulfing = (
-        last_bear
-        and prev_bull
-        and last_m["open"] >= prev_m["close"]
-        and last_m["close"] <= prev_m["open"]
-    )
-
-    bullish_rejection = (
-        last_m["lower_wick"] >= (last_m["body"] * 2.0)
-        and (last_m["upper_wick"] <= last_m["body"] * 1.2)
-        and last_m["close"] >= (last_m["open"] - 1e-9)
-    )
-    bearish_rejection = (
-        last_m["upper_wick"] >= (last_m["body"] * 2.0)
-        and (last_m["lower_wick"] <= last_m["body"] * 1.2)
-        and last_m["close"] <= (last_m["open"] + 1e-9)
-    )
-
-    for detector in (
-        _detect_false_breakout_pattern,
-        _detect_liquidity_sweep_pattern,
-        _detect_double_structure_pattern,
-        _detect_retest_pattern,
-    ):
-        payload = detector(df, atr, direction)
-        if payload is not None:
-            return payload
-
-    if bullish_engulfing:
-        return _price_action_result(
-            pattern="envolvente_alcista",
-            bias="ALCISTA",
-            score=10,
-            description="Vela envolvente alcista detectada.",
-            direction=direction,
-        )
-    if bearish_engulfing:
-        return _price_action_result(
-            pattern="envolvente_bajista",
-            bias="BAJISTA",
-            score=10,
-            description="Vela envolvente bajista detectada.",
-            direction=direction,
-        )
-    if bullish_rejection:
-        return _price_action_result(
-            pattern="rechazo_alcista",
-            bias="ALCISTA",
-            score=8,
-            description="Vela de rechazo alcista (mecha inferior dominante).",
-            direction=direction,
-        )
-    if bearish_rejection:
-        return _price_action_result(
-            pattern="rechazo_bajista",
-            bias="BAJISTA",
-            score=8,
-            description="Vela de rechazo bajista (mecha superior dominante).",
-            direction=direction,
-        )
-
-    return {
-        "pattern": "sin_patron",
-        "bias": "NEUTRAL",
-        "score": 2,
-        "aligned": False,
-        "description": "Sin patron de confirmacion fuerte.",
-    }
+    if df is None or df.empty:
+        return price_action_at({"size": 0}, -1, direction)
+    # El escaneo cubre todas las velas del frame y queda memorizado en su contexto de analisis.
+    scan = get_analysis_context(df).derived("price_action", lambda: scan_price_action(df))
+    return price_action_at(scan, -1, direction)
 
 
 def _opposite_direction(direction: str) -> str:
@@ -2137,26 +2692,14 @@ def _quality_metrics_from_record(record: Dict[str, Any], setup_bucket: str = "")
     noise_pct = ((losses + timeouts) / resolved * 100.0) if resolved > 0 else 0.0
     timeout_pct = (timeouts / resolved * 100.0) if resolved > 0 else 0.0
 
-    rr_values: List[float] = []
-    history = record.get("quality_history", [])
-    if isinstance(history, list):
-        for event in history:
-            if not isinstance(event, dict):
-                continue
-            if bucket and str(event.get("setup_bucket", "")).strip().lower() != bucket:
-                continue
-            status = str(event.get("status", "")).strip().lower()
-            if status not in {"win", "loss", "timeout"}:
-                continue
-            rr = _safe_float(event.get("rr_estimado"), 0.0)
-            if rr > 0:
-                rr_values.append(rr)
+    window = _quality_rr_window(record)
+    rr_sum, rr_count = window["by_setup"].get(bucket, [0.0, 0]) if bucket else (window["sum"], window["count"])
 
     rr_avg = _safe_float(stats.get("rr_avg"), 0.0)
     rr_samples = int(stats.get("rr_samples", 0) or 0)
-    if rr_values:
-        rr_samples = len(rr_values)
-        rr_avg = sum(rr_values) / rr_samples
+    if rr_count > 0:
+        rr_samples = int(rr_count)
+        rr_avg = rr_sum / rr_samples
     elif rr_samples <= 0:
         rr_avg = 0.0
         rr_samples = 0
@@ -2174,38 +2717,34 @@ def _quality_metrics_from_record(record: Dict[str, Any], setup_bucket: str = "")
     }
 
 
-def _aggregate_quality_stats(state: Dict[str, Any]) -> Dict[str, Any]:
-    symbols = state.get("symbols", {})
-    if not isinstance(symbols, dict):
-        return {
-            "resolved": 0,
-            "wins": 0,
-            "losses": 0,
-            "timeouts": 0,
-            "accuracy_pct": 0.0,
-            "noise_pct": 0.0,
-            "timeout_pct": 0.0,
-            "rr_avg": 0.0,
-        }
+def _quality_contribution(record: Any) -> Tuple[int, int, int, float, int]:
+    """(wins, losses, timeouts, suma RR, muestras RR) que un registro aporta al agregado global."""
+    if not isinstance(record, dict):
+        return (0, 0, 0, 0.0, 0)
+    metrics = _quality_metrics_from_record(record)
+    rr_samples = int(metrics.get("rr_samples", 0) or 0)
+    rr_avg = _safe_float(metrics.get("rr_avg"), 0.0)
+    if rr_samples <= 0 or rr_avg <= 0:
+        rr_samples, rr_avg = 0, 0.0
+    return (
+        int(metrics.get("wins", 0) or 0),
+        int(metrics.get("losses", 0) or 0),
+        int(metrics.get("timeouts", 0) or 0),
+        rr_avg * rr_samples,
+        rr_samples,
+    )
 
-    wins = 0
-    losses = 0
-    timeouts = 0
-    rr_weighted_sum = 0.0
-    rr_weighted_count = 0
-    for record in symbols.values():
-        if not isinstance(record, dict):
-            continue
-        metrics = _quality_metrics_from_record(record)
-        wins += int(metrics.get("wins", 0) or 0)
-        losses += int(metrics.get("losses", 0) or 0)
-        timeouts += int(metrics.get("timeouts", 0) or 0)
-        rr_samples = int(metrics.get("rr_samples", 0) or 0)
-        rr_avg = _safe_float(metrics.get("rr_avg"), 0.0)
-        if rr_samples > 0 and rr_avg > 0:
-            rr_weighted_sum += rr_avg * rr_samples
-            rr_weighted_count += rr_samples
 
+def _quality_totals_add(totals: List[Any], contribution: Tuple[int, int, int, float, int], sign: int) -> None:
+    for pos, value in enumerate(contribution):
+        totals[pos] += sign * value
+    # Sin muestras el residuo de coma flotante vuelve a cero.
+    if totals[4] <= 0:
+        totals[3], totals[4] = 0.0, 0
+
+
+def _quality_summary(totals: List[Any]) -> Dict[str, Any]:
+    wins, losses, timeouts, rr_weighted_sum, rr_weighted_count = totals
     resolved = wins + losses + timeouts
     accuracy_pct = (wins / resolved * 100.0) if resolved > 0 else 0.0
     noise_pct = ((losses + timeouts) / resolved * 100.0) if resolved > 0 else 0.0
@@ -2223,6 +2762,68 @@ def _aggregate_quality_stats(state: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def _bump_quality_epoch(state: Dict[str, Any], record_key: str) -> None:
+    """Avanza `quality_epoch` tras resolver una alerta de `record_key`; el agregado global solo rehace ese registro."""
+    previous = int(state.get("quality_epoch", 0) or 0)
+    state["quality_epoch"] = previous + 1
+    cached = _QUALITY_AGGREGATE_CACHE
+    if cached.get("symbols") is state.get("symbols") and cached.get("dirty_epoch", cached.get("epoch")) == previous:
+        cached["dirty"].add(record_key)
+        cached["dirty_epoch"] = previous + 1
+
+
+def _seed_record_quality(state: Dict[str, Any], record_key: str, seed: Dict[str, Any]) -> bool:
+    """Carga una semilla de `outcome_labeller` en el registro y avanza `quality_epoch` si la aplico."""
+    record = state.setdefault("symbols", {}).setdefault(record_key, {})
+    if not outcome_labeller.seed_record(record, seed):
+        return False
+    _bump_quality_epoch(state, record_key)
+    return True
+
+
+def _aggregate_quality_stats(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Agregado global de calidad con sumas corrientes: solo se recalculan los registros marcados por `_bump_quality_epoch`.
+
+    Si `quality_epoch` avanza por otra via (o cambia el dict de registros) se reconstruye completo.
+    """
+    symbols = state.get("symbols", {})
+    epoch = state.get("quality_epoch")
+    if epoch is None or not isinstance(symbols, dict):
+        return _compute_aggregate_quality_stats(symbols)
+    cached = _QUALITY_AGGREGATE_CACHE
+    if cached.get("symbols") is not symbols or epoch not in (cached.get("epoch"), cached.get("dirty_epoch")):
+        contrib = {key: _quality_contribution(record) for key, record in symbols.items()}
+        totals: List[Any] = [0, 0, 0, 0.0, 0]
+        for contribution in contrib.values():
+            _quality_totals_add(totals, contribution, 1)
+        cached.clear()
+        cached.update({"symbols": symbols, "contrib": contrib, "totals": totals, "dirty": set()})
+    elif cached["epoch"] != epoch or len(cached["contrib"]) != len(symbols):
+        contrib = cached["contrib"]
+        # Registros nuevos o eliminados (la diferencia de claves es barata frente a recalcular aportes).
+        keys = set(cached["dirty"]) | (contrib.keys() ^ symbols.keys())
+        for key in keys:
+            _quality_totals_add(cached["totals"], contrib.pop(key, (0, 0, 0, 0.0, 0)), -1)
+            if key in symbols:
+                contrib[key] = _quality_contribution(symbols[key])
+                _quality_totals_add(cached["totals"], contrib[key], 1)
+        cached["dirty"] = set()
+    else:
+        return dict(cached["quality"])
+    cached["epoch"] = epoch
+    cached.pop("dirty_epoch", None)
+    cached["quality"] = _quality_summary(cached["totals"])
+    return dict(cached["quality"])
+
+
+def _compute_aggregate_quality_stats(symbols: Any) -> Dict[str, Any]:
+    totals: List[Any] = [0, 0, 0, 0.0, 0]
+    if isinstance(symbols, dict):
+        for record in symbols.values():
+            _quality_totals_add(totals, _quality_contribution(record), 1)
+    return _quality_summary(totals)
+
+
 def _apply_quality_calibration(precision_cfg: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
     cfg = dict(precision_cfg)
     calibration_enabled = bool(cfg.get("quality_calibration_enabled", True))
@@ -2387,31 +2988,37 @@ def _compute_interval_direction(
     require_closed_candle: bool = True,
     grace_seconds: int = 10,
     cfg: Dict[str, Any] | None = None,
+    fetch_cache: Dict[str, Any] | None = None,
 ) -> Dict[str, Any]:
     cache_key = f"{item.state_key}|{interval}"
     if cache_key in cache:
         return cache[cache_key]
 
     period = _period_for_interval(interval)
-    df, source, err = _fetch_data(item, period=period, interval=interval, cfg=cfg)
+    candles = _fetch_candles_cached(
+        item,
+        period=period,
+        interval=interval,
+        cfg=cfg,
+        fetch_cache=fetch_cache,
+        require_closed_candle=require_closed_candle,
+        grace_seconds=grace_seconds,
+    )
+    df = candles["df"]
+    source = candles["source"]
     if df is None or df.empty:
         payload = {
             "ok": False,
             "interval": interval,
             "source": source,
-            "error": err or "sin datos",
+            "error": candles["error"] or "sin datos",
             "direction": "NEUTRAL",
         }
         cache[cache_key] = payload
         return payload
 
-    df_ready, ready_ok, _ = _prepare_df_for_closed_candle(
-        df,
-        interval=interval,
-        require_closed_candle=require_closed_candle,
-        grace_seconds=grace_seconds,
-    )
-    if not ready_ok or df_ready.empty:
+    df_ready = candles["df_ready"]
+    if not candles["ready_ok"] or df_ready.empty:
         payload = {
             "ok": False,
             "interval": interval,
@@ -2423,7 +3030,7 @@ def _compute_interval_direction(
         return payload
 
     try:
-        df_ind = calcular_indicadores(df_ready)
+        df_ind = _context_indicators(item, interval, period, candles, cfg, require_closed_candle)
         estado = construir_estado_final(df_ind, impacto_memoria=0, analysis_interval=interval)
         direction = str(estado.get("direccion_v13", "NEUTRAL")).upper().strip() or "NEUTRAL"
     except Exception as exc:
@@ -2455,6 +3062,7 @@ def _evaluate_mtf_alignment(
     precision_cfg: Dict[str, Any],
     cache: Dict[str, Dict[str, Any]],
     cfg: Dict[str, Any] | None = None,
+    fetch_cache: Dict[str, Any] | None = None,
 ) -> Dict[str, Any]:
     base_direction = str(base_direction or "").upper().strip()
     if base_direction not in {"ALCISTA", "BAJISTA"}:
@@ -2483,6 +3091,7 @@ def _evaluate_mtf_alignment(
     confirmations = 0
     opposites = 0
     neutrals = 0
+    errors = 0
     details: List[str] = []
     mandatory_map = {
         "15m": ["1h", "4h"],
@@ -2502,9 +3111,11 @@ def _evaluate_mtf_alignment(
             require_closed_candle=require_closed_candle,
             grace_seconds=grace_seconds,
             cfg=cfg,
+            fetch_cache=fetch_cache,
         )
         if not res.get("ok", False):
             details.append(f"{tf}: error({res.get('error', 'sin detalle')})")
+            errors += 1
             if tf in mandatory:
                 mandatory_ok = False
             continue
@@ -2537,6 +3148,7 @@ def _evaluate_mtf_alignment(
         "confirmations": confirmations,
         "opposites": opposites,
         "neutrals": neutrals,
+        "errors": errors,
     }
 
 
@@ -2553,11 +3165,76 @@ def _setup_bucket_from_regime_phase(regime_phase: str, direction: str) -> str:
     return "sin_setup"
 
 
+def _fetch_structural_candles(
+    item: MarketItem,
+    cfg: Dict[str, Any],
+    fetch_cache: Dict[str, Any] | None = None,
+    require_closed_candle: bool = True,
+    grace_seconds: int = 10,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    candles_1d = _fetch_candles_cached(
+        item,
+        period="3y",
+        interval="1d",
+        cfg=cfg,
+        fetch_cache=fetch_cache,
+        require_closed_candle=require_closed_candle,
+        grace_seconds=grace_seconds,
+    )
+    candles_4h = _fetch_candles_cached(
+        item,
+        period="12mo",
+        interval="4h",
+        cfg=cfg,
+        fetch_cache=fetch_cache,
+        require_closed_candle=require_closed_candle,
+        grace_seconds=grace_seconds,
+    )
+    err_1d = candles_1d["error"]
+    err_4h = candles_4h["error"]
+    df_1d = candles_1d["df"]
+    df_4h = candles_4h["df"]
+    if (
+        err_1d
+        or err_4h
+        or df_1d is None
+        or df_4h is None
+        or df_1d.empty
+        or df_4h.empty
+    ):
+        raise ValueError(err_1d or err_4h or "structural_context_fetch_failed")
+
+    if not candles_1d["ready_ok"] or not candles_4h["ready_ok"] or candles_1d["df_ready"].empty or candles_4h["df_ready"].empty:
+        raise ValueError("structural_context_no_closed_candles")
+    return candles_1d, candles_4h
+
+
+def _structural_indicators(
+    item: MarketItem,
+    cfg: Dict[str, Any],
+    fetch_cache: Dict[str, Any] | None = None,
+    require_closed_candle: bool = True,
+    grace_seconds: int = 10,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    candles_1d, candles_4h = _fetch_structural_candles(
+        item,
+        cfg=cfg,
+        fetch_cache=fetch_cache,
+        require_closed_candle=require_closed_candle,
+        grace_seconds=grace_seconds,
+    )
+    return (
+        _context_indicators(item, "1d", "3y", candles_1d, cfg, require_closed_candle),
+        _context_indicators(item, "4h", "12mo", candles_4h, cfg, require_closed_candle),
+    )
+
+
 def _load_structural_state(
     item: MarketItem,
     cfg: Dict[str, Any],
     precision_cfg: Dict[str, Any],
     cache: Dict[str, Dict[str, Any]],
+    fetch_cache: Dict[str, Any] | None = None,
 ) -> Dict[str, Any]:
     cache_key = str(item.state_key or item.ticker or item.label).strip()
     if cache_key in cache:
@@ -2567,38 +3244,14 @@ def _load_structural_state(
     grace_seconds = int(precision_cfg.get("closed_candle_grace_sec", 10))
     payload: Dict[str, Any]
     try:
-        df_1d, _, err_1d = _fetch_data(item, period="3y", interval="1d", cfg=cfg)
-        df_4h, _, err_4h = _fetch_data(item, period="12mo", interval="4h", cfg=cfg)
-        if (
-            err_1d
-            or err_4h
-            or df_1d is None
-            or df_4h is None
-            or df_1d.empty
-            or df_4h.empty
-        ):
-            raise ValueError(err_1d or err_4h or "structural_context_fetch_failed")
-
-        df_1d_ready, ok_1d, _ = _prepare_df_for_closed_candle(
-            df_1d,
-            interval="1d",
-            require_closed_candle=require_closed_candle,
-            grace_seconds=grace_seconds,
-        )
-        df_4h_ready, ok_4h, _ = _prepare_df_for_closed_candle(
-            df_4h,
-            interval="4h",
+        df_1d_ind, df_4h_ind = _structural_indicators(
+            item,
+            cfg=cfg,
+            fetch_cache=fetch_cache,
             require_closed_candle=require_closed_candle,
             grace_seconds=grace_seconds,
         )
-        if not ok_1d or not ok_4h or df_1d_ready.empty or df_4h_ready.empty:
-            raise ValueError("structural_context_no_closed_candles")
-
-        structural_state = construir_estado_final_estructural(
-            calcular_indicadores(df_1d_ready),
-            calcular_indicadores(df_4h_ready),
-            impacto_memoria=0,
-        )
+        structural_state = construir_estado_final_estructural(df_1d_ind, df_4h_ind, impacto_memoria=0)
         payload = {
             "ok": True,
             "state": structural_state,
@@ -2748,7 +3401,7 @@ def _increment_daily_alert_count(record: Dict[str, Any]) -> None:
             continue
         try:
             dt = datetime.strptime(k, "%Y-%m-%d").replace(tzinfo=pytz.UTC)
-            if (datetime.now(pytz.UTC) - dt).days <= 1:
+            if (_utcnow() - dt).days <= 1:
                 keep[k] = v
         except Exception:
             continue
@@ -2767,12 +3420,68 @@ def _quality_window_bars(interval: str, precision_cfg: Dict[str, Any]) -> int:
     return default_bars
 
 
+def _quality_event_rr(event: Any) -> Tuple[str, float]:
+    if not isinstance(event, dict):
+        return "", 0.0
+    if str(event.get("status", "")).strip().lower() not in {"win", "loss", "timeout"}:
+        return "", 0.0
+    rr = _safe_float(event.get("rr_estimado"), 0.0)
+    return str(event.get("setup_bucket", "")).strip().lower(), (rr if rr > 0 else 0.0)
+
+
+def _quality_history_marker(history: List[Any]) -> List[Any]:
+    last = history[-1] if history and isinstance(history[-1], dict) else {}
+    return [len(history), str(last.get("alert_id", "")), str(last.get("closed_utc", ""))]
+
+
+def _quality_rr_window_add(window: Dict[str, Any], event: Any, sign: int) -> None:
+    bucket, rr = _quality_event_rr(event)
+    if rr <= 0:
+        return
+    window["sum"] += sign * rr
+    window["count"] += sign
+    slot = window["by_setup"].setdefault(bucket, [0.0, 0])
+    slot[0] += sign * rr
+    slot[1] += sign
+    # Sin muestras el residuo de coma flotante vuelve a cero.
+    if window["count"] <= 0:
+        window["sum"], window["count"] = 0.0, 0
+    if slot[1] <= 0:
+        del window["by_setup"][bucket]
+
+
+def _quality_rr_window(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Suma/conteo de RR de `quality_history` (total y por setup), mantenidos al agregar eventos.
+
+    Se reconstruye solo si el historial cambio por otra via (largo o ultimo evento distintos).
+    """
+    history = record.get("quality_history", [])
+    if not isinstance(history, list) or not history:
+        return {"sum": 0.0, "count": 0, "by_setup": {}}
+    marker = _quality_history_marker(history)
+    window = record.get("quality_rr_window")
+    if isinstance(window, dict) and window.get("marker") == marker and isinstance(window.get("by_setup"), dict):
+        return window
+    window = {"marker": marker, "sum": 0.0, "count": 0, "by_setup": {}}
+    for event in history:
+        _quality_rr_window_add(window, event, 1)
+    record["quality_rr_window"] = window
+    return window
+
+
 def _append_quality_event(record: Dict[str, Any], event: Dict[str, Any]) -> None:
     history = record.get("quality_history", [])
     if not isinstance(history, list):
         history = []
+    window = _quality_rr_window(record) if history else {"sum": 0.0, "count": 0, "by_setup": {}}
     history.append(event)
-    record["quality_history"] = history[-120:]
+    _quality_rr_window_add(window, event, 1)
+    for evicted in history[: max(0, len(history) - QUALITY_HISTORY_LIMIT)]:
+        _quality_rr_window_add(window, evicted, -1)
+    history = history[-QUALITY_HISTORY_LIMIT:]
+    window["marker"] = _quality_history_marker(history)
+    record["quality_history"] = history
+    record["quality_rr_window"] = window
 
 
 def _update_quality_stats(record: Dict[str, Any], outcome: str, setup_bucket: str = "") -> None:
@@ -2927,14 +3636,14 @@ def _evaluate_open_alert_outcome(
     record: Dict[str, Any],
     estado: Dict[str, Any],
     compute_ctx: Dict[str, Any],
-) -> None:
+) -> int:
     open_alerts = _normalize_record_open_alerts(record)
     if not open_alerts:
-        return
+        return 0
 
     df_ind = compute_ctx.get("df_ind")
     if not isinstance(df_ind, pd.DataFrame) or df_ind.empty:
-        return
+        return 0
 
     last_row = df_ind.iloc[-1]
     high = _safe_float(last_row.get("High"), 0.0)
@@ -3000,6 +3709,7 @@ def _evaluate_open_alert_outcome(
     if resolved_outcomes:
         record["last_quality_outcome"] = resolved_outcomes[-1]
     _set_record_open_alerts(record, remaining_open_alerts)
+    return len(resolved_outcomes)
 
 
 def _should_alert(
@@ -3025,7 +3735,7 @@ def _should_alert(
     if last_alert_dt is None:
         return True
 
-    delta_sec = (datetime.now(pytz.UTC) - last_alert_dt).total_seconds()
+    delta_sec = (_utcnow() - last_alert_dt).total_seconds()
     return delta_sec >= max(1, cooldown_minutes) * 60
 
 
@@ -3033,9 +3743,10 @@ def _build_watchlist(cfg: Dict[str, Any]) -> List[MarketItem]:
     watchlist: List[MarketItem] = []
 
     if bool(cfg.get("scan_crypto", True)):
-        selected_crypto = cfg.get("crypto_symbols", list(CRYPTO_MAP.keys()))
+        crypto_map = _crypto_map(cfg)
+        selected_crypto = cfg.get("crypto_symbols", list(crypto_map.keys()))
         for symbol in selected_crypto:
-            row = CRYPTO_MAP.get(symbol)
+            row = crypto_map.get(symbol)
             if not row:
                 logging.warning("Cripto desconocida en config: %s", symbol)
                 continue
@@ -3165,6 +3876,7 @@ def _resolve_structural_context_label(
     estado: Dict[str, Any],
     cfg: Dict[str, Any],
     cache: Dict[str, str] | None = None,
+    fetch_cache: Dict[str, Any] | None = None,
 ) -> str:
     explicit = str(estado.get("contexto_estructural", "")).strip()
     if explicit:
@@ -3184,38 +3896,14 @@ def _resolve_structural_context_label(
     require_closed_candle = bool(precision_cfg.get("require_closed_candle", True))
     grace_seconds = int(precision_cfg.get("closed_candle_grace_sec", 10))
     try:
-        df_1d, _, err_1d = _fetch_data(item, period="3y", interval="1d", cfg=cfg)
-        df_4h, _, err_4h = _fetch_data(item, period="12mo", interval="4h", cfg=cfg)
-        if (
-            err_1d
-            or err_4h
-            or df_1d is None
-            or df_4h is None
-            or df_1d.empty
-            or df_4h.empty
-        ):
-            raise ValueError("structural_context_fetch_failed")
-
-        df_1d_ready, ok_1d, _ = _prepare_df_for_closed_candle(
-            df_1d,
-            interval="1d",
-            require_closed_candle=require_closed_candle,
-            grace_seconds=grace_seconds,
-        )
-        df_4h_ready, ok_4h, _ = _prepare_df_for_closed_candle(
-            df_4h,
-            interval="4h",
+        df_1d_ind, df_4h_ind = _structural_indicators(
+            item,
+            cfg=cfg,
+            fetch_cache=fetch_cache,
             require_closed_candle=require_closed_candle,
             grace_seconds=grace_seconds,
         )
-        if not ok_1d or not ok_4h or df_1d_ready.empty or df_4h_ready.empty:
-            raise ValueError("structural_context_no_closed_candles")
-
-        structural_state = construir_estado_final_estructural(
-            calcular_indicadores(df_1d_ready),
-            calcular_indicadores(df_4h_ready),
-            impacto_memoria=0,
-        )
+        structural_state = construir_estado_final_estructural(df_1d_ind, df_4h_ind, impacto_memoria=0)
         label = _structural_context_label_from_state(structural_state)
     except Exception:
         fallback_direction = str(estado.get("direccion_v13", "")).upper().strip()
@@ -3403,7 +4091,7 @@ def _alert_message_copy(
 
 def _session_status_for_alert(alert_bar_utc: str) -> Tuple[str, str]:
     bar_dt = _parse_iso_utc(str(alert_bar_utc or "").strip())
-    ref_dt = bar_dt if bar_dt is not None else datetime.now(pytz.UTC)
+    ref_dt = bar_dt if bar_dt is not None else _utcnow()
     if _is_colombia_holiday(ref_dt):
         return "No favorable", "No operar"
     ref_ny = ref_dt.astimezone(NY_TZ)
@@ -3485,7 +4173,7 @@ def _is_colombia_holiday(ref_dt: datetime) -> bool:
 
 def _format_colombia_alert_time(alert_bar_utc: str) -> str:
     bar_dt = _parse_iso_utc(str(alert_bar_utc or "").strip())
-    ref_dt = bar_dt if bar_dt is not None else datetime.now(pytz.UTC)
+    ref_dt = bar_dt if bar_dt is not None else _utcnow()
     return ref_dt.astimezone(BOGOTA_TZ).strftime("%Y-%m-%d %H:%M")
 
 
@@ -3765,98 +4453,157 @@ def _analysis_mode(cfg: Dict[str, Any]) -> str:
     return "tendencial"
 
 
-def _compute_estado(
+def _fetch_estado_inputs(
     item: MarketItem,
     cfg: Dict[str, Any],
     forced_mode: str | None = None,
     forced_interval: str | None = None,
-) -> Tuple[Dict[str, Any] | None, str, str, Dict[str, Any]]:
+    fetch_cache: Dict[str, Any] | None = None,
+) -> Tuple[Dict[str, Any] | None, str]:
     precision_cfg = _resolve_precision_cfg(cfg)
     require_closed_candle = bool(precision_cfg.get("require_closed_candle", True))
     grace_seconds = int(precision_cfg.get("closed_candle_grace_sec", 10))
     mode = str(forced_mode or _analysis_mode(cfg)).strip().lower()
     if mode == "estructural":
-        df_1d, source_1d, err_1d = _fetch_data(item, period="3y", interval="1d", cfg=cfg)
-        if df_1d is None or df_1d.empty:
-            return None, "", f"1D: {err_1d or 'sin datos'}", {}
-
-        df_4h, source_4h, err_4h = _fetch_data(item, period="12mo", interval="4h", cfg=cfg)
-        if df_4h is None or df_4h.empty:
-            return None, "", f"4H: {err_4h or 'sin datos'}", {}
-
-        df_1d_ready, ok_1d, _ = _prepare_df_for_closed_candle(
-            df_1d,
+        candles_1d = _fetch_candles_cached(
+            item,
+            period="3y",
             interval="1d",
+            cfg=cfg,
+            fetch_cache=fetch_cache,
             require_closed_candle=require_closed_candle,
             grace_seconds=grace_seconds,
         )
-        if not ok_1d or df_1d_ready.empty:
-            return None, "", "1D sin velas cerradas suficientes.", {}
+        df_1d = candles_1d["df"]
+        source_1d = candles_1d["source"]
+        if df_1d is None or df_1d.empty:
+            return None, f"1D: {candles_1d['error'] or 'sin datos'}"
 
-        df_4h_ready, ok_4h, trimmed_4h = _prepare_df_for_closed_candle(
-            df_4h,
+        candles_4h = _fetch_candles_cached(
+            item,
+            period="12mo",
             interval="4h",
+            cfg=cfg,
+            fetch_cache=fetch_cache,
             require_closed_candle=require_closed_candle,
             grace_seconds=grace_seconds,
         )
-        if not ok_4h or df_4h_ready.empty:
-            return None, "", "4H sin velas cerradas suficientes.", {}
+        df_4h = candles_4h["df"]
+        source_4h = candles_4h["source"]
+        if df_4h is None or df_4h.empty:
+            return None, f"4H: {candles_4h['error'] or 'sin datos'}"
 
-        try:
-            df_1d_ind = calcular_indicadores(df_1d_ready)
-            df_4h_ind = calcular_indicadores(df_4h_ready)
-            estado = construir_estado_final_estructural(df_1d_ind, df_4h_ind, impacto_memoria=0)
-        except Exception as exc:
-            return None, "", f"Error estructural: {exc}", {}
+        df_1d_ready = candles_1d["df_ready"]
+        if not candles_1d["ready_ok"] or df_1d_ready.empty:
+            return None, "1D sin velas cerradas suficientes."
 
-        if not isinstance(estado, dict):
-            return None, "", "Estado estructural invalido.", {}
-        estado["modo_alerta"] = "Estructural (1D+4H)"
-        estado["temporalidad_alerta"] = "1D + 4H"
-        try:
-            estado["precio_alerta"] = float(df_4h_ind["Close"].iloc[-1])
-        except Exception:
-            estado["precio_alerta"] = None
-        estado["indice_alerta_utc"] = _index_to_iso_utc(df_4h_ind.index[-1]) if len(df_4h_ind.index) else ""
-        vol_ratio = _atr_ratio_from_df(df_4h_ind)
-        estado["vol_ratio"] = round(vol_ratio, 4)
-        estado["analysis_interval"] = "4h"
-        estado["open_candle_trimmed"] = bool(trimmed_4h)
-        ctx = {
+        df_4h_ready = candles_4h["df_ready"]
+        if not candles_4h["ready_ok"] or df_4h_ready.empty:
+            return None, "4H sin velas cerradas suficientes."
+
+        return {
+            "mode": "estructural",
             "interval": "4h",
-            "df_ind": df_4h_ind,
-            "vol_ratio": vol_ratio,
-            "open_candle_trimmed": bool(trimmed_4h),
-        }
-        return estado, f"1D:{source_1d} | 4H:{source_4h}", "", ctx
+            "frames": [df_1d_ready, df_4h_ready],
+            "indicator_keys": [
+                _indicator_engine_key(item, "1d", source_1d, "3y"),
+                _indicator_engine_key(item, "4h", source_4h, "12mo"),
+            ],
+            "streaming_cfg": _resolve_streaming_indicators_cfg(cfg),
+            "kernel": _indicator_kernel(cfg),
+            "closed_only": require_closed_candle,
+            "open_candle_trimmed": bool(candles_4h["open_candle_trimmed"]),
+            "source": f"1D:{source_1d} | 4H:{source_4h}",
+        }, ""
 
     interval = str(forced_interval or cfg.get("interval", "15m")).strip().lower()
     if interval not in TD_INTERVAL_MAP:
         interval = "15m"
     period = str(cfg.get("period", "5d"))
-    df, source, fetch_err = _fetch_data(item, period=period, interval=interval, cfg=cfg)
-    if df is None or df.empty:
-        return None, "", fetch_err or "No se pudieron descargar velas.", {}
-
-    df_ready, ready_ok, trimmed_open = _prepare_df_for_closed_candle(
-        df,
+    candles = _fetch_candles_cached(
+        item,
+        period=period,
         interval=interval,
+        cfg=cfg,
+        fetch_cache=fetch_cache,
         require_closed_candle=require_closed_candle,
         grace_seconds=grace_seconds,
     )
-    if not ready_ok or df_ready.empty:
-        return None, "", "Sin velas cerradas suficientes para analisis.", {}
+    df = candles["df"]
+    if df is None or df.empty:
+        return None, candles["error"] or "No se pudieron descargar velas."
 
-    try:
-        df_ind = calcular_indicadores(df_ready)
-        estado = construir_estado_final(df_ind, impacto_memoria=0, analysis_interval=interval)
-    except Exception as exc:
-        return None, "", f"Error calculando estado: {exc}", {}
+    df_ready = candles["df_ready"]
+    if not candles["ready_ok"] or df_ready.empty:
+        return None, "Sin velas cerradas suficientes para analisis."
+
+    return {
+        "mode": "tendencial",
+        "interval": interval,
+        "frames": [df_ready],
+        "indicator_keys": [_indicator_engine_key(item, interval, candles["source"], period)],
+        "streaming_cfg": _resolve_streaming_indicators_cfg(cfg),
+        "kernel": _indicator_kernel(cfg),
+        "closed_only": require_closed_candle,
+        "open_candle_trimmed": bool(candles["open_candle_trimmed"]),
+        "source": candles["source"],
+    }, ""
+
+
+def _estado_inputs_fingerprint(inputs: Dict[str, Any]) -> str:
+    parts: List[str] = [str(inputs.get("mode", "")), str(inputs.get("interval", "")), str(inputs.get("open_candle_trimmed", ""))]
+    for frame in inputs.get("frames", []):
+        if not isinstance(frame, pd.DataFrame) or frame.empty:
+            parts.append("empty")
+            continue
+        last = frame.iloc[-1]
+        ohlc = ",".join(f"{_safe_float(last.get(col), 0.0):.10g}" for col in ("Open", "High", "Low", "Close"))
+        parts.append(f"{len(frame)}|{_index_to_iso_utc(frame.index[0])}|{_index_to_iso_utc(frame.index[-1])}|{ohlc}")
+    return hashlib.sha1("#".join(parts).encode("utf-8")).hexdigest()
+
+
+def _compute_estado_from_inputs(inputs: Dict[str, Any]) -> Tuple[Dict[str, Any] | None, str, str, Dict[str, Any]]:
+    source = str(inputs.get("source", ""))
+    trimmed_open = bool(inputs.get("open_candle_trimmed", False))
+    frames = inputs.get("frames", [])
+    keys = list(inputs.get("indicator_keys", [])) + ["", ""]
+    streaming_cfg = inputs.get("streaming_cfg")
+    kernel = inputs.get("kernel", calcular_indicadores)
+    closed_only = bool(inputs.get("closed_only", False))
+    batched = inputs.get("indicator_frames")
+
+    def _indicators(pos: int) -> pd.DataFrame:
+        if isinstance(batched, list) and len(batched) > pos:
+            return batched[pos]
+        return _calcular_indicadores_streaming(frames[pos], keys[pos], streaming_cfg, kernel, closed_only)
+
+    if inputs.get("mode") == "estructural":
+        try:
+            df_1d_ind = _indicators(0)
+            df_4h_ind = _indicators(1)
+            estado = construir_estado_final_estructural(df_1d_ind, df_4h_ind, impacto_memoria=0)
+        except Exception as exc:
+            return None, "", f"Error estructural: {exc}", {}
+
+        if not isinstance(estado, dict):
+            return None, "", "Estado estructural invalido.", {}
+        estado["modo_alerta"] = "Estructural (1D+4H)"
+        estado["temporalidad_alerta"] = "1D + 4H"
+        df_ind = df_4h_ind
+        interval = "4h"
+    else:
+        interval = str(inputs.get("interval", "15m"))
+        try:
+            df_ind = _indicators(0)
+            estado = construir_estado_final(df_ind, impacto_memoria=0, analysis_interval=interval)
+        except Exception as exc:
+            return None, "", f"Error calculando estado: {exc}", {}
+
+        if not isinstance(estado, dict):
+            return None, "", "Estado tendencial invalido.", {}
+        estado["modo_alerta"] = "Tendencial"
+        estado["temporalidad_alerta"] = interval
 
-    if not isinstance(estado, dict):
-        return None, "", "Estado tendencial invalido.", {}
-    estado["modo_alerta"] = "Tendencial"
-    estado["temporalidad_alerta"] = interval
     try:
         estado["precio_alerta"] = float(df_ind["Close"].iloc[-1])
     except Exception:
@@ -3865,16 +4612,252 @@ def _compute_estado(
     vol_ratio = _atr_ratio_from_df(df_ind)
     estado["vol_ratio"] = round(vol_ratio, 4)
     estado["analysis_interval"] = interval
-    estado["open_candle_trimmed"] = bool(trimmed_open)
+    estado["open_candle_trimmed"] = trimmed_open
     ctx = {
         "interval": interval,
         "df_ind": df_ind,
         "vol_ratio": vol_ratio,
-        "open_candle_trimmed": bool(trimmed_open),
+        "open_candle_trimmed": trimmed_open,
     }
     return estado, source, "", ctx
 
 
+def _eval_cache_enabled(cfg: Dict[str, Any]) -> bool:
+    raw = cfg.get("eval_cache", {})
+    # La cache guarda `df_ind` por registro (lo usa el outcome de alertas abiertas): no cabe en 512MB.
+    if _resource_profile_active(cfg, "render_512mb"):
+        return False
+    return isinstance(raw, dict) and bool(raw.get("enabled", True))
+
+
+def _precision_fingerprint(
+    bar_fingerprint: str,
+    precision_cfg: Dict[str, Any],
+    record: Dict[str, Any],
+    state: Dict[str, Any],
+) -> str:
+    history = record.get("quality_history", [])
+    payload = {
+        "bar": bar_fingerprint,
+        "cfg": precision_cfg,
+        "stats": record.get("quality_stats", {}),
+        "stats_by_setup": record.get("quality_stats_by_setup", {}),
+        "history_len": len(history) if isinstance(history, list) else 0,
+        "quality_epoch": state.get("quality_epoch"),
+        "quality_global": _aggregate_quality_stats(state),
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _precision_is_partial(precision: Dict[str, Any]) -> bool:
+    """Filtros evaluados sin todo el contexto (fallo temporal de velas MTF o 1D/4H): no se cachean."""
+    if str(precision.get("structural_error", "")).strip():
+        return True
+    mtf = precision.get("mtf", {})
+    return isinstance(mtf, dict) and int(mtf.get("errors", 0) or 0) > 0
+
+
+def _evaluate_record_estado(
+    item: MarketItem,
+    cfg: Dict[str, Any],
+    forced_mode: str | None,
+    forced_interval: str | None,
+    fetch_cache: Dict[str, Any] | None,
+    record_key: str,
+    use_eval_cache: bool = False,
+) -> Tuple[Dict[str, Any] | None, str, str, Dict[str, Any], str, bool]:
+    inputs, fetch_err = _fetch_estado_inputs(
+        item,
+        cfg,
+        forced_mode=forced_mode,
+        forced_interval=forced_interval,
+        fetch_cache=fetch_cache,
+    )
+    return _evaluate_estado_inputs(inputs, fetch_err, record_key, use_eval_cache)
+
+
+def _cached_record_eval(record_key: str, inputs: Dict[str, Any]) -> Dict[str, Any] | None:
+    bar_fingerprint = inputs.get("bar_fp") or _estado_inputs_fingerprint(inputs)
+    inputs["bar_fp"] = bar_fingerprint
+    cached = _RECORD_EVAL_CACHE.get(record_key)
+    if isinstance(cached, dict) and cached.get("bar_fp") == bar_fingerprint:
+        return cached
+    return None
+
+
+def _evaluate_estado_inputs(
+    inputs: Dict[str, Any] | None,
+    fetch_err: str,
+    record_key: str,
+    use_eval_cache: bool = False,
+) -> Tuple[Dict[str, Any] | None, str, str, Dict[str, Any], str, bool]:
+    if inputs is None:
+        return None, "", fetch_err, {}, "", False
+    if not use_eval_cache:
+        return (*_compute_estado_from_inputs(inputs), "", False)
+
+    cached = _cached_record_eval(record_key, inputs)
+    bar_fingerprint = str(inputs["bar_fp"])
+    if cached is not None:
+        return copy.deepcopy(cached["estado"]), str(cached.get("source", "")), "", cached["ctx"], bar_fingerprint, True
+    return (*_compute_estado_from_inputs(inputs), bar_fingerprint, False)
+
+
+def _attach_batch_indicators(inputs_list: List[Dict[str, Any]], min_frames: int = 2) -> int:
+    """Calcula en un solo lote los indicadores de todos los frames pendientes del ciclo."""
+    frames: List[pd.DataFrame] = []
+    for inputs in inputs_list:
+        frames.extend(inputs.get("frames", []))
+    if len(frames) < min_frames:
+        return 0
+    results = calcular_indicadores_batch(frames)
+    pos = 0
+    for inputs in inputs_list:
+        count = len(inputs.get("frames", []))
+        inputs["indicator_frames"] = results[pos : pos + count]
+        pos += count
+    return len(frames)
+
+
+def _compute_estado(
+    item: MarketItem,
+    cfg: Dict[str, Any],
+    forced_mode: str | None = None,
+    forced_interval: str | None = None,
+    fetch_cache: Dict[str, Any] | None = None,
+) -> Tuple[Dict[str, Any] | None, str, str, Dict[str, Any]]:
+    inputs, fetch_err = _fetch_estado_inputs(
+        item,
+        cfg,
+        forced_mode=forced_mode,
+        forced_interval=forced_interval,
+        fetch_cache=fetch_cache,
+    )
+    if inputs is None:
+        return None, "", fetch_err, {}
+    return _compute_estado_from_inputs(inputs)
+
+
+def _resolve_telegram_rate_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    notif = cfg.get("notification", {}) if isinstance(cfg.get("notification", {}), dict) else {}
+    telegram = notif.get("telegram", {}) if isinstance(notif.get("telegram", {}), dict) else {}
+    raw = telegram.get("rate_limit", {})
+    if not isinstance(raw, dict):
+        raw = {}
+    out: Dict[str, Any] = {"enabled": bool(raw.get("enabled", True))}
+    for key, default in (
+        ("global_per_sec", 25.0),
+        ("chat_per_sec", 1.0),
+        ("group_per_min", 20.0),
+        ("max_wait_sec", 30.0),
+        ("max_retries", 3),
+    ):
+        try:
+            out[key] = max(0.0, float(raw.get(key, default)))
+        except Exception:
+            out[key] = float(default)
+    out["max_retries"] = int(out["max_retries"])
+    return out
+
+
+def _telegram_transport(cfg: Dict[str, Any]) -> TelegramTransport | None:
+    global _TELEGRAM_TRANSPORT
+    rate_cfg = _resolve_telegram_rate_cfg(cfg)
+    if not rate_cfg["enabled"]:
+        return None
+    key = tuple(float(rate_cfg[k]) for k in ("global_per_sec", "chat_per_sec", "group_per_min", "max_wait_sec", "max_retries"))
+    with _TELEGRAM_TRANSPORT_LOCK:
+        if _TELEGRAM_TRANSPORT is None or _TELEGRAM_TRANSPORT[0] != key:
+            transport = TelegramTransport(
+                global_per_sec=rate_cfg["global_per_sec"],
+                chat_per_sec=rate_cfg["chat_per_sec"],
+                group_per_min=rate_cfg["group_per_min"],
+                max_wait_sec=rate_cfg["max_wait_sec"],
+                max_retries=rate_cfg["max_retries"],
+            )
+            _TELEGRAM_TRANSPORT = (key, transport)
+        return _TELEGRAM_TRANSPORT[1]
+
+
+def _telegram_post(cfg: Dict[str, Any], url: str, payload: Dict[str, Any], priority: int = 0) -> requests.Response:
+    transport = _telegram_transport(cfg)
+    if transport is None:
+        return http_pool.post(url, data=payload, timeout=20)
+    return transport.post(url, data=payload, chat_id=str(payload.get("chat_id", "")), priority=priority, timeout=20)
+
+
+def _resolve_smtp_session_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    notif = cfg.get("notification", {}) if isinstance(cfg.get("notification", {}), dict) else {}
+    email = notif.get("email", {}) if isinstance(notif.get("email", {}), dict) else {}
+    raw = email.get("session", {})
+    if not isinstance(raw, dict):
+        raw = {}
+    try:
+        idle_timeout_sec = float(raw.get("idle_timeout_sec", 60))
+    except Exception:
+        idle_timeout_sec = 60.0
+    try:
+        max_sessions = int(raw.get("max_sessions", 4))
+    except Exception:
+        max_sessions = 4
+    try:
+        max_messages = int(raw.get("max_messages_per_session", 100))
+    except Exception:
+        max_messages = 100
+    return {
+        "enabled": bool(raw.get("enabled", True)),
+        "idle_timeout_sec": max(1.0, idle_timeout_sec),
+        "max_sessions": min(16, max(1, max_sessions)),
+        "max_messages_per_session": max(1, max_messages),
+    }
+
+
+def _smtp_transport(cfg: Dict[str, Any], host: str, port: int, user: str, password: str) -> SmtpTransport | None:
+    global _SMTP_TRANSPORT
+    session_cfg = _resolve_smtp_session_cfg(cfg)
+    if not session_cfg["enabled"]:
+        return None
+    # Cambiar servidor o credenciales (variables SMTP_*) abre sesiones nuevas.
+    key = (
+        host,
+        port,
+        user,
+        hashlib.sha256(password.encode("utf-8")).hexdigest(),
+        session_cfg["idle_timeout_sec"],
+        session_cfg["max_sessions"],
+        session_cfg["max_messages_per_session"],
+    )
+    previous = None
+    with _SMTP_TRANSPORT_LOCK:
+        if _SMTP_TRANSPORT is None or _SMTP_TRANSPORT[0] != key:
+            previous = _SMTP_TRANSPORT
+            transport = SmtpTransport(
+                host,
+                port,
+                user,
+                password,
+                timeout=20,
+                idle_timeout_sec=session_cfg["idle_timeout_sec"],
+                max_sessions=session_cfg["max_sessions"],
+                max_messages_per_session=session_cfg["max_messages_per_session"],
+            )
+            _SMTP_TRANSPORT = (key, transport)
+        current = _SMTP_TRANSPORT[1]
+    if previous is not None:
+        previous[1].close()
+    return current
+
+
+def _close_smtp_transport() -> None:
+    global _SMTP_TRANSPORT
+    with _SMTP_TRANSPORT_LOCK:
+        previous = _SMTP_TRANSPORT
+        _SMTP_TRANSPORT = None
+    if previous is not None:
+        previous[1].close()
+
+
 def _send_email_alert(
     cfg: Dict[str, Any],
     item: MarketItem,
@@ -3907,7 +4890,11 @@ def _send_email_alert(
     msg["To"] = ", ".join(recipients)
     msg.set_content(body)
 
+    transport = _smtp_transport(cfg, smtp_host, smtp_port, smtp_user, smtp_password)
     try:
+        if transport is not None:
+            transport.send(msg)
+            return True, ""
         with smtplib.SMTP(smtp_host, smtp_port, timeout=20) as server:
             server.ehlo()
             if smtp_port == 587:
@@ -3920,12 +4907,113 @@ def _send_email_alert(
         return False, _redact_text(str(exc))
 
 
+def _telegram_photo_key(item: MarketItem | None) -> str:
+    return str(item.label or "").strip().upper() if item is not None else ""
+
+
+def _cached_telegram_photo_file_id(key: str, url: str) -> str:
+    with _TELEGRAM_PHOTO_CACHE_LOCK:
+        entry = _TELEGRAM_PHOTO_CACHE.get(key)
+        # Si cambio la URL configurada el file_id guardado es de otra imagen.
+        if not isinstance(entry, dict) or entry.get("url") != url:
+            return ""
+        return str(entry.get("file_id", "") or "")
+
+
+def _remember_telegram_photo_file_id(key: str, url: str, data: Dict[str, Any]) -> None:
+    result = data.get("result", {}) if isinstance(data.get("result", {}), dict) else {}
+    sizes = result.get("photo", [])
+    if not key or not isinstance(sizes, list) or not sizes or not isinstance(sizes[-1], dict):
+        return
+    # Telegram devuelve los tamanos de menor a mayor; se reutiliza el original.
+    file_id = str(sizes[-1].get("file_id", "") or "").strip()
+    if not file_id:
+        return
+    with _TELEGRAM_PHOTO_CACHE_LOCK:
+        _TELEGRAM_PHOTO_CACHE[key] = {"url": url, "file_id": file_id, "cached_utc": _now_iso_utc()}
+        _TELEGRAM_PHOTO_STATS["uploads"] += 1
+
+
+def _forget_telegram_photo_file_id(key: str, file_id: str) -> None:
+    with _TELEGRAM_PHOTO_CACHE_LOCK:
+        entry = _TELEGRAM_PHOTO_CACHE.get(key)
+        if isinstance(entry, dict) and entry.get("file_id") == file_id:
+            _TELEGRAM_PHOTO_CACHE.pop(key, None)
+            _TELEGRAM_PHOTO_STATS["invalidated"] += 1
+
+
+def _sync_telegram_photo_cache(state: Dict[str, Any], reset_stats: bool = False) -> Dict[str, int]:
+    """Une el cache en memoria con `state[TELEGRAM_PHOTO_FILE_IDS_KEY]` (memoria manda) y lo deja en el estado.
+
+    Devuelve entradas y conteos desde el ultimo `reset_stats=True` (el cierre de cada ciclo los pone en cero).
+    """
+    persisted = state.get(TELEGRAM_PHOTO_FILE_IDS_KEY, {})
+    with _TELEGRAM_PHOTO_CACHE_LOCK:
+        if isinstance(persisted, dict):
+            for key, entry in persisted.items():
+                if key not in _TELEGRAM_PHOTO_CACHE and isinstance(entry, dict) and entry.get("file_id") and entry.get("url"):
+                    _TELEGRAM_PHOTO_CACHE[str(key)] = dict(entry)
+        state[TELEGRAM_PHOTO_FILE_IDS_KEY] = {key: dict(entry) for key, entry in _TELEGRAM_PHOTO_CACHE.items()}
+        out = {"entries": len(_TELEGRAM_PHOTO_CACHE), **_TELEGRAM_PHOTO_STATS}
+        if reset_stats:
+            _TELEGRAM_PHOTO_STATS.update(dict.fromkeys(_TELEGRAM_PHOTO_STATS, 0))
+        return out
+
+
+def _telegram_rejected_file_id(resp: Any) -> bool:
+    """400 de Telegram por `file_id` invalido (vencido o de otro bot), no por caption, parse_mode o chat."""
+    try:
+        description = str(resp.json().get("description", "")).lower()
+    except Exception:
+        return False
+    return "file identifier" in description or "file_id" in description
+
+
+def _send_telegram_photo(
+    cfg: Dict[str, Any],
+    token: str,
+    chat_id: str,
+    item: MarketItem | None,
+    photo_url: str,
+    caption: str,
+    parse_mode: str,
+    priority: int = 0,
+) -> str:
+    """sendPhoto con el file_id cacheado del simbolo (o la URL si no hay). Devuelve "" si salio o el error."""
+    key = _telegram_photo_key(item)
+    cached = _cached_telegram_photo_file_id(key, photo_url)
+    photo_error = ""
+    for photo in ([cached] if cached else []) + [photo_url]:
+        payload: Dict[str, Any] = {"chat_id": chat_id, "photo": photo, "caption": caption}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        resp = _telegram_post(cfg, f"{TELEGRAM_API_BASE}/bot{token}/sendPhoto", payload, priority)
+        if resp.status_code < 400:
+            data = resp.json()
+            if data.get("ok", False):
+                if photo == cached:
+                    with _TELEGRAM_PHOTO_CACHE_LOCK:
+                        _TELEGRAM_PHOTO_STATS["hits"] += 1
+                else:
+                    _remember_telegram_photo_file_id(key, photo_url, data)
+                return ""
+            photo_error = str(data.get("description", "Error Telegram sin descripcion"))
+        else:
+            photo_error = f"HTTP {resp.status_code}"
+        if photo != cached or resp.status_code != 400 or not _telegram_rejected_file_id(resp):
+            break
+        # Telegram rechazo el file_id: se descarta y se reintenta con la URL.
+        _forget_telegram_photo_file_id(key, cached)
+    return photo_error
+
+
 def _send_telegram_alert(
     cfg: Dict[str, Any],
     subject: str,
     body: str,
     chat_ids_override: List[str] | None = None,
     item: MarketItem | None = None,
+    priority: int = 0,
 ) -> Tuple[bool, str]:
     token = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
     if not token:
@@ -3948,31 +5036,15 @@ def _send_telegram_alert(
         try:
             photo_error = ""
             if photo_url:
-                photo_payload: Dict[str, Any] = {"chat_id": chat_id, "photo": photo_url, "caption": caption}
-                if parse_mode:
-                    photo_payload["parse_mode"] = parse_mode
-                photo_resp = requests.post(
-                    f"https://api.telegram.org/bot{token}/sendPhoto",
-                    data=photo_payload,
-                    timeout=20,
-                )
-                if photo_resp.status_code < 400:
-                    photo_data = photo_resp.json()
-                    if photo_data.get("ok", False):
-                        sent_any = True
-                        continue
-                    photo_error = str(photo_data.get("description", "Error Telegram sin descripcion"))
-                else:
-                    photo_error = f"HTTP {photo_resp.status_code}"
+                photo_error = _send_telegram_photo(cfg, token, chat_id, item, photo_url, caption, parse_mode, priority)
+                if not photo_error:
+                    sent_any = True
+                    continue
 
             payload: Dict[str, Any] = {"chat_id": chat_id, "text": message}
             if parse_mode:
                 payload["parse_mode"] = parse_mode
-            resp = requests.post(
-                f"https://api.telegram.org/bot{token}/sendMessage",
-                data=payload,
-                timeout=20,
-            )
+            resp = _telegram_post(cfg, f"{TELEGRAM_API_BASE}/bot{token}/sendMessage", payload, priority)
             if resp.status_code >= 400:
                 if photo_error:
                     errors.append(f"{chat_id}: foto({photo_error}) | mensaje(HTTP {resp.status_code})")
@@ -4041,6 +5113,315 @@ def _send_windows_toast(subject: str, body: str) -> Tuple[bool, str]:
         return False, _redact_text(str(exc))
 
 
+def _resolve_notify_dispatcher_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    notif = cfg.get("notification", {}) if isinstance(cfg.get("notification", {}), dict) else {}
+    raw = notif.get("dispatcher", {})
+    if not isinstance(raw, dict):
+        raw = {}
+    try:
+        workers = int(raw.get("workers", 8))
+    except Exception:
+        workers = 8
+    try:
+        queue_size = int(raw.get("queue_size", 512))
+    except Exception:
+        queue_size = 512
+    try:
+        flush_timeout_sec = float(raw.get("flush_timeout_sec", 30))
+    except Exception:
+        flush_timeout_sec = 30.0
+    return {
+        "enabled": bool(raw.get("enabled", True)),
+        "workers": min(64, max(1, workers)),
+        "queue_size": max(1, queue_size),
+        "flush_timeout_sec": max(0.0, flush_timeout_sec),
+    }
+
+
+def _start_notify_dispatcher(cfg: Dict[str, Any]) -> NotificationDispatcher | None:
+    global _NOTIFY_DISPATCHER
+    dispatcher_cfg = _resolve_notify_dispatcher_cfg(cfg)
+    if not dispatcher_cfg["enabled"]:
+        return None
+    dispatcher = NotificationDispatcher(workers=dispatcher_cfg["workers"], queue_size=dispatcher_cfg["queue_size"])
+    dispatcher.start()
+    logging.info(
+        "Dispatcher de notificaciones iniciado: %s hilos, cola=%s.",
+        dispatcher.workers,
+        dispatcher.queue_size,
+    )
+    _NOTIFY_DISPATCHER = dispatcher
+    return dispatcher
+
+
+def _stop_notify_dispatcher(timeout: float = 30.0) -> List[NotificationBatch]:
+    """Espera los envios en curso y devuelve los batches sin aplicar (el llamador los aplica al estado)."""
+    global _NOTIFY_DISPATCHER
+    dispatcher = _NOTIFY_DISPATCHER
+    _NOTIFY_DISPATCHER = None
+    if dispatcher is None:
+        return []
+    if not dispatcher.stop(timeout=timeout):
+        logging.warning("Dispatcher detenido con envios pendientes: %s", ", ".join(dispatcher.pending_keys()))
+    return dispatcher.drain()
+
+
+def _build_alert_delivery(
+    cfg: Dict[str, Any],
+    item: MarketItem,
+    subject: str,
+    body: str,
+    state: Dict[str, Any],
+    record: Dict[str, Any],
+    record_key: str,
+    target_key: str,
+    market_key: str,
+    user_targets: List[Dict[str, Any]],
+    telegram_broadcast_ids: List[str],
+    snapshot: Dict[str, Any] | None = None,
+) -> NotificationBatch:
+    """Arma los envios de una alerta (uno por usuario/canal) sin ejecutarlos."""
+    telegram_enabled = _channel_enabled(cfg, "telegram", default=True)
+    email_enabled = _channel_enabled(cfg, "email", default=True)
+    windows_enabled = _channel_enabled(cfg, "windows", default=True)
+    jobs: List[NotificationJob] = []
+    followup = None
+    context: Dict[str, Any] = {
+        "record": record,
+        "record_key": record_key,
+        "state_key": item.state_key,
+        "target_key": target_key,
+        "market_key": market_key,
+        "snapshot": snapshot,
+        "queued_utc": _now_iso_utc(),
+        "users": [],
+        "by_user": bool(user_targets),
+        "windows_enabled": windows_enabled,
+        "enabled_any": False,
+    }
+
+    if user_targets:
+        context["enabled_any"] = telegram_enabled or email_enabled or windows_enabled
+        day_key = _utc_day_key()
+        for target_user in user_targets:
+            user_id = target_user["id"]
+            chat_id = target_user["chat_id"]
+            email = target_user.get("email", "")
+            is_premium = bool(target_user.get("es_premium", False))
+
+            if not is_premium and not _free_user_can_receive_market_alert(state, user_id, market_key):
+                continue
+            if not is_premium:
+                # Reserva el cupo diario hasta conocer el resultado: otra alerta del mismo mercado
+                # encolada antes de que este envio termine no debe pasar el filtro.
+                _FREE_ALERT_RESERVATIONS[(user_id, market_key)] = day_key
+            context["users"].append({"user_id": user_id, "premium": is_premium})
+
+            if telegram_enabled and _chat_id_telegram_valido(chat_id):
+                jobs.append(
+                    NotificationJob(
+                        "telegram",
+                        partial(
+                            _send_telegram_alert,
+                            cfg,
+                            subject,
+                            body,
+                            chat_ids_override=[chat_id],
+                            item=item,
+                            priority=1 if is_premium else 0,
+                        ),
+                        target=user_id,
+                        priority=1 if is_premium else 0,
+                    )
+                )
+            if is_premium and email_enabled and email:
+                jobs.append(
+                    NotificationJob(
+                        "email",
+                        partial(_send_email_alert, cfg, item, subject, body, recipients_override=[email]),
+                        target=user_id,
+                        priority=1,
+                    )
+                )
+
+        known_user_chat_ids = set(_dedupe_chat_ids([t.get("chat_id", "") for t in user_targets]))
+        broadcast_extra_chat_ids = [cid for cid in telegram_broadcast_ids if cid not in known_user_chat_ids]
+        if telegram_enabled and broadcast_extra_chat_ids:
+            jobs.append(
+                NotificationJob(
+                    "telegram",
+                    partial(_send_telegram_alert, cfg, subject, body, chat_ids_override=broadcast_extra_chat_ids, item=item),
+                    target=NOTIFY_BROADCAST_TARGET,
+                    meta={"sent_to": len(broadcast_extra_chat_ids)},
+                )
+            )
+
+        if windows_enabled:
+            premium_ids = {user["user_id"] for user in context["users"] if user["premium"]}
+
+            def followup(batch: NotificationBatch) -> List[NotificationJob]:
+                # El toast local solo sale si algun premium recibio la alerta.
+                if any(job.ok and job.target in premium_ids for job in batch.jobs):
+                    return [NotificationJob("windows", partial(_send_windows_toast, subject, body), target="windows")]
+                return []
+
+    else:
+        if email_enabled:
+            jobs.append(NotificationJob("email", partial(_send_email_alert, cfg, item, subject, body), target="email"))
+        if telegram_enabled:
+            jobs.append(
+                NotificationJob(
+                    "telegram",
+                    partial(_send_telegram_alert, cfg, subject, body, chat_ids_override=telegram_broadcast_ids or None, item=item),
+                    target="telegram",
+                )
+            )
+        if windows_enabled:
+            jobs.append(NotificationJob("windows", partial(_send_windows_toast, subject, body), target="windows"))
+        context["enabled_any"] = bool(jobs)
+
+    return NotificationBatch(record_key, jobs, followup=followup, context=context)
+
+
+def _apply_alert_delivery(state: Dict[str, Any], batch: NotificationBatch, cycle_metrics: Dict[str, Any]) -> bool:
+    """Escribe el resultado de un batch en el registro (last_notify, cupo free, alerta abierta). Hilo principal."""
+    ctx = batch.context
+    market_key = str(ctx.get("market_key", ""))
+    for job in batch.jobs:
+        _record_notification_metrics(cycle_metrics, job.channel, job.ok, job.latency_ms)
+
+    notify_status: Dict[str, Any] = {}
+    errors: List[str] = []
+    sent_any = False
+    if ctx.get("by_user"):
+        jobs_by_target: Dict[str, List[NotificationJob]] = {}
+        for job in batch.jobs:
+            jobs_by_target.setdefault(job.target, []).append(job)
+
+        user_results: List[Dict[str, Any]] = []
+        for user in ctx.get("users", []):
+            user_id = user["user_id"]
+            is_premium = bool(user["premium"])
+            user_jobs = jobs_by_target.get(user_id, [])
+            user_notified = any(job.ok for job in user_jobs)
+            user_errors = [f"{job.channel}: {job.error}" for job in user_jobs if not job.ok]
+            if not is_premium:
+                _FREE_ALERT_RESERVATIONS.pop((user_id, market_key), None)
+                if user_notified:
+                    _mark_free_user_market_alert(state, user_id, market_key)
+            sent_any = sent_any or user_notified
+            user_results.append(
+                {
+                    "user_id": user_id,
+                    "premium": is_premium,
+                    "ok": user_notified,
+                    "error": "; ".join(user_errors),
+                }
+            )
+            if user_errors and not user_notified:
+                errors.append(f"{user_id}: {'; '.join(user_errors)}")
+        notify_status["users"] = user_results
+
+        for job in jobs_by_target.get(NOTIFY_BROADCAST_TARGET, []):
+            notify_status["telegram_broadcast"] = {
+                "ok": job.ok,
+                "error": job.error,
+                "sent_to": int(job.meta.get("sent_to", 0) or 0),
+            }
+            if job.ok:
+                sent_any = True
+            else:
+                errors.append(f"telegram_broadcast: {job.error}")
+
+        if not ctx.get("users"):
+            errors.append("Sin usuarios elegibles con Telegram para esta alerta.")
+
+        if ctx.get("windows_enabled"):
+            windows_jobs = jobs_by_target.get("windows", [])
+            if windows_jobs:
+                notify_status["windows"] = {"ok": windows_jobs[0].ok, "error": windows_jobs[0].error}
+                if windows_jobs[0].ok:
+                    sent_any = True
+                else:
+                    errors.append(f"windows: {windows_jobs[0].error}")
+            else:
+                notify_status["windows"] = {
+                    "ok": False,
+                    "error": "Sin usuarios premium alertados en este evento.",
+                }
+    else:
+        for job in batch.jobs:
+            notify_status[job.channel] = {"ok": job.ok, "error": job.error}
+            if job.ok:
+                sent_any = True
+            else:
+                errors.append(f"{job.channel}: {job.error}")
+        if not ctx.get("enabled_any"):
+            errors.append("No hay canales habilitados en notification.")
+
+    record_key = str(ctx.get("record_key", batch.key))
+    symbols_state = state.setdefault("symbols", {})
+    record = symbols_state.get(record_key)
+    if not isinstance(record, dict):
+        record = ctx.get("record") if isinstance(ctx.get("record"), dict) else {}
+    record["last_notify"] = notify_status
+    if sent_any:
+        cycle_metrics["alerts_sent"] = int(cycle_metrics.get("alerts_sent", 0) or 0) + 1
+        record["last_alert_utc"] = str(ctx.get("queued_utc", "") or _now_iso_utc())
+        _increment_daily_alert_count(record)
+        snapshot = ctx.get("snapshot")
+        if isinstance(snapshot, dict):
+            open_alerts = _normalize_record_open_alerts(record, record_key=record_key)
+            open_alerts.append(snapshot)
+            _set_record_open_alerts(record, open_alerts)
+        logging.info("[%s|%s] Alerta enviada (multicanal).", ctx.get("state_key", ""), ctx.get("target_key", ""))
+    else:
+        cycle_metrics["alerts_failed"] = int(cycle_metrics.get("alerts_failed", 0) or 0) + 1
+        record["last_error"] = _redact_text("; ".join(errors))
+        cycle_metrics.setdefault("errors", []).append(f"{record_key}: {record['last_error']}")
+        logging.error(
+            "[%s|%s] Fallo envio alerta: %s",
+            ctx.get("state_key", ""),
+            ctx.get("target_key", ""),
+            record["last_error"],
+        )
+    return sent_any
+
+
+def _dispatch_alert_delivery(state: Dict[str, Any], batch: NotificationBatch, cycle_metrics: Dict[str, Any]) -> bool | None:
+    """Encola el batch si hay dispatcher; si no (o la cola esta llena) lo envia aqui mismo.
+
+    Devuelve None cuando queda en cola (el resultado se aplica en `_drain_notification_results`).
+    """
+    dispatcher_metrics = cycle_metrics.setdefault("notify_dispatcher", {})
+    dispatcher = _NOTIFY_DISPATCHER
+    if dispatcher is not None and dispatcher.submit(batch):
+        record = batch.context.get("record")
+        if isinstance(record, dict):
+            record["last_notify"] = {
+                "queued": True,
+                "queued_utc": batch.context.get("queued_utc", ""),
+                "jobs": len(batch.jobs),
+            }
+        dispatcher_metrics["queued"] = int(dispatcher_metrics.get("queued", 0) or 0) + 1
+        return None
+    if dispatcher is not None:
+        dispatcher_metrics["inline"] = int(dispatcher_metrics.get("inline", 0) or 0) + 1
+    run_batch(batch)
+    return _apply_alert_delivery(state, batch, cycle_metrics)
+
+
+def _drain_notification_results(state: Dict[str, Any], cycle_metrics: Dict[str, Any], batches: List[NotificationBatch] | None = None) -> int:
+    if batches is None:
+        batches = _NOTIFY_DISPATCHER.drain() if _NOTIFY_DISPATCHER is not None else []
+    for batch in batches:
+        _apply_alert_delivery(state, batch, cycle_metrics)
+    if batches:
+        dispatcher_metrics = cycle_metrics.setdefault("notify_dispatcher", {})
+        dispatcher_metrics["applied"] = int(dispatcher_metrics.get("applied", 0) or 0) + len(batches)
+    return len(batches)
+
+
 def _channel_enabled(cfg: Dict[str, Any], channel: str, default: bool = True) -> bool:
     notif = cfg.get("notification", {}) if isinstance(cfg.get("notification", {}), dict) else {}
     ch = notif.get(channel, {})
@@ -4060,6 +5441,7 @@ def _apply_precision_filters(
     precision_cfg: Dict[str, Any] | None = None,
     record: Dict[str, Any] | None = None,
     record_key: str = "",
+    fetch_cache: Dict[str, Any] | None = None,
 ) -> Dict[str, Any]:
     if not isinstance(precision_cfg, dict):
         precision_cfg = _resolve_precision_cfg(cfg)
@@ -4097,6 +5479,7 @@ def _apply_precision_filters(
             cfg=cfg,
             precision_cfg=effective_cfg,
             cache=structural_cache_ref,
+            fetch_cache=fetch_cache,
         )
 
     structural_state = structural_payload.get("state", {}) if isinstance(structural_payload, dict) else {}
@@ -4174,6 +5557,7 @@ def _apply_precision_filters(
             precision_cfg=effective_cfg,
             cache=mtf_cache,
             cfg=cfg,
+            fetch_cache=fetch_cache,
         )
     else:
         mtf_info = {
@@ -4369,7 +5753,173 @@ def _resolve_scan_targets(cfg: Dict[str, Any]) -> List[Dict[str, str]]:
     return targets
 
 
-def run_scan_cycle(cfg: Dict[str, Any], state: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+def _resolve_scheduler_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    raw = cfg.get("scheduler", {})
+    if not isinstance(raw, dict):
+        raw = {}
+    mode = str(raw.get("mode", "bar_close")).strip().lower()
+    if mode not in {"poll", "bar_close"}:
+        mode = "bar_close"
+    try:
+        outcome_interval_sec = int(raw.get("outcome_interval_sec", 300))
+    except Exception:
+        outcome_interval_sec = 300
+    return {
+        "mode": mode,
+        "outcome_interval_sec": max(30, outcome_interval_sec),
+    }
+
+
+def _resolve_parallel_fetch_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    raw = cfg.get("parallel_fetch", {})
+    if not isinstance(raw, dict):
+        raw = {}
+    try:
+        max_workers = int(raw.get("max_workers", 6))
+    except Exception:
+        max_workers = 6
+    return {
+        "enabled": bool(raw.get("enabled", True)),
+        "max_workers": max(1, max_workers),
+    }
+
+
+def _scan_target_parts(item: MarketItem, target: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    target_mode = str(target.get("mode", "tendencial")).strip().lower()
+    target_interval = str(target.get("interval", "15m")).strip()
+    target_key = str(target.get("key", target_interval)).strip().lower() or target_interval.lower()
+    return target_mode, target_interval, target_key, f"{item.state_key}|{target_key}"
+
+
+def _context_fetch_specs(
+    item: MarketItem,
+    target_mode: str,
+    target_interval: str,
+    precision_cfg: Dict[str, Any],
+) -> List[Tuple[MarketItem, str, str, bool, int]]:
+    """Velas que los filtros de precision piden despues del estado: contexto estructural 1D/4H e intervalos MTF.
+
+    Mismas claves que `_load_structural_state` y `_compute_interval_direction`, para que el prefetch las deje en
+    `fetch_cache`.
+    """
+    if target_mode == "estructural":
+        return []
+    require_closed_candle = bool(precision_cfg.get("require_closed_candle", True))
+    grace_seconds = int(precision_cfg.get("closed_candle_grace_sec", 10))
+    specs = [("3y", "1d"), ("12mo", "4h")]
+    if bool(precision_cfg.get("enabled", True)) and bool(precision_cfg.get("multi_timeframe_filter", True)):
+        base_interval = str(target_interval or "15m").strip().lower()
+        specs.extend((_period_for_interval(tf), tf) for tf in _resolve_mtf_intervals(base_interval, precision_cfg))
+    out: List[Tuple[MarketItem, str, str, bool, int]] = []
+    seen: set = set()
+    for period, interval in specs:
+        if interval not in seen:
+            seen.add(interval)
+            out.append((item, period, interval, require_closed_candle, grace_seconds))
+    return out
+
+
+def _compute_estados_parallel(
+    tasks: List[Tuple[str, MarketItem, str, str]],
+    cfg: Dict[str, Any],
+    fetch_cache: Dict[str, Any],
+    max_workers: int,
+    use_eval_cache: bool = False,
+    batch_cfg: Dict[str, Any] | None = None,
+    stats: Dict[str, Any] | None = None,
+    context_fetches: List[Tuple[MarketItem, str, str, bool, int]] | None = None,
+) -> Dict[str, Tuple[Dict[str, Any] | None, str, str, Dict[str, Any], str, bool]]:
+    results: Dict[str, Tuple[Dict[str, Any] | None, str, str, Dict[str, Any], str, bool]] = {}
+    if not tasks:
+        return results
+
+    def _submit_context(pool: ThreadPoolExecutor) -> None:
+        # Van detras de las descargas principales; el loop del ciclo las encuentra en `fetch_cache`
+        # (o espera la descarga en curso) al aplicar MTF y contexto estructural.
+        submitted: set = set()
+        for item, period, interval, require_closed_candle, grace_seconds in context_fetches or []:
+            if (item.state_key, interval) in submitted:
+                continue
+            submitted.add((item.state_key, interval))
+            pool.submit(
+                _fetch_candles_cached,
+                item,
+                period=period,
+                interval=interval,
+                cfg=cfg,
+                fetch_cache=fetch_cache,
+                require_closed_candle=require_closed_candle,
+                grace_seconds=grace_seconds,
+            )
+
+    pool_size = min(max_workers, len(tasks) + len(context_fetches or []))
+    with ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="scan-fetch") as pool:
+        if isinstance(batch_cfg, dict) and batch_cfg.get("enabled"):
+            # Primero se descargan todos los registros; los indicadores se calculan en un lote
+            # simbolos x velas y solo el estado final vuelve al pool.
+            fetch_futures = {
+                record_key: pool.submit(
+                    _fetch_estado_inputs,
+                    item,
+                    cfg,
+                    forced_mode=target_mode,
+                    forced_interval=target_interval if target_mode != "estructural" else None,
+                    fetch_cache=fetch_cache,
+                )
+                for record_key, item, target_mode, target_interval in tasks
+            }
+            _submit_context(pool)
+            fetched: Dict[str, Tuple[Dict[str, Any] | None, str]] = {}
+            for record_key, future in fetch_futures.items():
+                try:
+                    fetched[record_key] = future.result()
+                except Exception as exc:
+                    fetched[record_key] = (None, f"Error calculando estado: {exc}")
+            pending = [
+                inputs
+                for record_key, (inputs, _) in fetched.items()
+                if inputs is not None and not (use_eval_cache and _cached_record_eval(record_key, inputs) is not None)
+            ]
+            try:
+                batched_frames = _attach_batch_indicators(pending, int(batch_cfg.get("min_frames", 2)))
+            except Exception as exc:
+                logging.warning("Lote de indicadores fallo, se calcula por simbolo: %s", exc)
+                batched_frames = 0
+            if stats is not None:
+                stats["batched_frames"] = batched_frames
+            futures = {
+                record_key: pool.submit(_evaluate_estado_inputs, inputs, fetch_err, record_key, use_eval_cache)
+                for record_key, (inputs, fetch_err) in fetched.items()
+            }
+        else:
+            futures = {
+                record_key: pool.submit(
+                    _evaluate_record_estado,
+                    item=item,
+                    cfg=cfg,
+                    forced_mode=target_mode,
+                    forced_interval=target_interval if target_mode != "estructural" else None,
+                    fetch_cache=fetch_cache,
+                    record_key=record_key,
+                    use_eval_cache=use_eval_cache,
+                )
+                for record_key, item, target_mode, target_interval in tasks
+            }
+            _submit_context(pool)
+        for record_key, future in futures.items():
+            try:
+                results[record_key] = future.result()
+            except Exception as exc:
+                results[record_key] = (None, "", f"Error calculando estado: {exc}", {}, "", False)
+    return results
+
+
+def run_scan_cycle(
+    cfg: Dict[str, Any],
+    state: Dict[str, Any],
+    due_targets: set[str] | None = None,
+    outcome_only: bool = False,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
     cycle_started_perf = time.perf_counter()
     cycle_metrics = _new_cycle_metrics()
     cfg = _apply_resource_profile(cfg)
@@ -4380,8 +5930,15 @@ def run_scan_cycle(cfg: Dict[str, Any], state: Dict[str, Any]) -> Tuple[Dict[str
     persistence_bars = max(1, int(precision_cfg.get("persistence_bars", 1)))
     watchlist = _build_watchlist(cfg)
     scan_targets = _resolve_scan_targets(cfg)
+    if due_targets is not None:
+        scan_targets = [t for t in scan_targets if str(t.get("key", "")).strip() in due_targets]
+    cycle_metrics["outcome_only"] = bool(outcome_only)
     cycle_metrics["watchlist_size"] = len(watchlist)
     cycle_metrics["scan_targets"] = len(scan_targets)
+    # Claves en cola antes de aplicar lo terminado: un batch que termine entre ambas no habilita un reenvio.
+    notify_pending = set(_NOTIFY_DISPATCHER.pending_keys()) if _NOTIFY_DISPATCHER is not None else set()
+    _drain_notification_results(state, cycle_metrics)
+    _sync_telegram_photo_cache(state)
     cal = precision_cfg.get("quality_calibration", {})
     if isinstance(cal, dict):
         logging.debug(
@@ -4418,16 +5975,60 @@ def run_scan_cycle(cfg: Dict[str, Any], state: Dict[str, Any]) -> Tuple[Dict[str
     mtf_cache: Dict[str, Dict[str, Any]] = {}
     structural_context_cache: Dict[str, str] = {}
     structural_state_cache: Dict[str, Dict[str, Any]] = {}
-
-    def _timed_send(channel: str, fn, *args, **kwargs) -> Tuple[bool, str]:
-        started = time.perf_counter()
-        ok, err = fn(*args, **kwargs)
-        elapsed_ms = (time.perf_counter() - started) * 1000.0
-        _record_notification_metrics(cycle_metrics, channel, bool(ok), elapsed_ms)
-        return ok, err
+    fetch_cache = _new_fetch_cache()
+    candle_store = _candle_store_from_cfg(cfg)
+    if candle_store is not None:
+        candle_store.reset_stats()
+    streaming_cfg = _resolve_streaming_indicators_cfg(cfg)
+    if streaming_cfg["enabled"]:
+        reset_indicator_stats()
+
+    market_open_by_key = {item.state_key: _market_open(item.kind) for item in watchlist}
+
+    def _needs_eval(record_key: str) -> bool:
+        # En pasadas de seguimiento solo se recalculan registros con alertas abiertas.
+        return not outcome_only or bool(_normalize_record_open_alerts(symbols_state.get(record_key, {})))
+
+    parallel_cfg = _resolve_parallel_fetch_cfg(cfg)
+    use_eval_cache = _eval_cache_enabled(cfg) and not outcome_only
+    prefetched_estados: Dict[str, Tuple[Dict[str, Any] | None, str, str, Dict[str, Any], str, bool]] = {}
+    if parallel_cfg["enabled"] and not compact_mode:
+        # Descarga + estado de todos los registros en paralelo; el resto del ciclo
+        # (filtros, alertas, estado) sigue en orden de watchlist.
+        prefetch_tasks: List[Tuple[str, MarketItem, str, str]] = []
+        context_fetches: List[Tuple[MarketItem, str, str, bool, int]] = []
+        for item in watchlist:
+            if not market_open_by_key.get(item.state_key, False):
+                continue
+            for target in scan_targets:
+                target_mode, target_interval, _, record_key = _scan_target_parts(item, target)
+                if _needs_eval(record_key):
+                    prefetch_tasks.append((record_key, item, target_mode, target_interval))
+                    if not outcome_only:
+                        context_fetches.extend(_context_fetch_specs(item, target_mode, target_interval, precision_cfg))
+        prefetch_started = time.perf_counter()
+        batch_stats: Dict[str, Any] = {"batched_frames": 0}
+        prefetched_estados = _compute_estados_parallel(
+            prefetch_tasks,
+            cfg=cfg,
+            fetch_cache=fetch_cache,
+            max_workers=int(parallel_cfg["max_workers"]),
+            use_eval_cache=use_eval_cache,
+            batch_cfg=_resolve_batch_indicators_cfg(cfg),
+            stats=batch_stats,
+            context_fetches=context_fetches,
+        )
+        cycle_metrics["parallel_fetch"] = {
+            "enabled": True,
+            "workers": min(int(parallel_cfg["max_workers"]), len(prefetch_tasks) + len(context_fetches)),
+            "records": len(prefetch_tasks),
+            "context_fetches": len(context_fetches),
+            "batched_frames": int(batch_stats["batched_frames"]),
+            "wall_ms": round((time.perf_counter() - prefetch_started) * 1000.0, 3),
+        }
 
     for item in watchlist:
-        if not _market_open(item.kind):
+        if not market_open_by_key.get(item.state_key, False):
             logging.debug("[%s] Mercado cerrado, se omite ciclo.", item.state_key)
             for target in scan_targets:
                 record_key = f"{item.state_key}|{target['key']}"
@@ -4440,10 +6041,9 @@ def run_scan_cycle(cfg: Dict[str, Any], state: Dict[str, Any]) -> Tuple[Dict[str
             continue
 
         for target in scan_targets:
-            target_mode = str(target.get("mode", "tendencial")).strip().lower()
-            target_interval = str(target.get("interval", "15m")).strip()
-            target_key = str(target.get("key", target_interval)).strip().lower() or target_interval.lower()
-            record_key = f"{item.state_key}|{target_key}"
+            target_mode, target_interval, target_key, record_key = _scan_target_parts(item, target)
+            if not _needs_eval(record_key):
+                continue
             cycle_metrics["records_total"] = int(cycle_metrics.get("records_total", 0) or 0) + 1
             record_eval_started = time.perf_counter()
 
@@ -4452,12 +6052,18 @@ def run_scan_cycle(cfg: Dict[str, Any], state: Dict[str, Any]) -> Tuple[Dict[str
             record["market_open"] = True
             record["scan_target"] = target.get("label", target_interval)
 
-            estado, source, compute_err, compute_ctx = _compute_estado(
-                item=item,
-                cfg=cfg,
-                forced_mode=target_mode,
-                forced_interval=target_interval if target_mode != "estructural" else None,
-            )
+            prefetched = prefetched_estados.pop(record_key, None)
+            if prefetched is None:
+                prefetched = _evaluate_record_estado(
+                    item=item,
+                    cfg=cfg,
+                    forced_mode=target_mode,
+                    forced_interval=target_interval if target_mode != "estructural" else None,
+                    fetch_cache=fetch_cache,
+                    record_key=record_key,
+                    use_eval_cache=use_eval_cache,
+                )
+            estado, source, compute_err, compute_ctx, bar_fingerprint, estado_reused = prefetched
             if estado is None:
                 record["last_error"] = _redact_text(compute_err or "No se pudo calcular estado.")
                 symbols_state[record_key] = record
@@ -4467,18 +6073,51 @@ def run_scan_cycle(cfg: Dict[str, Any], state: Dict[str, Any]) -> Tuple[Dict[str
                 logging.warning("[%s|%s] Error de datos/estado: %s", item.state_key, target_key, record["last_error"])
                 continue
 
-            _evaluate_open_alert_outcome(record=record, estado=estado, compute_ctx=compute_ctx)
-            precision = _apply_precision_filters(
-                item=item,
-                cfg=cfg,
-                estado=estado,
-                compute_ctx=compute_ctx,
-                mtf_cache=mtf_cache,
-                structural_cache=structural_state_cache,
-                precision_cfg=precision_cfg,
-                record=record,
-                record_key=record_key,
-            )
+            if _evaluate_open_alert_outcome(record=record, estado=estado, compute_ctx=compute_ctx):
+                _bump_quality_epoch(state, record_key)
+            if outcome_only:
+                record["last_error"] = ""
+                symbols_state[record_key] = record
+                cycle_metrics["records_success"] = int(cycle_metrics.get("records_success", 0) or 0) + 1
+                _observe_latency(cycle_metrics.get("latency_ms", {}).get("record_eval", {}), (time.perf_counter() - record_eval_started) * 1000.0)
+                continue
+            eval_metrics = cycle_metrics.setdefault("eval_cache", {})
+            cached_eval = _RECORD_EVAL_CACHE.get(record_key) if use_eval_cache else None
+            precision_fingerprint = _precision_fingerprint(bar_fingerprint, precision_cfg, record, state) if use_eval_cache else ""
+            if estado_reused and isinstance(cached_eval, dict) and cached_eval.get("precision_fp") == precision_fingerprint:
+                # Misma vela cerrada y misma calibracion: se reutiliza estado + filtros del ciclo previo.
+                estado = copy.deepcopy(cached_eval["estado_post"])
+                precision = copy.deepcopy(cached_eval["precision"])
+                eval_metrics["reused"] = int(eval_metrics.get("reused", 0) or 0) + 1
+            else:
+                estado_pristine = copy.deepcopy(estado) if use_eval_cache else None
+                precision = _apply_precision_filters(
+                    item=item,
+                    cfg=cfg,
+                    estado=estado,
+                    compute_ctx=compute_ctx,
+                    mtf_cache=mtf_cache,
+                    structural_cache=structural_state_cache,
+                    precision_cfg=precision_cfg,
+                    record=record,
+                    record_key=record_key,
+                    fetch_cache=fetch_cache,
+                )
+                if use_eval_cache and _precision_is_partial(precision):
+                    _RECORD_EVAL_CACHE.pop(record_key, None)
+                elif use_eval_cache:
+                    _RECORD_EVAL_CACHE[record_key] = {
+                        "bar_fp": bar_fingerprint,
+                        "estado": estado_pristine,
+                        "source": source,
+                        "ctx": compute_ctx,
+                        "precision_fp": precision_fingerprint,
+                        "precision": copy.deepcopy(precision),
+                        "estado_post": copy.deepcopy(estado),
+                    }
+                if estado_reused:
+                    eval_metrics["estado_reused"] = int(eval_metrics.get("estado_reused", 0) or 0) + 1
+                eval_metrics["recomputed"] = int(eval_metrics.get("recomputed", 0) or 0) + 1
             signal_ready = bool(precision.get("signal_ready", False))
             signal_bar_utc = str(estado.get("indice_alerta_utc", "")).strip()
             prev_gate_bar = str(record.get("last_gate_bar_utc", "")).strip()
@@ -4533,18 +6172,27 @@ def run_scan_cycle(cfg: Dict[str, Any], state: Dict[str, Any]) -> Tuple[Dict[str
             estado["quality_accuracy_pct"] = quality_stats.get("accuracy_pct", 0.0)
             estado["quality_resolved_alerts"] = int(quality_stats.get("resolved", 0) or 0)
 
-            if _should_alert(
+            should_alert = _should_alert(
                 record=record,
                 signal_ready=signal_ready,
                 cooldown_minutes=int(precision.get("cooldown_minutes", cfg.get("cooldown_minutes", 60))),
                 persistence_bars=int(precision.get("persistence_bars", persistence_bars)),
-            ):
+            )
+            deferred = should_alert and record_key in notify_pending
+            if deferred:
+                # La alerta previa de este registro sigue en cola: no se duplica el envio. `dorado_active` queda
+                # como estaba para que el siguiente ciclo la vuelva a disparar.
+                dispatcher_metrics = cycle_metrics.setdefault("notify_dispatcher", {})
+                dispatcher_metrics["deferred"] = int(dispatcher_metrics.get("deferred", 0) or 0) + 1
+                should_alert = False
+            if should_alert:
                 cycle_metrics["alerts_triggered"] = int(cycle_metrics.get("alerts_triggered", 0) or 0) + 1
                 structural_context_label = _resolve_structural_context_label(
                     item=item,
                     estado=estado,
                     cfg=cfg,
                     cache=structural_context_cache,
+                    fetch_cache=fetch_cache,
                 )
                 estado["contexto_estructural"] = structural_context_label
                 subject, body = _build_alert_payload(
@@ -4554,201 +6202,35 @@ def run_scan_cycle(cfg: Dict[str, Any], state: Dict[str, Any]) -> Tuple[Dict[str
                     source,
                     structural_context_label=structural_context_label,
                 )
-                notify_status: Dict[str, Any] = {}
-                sent_any = False
-                errors: List[str] = []
-                enabled_any = False
-                replacement_telegram_chat_ids: List[str] = []
                 temporalidad = str(estado.get("temporalidad_alerta", target_interval)).strip()
-                market_key = f"{item.market}|{item.label}|{temporalidad}"
-                telegram_enabled = _channel_enabled(cfg, "telegram", default=True)
-
-                if user_targets:
-                    user_results: List[Dict[str, Any]] = []
-                    premium_users_alerted = False
-                    eligible_users = 0
-
-                    email_enabled = _channel_enabled(cfg, "email", default=True)
-                    windows_enabled = _channel_enabled(cfg, "windows", default=True)
-
-                    if telegram_enabled:
-                        enabled_any = True
-                    if email_enabled:
-                        enabled_any = True
-                    if windows_enabled:
-                        enabled_any = True
-
-                    for target_user in user_targets:
-                        user_id = target_user["id"]
-                        chat_id = target_user["chat_id"]
-                        email = target_user.get("email", "")
-                        is_premium = bool(target_user.get("es_premium", False))
-
-                        if not is_premium and not _free_user_can_receive_market_alert(state, user_id, market_key):
-                            continue
-
-                        eligible_users += 1
-                        user_notified = False
-                        user_errors: List[str] = []
-
-                        if telegram_enabled and _chat_id_telegram_valido(chat_id):
-                            sent_ok, sent_err = _timed_send(
-                                "telegram",
-                                _send_telegram_alert,
-                                cfg,
-                                subject,
-                                body,
-                                chat_ids_override=[chat_id],
-                                item=item,
-                            )
-                            if sent_ok:
-                                user_notified = True
-                                sent_any = True
-                                replacement_telegram_chat_ids.append(chat_id)
-                            else:
-                                user_errors.append(f"telegram: {sent_err}")
-
-                        if is_premium and email_enabled and email:
-                            sent_ok, sent_err = _timed_send(
-                                "email",
-                                _send_email_alert,
-                                cfg,
-                                item,
-                                subject,
-                                body,
-                                recipients_override=[email],
-                            )
-                            if sent_ok:
-                                user_notified = True
-                                sent_any = True
-                            else:
-                                user_errors.append(f"email: {sent_err}")
-
-                        if user_notified and is_premium:
-                            premium_users_alerted = True
-
-                        if user_notified and not is_premium:
-                            _mark_free_user_market_alert(state, user_id, market_key)
-
-                        user_results.append(
-                            {
-                                "user_id": user_id,
-                                "premium": is_premium,
-                                "ok": user_notified,
-                                "error": "; ".join(user_errors),
-                            }
-                        )
-                        if user_errors and not user_notified:
-                            errors.append(f"{user_id}: {'; '.join(user_errors)}")
-
-                    notify_status["users"] = user_results
-                    known_user_chat_ids = _dedupe_chat_ids([t.get("chat_id", "") for t in user_targets])
-                    broadcast_extra_chat_ids = [cid for cid in telegram_broadcast_ids if cid not in set(known_user_chat_ids)]
-                    if telegram_enabled and broadcast_extra_chat_ids:
-                        sent_ok, sent_err = _timed_send(
-                            "telegram",
-                            _send_telegram_alert,
-                            cfg,
-                            subject,
-                            body,
-                            chat_ids_override=broadcast_extra_chat_ids,
-                            item=item,
-                        )
-                        notify_status["telegram_broadcast"] = {
-                            "ok": sent_ok,
-                            "error": sent_err,
-                            "sent_to": len(broadcast_extra_chat_ids),
-                        }
-                        if sent_ok:
-                            sent_any = True
-                            replacement_telegram_chat_ids.extend(broadcast_extra_chat_ids)
-                        else:
-                            errors.append(f"telegram_broadcast: {sent_err}")
-
-                    if eligible_users == 0:
-                        errors.append("Sin usuarios elegibles con Telegram para esta alerta.")
-
-                    if windows_enabled:
-                        if premium_users_alerted:
-                            sent_ok, sent_err = _timed_send("windows", _send_windows_toast, subject, body)
-                            notify_status["windows"] = {"ok": sent_ok, "error": sent_err}
-                            if sent_ok:
-                                sent_any = True
-                            else:
-                                errors.append(f"windows: {sent_err}")
-                        else:
-                            notify_status["windows"] = {
-                                "ok": False,
-                                "error": "Sin usuarios premium alertados en este evento.",
-                            }
-                else:
-                    if _channel_enabled(cfg, "email", default=True):
-                        enabled_any = True
-                        sent_ok, sent_err = _timed_send("email", _send_email_alert, cfg, item, subject, body)
-                        notify_status["email"] = {"ok": sent_ok, "error": sent_err}
-                        if sent_ok:
-                            sent_any = True
-                        else:
-                            errors.append(f"email: {sent_err}")
-
-                    if telegram_enabled:
-                        enabled_any = True
-                        sent_ok, sent_err = _timed_send(
-                            "telegram",
-                            _send_telegram_alert,
-                            cfg,
-                            subject,
-                            body,
-                            chat_ids_override=telegram_broadcast_ids or None,
-                            item=item,
-                        )
-                        notify_status["telegram"] = {"ok": sent_ok, "error": sent_err}
-                        if sent_ok:
-                            sent_any = True
-                            replacement_telegram_chat_ids.extend(telegram_broadcast_ids)
-                        else:
-                            errors.append(f"telegram: {sent_err}")
-
-                    if _channel_enabled(cfg, "windows", default=True):
-                        enabled_any = True
-                        sent_ok, sent_err = _timed_send("windows", _send_windows_toast, subject, body)
-                        notify_status["windows"] = {"ok": sent_ok, "error": sent_err}
-                        if sent_ok:
-                            sent_any = True
-                        else:
-                            errors.append(f"windows: {sent_err}")
-
-                    if not enabled_any:
-                        errors.append("No hay canales habilitados en notification.")
-
-                record["last_notify"] = notify_status
-                if sent_any:
-                    cycle_metrics["alerts_sent"] = int(cycle_metrics.get("alerts_sent", 0) or 0) + 1
-                    record["last_alert_utc"] = _now_iso_utc()
-                    _increment_daily_alert_count(record)
-                    snapshot = _open_alert_snapshot(
+                batch = _build_alert_delivery(
+                    cfg,
+                    item,
+                    subject,
+                    body,
+                    state=state,
+                    record=record,
+                    record_key=record_key,
+                    target_key=target_key,
+                    market_key=f"{item.market}|{item.label}|{temporalidad}",
+                    user_targets=user_targets,
+                    telegram_broadcast_ids=telegram_broadcast_ids,
+                    snapshot=_open_alert_snapshot(
                         estado=estado,
                         precision=precision,
                         compute_ctx=compute_ctx,
                         precision_cfg=precision_cfg,
                         record_key=record_key,
-                    )
-                    if snapshot is not None:
-                        open_alerts = _normalize_record_open_alerts(record, record_key=record_key)
-                        open_alerts.append(snapshot)
-                        _set_record_open_alerts(record, open_alerts)
-                    logging.info("[%s|%s] Alerta enviada (multicanal).", item.state_key, target_key)
-                else:
-                    cycle_metrics["alerts_failed"] = int(cycle_metrics.get("alerts_failed", 0) or 0) + 1
-                    record["last_error"] = _redact_text("; ".join(errors))
-                    cycle_metrics.setdefault("errors", []).append(f"{record_key}: {record['last_error']}")
-                    logging.error("[%s|%s] Fallo envio alerta: %s", item.state_key, target_key, record["last_error"])
+                    ),
+                )
+                _dispatch_alert_delivery(state, batch, cycle_metrics)
 
-            record["dorado_active"] = _compute_dorado_active_state(
-                signal_ready=signal_ready,
-                current_streak=current_streak,
-                persistence_bars=int(precision.get("persistence_bars", persistence_bars)),
-            )
+            if not deferred:
+                record["dorado_active"] = _compute_dorado_active_state(
+                    signal_ready=signal_ready,
+                    current_streak=current_streak,
+                    persistence_bars=int(precision.get("persistence_bars", persistence_bars)),
+                )
             record["last_source"] = source
             record["decision"] = estado.get("decision", "")
             record["riesgo"] = estado.get("riesgo", "")
@@ -4765,6 +6247,27 @@ def run_scan_cycle(cfg: Dict[str, Any], state: Dict[str, Any]) -> Tuple[Dict[str
             if compact_mode and int(cycle_metrics.get("records_total", 0) or 0) % 8 == 0:
                 _compact_memory_sweep()
 
+    _drain_notification_results(state, cycle_metrics)
+    cycle_metrics["telegram_photo_cache"] = _sync_telegram_photo_cache(state, reset_stats=True)
+    if _TELEGRAM_TRANSPORT is not None:
+        cycle_metrics["telegram_transport"] = _TELEGRAM_TRANSPORT[1].stats()
+    if _SMTP_TRANSPORT is not None:
+        cycle_metrics["smtp_transport"] = _SMTP_TRANSPORT[1].stats()
+    if _NOTIFY_DISPATCHER is not None:
+        cycle_metrics["notify_dispatcher"] = {
+            **cycle_metrics.get("notify_dispatcher", {}),
+            "enabled": True,
+            **_NOTIFY_DISPATCHER.stats(),
+        }
+    cycle_metrics["fetch_cache"] = _fetch_cache_stats(fetch_cache)
+    if candle_store is not None:
+        cycle_metrics["candle_store"] = {"enabled": True, **candle_store.stats()}
+    if streaming_cfg["enabled"]:
+        cycle_metrics["streaming_indicators"] = {"enabled": True, **indicator_stats()}
+    if _BINANCE_FEED is not None:
+        cycle_metrics["binance_stream"] = _BINANCE_FEED.stats()
+    cycle_metrics["http_pool"] = http_pool.stats()
+    fetch_cache["entries"].clear()
     if compact_mode:
         _compact_memory_sweep()
     rss_end = _current_process_rss_mb()
@@ -4782,6 +6285,10 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--health", default=str(DEFAULT_HEALTH_PATH), help="Ruta al scanner_health.json")
     parser.add_argument("--once", action="store_true", help="Ejecuta un solo ciclo y termina.")
     parser.add_argument("--debug", action="store_true", help="Activa logs DEBUG.")
+    parser.add_argument("--replay", default="", help="Directorio de velas grabadas (formato candle_store) para replay.")
+    parser.add_argument("--from", dest="replay_from", default="", help="Inicio del replay (UTC, ISO).")
+    parser.add_argument("--to", dest="replay_to", default="", help="Fin del replay (UTC, ISO).")
+    parser.add_argument("--replay-report", default="", help="JSON de salida con reporte y estado final del replay.")
     return parser.parse_args()
 
 
@@ -4795,6 +6302,11 @@ def main() -> int:
     health_path.parent.mkdir(parents=True, exist_ok=True)
 
     _setup_logging(log_path, debug=bool(args.debug))
+    if args.replay:
+        # scanner_replay importa este modulo: se le pasa el que esta corriendo para no cargarlo dos veces.
+        import scanner_replay
+
+        return scanner_replay.main_from_args(args, worker=sys.modules[__name__])
     lock_ok, lock_msg = _acquire_single_instance_lock(LOCK_PATH)
     if not lock_ok:
         logging.warning(lock_msg)
@@ -4803,14 +6315,17 @@ def main() -> int:
 
     try:
         cfg = load_config(config_path)
-        state = load_state(state_path)
+        _apply_endpoints_cfg(cfg)
+        _apply_http_pool_cfg(cfg)
+        state_store = _open_state_store(cfg, state_path)
+        state = load_state(state_path, state_store)
         health = load_health(health_path)
         health["pid"] = os.getpid()
         health["started_utc"] = _iso_utc_now()
         health["started_epoch"] = time.time()
         health["paths"] = {
             "config": str(config_path),
-            "state": str(state_path),
+            "state": str(state_store.path) if state_store is not None else str(state_path),
             "log": str(log_path),
         }
         health["status"] = "starting"
@@ -4818,7 +6333,7 @@ def main() -> int:
 
         if not bool(cfg.get("enabled", True)):
             logging.warning("Scanner deshabilitado en config (enabled=false).")
-            save_state(state_path, state)
+            save_state(state_path, state, state_store)
             health = _update_health_from_cycle(
                 health=health,
                 cycle_metrics=_new_cycle_metrics(),
@@ -4830,13 +6345,30 @@ def main() -> int:
             return 0
 
         poll_interval = max(10, int(cfg.get("poll_interval_sec", 60)))
+        if not args.once:
+            _start_binance_feed(cfg)
+            _start_notify_dispatcher(cfg)
+        scheduler_cfg = _resolve_scheduler_cfg(cfg)
+        scheduler: BarCloseScheduler | None = None
+        if scheduler_cfg["mode"] == "bar_close" and not args.once:
+            scheduler = BarCloseScheduler(
+                _resolve_scan_targets(_apply_resource_profile(cfg)),
+                grace_seconds=int(_resolve_precision_cfg(cfg).get("closed_candle_grace_sec", 10)),
+            )
+            logging.info(
+                "Scheduler por cierre de vela activo (seguimiento de alertas cada %ss).",
+                scheduler_cfg["outcome_interval_sec"],
+            )
+        next_outcome_at = time.time() + float(scheduler_cfg["outcome_interval_sec"])
+        due_targets: set[str] | None = None
+        outcome_only = False
 
         while True:
             cycle_start = time.time()
             cycle_metrics = _new_cycle_metrics()
             try:
-                state, cycle_metrics = run_scan_cycle(cfg, state)
-                save_state(state_path, state)
+                state, cycle_metrics = run_scan_cycle(cfg, state, due_targets=due_targets, outcome_only=outcome_only)
+                cycle_metrics["state_store"] = save_state(state_path, state, state_store)
                 health = _update_health_from_cycle(health=health, cycle_metrics=cycle_metrics, cycle_ok=True, cycle_error="")
                 save_health(health_path, health)
                 logging.info(
@@ -4864,10 +6396,39 @@ def main() -> int:
             if args.once:
                 break
 
-            elapsed = time.time() - cycle_start
-            sleep_sec = max(1, poll_interval - int(elapsed))
-            time.sleep(sleep_sec)
+            if scheduler is None:
+                elapsed = time.time() - cycle_start
+                sleep_sec = max(1, poll_interval - int(elapsed))
+                time.sleep(sleep_sec)
+                continue
 
+            # Duerme hasta el proximo cierre de vela (o el seguimiento de alertas abiertas),
+            # con heartbeat al menos cada poll_interval para check_scanner_health.
+            while True:
+                now = time.time()
+                wake_at = min(scheduler.next_due(), next_outcome_at, now + poll_interval)
+                if wake_at > now:
+                    time.sleep(max(0.5, wake_at - now))
+                now = time.time()
+                due_targets = scheduler.pop_due(now)
+                if due_targets:
+                    outcome_only = False
+                    break
+                if now >= next_outcome_at:
+                    due_targets = None
+                    outcome_only = True
+                    break
+                health["last_heartbeat_utc"] = _iso_utc_now()
+                save_health(health_path, health)
+            if outcome_only:
+                next_outcome_at = now + float(scheduler_cfg["outcome_interval_sec"])
+
+        _stop_binance_feed()
+        pending_batches = _stop_notify_dispatcher(_resolve_notify_dispatcher_cfg(cfg)["flush_timeout_sec"])
+        if pending_batches:
+            _drain_notification_results(state, _new_cycle_metrics(), pending_batches)
+            save_state(state_path, state, state_store)
+        _close_smtp_transport()
         health["status"] = "stopped"
         health["last_heartbeat_utc"] = _iso_utc_now()
         save_health(health_path, health)
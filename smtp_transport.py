@@ -0,0 +1,233 @@
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_TIMEOUT_SEC = 20.0
+DEFAULT_IDLE_TIMEOUT_SEC = 60.0
+DEFAULT_MAX_SESSIONS = 4
+# Gmail y la mayoria de los relays cortan la sesion tras ~100 mensajes.
+DEFAULT_MAX_MESSAGES_PER_SESSION = 100
+
+
+def _is_connection_error(exc: BaseException) -> bool:
+    """Falla de la sesion (no del mensaje): conviene reabrir y reintentar."""
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException):
+        # 421 = el servidor cierra el canal (timeout, limite de mensajes por sesion).
+        return exc.smtp_code == 421
+    # SMTPException hereda de OSError: rechazos de destinatario/remitente no son fallas de conexion.
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+def _rejected_before_data(exc: BaseException) -> bool:
+    """421 al MAIL FROM (limite de mensajes por sesion, timeout): el servidor no recibio el mensaje."""
+    return isinstance(exc, smtplib.SMTPSenderRefused) and exc.smtp_code == 421
+
+
+def _noop_ok(smtp: Any) -> bool:
+    try:
+        return smtp.noop()[0] == 250
+    except Exception:
+        return False
+
+
+def _quit(smtp: Any) -> None:
+    try:
+        smtp.quit()
+    except Exception:
+        try:
+            smtp.close()
+        except Exception:
+            pass
+
+
+class _Session:
+    __slots__ = ("smtp", "last_used", "messages")
+
+    def __init__(self, smtp: Any) -> None:
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.messages = 0
+
+
+class SmtpTransport:
+    """Sesiones SMTP autenticadas (EHLO/STARTTLS/login una vez) reutilizadas entre envios.
+
+    Hasta `max_sessions` envios en paralelo, cada uno con su sesion; el resto espera una libre. Una sesion
+    reutilizada se prueba con NOOP y, si cayo, se reabre antes de enviar. Un corte durante el envio no se
+    reintenta (el servidor pudo haber aceptado el DATA y el correo saldria dos veces); solo un 421 al MAIL FROM
+    se reintenta una vez en otra sesion. Las sesiones sin uso por `idle_timeout_sec` se cierran con QUIT.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        timeout: float = DEFAULT_TIMEOUT_SEC,
+        idle_timeout_sec: float = DEFAULT_IDLE_TIMEOUT_SEC,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        max_messages_per_session: int = DEFAULT_MAX_MESSAGES_PER_SESSION,
+        smtp_factory: Optional[Callable[..., Any]] = None,
+    ) -> None:
+        self.host = host
+        self.port = int(port)
+        self.user = user
+        self.password = password
+        self.timeout = max(1.0, float(timeout))
+        self.idle_timeout_sec = max(0.1, float(idle_timeout_sec))
+        self.max_sessions = max(1, int(max_sessions))
+        self.max_messages_per_session = max(1, int(max_messages_per_session))
+        self._factory = smtp_factory or smtplib.SMTP
+        self._slots = threading.BoundedSemaphore(self.max_sessions)
+        self._lock = threading.Lock()
+        self._idle: List[_Session] = []
+        self._busy = 0
+        self._reaper: Optional[threading.Timer] = None
+        self._stats: Dict[str, Any] = {
+            "sent": 0,
+            "failed": 0,
+            "reused": 0,
+            "sessions_opened": 0,
+            "sessions_closed": 0,
+            "idle_closed": 0,
+            "reconnects": 0,
+            "login_ms": 0.0,
+        }
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def _open(self) -> _Session:
+        started = time.perf_counter()
+        smtp = self._factory(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.port == 587:
+                smtp.starttls()
+                smtp.ehlo()
+            smtp.login(self.user, self.password)
+        except Exception:
+            _quit(smtp)
+            raise
+        self._count("sessions_opened")
+        self._count("login_ms", (time.perf_counter() - started) * 1000.0)
+        return _Session(smtp)
+
+    def _close(self, session: _Session, idle: bool = False) -> None:
+        _quit(session.smtp)
+        self._count("idle_closed" if idle else "sessions_closed")
+
+    def _checkout(self) -> Optional[_Session]:
+        now = time.monotonic()
+        stale: List[_Session] = []
+        session = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if now - candidate.last_used > self.idle_timeout_sec:
+                    stale.append(candidate)
+                    continue
+                session = candidate
+                break
+            self._busy += 1
+        for old in stale:
+            self._close(old, idle=True)
+        return session
+
+    def _release(self, session: Optional[_Session]) -> None:
+        if session is not None and session.messages >= self.max_messages_per_session:
+            self._close(session)
+            session = None
+        with self._lock:
+            self._busy -= 1
+            if session is None:
+                return
+            session.last_used = time.monotonic()
+            self._idle.append(session)
+            if self._reaper is None:
+                self._reaper = threading.Timer(self.idle_timeout_sec, self._reap)
+                self._reaper.daemon = True
+                self._reaper.start()
+
+    def _reap(self) -> None:
+        with self._lock:
+            self._reaper = None
+        self.close_idle()
+        with self._lock:
+            if self._idle and self._reaper is None:
+                # Quedan sesiones usadas hace menos de `idle_timeout_sec`: se revisan de nuevo al vencer la mas nueva.
+                newest = max(session.last_used for session in self._idle)
+                delay = max(0.05, newest + self.idle_timeout_sec - time.monotonic())
+                self._reaper = threading.Timer(delay, self._reap)
+                self._reaper.daemon = True
+                self._reaper.start()
+
+    def send(self, msg: EmailMessage) -> None:
+        """Envia por una sesion del pool (abre una si no hay). Propaga la excepcion de smtplib si falla."""
+        if not self._slots.acquire(timeout=self.timeout):
+            self._count("failed")
+            raise smtplib.SMTPException(f"Sin sesion SMTP libre en {self.timeout:g}s.")
+        session = self._checkout()
+        try:
+            if session is not None and not _noop_ok(session.smtp):
+                # El servidor corto la sesion ociosa: se reabre sin haber mandado nada del mensaje.
+                self._close(session)
+                session = None
+                self._count("reconnects")
+            reused = session is not None
+            for attempt in range(2):
+                sending = False
+                try:
+                    if session is None:
+                        session = self._open()
+                    sending = True
+                    session.smtp.send_message(msg)
+                    session.messages += 1
+                    self._count("sent")
+                    if reused and attempt == 0:
+                        self._count("reused")
+                    return
+                except Exception as exc:
+                    if _is_connection_error(exc) and session is not None:
+                        self._close(session)
+                        session = None
+                    retry = _rejected_before_data(exc) if sending else _is_connection_error(exc)
+                    if not retry or attempt:
+                        self._count("failed")
+                        raise
+                    self._count("reconnects")
+        finally:
+            self._release(session)
+            self._slots.release()
+
+    def close_idle(self, max_idle_sec: Optional[float] = None) -> int:
+        """Cierra las sesiones libres sin uso por mas de `max_idle_sec` (default `idle_timeout_sec`)."""
+        limit = self.idle_timeout_sec if max_idle_sec is None else max(0.0, float(max_idle_sec))
+        now = time.monotonic()
+        with self._lock:
+            stale = [session for session in self._idle if now - session.last_used >= limit]
+            self._idle = [session for session in self._idle if session not in stale]
+        for session in stale:
+            self._close(session, idle=True)
+        return len(stale)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+        self.close_idle(0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+            out["login_ms"] = round(float(out["login_ms"]), 3)
+            out["open"] = len(self._idle) + self._busy
+            out["idle"] = len(self._idle)
+            return out
@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from state_store import history_fingerprint
+
+DEFAULT_COMPACT_BYTES = 4 * 1024 * 1024
+DEFAULT_COMPACT_EVERY = 500
+
+
+def _file_mode(path: Path) -> int:
+    """Permisos del archivo que se reemplaza; si no existe, los de un archivo nuevo (0666 menos umask)."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def write_json_atomic(path: Path, payload: Any, indent: int | None = 2) -> int:
+    """Escribe en un temporal del mismo directorio y lo renombra: un corte a mitad no deja el archivo truncado."""
+    path = Path(path)
+    text = json.dumps(payload, ensure_ascii=False, indent=indent)
+    data = text.encode("utf-8")
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        # mkstemp crea el temporal con 0600; se conservan los permisos del archivo que se reemplaza.
+        os.chmod(tmp_name, _file_mode(path))
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+    return len(data)
+
+
+def journal_path_for(state_path: Path) -> Path:
+    state_path = Path(state_path)
+    return state_path.with_name(f"{state_path.stem}.journal.jsonl")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _record_fingerprint(record: Any) -> str:
+    if not isinstance(record, dict):
+        return _dumps(record)
+    history = record.get("quality_history")
+    if not isinstance(history, list):
+        return _dumps(record)
+    core = {key: value for key, value in record.items() if key != "quality_history"}
+    return _dumps(core) + history_fingerprint(history)
+
+
+def _apply_entry(state: Dict[str, Any], entry: Dict[str, Any]) -> None:
+    symbols = state.setdefault("symbols", {})
+    if not isinstance(symbols, dict):
+        symbols = {}
+        state["symbols"] = symbols
+    symbols.update(entry.get("records", {}) or {})
+    for key in entry.get("deleted", []) or []:
+        symbols.pop(key, None)
+    state.update(entry.get("top", {}) or {})
+    for key in entry.get("top_deleted", []) or []:
+        state.pop(key, None)
+
+
+def replay(state_path: Path, fallback: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Snapshot + entradas del journal. Devuelve (estado, entradas aplicadas); ignora una ultima linea cortada."""
+    state_path = Path(state_path)
+    state = fallback
+    if state_path.exists():
+        payload = json.loads(state_path.read_text(encoding="utf-8-sig"))
+        if isinstance(payload, dict):
+            state = payload
+    journal = journal_path_for(state_path)
+    applied = 0
+    if not journal.exists():
+        return state, applied
+    with journal.open("r", encoding="utf-8") as handle:
+        lines = handle.readlines()
+    for pos, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            if pos == len(lines) - 1:
+                logging.warning("Journal de estado con ultima linea incompleta (%s); se descarta.", journal)
+            else:
+                logging.error("Journal de estado con linea %s invalida (%s); se omite.", pos + 1, journal)
+            continue
+        if isinstance(entry, dict):
+            _apply_entry(state, entry)
+            applied += 1
+    return state, applied
+
+
+class StateJournal:
+    """Estado en `scanner_state.json` (snapshot) + journal JSONL solo-agregar con los registros que cambiaron.
+
+    Cada `save` agrega una linea con los registros y claves de nivel superior modificados desde la
+    ultima carga/escritura. Al superar `compact_bytes` o `compact_every` entradas se reescribe el
+    snapshot (atomico) y se vacia el journal.
+    """
+
+    def __init__(
+        self,
+        state_path: Path,
+        compact_bytes: int = DEFAULT_COMPACT_BYTES,
+        compact_every: int = DEFAULT_COMPACT_EVERY,
+    ) -> None:
+        self.path = Path(state_path)
+        self.journal_path = journal_path_for(self.path)
+        self.compact_bytes = max(0, int(compact_bytes))
+        self.compact_every = max(1, int(compact_every))
+        self._lock = threading.Lock()
+        self._records: Dict[str, str] = {}
+        self._top: Dict[str, str] = {}
+        self._entries = 0
+        self._loaded = False
+        self.last_save: Dict[str, Any] = {"records_written": 0, "records_deleted": 0, "bytes_written": 0, "compacted": False}
+
+    def is_empty(self) -> bool:
+        return not self.path.exists() and not self.journal_path.exists()
+
+    def load(self) -> Dict[str, Any]:
+        with self._lock:
+            state, self._entries = replay(self.path, {"symbols": {}})
+            self._remember(state)
+            self._loaded = True
+            return state
+
+    def _remember(self, state: Dict[str, Any]) -> None:
+        symbols = state.get("symbols", {}) if isinstance(state.get("symbols"), dict) else {}
+        self._records = {str(key): _record_fingerprint(record) for key, record in symbols.items()}
+        self._top = {str(key): _dumps(value) for key, value in state.items() if key != "symbols"}
+
+    def _diff(self, state: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str], Dict[str, str]]:
+        symbols = state.get("symbols", {}) if isinstance(state.get("symbols"), dict) else {}
+        records_fp = {str(key): _record_fingerprint(record) for key, record in symbols.items()}
+        top_fp = {str(key): _dumps(value) for key, value in state.items() if key != "symbols"}
+        entry: Dict[str, Any] = {
+            "ts": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "records": {key: symbols[key] for key, fp in records_fp.items() if self._records.get(key) != fp},
+            "deleted": sorted(key for key in self._records if key not in records_fp),
+            "top": {key: state[key] for key, fp in top_fp.items() if self._top.get(key) != fp},
+            "top_deleted": sorted(key for key in self._top if key not in top_fp),
+        }
+        return entry, records_fp, top_fp
+
+    def save(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            entry, records_fp, top_fp = self._diff(state)
+            stats = {
+                "records_written": len(entry["records"]),
+                "records_deleted": len(entry["deleted"]),
+                "bytes_written": 0,
+                "compacted": False,
+            }
+            if not self._loaded or not self.path.exists():
+                stats["bytes_written"] = self._compact(state)
+                stats["compacted"] = True
+            elif entry["records"] or entry["deleted"] or entry["top"] or entry["top_deleted"]:
+                line = (_dumps(entry) + "\n").encode("utf-8")
+                with self.journal_path.open("ab") as handle:
+                    handle.write(line)
+                    handle.flush()
+                    os.fsync(handle.fileno())
+                self._entries += 1
+                stats["bytes_written"] = len(line)
+                too_big = self.compact_bytes and self.journal_path.stat().st_size >= self.compact_bytes
+                if too_big or self._entries >= self.compact_every:
+                    stats["bytes_written"] += self._compact(state)
+                    stats["compacted"] = True
+            self._records, self._top = records_fp, top_fp
+            self.last_save = stats
+            return stats
+
+    def _compact(self, state: Dict[str, Any]) -> int:
+        # Snapshot primero: si se corta antes de vaciar el journal, reaplicarlo es idempotente.
+        written = write_json_atomic(self.path, state)
+        with self.journal_path.open("wb") as handle:
+            handle.flush()
+            os.fsync(handle.fileno())
+        self._entries = 0
+        self._loaded = True
+        return written
+
+
+def read_state(state_path: Path) -> Dict[str, Any]:
+    """Snapshot + journal para lectores (app/monitores); {} si no hay estado."""
+    state, _ = replay(Path(state_path), {})
+    return state
+
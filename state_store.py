@@ -0,0 +1,342 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SCHEMA_VERSION = 1
+# Listas por registro que van a su propia tabla; el resto del registro queda como JSON en `records`.
+CHILD_TABLES = {"open_alerts": "open_alerts", "quality_history": "quality_events"}
+FREE_ALERTS_KEY = "free_daily_market_alerts"
+TELEGRAM_LINKS_KEY = "telegram_user_chat_links"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+    key TEXT PRIMARY KEY,
+    market TEXT NOT NULL DEFAULT '',
+    label TEXT NOT NULL DEFAULT '',
+    ticker TEXT NOT NULL DEFAULT '',
+    timeframe TEXT NOT NULL DEFAULT '',
+    last_checked_utc TEXT NOT NULL DEFAULT '',
+    children TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS open_alerts (
+    record_key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    alert_id TEXT NOT NULL DEFAULT '',
+    direction TEXT NOT NULL DEFAULT '',
+    opened_utc TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL,
+    PRIMARY KEY (record_key, seq)
+);
+CREATE TABLE IF NOT EXISTS quality_events (
+    record_key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT '',
+    setup_bucket TEXT NOT NULL DEFAULT '',
+    closed_utc TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL,
+    PRIMARY KEY (record_key, seq)
+);
+CREATE INDEX IF NOT EXISTS quality_events_status ON quality_events (status);
+CREATE TABLE IF NOT EXISTS free_daily_alerts (
+    user_id TEXT NOT NULL,
+    market_key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    PRIMARY KEY (user_id, market_key)
+);
+CREATE TABLE IF NOT EXISTS telegram_links (
+    user_id TEXT PRIMARY KEY,
+    chat_id TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+"""
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def history_fingerprint(history: List[Any]) -> str:
+    # Historial solo-agregar con recorte: largo y extremos bastan para detectar cambios.
+    return _digest(_dumps([len(history), history[:1], history[-1:]]))
+
+
+def _key_parts(record_key: str, record: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    parts = [str(part).strip() for part in str(record_key).split("|")]
+    parts += [""] * (4 - len(parts))
+    timeframe = parts[3] or str(record.get("scan_target") or record.get("analysis_interval") or "")
+    return parts[0], parts[1], parts[2], timeframe
+
+
+class StateStore:
+    """Estado del worker en SQLite (WAL): una fila por registro y tablas para alertas abiertas, eventos de
+    calidad, alertas diarias free y vinculos de Telegram.
+
+    `save` compara huellas con la ultima carga/escritura y solo reescribe lo que cambio, en una
+    transaccion por llamada. Con `readonly=True` la conexion no bloquea al escritor.
+    """
+
+    def __init__(self, path: Path, readonly: bool = False) -> None:
+        self.path = Path(path)
+        self.readonly = bool(readonly)
+        self._lock = threading.Lock()
+        # Huellas de lo ultimo persistido: {(tabla, clave): digest}.
+        self._digests: Dict[Tuple[str, str], str] = {}
+        self.last_save: Dict[str, int] = {"records_written": 0, "records_deleted": 0, "records_unchanged": 0, "bytes_written": 0}
+        if self.readonly:
+            self._conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO meta (key, data) VALUES ('schema_version', ?)", (_dumps(SCHEMA_VERSION),)
+                )
+        self._conn.execute("PRAGMA busy_timeout=5000")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "StateStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM meta WHERE key != 'schema_version'").fetchone()
+            records = self._conn.execute("SELECT COUNT(*) FROM records").fetchone()
+        return not int(row[0]) and not int(records[0])
+
+    def _child_rows(self, record_key: str, fields: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        out: Dict[str, List[Dict[str, Any]]] = {}
+        for field in fields:
+            table = CHILD_TABLES[field]
+            query = f"SELECT data FROM {table} WHERE record_key = ? ORDER BY seq"
+            out[field] = [json.loads(row[0]) for row in self._conn.execute(query, (record_key,))]
+        return out
+
+    def _record(
+        self, key: str, children: str, data: str, child_rows: Dict[str, List[Dict[str, Any]]], fields: Iterable[str]
+    ) -> Dict[str, Any]:
+        record = json.loads(data)
+        for field in filter(None, children.split(",")):
+            if field in fields:
+                record[field] = child_rows.get(field, [])
+        return record
+
+    def records(self, keys: Optional[Iterable[str]] = None, fields: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Registros, todos o solo `keys`, con las listas hijas de `fields` (default: `open_alerts` y `quality_history`).
+
+        Las listas que no se piden no se leen ni aparecen en el registro.
+        """
+        wanted = None if keys is None else [str(key) for key in keys]
+        selected = list(CHILD_TABLES) if fields is None else [field for field in CHILD_TABLES if field in set(fields)]
+        with self._lock:
+            if wanted is None:
+                rows = self._conn.execute("SELECT key, children, data FROM records ORDER BY key").fetchall()
+            else:
+                marks = ",".join("?" for _ in wanted)
+                rows = self._conn.execute(
+                    f"SELECT key, children, data FROM records WHERE key IN ({marks}) ORDER BY key", wanted
+                ).fetchall()
+            children: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+            if wanted is not None:
+                children = {key: self._child_rows(key, selected) for key, _, _ in rows}
+            else:
+                for field in selected:
+                    table = CHILD_TABLES[field]
+                    for record_key, data in self._conn.execute(f"SELECT record_key, data FROM {table} ORDER BY record_key, seq"):
+                        children.setdefault(record_key, {}).setdefault(field, []).append(json.loads(data))
+        return {key: self._record(key, flags, data, children.get(key, {}), selected) for key, flags, data in rows}
+
+    def open_alerts(self) -> List[Dict[str, Any]]:
+        """Alertas abiertas de todos los registros, con `record_key`."""
+        with self._lock:
+            rows = self._conn.execute("SELECT record_key, data FROM open_alerts ORDER BY record_key, seq").fetchall()
+        return [dict(json.loads(data), record_key=record_key) for record_key, data in rows]
+
+    def quality_events(self, record_key: str = "", limit: int = 0) -> List[Dict[str, Any]]:
+        """Eventos de calidad (los mas recientes al final); `record_key` vacio = todos."""
+        query = "SELECT record_key, data FROM quality_events"
+        params: List[Any] = []
+        if record_key:
+            query += " WHERE record_key = ?"
+            params.append(record_key)
+        query += " ORDER BY record_key, seq"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        events = [dict(json.loads(data), record_key=key) for key, data in rows]
+        return events[-int(limit):] if limit and limit > 0 else events
+
+    def load(self) -> Dict[str, Any]:
+        """Reconstruye el dict de estado con el mismo formato que `scanner_state.json`."""
+        state: Dict[str, Any] = {}
+        with self._lock:
+            for key, data in self._conn.execute("SELECT key, data FROM meta WHERE key != 'schema_version'"):
+                state[key] = json.loads(data)
+            free: Dict[str, Dict[str, str]] = {}
+            for user_id, market_key, day in self._conn.execute("SELECT user_id, market_key, day FROM free_daily_alerts"):
+                free.setdefault(user_id, {})[market_key] = day
+            links = {user_id: json.loads(data) for user_id, data in self._conn.execute("SELECT user_id, data FROM telegram_links")}
+        state["symbols"] = self.records()
+        state[FREE_ALERTS_KEY] = free
+        state[TELEGRAM_LINKS_KEY] = links
+        if not self.readonly:
+            self._digests = self._snapshot_digests(state)[0]
+        return state
+
+    def _snapshot_digests(self, state: Dict[str, Any]) -> Tuple[Dict[Tuple[str, str], str], Dict[Tuple[str, str], str]]:
+        """(huellas, textos JSON) por parte del estado."""
+        digests: Dict[Tuple[str, str], str] = {}
+        texts: Dict[Tuple[str, str], str] = {}
+
+        def put(part: Tuple[str, str], value: Any) -> None:
+            text = _dumps(value)
+            texts[part] = text
+            digests[part] = _digest(text)
+
+        symbols = state.get("symbols", {})
+        for key, record in (symbols.items() if isinstance(symbols, dict) else []):
+            if not isinstance(record, dict):
+                continue
+            core = {name: value for name, value in record.items() if not (name in CHILD_TABLES and isinstance(value, list))}
+            put(("records", str(key)), core)
+            if isinstance(record.get("open_alerts"), list):
+                put(("open_alerts", str(key)), record["open_alerts"])
+            history = record.get("quality_history")
+            if isinstance(history, list):
+                digests[("quality_history", str(key))] = history_fingerprint(history)
+        for key, value in state.items():
+            if key in ("symbols", FREE_ALERTS_KEY, TELEGRAM_LINKS_KEY):
+                continue
+            put(("meta", str(key)), value)
+        put(("free", ""), state.get(FREE_ALERTS_KEY, {}))
+        put(("links", ""), state.get(TELEGRAM_LINKS_KEY, {}))
+        return digests, texts
+
+    def save(self, state: Dict[str, Any]) -> Dict[str, int]:
+        """Escribe solo las partes que cambiaron desde la ultima carga/escritura, en una transaccion."""
+        if self.readonly:
+            raise RuntimeError("StateStore abierto en solo lectura.")
+        digests, texts = self._snapshot_digests(state)
+        changed = {part for part, digest in digests.items() if self._digests.get(part) != digest}
+        removed = {part for part in self._digests if part not in digests}
+        symbols = state.get("symbols", {}) if isinstance(state.get("symbols"), dict) else {}
+        record_keys = {key for table, key in changed | removed if table == "records" or table in CHILD_TABLES}
+        stats = {"records_written": 0, "records_deleted": 0, "records_unchanged": 0, "bytes_written": 0}
+        with self._lock, self._conn:
+            for key in sorted(record_keys):
+                record = symbols.get(key)
+                if not isinstance(record, dict):
+                    self._conn.execute("DELETE FROM records WHERE key = ?", (key,))
+                    for table in CHILD_TABLES.values():
+                        self._conn.execute(f"DELETE FROM {table} WHERE record_key = ?", (key,))
+                    stats["records_deleted"] += 1
+                    continue
+                stats["bytes_written"] += self._write_record(key, record, texts, changed | removed)
+                stats["records_written"] += 1
+            for table, key in sorted(changed | removed):
+                if table != "meta":
+                    continue
+                if ("meta", key) in texts:
+                    stats["bytes_written"] += len(texts[("meta", key)])
+                    self._conn.execute("INSERT OR REPLACE INTO meta (key, data) VALUES (?, ?)", (key, texts[("meta", key)]))
+                else:
+                    self._conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+            if ("free", "") in changed:
+                self._write_free(state.get(FREE_ALERTS_KEY, {}))
+            if ("links", "") in changed:
+                self._write_links(state.get(TELEGRAM_LINKS_KEY, {}))
+        self._digests = digests
+        stats["records_unchanged"] = max(0, len(symbols) - stats["records_written"])
+        self.last_save = stats
+        return stats
+
+    def _write_record(self, key: str, record: Dict[str, Any], texts: Dict[Tuple[str, str], str], dirty: set) -> int:
+        children = [field for field in CHILD_TABLES if isinstance(record.get(field), list)]
+        market, label, ticker, timeframe = _key_parts(key, record)
+        written = 0
+        if ("records", key) in dirty:
+            written += len(texts[("records", key)])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO records (key, market, label, ticker, timeframe, last_checked_utc, children, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, market, label, ticker, timeframe, str(record.get("last_checked_utc", "") or ""), ",".join(children), texts[("records", key)]),
+            )
+        for field, table in CHILD_TABLES.items():
+            if (field, key) not in dirty:
+                continue
+            self._conn.execute(f"DELETE FROM {table} WHERE record_key = ?", (key,))
+            rows = [row for row in record.get(field, []) if isinstance(row, dict)]
+            row_texts = [_dumps(row) for row in rows]
+            written += sum(len(text) for text in row_texts)
+            if table == "open_alerts":
+                self._conn.executemany(
+                    "INSERT INTO open_alerts (record_key, seq, alert_id, direction, opened_utc, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (key, seq, str(row.get("alert_id", "")), str(row.get("direction", "")), str(row.get("opened_utc", "")), text)
+                        for seq, (row, text) in enumerate(zip(rows, row_texts))
+                    ],
+                )
+            else:
+                self._conn.executemany(
+                    "INSERT INTO quality_events (record_key, seq, status, setup_bucket, closed_utc, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (key, seq, str(row.get("status", "")), str(row.get("setup_bucket", "")), str(row.get("closed_utc", "")), text)
+                        for seq, (row, text) in enumerate(zip(rows, row_texts))
+                    ],
+                )
+        return written
+
+    def _write_free(self, free: Any) -> None:
+        self._conn.execute("DELETE FROM free_daily_alerts")
+        rows = []
+        for user_id, markets in (free.items() if isinstance(free, dict) else []):
+            for market_key, day in (markets.items() if isinstance(markets, dict) else []):
+                rows.append((str(user_id), str(market_key), str(day)))
+        self._conn.executemany("INSERT INTO free_daily_alerts (user_id, market_key, day) VALUES (?, ?, ?)", rows)
+
+    def _write_links(self, links: Any) -> None:
+        self._conn.execute("DELETE FROM telegram_links")
+        self._conn.executemany(
+            "INSERT INTO telegram_links (user_id, chat_id, data) VALUES (?, ?, ?)",
+            [
+                (str(user_id), str(link.get("chat_id", "") if isinstance(link, dict) else ""), _dumps(link))
+                for user_id, link in (links.items() if isinstance(links, dict) else [])
+            ],
+        )
+
+
+def read_state(path: Path) -> Dict[str, Any]:
+    """Lectura puntual (app/monitores) sin bloquear al worker; {} si la base no existe."""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with StateStore(path, readonly=True) as store:
+        return store.load()
+
+
+def read_records(path: Path, fields: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Solo los registros (`symbols`) con las listas hijas de `fields`, para paneles; {} si la base no existe."""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with StateStore(path, readonly=True) as store:
+        return store.records(fields=fields)
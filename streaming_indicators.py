@@ -0,0 +1,354 @@
+import json
+import logging
+import math
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis import calcular_indicadores
+
+logger = logging.getLogger(__name__)
+
+EMA_LENGTHS = (20, 50, 200)
+RSI_LENGTH = 14
+BB_LENGTH = 20
+BB_STD = 2.0
+ATR_LENGTH = 14
+INDICATOR_COLUMNS = ("EMA_20", "EMA_50", "EMA_200", "RSI", "BBL", "BBM", "BBU", "TR", "ATR")
+_PRICE_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+# Filas consolidadas: Close (para detectar velas revisadas) + indicadores.
+_STORED_COLUMNS = ("Close",) + INDICATOR_COLUMNS
+_NAN = float("nan")
+
+
+def _true_range(high: float, low: float, prev_close: Optional[float]) -> float:
+    if prev_close is None or math.isnan(prev_close):
+        return _NAN
+    return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+
+class StreamingIndicators:
+    """EMA 20/50/200, RSI 14, Bollinger 20x2 y ATR 14 actualizados vela a vela.
+
+    Reproduce las formulas de `calcular_indicadores` (EMA adjust=False, RSI de Wilder,
+    Bollinger con ddof=0) y agrega TR/ATR como `_atr14`. Por defecto solo se consolidan
+    las velas anteriores a la ultima: la ultima fila se calcula como vista previa sin tocar
+    el estado, asi una vela en formacion puede cambiar entre llamadas. Con
+    `closed_only=True` (frames de velas cerradas) se consolida tambien la ultima.
+    """
+
+    def __init__(self, max_rows: int = 1000) -> None:
+        self.max_rows = max(BB_LENGTH + 1, int(max_rows))
+        self.lock = threading.Lock()
+        self.incremental_bars = 0
+        self.reseeds = 0
+        self.reset()
+
+    def reset(self) -> None:
+        self._state: Optional[Dict[str, Any]] = None
+        self._rows_index = pd.DatetimeIndex([])
+        self._rows_values = np.empty((0, len(_STORED_COLUMNS)), dtype="float64")
+
+    def _set_rows(self, index: pd.Index, values: np.ndarray) -> None:
+        self._rows_index = pd.DatetimeIndex(index[-self.max_rows :])
+        self._rows_values = np.asarray(values, dtype="float64")[-self.max_rows :]
+
+    @property
+    def rows(self) -> pd.DataFrame:
+        """Indicadores de las velas consolidadas (sin la vista previa)."""
+        return pd.DataFrame(self._rows_values[:, 1:], index=self._rows_index, columns=list(INDICATOR_COLUMNS))
+
+    @property
+    def seeded(self) -> bool:
+        return self._state is not None
+
+    @property
+    def last_index(self) -> Optional[pd.Timestamp]:
+        if self._state is None:
+            return None
+        return self._state["index"]
+
+    def _step(self, state: Dict[str, Any], high: float, low: float, close: float) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        emas = state["ema"]
+        for length in EMA_LENGTHS:
+            prev = emas.get(length)
+            alpha = 2.0 / (length + 1)
+            value = close if prev is None else prev + alpha * (close - prev)
+            emas[length] = value
+            out[f"EMA_{length}"] = value
+
+        prev_close = state["prev_close"]
+        rsi = _NAN
+        if prev_close is not None:
+            delta = close - prev_close
+            gain = max(delta, 0.0)
+            loss = max(-delta, 0.0)
+            alpha = 1.0 / RSI_LENGTH
+            if state["avg_gain"] is None:
+                state["avg_gain"], state["avg_loss"] = gain, loss
+            else:
+                state["avg_gain"] += alpha * (gain - state["avg_gain"])
+                state["avg_loss"] += alpha * (loss - state["avg_loss"])
+            if state["avg_loss"] != 0:
+                rsi = 100.0 - (100.0 / (1.0 + state["avg_gain"] / state["avg_loss"]))
+        out["RSI"] = rsi
+
+        closes = state["closes"]
+        closes.append(close)
+        if len(closes) == BB_LENGTH:
+            window = np.fromiter(closes, dtype="float64", count=BB_LENGTH)
+            mid = float(window.mean())
+            dev = float(window.std(ddof=0))
+            out["BBL"], out["BBM"], out["BBU"] = mid - BB_STD * dev, mid, mid + BB_STD * dev
+        else:
+            out["BBL"] = out["BBM"] = out["BBU"] = _NAN
+
+        tr = _true_range(high, low, prev_close)
+        trs = state["trs"]
+        trs.append(tr)
+        out["TR"] = tr
+        out["ATR"] = float(sum(trs) / ATR_LENGTH) if len(trs) == ATR_LENGTH else _NAN
+
+        state["prev_close"] = close
+        return out
+
+    @staticmethod
+    def _copy_state(state: Dict[str, Any]) -> Dict[str, Any]:
+        copied = dict(state)
+        copied["ema"] = dict(state["ema"])
+        copied["closes"] = deque(state["closes"], maxlen=BB_LENGTH)
+        copied["trs"] = deque(state["trs"], maxlen=ATR_LENGTH)
+        return copied
+
+    def _seed(self, data: pd.DataFrame, closed_only: bool = False) -> pd.DataFrame:
+        self.reset()
+        out = calcular_indicadores(data)
+        close = out["Close"]
+        tr = np.maximum(
+            out["High"] - out["Low"],
+            np.maximum((out["High"] - close.shift()).abs(), (out["Low"] - close.shift()).abs()),
+        )
+        out["TR"] = tr
+        out["ATR"] = tr.rolling(ATR_LENGTH).mean()
+        if (
+            len(out) < BB_LENGTH + 1
+            or not out.index.is_monotonic_increasing
+            or out.index.has_duplicates
+            or out[["High", "Low", "Close"]].isna().to_numpy().any()
+        ):
+            return out
+
+        k = len(out) - (1 if closed_only else 2)
+        delta = close.diff()
+        avg_gain = delta.clip(lower=0).ewm(alpha=1 / RSI_LENGTH, adjust=False).mean()
+        avg_loss = (-delta.clip(upper=0)).ewm(alpha=1 / RSI_LENGTH, adjust=False).mean()
+        closes = close.to_numpy(dtype="float64")
+        trs = tr.to_numpy(dtype="float64")
+        self._state = {
+            "index": pd.Timestamp(out.index[k]),
+            "ema": {length: float(out[f"EMA_{length}"].iloc[k]) for length in EMA_LENGTHS},
+            "prev_close": float(closes[k]),
+            "avg_gain": float(avg_gain.iloc[k]),
+            "avg_loss": float(avg_loss.iloc[k]),
+            "closes": deque(closes[k - BB_LENGTH + 1 : k + 1].tolist(), maxlen=BB_LENGTH),
+            "trs": deque(trs[max(0, k - ATR_LENGTH + 1) : k + 1].tolist(), maxlen=ATR_LENGTH),
+        }
+        ind = out[list(_STORED_COLUMNS)].iloc[: k + 1].apply(pd.to_numeric, errors="coerce")
+        self._set_rows(ind.index, ind.to_numpy(dtype="float64"))
+        self.reseeds += 1
+        return out
+
+    def _continues(self, data: pd.DataFrame) -> int:
+        """Posicion de la ultima vela consolidada dentro de `data`, o -1 si hay que resembrar."""
+        state = self._state
+        if state is None or not len(self._rows_index) or len(data) < 2:
+            return -1
+        index = data.index
+        if index[0] < self._rows_index[0]:
+            return -1
+        pos = int(index.searchsorted(state["index"]))
+        if pos >= len(index) or index[pos] != state["index"]:
+            return -1
+        start = int(self._rows_index.searchsorted(index[0]))
+        if not self._rows_index[start:].equals(index[: pos + 1]):
+            return -1
+        prices = data[["High", "Low", "Close"]].to_numpy(dtype="float64")
+        # Un proveedor puede corregir velas ya cerradas: cualquier cambio obliga a resembrar.
+        if not np.allclose(prices[: pos + 1, 2], self._rows_values[start:, 0], rtol=1e-12, atol=0.0):
+            return -1
+        if np.isnan(prices[pos + 1 :]).any():
+            return -1
+        return pos
+
+    def apply(self, data: pd.DataFrame, closed_only: bool = False) -> pd.DataFrame:
+        """Devuelve `data` con las columnas de `calcular_indicadores` mas TR/ATR.
+
+        `closed_only=True`: todas las velas de `data` estan cerradas y se consolidan (sin vista previa).
+        """
+        if data is None or data.empty:
+            return calcular_indicadores(data)
+        to_convert = [
+            col for col in _PRICE_COLUMNS if col in data.columns and not pd.api.types.is_float_dtype(data[col].dtype)
+        ]
+        if to_convert:
+            data = data.copy()
+            for col in to_convert:
+                data[col] = pd.to_numeric(data[col], errors="coerce")
+        try:
+            pos = self._continues(data)
+        except Exception:
+            pos = -1
+        if pos < 0:
+            return self._seed(data, closed_only)
+
+        highs = data["High"].to_numpy(dtype="float64")
+        lows = data["Low"].to_numpy(dtype="float64")
+        closes = data["Close"].to_numpy(dtype="float64")
+        last = len(data) - 1
+        end = last + 1 if closed_only else last
+        committed = []
+        for i in range(pos + 1, end):
+            committed.append(self._step(self._state, highs[i], lows[i], closes[i]))
+        if committed:
+            self._state["index"] = pd.Timestamp(data.index[end - 1])
+            new_values = np.array(
+                [[closes[pos + 1 + i]] + [row[col] for col in INDICATOR_COLUMNS] for i, row in enumerate(committed)],
+                dtype="float64",
+            )
+            self._set_rows(
+                self._rows_index.append(data.index[pos + 1 : end]),
+                np.vstack([self._rows_values, new_values]),
+            )
+            self.incremental_bars += len(committed)
+
+        start = int(self._rows_index.searchsorted(data.index[0]))
+        values = self._rows_values[start:, 1:]
+        if len(values) < len(data):
+            # La ultima vela sigue abierta: se calcula sobre una copia del estado.
+            preview = self._step(self._copy_state(self._state), highs[last], lows[last], closes[last])
+            values = np.vstack([values, [[preview[col] for col in INDICATOR_COLUMNS]]])
+        columns: Dict[str, Any] = {col: values[:, i] for i, col in enumerate(INDICATOR_COLUMNS)}
+        # Igual que `_rsi`: dtype object con pd.NA donde no hay valor.
+        rsi = columns["RSI"].astype(object)
+        rsi[np.isnan(columns["RSI"])] = pd.NA
+        columns["RSI"] = rsi
+        overlap = [col for col in INDICATOR_COLUMNS if col in data.columns]
+        if overlap:
+            data = data.drop(columns=overlap)
+        return pd.concat([data, pd.DataFrame(columns, index=data.index)], axis=1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self._state
+        if state is None:
+            return {}
+        return {
+            "index": pd.Timestamp(state["index"]).isoformat(),
+            "ema": {str(k): v for k, v in state["ema"].items()},
+            "prev_close": state["prev_close"],
+            "avg_gain": state["avg_gain"],
+            "avg_loss": state["avg_loss"],
+            "closes": list(state["closes"]),
+            "trs": list(state["trs"]),
+        }
+
+    def restore(self, payload: Dict[str, Any], rows: pd.DataFrame) -> bool:
+        try:
+            self._state = {
+                "index": pd.Timestamp(payload["index"]),
+                "ema": {int(k): float(v) for k, v in dict(payload["ema"]).items()},
+                "prev_close": float(payload["prev_close"]),
+                "avg_gain": float(payload["avg_gain"]),
+                "avg_loss": float(payload["avg_loss"]),
+                "closes": deque([float(v) for v in payload["closes"]], maxlen=BB_LENGTH),
+                "trs": deque([float(v) for v in payload["trs"]], maxlen=ATR_LENGTH),
+            }
+            self._set_rows(rows.index, rows[list(_STORED_COLUMNS)].to_numpy(dtype="float64"))
+        except Exception:
+            self.reset()
+            return False
+        if not len(self._rows_index) or self._rows_index[-1] != self._state["index"]:
+            self.reset()
+            return False
+        return True
+
+    def save(self, path: Path) -> None:
+        if self._state is None:
+            return
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            index = self._rows_index
+            tz = str(index.tz) if index.tz is not None else ""
+            if tz:
+                index = index.tz_convert("UTC").tz_localize(None)
+            arrays = {
+                "ts": index.values.astype("datetime64[ns]").astype("int64"),
+                "tz": np.array(tz),
+                "state": np.array(json.dumps(self.snapshot())),
+            }
+            for pos, col in enumerate(_STORED_COLUMNS):
+                arrays[col] = self._rows_values[:, pos]
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as fh:
+                np.savez(fh, **arrays)
+            os.replace(tmp_path, path)
+        except Exception as exc:
+            logger.warning("No se pudo guardar snapshot de indicadores (%s): %s", path.name, exc)
+            try:
+                tmp_path.unlink()
+            except Exception:
+                pass
+
+    def load(self, path: Path) -> bool:
+        path = Path(path)
+        if not path.exists():
+            return False
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                tz = str(data["tz"])
+                index = pd.DatetimeIndex(pd.to_datetime(data["ts"].astype("int64"), unit="ns"))
+                if tz:
+                    index = index.tz_localize("UTC").tz_convert(tz)
+                rows = pd.DataFrame({col: data[col] for col in _STORED_COLUMNS}, index=index)
+                payload = json.loads(str(data["state"]))
+        except Exception as exc:
+            logger.warning("Snapshot de indicadores ilegible (%s): %s", path.name, exc)
+            return False
+        return self.restore(payload, rows)
+
+
+_ENGINES: Dict[str, StreamingIndicators] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_engine(key: str, max_rows: int = 1000) -> StreamingIndicators:
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            engine = StreamingIndicators(max_rows=max_rows)
+            _ENGINES[key] = engine
+        return engine
+
+
+def reset_stats() -> None:
+    with _ENGINES_LOCK:
+        engines = list(_ENGINES.values())
+    for engine in engines:
+        engine.incremental_bars = 0
+        engine.reseeds = 0
+
+
+def stats() -> Dict[str, int]:
+    with _ENGINES_LOCK:
+        engines = list(_ENGINES.values())
+    return {
+        "engines": len(engines),
+        "incremental_bars": sum(int(engine.incremental_bars) for engine in engines),
+        "reseeds": sum(int(engine.reseeds) for engine in engines),
+    }
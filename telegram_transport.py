@@ -0,0 +1,232 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import http_pool
+
+# Limites publicados por Telegram: ~30 mensajes/s en total, 1/s por chat y 20/min por grupo.
+DEFAULT_GLOBAL_PER_SEC = 25.0
+DEFAULT_CHAT_PER_SEC = 1.0
+DEFAULT_GROUP_PER_MIN = 20.0
+DEFAULT_MAX_WAIT_SEC = 30.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_IDLE_EVICT_SEC = 60.0
+
+
+class TelegramRateLimited(Exception):
+    """No hubo cupo (local o `retry_after` de Telegram) dentro de `max_wait_sec`; el envio se descarta."""
+
+
+class TokenBucket:
+    """`rate` fichas/s hasta `burst`; `block(until)` lo congela (retry_after de un 429)."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, now: Optional[float] = None) -> None:
+        self.rate = max(0.0, float(rate))
+        self.burst = max(1.0, float(burst if burst is not None else self.rate))
+        self.tokens = self.burst
+        self.stamp = time.monotonic() if now is None else float(now)
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self.stamp:
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def wait_time(self, now: float) -> float:
+        """0.0 si hay ficha ya; si no, segundos hasta la proxima."""
+        if self.rate <= 0:
+            return max(0.0, self.blocked_until - now)
+        self._refill(now)
+        missing = 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+        return max(missing, self.blocked_until - now, 0.0)
+
+    def consume(self, now: float) -> None:
+        if self.rate > 0:
+            self._refill(now)
+            self.tokens -= 1.0
+
+    def block(self, until: float) -> None:
+        self.blocked_until = max(self.blocked_until, float(until))
+
+    def idle(self, now: float) -> bool:
+        """Lleno y sin bloqueo: equivale a un bucket nuevo y se puede descartar."""
+        self._refill(now)
+        return self.tokens >= self.burst and self.blocked_until <= now
+
+
+def retry_after_sec(resp: Any, default: float = 1.0) -> float:
+    """`parameters.retry_after` del cuerpo 429 (o header Retry-After)."""
+    try:
+        params = (resp.json() or {}).get("parameters", {}) or {}
+        if params.get("retry_after") is not None:
+            return max(0.0, float(params["retry_after"]))
+    except Exception:
+        pass
+    try:
+        return max(0.0, float(resp.headers.get("Retry-After", default)))
+    except Exception:
+        return default
+
+
+class TelegramTransport:
+    """POST a la Bot API con bucket global + bucket por chat (grupos por minuto).
+
+    Entre envios que ya tienen cupo en su chat, la ficha global la toma primero el de mayor
+    `priority` (premium) y luego el mas antiguo. Un 429 congela el chat y el bucket global durante
+    `retry_after` y se reintenta hasta `max_retries`; si el cupo no llega en `max_wait_sec` el envio
+    se descarta con `TelegramRateLimited`. Cada `idle_evict_sec` se descartan los buckets de chat ociosos.
+    """
+
+    def __init__(
+        self,
+        global_per_sec: float = DEFAULT_GLOBAL_PER_SEC,
+        chat_per_sec: float = DEFAULT_CHAT_PER_SEC,
+        group_per_min: float = DEFAULT_GROUP_PER_MIN,
+        max_wait_sec: float = DEFAULT_MAX_WAIT_SEC,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        post: Optional[Callable[..., Any]] = None,
+        idle_evict_sec: float = DEFAULT_IDLE_EVICT_SEC,
+    ) -> None:
+        self.global_per_sec = max(0.0, float(global_per_sec))
+        self.chat_per_sec = max(0.0, float(chat_per_sec))
+        self.group_per_min = max(0.0, float(group_per_min))
+        self.max_wait_sec = max(0.0, float(max_wait_sec))
+        self.max_retries = max(0, int(max_retries))
+        self.idle_evict_sec = max(0.0, float(idle_evict_sec))
+        self._post = post or http_pool.post
+        self._cond = threading.Condition()
+        self._global = TokenBucket(self.global_per_sec)
+        self._chats: Dict[str, TokenBucket] = {}
+        # Chat -> envios esperando cupo con ese bucket (no se descarta mientras haya alguno).
+        self._chat_users: Dict[str, int] = {}
+        self._last_evict = time.monotonic()
+        self._line: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._stats: Dict[str, Any] = {
+            "sent": 0,
+            "deferred": 0,
+            "dropped": 0,
+            "retried_429": 0,
+            "http_errors": 0,
+            "waited_ms": 0.0,
+            "premium_sent": 0,
+            "chats_evicted": 0,
+        }
+
+    def _evict_idle_chats(self, now: float) -> None:
+        if now - self._last_evict < self.idle_evict_sec:
+            return
+        self._last_evict = now
+        idle = [chat_id for chat_id, bucket in self._chats.items() if chat_id not in self._chat_users and bucket.idle(now)]
+        for chat_id in idle:
+            del self._chats[chat_id]
+        self._stats["chats_evicted"] += len(idle)
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        self._evict_idle_chats(time.monotonic())
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if chat_id.startswith("-"):
+                bucket = TokenBucket(self.group_per_min / 60.0, burst=1.0)
+            else:
+                bucket = TokenBucket(self.chat_per_sec, burst=1.0)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _acquire(self, chat_id: str, priority: int, deadline: float) -> Optional[float]:
+        """Segundos esperados hasta obtener cupo, o None si no llega antes de `deadline`."""
+        started = time.monotonic()
+        slept = False
+        ticket: Optional[Tuple[int, int]] = None
+        with self._cond:
+            chat = self._chat_bucket(chat_id)
+            self._chat_users[chat_id] = self._chat_users.get(chat_id, 0) + 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    chat_wait = chat.wait_time(now)
+                    if chat_wait > 0:
+                        if ticket is not None:
+                            self._line.remove(ticket)
+                            heapq.heapify(self._line)
+                            ticket = None
+                            self._cond.notify_all()
+                        wait = chat_wait
+                    else:
+                        if ticket is None:
+                            ticket = (-int(priority), next(self._seq))
+                            heapq.heappush(self._line, ticket)
+                        if self._line[0] == ticket:
+                            global_wait = self._global.wait_time(now)
+                            if global_wait <= 0:
+                                self._global.consume(now)
+                                chat.consume(now)
+                                heapq.heappop(self._line)
+                                ticket = None
+                                self._cond.notify_all()
+                                return now - started if slept else 0.0
+                            wait = global_wait
+                        else:
+                            # En fila detras de otro envio: se despierta con notify_all.
+                            wait = deadline - now
+                    if wait > deadline - now or now >= deadline:
+                        return None
+                    self._cond.wait(timeout=max(0.001, wait))
+                    slept = True
+            finally:
+                users = self._chat_users.pop(chat_id) - 1
+                if users > 0:
+                    self._chat_users[chat_id] = users
+                if ticket is not None:
+                    self._line.remove(ticket)
+                    heapq.heapify(self._line)
+                    self._cond.notify_all()
+
+    def _penalize(self, chat_id: str, retry_after: float) -> None:
+        with self._cond:
+            until = time.monotonic() + retry_after
+            self._chat_bucket(chat_id).block(until)
+            self._global.block(until)
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._cond:
+            self._stats[key] += amount
+
+    def post(self, url: str, data: Dict[str, Any], chat_id: str, priority: int = 0, timeout: float = 20) -> Any:
+        """POST (pool HTTP compartido) con pacing; devuelve la respuesta final (no 429) o lanza `TelegramRateLimited`."""
+        chat_id = str(chat_id).strip()
+        deadline = time.monotonic() + self.max_wait_sec
+        deferred = False
+        reason = "sin cupo local"
+        for _ in range(self.max_retries + 1):
+            waited = self._acquire(chat_id, priority, deadline)
+            if waited is None:
+                break
+            if waited > 0:
+                deferred = True
+                self._count("waited_ms", waited * 1000.0)
+            resp = self._post(url, data=data, timeout=timeout)
+            if resp.status_code != 429:
+                self._count("sent" if resp.status_code < 400 else "http_errors")
+                if resp.status_code < 400 and priority > 0:
+                    self._count("premium_sent")
+                if deferred:
+                    self._count("deferred")
+                return resp
+            retry_after = retry_after_sec(resp)
+            reason = f"HTTP 429 retry_after={retry_after:g}s"
+            self._count("retried_429")
+            self._penalize(chat_id, retry_after)
+            deferred = True
+        self._count("dropped")
+        raise TelegramRateLimited(f"Telegram rate limit ({reason}); envio descartado.")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            out = dict(self._stats)
+            out["waited_ms"] = round(float(out["waited_ms"]), 3)
+            out["waiting"] = len(self._line)
+            out["chats"] = len(self._chats)
+            return out
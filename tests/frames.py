@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+
+
+def random_ohlcv(periods: int, seed: int = 7, start: float = 100.0, step: float = 1.0, freq: str = "15min") -> pd.DataFrame:
+    """Velas OHLCV de un paseo aleatorio reproducible (High/Low envuelven Open/Close)."""
+    rng = np.random.default_rng(seed)
+    close = start + np.cumsum(rng.normal(0.0, step, periods))
+    open_ = close + rng.normal(0.0, 0.4 * step, periods)
+    return pd.DataFrame(
+        {
+            "Open": open_,
+            "High": np.maximum(open_, close) + rng.uniform(0.1 * step, 1.5 * step, periods),
+            "Low": np.minimum(open_, close) - rng.uniform(0.1 * step, 1.5 * step, periods),
+            "Close": close,
+            "Volume": rng.uniform(1.0, 5.0, periods),
+        },
+        index=pd.date_range("2024-01-01", periods=periods, freq=freq, tz="UTC"),
+    )
@@ -0,0 +1,59 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import analysis
+from analysis_context import get_analysis_context
+from frames import random_ohlcv
+
+
+class AnalysisContextTests(unittest.TestCase):
+    def test_context_is_shared_per_frame_and_matches_direct_formulas(self):
+        df = analysis.calcular_indicadores(random_ohlcv(240, seed=5))
+        ctx = get_analysis_context(df)
+
+        self.assertIs(get_analysis_context(df), ctx)
+        self.assertIsNot(get_analysis_context(df.copy()), ctx)
+        self.assertIs(ctx.true_range(), ctx.true_range())
+
+        prev_close = df["Close"].shift()
+        tr = np.maximum(df["High"] - df["Low"], np.maximum((df["High"] - prev_close).abs(), (df["Low"] - prev_close).abs()))
+        self.assertAlmostEqual(ctx.atr14(), float(tr.rolling(14).mean().iloc[-1]), places=12)
+        self.assertEqual(ctx.resistencia(50), float(df["High"].tail(50).max()))
+        self.assertEqual(ctx.soporte(50), float(df["Low"].tail(50).min()))
+        self.assertEqual(ctx.swing_high(-7, -2), float(df["High"].iloc[-7:-2].max()))
+        self.assertAlmostEqual(ctx.range_mean(50), float((df["High"] - df["Low"]).tail(50).mean()), places=12)
+
+        candle = ctx.candle(-1)
+        last = df.iloc[-1]
+        self.assertAlmostEqual(candle["body"], abs(last["Close"] - last["Open"]), places=12)
+        self.assertAlmostEqual(candle["upper_wick"], last["High"] - max(last["Open"], last["Close"]), places=12)
+
+    def test_context_is_rebuilt_when_frame_grows(self):
+        df = random_ohlcv(60, seed=5)
+        ctx = get_analysis_context(df)
+        self.assertEqual(ctx.range_mean(50), ctx.range_mean(50))
+
+        df.loc[df.index[-1] + pd.Timedelta(minutes=15)] = df.iloc[-1]
+        grown = get_analysis_context(df)
+
+        self.assertIsNot(grown, ctx)
+        self.assertEqual(grown.size, 61)
+
+    def test_context_is_rebuilt_when_last_bar_changes_in_place(self):
+        df = random_ohlcv(60, seed=5)
+        ctx = get_analysis_context(df)
+        self.assertIs(get_analysis_context(df), ctx)
+
+        df.iloc[-1, df.columns.get_loc("Close")] += 1.0
+        updated = get_analysis_context(df)
+        self.assertIsNot(updated, ctx)
+        self.assertIs(get_analysis_context(df), updated)
+
+        df.iloc[-1, df.columns.get_loc("Close")] = np.nan
+        self.assertIs(get_analysis_context(df), get_analysis_context(df))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from urllib3.response import HTTPResponse
+
+import http_pool
+import live_binance
+import market_standin
+import scanner_worker as sw
+
+
+class HttpPoolTests(unittest.TestCase):
+    def tearDown(self):
+        sw._apply_endpoints_cfg({})
+        http_pool.configure()
+
+    def test_fetch_klines_reuses_one_keepalive_connection(self):
+        with market_standin.MarketStandIn() as standin:
+            live_binance.set_base_urls(standin.rest_url)
+            pool = http_pool.configure(retries=0)
+            frames = [live_binance.fetch_klines("SYN0001USDT", "15m", limit=20) for _ in range(10)]
+            stats = http_pool.stats()
+
+        self.assertTrue(all(err is None and len(df) == 20 for df, err in frames))
+        self.assertIs(http_pool.get_pool(), pool)
+        host = stats["hosts"][standin.rest_url.split("://", 1)[1]]
+        self.assertEqual((host["requests"], host["connections"], host["reused"]), (10, 1, 9))
+        self.assertEqual(stats["reuse_pct"], 90.0)
+        self.assertIs(http_pool.configure(retries=0), pool)
+
+    def test_retries_5xx_only_for_get(self):
+        with market_standin.MarketStandIn(error_rate=1.0) as standin:
+            live_binance.set_base_urls(standin.rest_url)
+            http_pool.configure(retries=2, backoff_sec=0.01)
+            df, err = live_binance.fetch_klines("SYN0001USDT", "15m", limit=5)
+            sent = http_pool.post(f"{standin.rest_url}/botTEST/sendMessage", data={"chat_id": "42", "text": "x"}, timeout=5)
+            counts = standin.snapshot()
+
+        self.assertTrue(df.empty)
+        self.assertIn("HTTP 503", err)
+        self.assertEqual(counts["binance"]["requests"], 3)
+        self.assertGreaterEqual(sent.status_code, 500)
+        self.assertEqual(counts["telegram"]["requests"], 1)
+
+    def test_retry_after_sleep_is_capped(self):
+        retry = http_pool.configure(retries=2)._session.get_adapter("https://api.binance.com").max_retries
+        response = HTTPResponse(headers={"Retry-After": "3600"})
+        self.assertEqual(retry.get_retry_after(response), http_pool.RETRY_AFTER_MAX_SEC)
+        self.assertEqual(retry.new(total=1).get_retry_after(HTTPResponse(headers={"Retry-After": "1"})), 1.0)
+
+    def test_worker_config_and_health_report(self):
+        self.assertTrue(sw._resolve_http_pool_cfg({})["enabled"])
+        self.assertFalse(sw._resolve_http_pool_cfg({"http_pool": {"enabled": False}})["enabled"])
+        pool = sw._apply_http_pool_cfg({"http_pool": {"enabled": True, "pool_maxsize": 500, "retries": -1}})
+        self.assertEqual((pool.enabled, pool.pool_maxsize, pool.retries), (True, 64, 0))
+
+        metrics = sw._new_cycle_metrics()
+        metrics["http_pool"] = {"requests": 4, "connections": 1, "reuse_pct": 75.0, "hosts": {"api.binance.com": {"reuse_pct": 75.0}}}
+        health = sw._update_health_from_cycle(health=sw._default_health_state(), cycle_metrics=metrics, cycle_ok=True, cycle_error="")
+        self.assertEqual(health["http_pool"]["reuse_pct"], 75.0)
+        self.assertEqual(health["last_cycle"]["http_pool"]["hosts"]["api.binance.com"]["reuse_pct"], 75.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
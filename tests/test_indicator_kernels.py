@@ -0,0 +1,82 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import analysis
+import indicator_kernels
+from frames import random_ohlcv
+
+
+def _btc(periods: int, seed: int = 3) -> pd.DataFrame:
+    return random_ohlcv(periods, seed=seed, start=30000.0, step=25.0)
+
+
+class IndicatorKernelsTests(unittest.TestCase):
+    def _assert_matches(self, got: pd.DataFrame, expected: pd.DataFrame) -> None:
+        self.assertEqual(list(got.columns), list(expected.columns))
+        self.assertEqual(list(got.dtypes), list(expected.dtypes))
+        for col in ("Open", "High", "Low", "Close", "Volume", "EMA_20", "EMA_50", "EMA_200", "RSI", "BBL", "BBM", "BBU"):
+            ref = pd.to_numeric(expected[col], errors="coerce").to_numpy(dtype="float64")
+            val = pd.to_numeric(got[col], errors="coerce").to_numpy(dtype="float64")
+            np.testing.assert_allclose(val, ref, rtol=1e-10, atol=1e-8, equal_nan=True, err_msg=col)
+
+    def test_numpy_kernel_matches_pandas_indicators(self):
+        df = _btc(720)
+
+        expected = analysis.calcular_indicadores(df)
+        got = analysis.calcular_indicadores_np(df)
+
+        self._assert_matches(got, expected)
+        self.assertTrue(np.isnan(indicator_kernels.rsi(np.arange(30.0))[-1]))
+
+    def test_numpy_kernel_matches_pandas_on_object_dtype_input(self):
+        df = _btc(300).astype(object)
+        df.iloc[3, df.columns.get_loc("Volume")] = "2.5"
+        # Tramo solo alcista: perdida media 0, `_rsi` devuelve dtype object con pd.NA.
+        df.iloc[:40, df.columns.get_loc("Close")] = [30000.0 + pos for pos in range(40)]
+
+        expected = analysis.calcular_indicadores(df)
+        got = analysis.calcular_indicadores_np(df)
+
+        self._assert_matches(got, expected)
+        self.assertEqual(got["RSI"].dtype, object)
+        self.assertIs(got["RSI"].iloc[5], pd.NA)
+        self.assertEqual(df["Close"].dtype, object)
+
+    def test_batch_matrix_matches_per_symbol_frames(self):
+        frames = [_btc(300), _btc(300, seed=4), _btc(240, seed=5)]
+        frames[1]["Volume"] = frames[1]["Volume"].astype("int64")
+        with_gap = _btc(240)
+        with_gap.iloc[5, with_gap.columns.get_loc("Close")] = np.nan
+        frames.append(with_gap)
+
+        results = analysis.calcular_indicadores_batch(frames)
+
+        self.assertEqual(len(results), len(frames))
+        for data, got in zip(frames[:3], results[:3]):
+            expected = analysis.calcular_indicadores_np(data)
+            self.assertEqual(list(got.index), list(data.index))
+            self.assertEqual(list(got.columns), list(expected.columns) + ["TR", "ATR"])
+            self.assertEqual(got["RSI"].dtype, expected["RSI"].dtype)
+            for col in ("EMA_20", "EMA_50", "EMA_200", "RSI", "BBL", "BBM", "BBU"):
+                np.testing.assert_array_equal(
+                    pd.to_numeric(got[col]).to_numpy(dtype="float64"),
+                    pd.to_numeric(expected[col]).to_numpy(dtype="float64"),
+                    err_msg=col,
+                )
+            self.assertAlmostEqual(float(got["ATR"].iloc[-1]), analysis._atr14(data), places=9)
+        self.assertEqual(results[1]["Volume"].dtype, np.int64)
+        self.assertNotIn("ATR", results[3].columns)
+
+    def test_ema_blocks_stay_accurate_on_long_series(self):
+        close = _btc(50000)["Close"]
+
+        for length in (14, 20, 200):
+            alpha = 2.0 / (length + 1)
+            expected = close.ewm(alpha=alpha, adjust=False).mean().to_numpy()
+            np.testing.assert_allclose(indicator_kernels.ema(close.to_numpy(), alpha), expected, rtol=1e-11)
+
+
+if __name__ == "__main__":
+    unittest.main()
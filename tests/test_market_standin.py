@@ -0,0 +1,89 @@
+import unittest
+
+import requests
+
+import live_binance
+import market_standin
+import scanner_worker as sw
+
+ORIGIN_MS = 1_699_920_000_000
+NOW = 1_700_050_000.0
+
+
+class MarketStandInTests(unittest.TestCase):
+    def setUp(self):
+        self.market = market_standin.SyntheticMarket(seed=3, origin_ms=ORIGIN_MS, clock=lambda: NOW)
+
+    def tearDown(self):
+        sw._apply_endpoints_cfg({})
+
+    def test_walk_is_deterministic_and_respects_start_time(self):
+        first = self.market.klines("SYN0001USDT", "15m", limit=40)
+        again = market_standin.SyntheticMarket(seed=3, origin_ms=ORIGIN_MS, clock=lambda: NOW).klines("SYN0001USDT", "15m", limit=40)
+        other = self.market.klines("SYN0002USDT", "15m", limit=40)
+
+        self.assertTrue(first.equals(again))
+        self.assertFalse(first["Close"].equals(other["Close"]))
+        self.assertLessEqual(int(first["open_ms"].iloc[-1]), NOW * 1000)
+        self.assertGreater(int(first["open_ms"].iloc[-1]) + 900_000, NOW * 1000)
+        self.assertTrue((first["Open"].iloc[1:].to_numpy() == first["Close"].iloc[:-1].to_numpy()).all())
+        self.assertTrue((first["High"] >= first[["Open", "Close"]].max(axis=1)).all())
+
+        page = self.market.klines("SYN0001USDT", "15m", limit=5, start_ms=int(first["open_ms"].iloc[10]))
+        self.assertEqual(list(page["open_ms"]), list(first["open_ms"].iloc[10:15]))
+        self.assertTrue(page["Close"].equals(first["Close"].iloc[10:15].reset_index(drop=True)))
+
+    def test_worker_fetches_through_configured_endpoints(self):
+        with market_standin.MarketStandIn(market=self.market) as standin:
+            sw._apply_endpoints_cfg({"endpoints": standin.endpoints()})
+            self.assertEqual(live_binance.REST_BASE, standin.rest_url)
+
+            df, err = live_binance.fetch_klines("SYN0001USDT", "15m", limit=40)
+            td_df, td_err = sw._fetch_twelvedata("SYN0001/USD", "15min", "demo")
+            photo = requests.post(f"{sw.TELEGRAM_API_BASE}/botTEST/sendPhoto", data={"chat_id": "42"}, timeout=5).json()
+            file_id = photo["result"]["photo"][0]["file_id"]
+            reused = requests.post(f"{sw.TELEGRAM_API_BASE}/botTEST/sendPhoto", data={"chat_id": "43", "photo": file_id}, timeout=5)
+            unknown = requests.post(f"{sw.TELEGRAM_API_BASE}/botTEST/sendPhoto", data={"chat_id": "43", "photo": "nope"}, timeout=5)
+            stats = standin.snapshot()
+
+        expected = self.market.klines("SYN0001USDT", "15m", limit=40)
+        self.assertIsNone(err)
+        self.assertEqual(len(df), 40)
+        self.assertEqual([int(ts.timestamp() * 1000) for ts in df.index], list(expected["open_ms"]))
+        self.assertAlmostEqual(float(df["Close"].iloc[-1]), float(expected["Close"].iloc[-1]), places=6)
+        self.assertEqual(td_err, "")
+        self.assertTrue(td_df.index.is_monotonic_increasing)
+        self.assertEqual(stats["binance"]["requests"], 1)
+        self.assertEqual(stats["twelvedata"]["requests"], 1)
+        self.assertTrue(file_id)
+        self.assertEqual(reused.json()["result"]["photo"][0]["file_id"], file_id)
+        self.assertEqual(unknown.status_code, 400)
+        self.assertEqual(stats["telegram"]["photo_uploads"], 1)
+
+    def test_rate_limit_and_errors_follow_provider_formats(self):
+        with market_standin.MarketStandIn(market=self.market, rate_limit_per_sec=2) as standin:
+            url = f"{standin.rest_url}/botTEST/sendMessage"
+            replies = [requests.post(url, data={"chat_id": "42", "text": "hola"}, timeout=5) for _ in range(4)]
+        self.assertEqual(replies[0].json()["result"]["chat"]["id"], 42)
+        limited = [reply for reply in replies if reply.status_code == 429]
+        self.assertTrue(limited)
+        self.assertGreaterEqual(limited[0].json()["parameters"]["retry_after"], 1)
+
+        with market_standin.MarketStandIn(market=self.market, error_rate=1.0) as standin:
+            live_binance.set_base_urls(standin.rest_url)
+            df, err = live_binance.fetch_klines("SYN0001USDT", "15m", limit=5)
+        self.assertTrue(df.empty)
+        self.assertIn("HTTP 503", err)
+
+    def test_extra_crypto_map_joins_watchlist(self):
+        extra = market_standin.synthetic_symbols(3)
+        cfg = {"extra_crypto_map": extra, "crypto_symbols": ["BTC", "SYN0002"], "scan_gold": False}
+        items = {item.label: item for item in sw._build_watchlist(cfg)}
+
+        self.assertEqual(set(items), {"BTC", "SYN0002"})
+        self.assertEqual(items["SYN0002"].binance_symbol, "SYN0002USDT")
+        self.assertEqual(items["SYN0002"].td_symbol, "SYN0002/USD")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import threading
+import unittest
+
+from notify_dispatcher import NotificationBatch, NotificationDispatcher, NotificationJob, run_batch
+
+
+class NotifyDispatcherTests(unittest.TestCase):
+    def setUp(self):
+        self.dispatcher = NotificationDispatcher(workers=4, queue_size=8)
+        self.dispatcher.start()
+
+    def tearDown(self):
+        self.dispatcher.stop(timeout=5)
+
+    def test_batch_fans_out_across_workers_then_runs_followup(self):
+        # Los 4 envios solo pasan la barrera si corren a la vez.
+        barrier = threading.Barrier(4, timeout=5)
+
+        def send(ok=True):
+            barrier.wait()
+            return ok, "" if ok else "SMTP caido"
+
+        jobs = [NotificationJob("telegram", send, target=f"u{pos}") for pos in range(3)]
+        jobs.append(NotificationJob("email", lambda: send(False), target="u0"))
+        followup_seen = []
+
+        def followup(batch):
+            followup_seen.append(sorted(job.target for job in batch.jobs if job.ok))
+            return [NotificationJob("windows", lambda: (True, ""), target="windows")]
+
+        batch = NotificationBatch("Cripto|BTC|BTC-USD|15m", jobs, followup=followup)
+        self.assertTrue(self.dispatcher.submit(batch))
+        self.assertTrue(self.dispatcher.wait_idle(5))
+
+        done = self.dispatcher.drain()
+        self.assertEqual(done, [batch])
+        self.assertEqual(followup_seen, [["u0", "u1", "u2"]])
+        self.assertEqual([job.channel for job in batch.jobs][-1], "windows")
+        self.assertEqual(jobs[3].error, "SMTP caido")
+        stats = self.dispatcher.stats()
+        self.assertEqual(stats["channels"]["telegram"]["sent"], 3)
+        self.assertEqual(stats["channels"]["email"]["failed"], 1)
+        self.assertEqual(stats["channels"]["windows"]["sent"], 1)
+        self.assertEqual((stats["in_flight"], stats["queue_depth"], stats["batches_completed"]), (0, 0, 1))
+        self.assertEqual(self.dispatcher.drain(), [])
+
+    def test_full_queue_rejects_whole_batch(self):
+        release = threading.Event()
+        started = threading.Semaphore(0)
+
+        def slow():
+            started.release()
+            return release.wait(5), ""
+
+        blocker = NotificationBatch("slow", [NotificationJob("telegram", slow) for _ in range(4)])
+        self.assertTrue(self.dispatcher.submit(blocker))
+        for _ in range(4):
+            self.assertTrue(started.acquire(timeout=5))
+        filler = NotificationBatch("fill", [NotificationJob("telegram", lambda: (True, "")) for _ in range(8)])
+        self.assertTrue(self.dispatcher.submit(filler))
+        overflow = NotificationBatch("extra", [NotificationJob("telegram", lambda: (True, ""))])
+        self.assertFalse(self.dispatcher.submit(overflow))
+        self.assertEqual(self.dispatcher.stats()["overflow"], 1)
+        self.assertIn("slow", self.dispatcher.pending_keys())
+
+        release.set()
+        self.assertTrue(self.dispatcher.wait_idle(5))
+        self.assertEqual({batch.key for batch in self.dispatcher.drain()}, {"slow", "fill"})
+        self.assertTrue(run_batch(overflow).jobs[0].ok)
+
+    def test_batch_larger_than_queue_is_enqueued_in_parts(self):
+        sent = []
+        jobs = [NotificationJob("telegram", lambda pos=pos: (sent.append(pos) or True, ""), target=f"u{pos}") for pos in range(30)]
+        batch = NotificationBatch("grande", jobs)
+
+        self.assertTrue(self.dispatcher.submit(batch))
+        self.assertTrue(self.dispatcher.wait_idle(5))
+
+        self.assertEqual(self.dispatcher.drain(), [batch])
+        self.assertEqual(sorted(sent), list(range(30)))
+        stats = self.dispatcher.stats()
+        self.assertEqual((stats["overflow"], stats["split_batches"], stats["jobs_completed"]), (0, 1, 30))
+        self.assertLessEqual(stats["queue_peak"], 8)
+
+    def test_exceptions_become_failed_jobs(self):
+        def boom():
+            raise RuntimeError("sin red")
+
+        batch = run_batch(NotificationBatch("k", [NotificationJob("telegram", boom)]))
+        self.assertTrue(batch.done)
+        self.assertEqual((batch.jobs[0].ok, batch.jobs[0].error), (False, "sin red"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import outcome_labeller
+import scanner_worker as sw
+from frames import random_ohlcv
+
+
+class OutcomeLabellerTests(unittest.TestCase):
+    def _signals(self, df: pd.DataFrame) -> pd.DataFrame:
+        rng = np.random.default_rng(4)
+        rows = []
+        for pos in range(0, len(df), 3):
+            direction = "ALCISTA" if rng.random() < 0.5 else "BAJISTA"
+            entry = float(df["Close"].iloc[pos])
+            risk = float(rng.uniform(0.3, 2.5))
+            sign = 1 if direction == "ALCISTA" else -1
+            rows.append(
+                {
+                    "bar": df.index[pos],
+                    "direction": direction,
+                    "entry_price": entry,
+                    "tp_price": entry + sign * risk * 1.8,
+                    "sl_price": entry - sign * risk,
+                    "max_bars": int(rng.integers(2, 20)),
+                    "rr_estimado": 1.8,
+                    "setup_bucket": "continuidad_alcista" if sign > 0 else "continuidad_bajista",
+                }
+            )
+        return pd.DataFrame(rows)
+
+    def _live_outcome(self, df: pd.DataFrame, signal: dict) -> tuple:
+        pos = df.index.get_loc(signal["bar"])
+        record = {"open_alerts": [dict(signal, status="open", alert_id="a", last_bar_utc=str(pos), bars_elapsed=0)]}
+        for nxt in range(pos + 1, len(df)):
+            sw._evaluate_open_alert_outcome(record, {"indice_alerta_utc": str(nxt)}, {"df_ind": df.iloc[: nxt + 1]})
+            history = record.get("quality_history", [])
+            if history:
+                event = history[-1]
+                return event["status"], int(event["bars_elapsed"]), event["outcome_note"]
+        return "open", len(df) - 1 - pos, ""
+
+    def test_vectorized_labels_match_live_bar_by_bar_resolution(self):
+        df = random_ohlcv(400, seed=9, step=0.8)
+        signals = self._signals(df)
+        labelled = outcome_labeller.label_signals(df, signals)
+
+        for row, signal in zip(labelled.itertuples(), signals.to_dict("records")):
+            self.assertEqual((row.status, int(row.bars_elapsed), row.outcome_note), self._live_outcome(df, signal), signal["bar"])
+        self.assertEqual(set(labelled["status"]), {"win", "loss", "timeout", "open"})
+
+    def test_same_bar_touch_counts_as_loss(self):
+        df = pd.DataFrame({"High": [10.0, 13.0], "Low": [9.0, 7.0], "Close": [10.0, 10.0]})
+        out = outcome_labeller.label_outcomes(df["High"], df["Low"], [0], [1], [12.0], [8.0], [5])
+        self.assertEqual(int(out["status"][0]), outcome_labeller.LOSS)
+        self.assertEqual(int(out["bars"][0]), 1)
+        self.assertTrue(bool(out["same_bar"][0]))
+
+    def test_seed_loads_into_worker_calibration(self):
+        df = random_ohlcv(400, seed=9, step=0.8)
+        labelled = outcome_labeller.label_signals(df, self._signals(df))
+        seed = outcome_labeller.quality_seed(labelled)
+        resolved = labelled[labelled["status"] != "open"]
+
+        record = {}
+        self.assertTrue(outcome_labeller.seed_record(record, seed))
+        self.assertFalse(outcome_labeller.seed_record(record, seed))
+        metrics = sw._quality_metrics_from_record(record)
+        self.assertEqual(metrics["resolved"], len(resolved))
+        self.assertEqual(metrics["wins"], int((resolved["status"] == "win").sum()))
+        self.assertEqual(len(record["quality_history"]), outcome_labeller.QUALITY_HISTORY_LIMIT)
+        self.assertEqual(set(record["quality_stats_by_setup"]), {"continuidad_alcista", "continuidad_bajista"})
+
+        state = {"quality_epoch": 0, "symbols": {"A": {"quality_stats": {"wins": 2}}}}
+        self.assertEqual(sw._aggregate_quality_stats(state)["wins"], 2)
+        self.assertTrue(sw._seed_record_quality(state, "B", seed))
+        self.assertFalse(sw._seed_record_quality(state, "B", seed))
+        self.assertEqual(state["quality_epoch"], 1)
+        self.assertEqual(sw._aggregate_quality_stats(state), sw._compute_aggregate_quality_stats(state["symbols"]))
+        self.assertEqual(sw._aggregate_quality_stats(state)["wins"], 2 + metrics["wins"])
+
+        calibrated = sw._apply_record_quality_calibration({"min_confidence_score": 85, "min_rr": 1.8}, record, "k")
+        self.assertNotEqual(calibrated["quality_calibration"]["mode"], "warmup")
+        sw._update_quality_stats(record, "win")
+        self.assertEqual(record["quality_stats"]["resolved"], len(resolved) + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import param_sweep
+import scanner_worker as sw
+from candle_store import CandleStore
+
+
+class ParamSweepTests(unittest.TestCase):
+    def _bars(self, periods: int = 300, seed: int = 3) -> pd.DataFrame:
+        rng = np.random.default_rng(seed)
+        index = pd.date_range("2024-02-01", periods=periods, freq="15min", tz="UTC")
+        return pd.DataFrame(
+            {
+                "bar": index.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "direction": np.where(rng.random(periods) < 0.5, "ALCISTA", "BAJISTA"),
+                "tp_price": 0.0,
+                "sl_price": 0.0,
+                "rr_estimado": 2.0,
+                "setup_bucket": "continuidad_alcista",
+                "cooldown_minutes": rng.choice([15, 45, 90], periods),
+                "ready": list(rng.random((periods, 2)) < 0.6),
+                "persistence": list(rng.integers(1, 3, (periods, 2))),
+            }
+        )
+
+    def test_alert_bars_match_worker_gate(self):
+        bars = self._bars()
+        for gate in (0, 1):
+            for persistence_bars in (1, 2, 3):
+                record = {}
+                expected = []
+                for pos, row in bars.iterrows():
+                    ready = bool(row["ready"][gate])
+                    needed = max(persistence_bars, int(row["persistence"][gate]))
+                    streak = int(record.get("dorado_streak", 0)) + 1 if ready else 0
+                    record["dorado_streak"] = streak
+                    sw.set_virtual_clock(datetime.strptime(row["bar"], "%Y-%m-%dT%H:%M:%SZ") + timedelta(seconds=10))
+                    if sw._should_alert(record, ready, int(row["cooldown_minutes"]), needed):
+                        expected.append(pos)
+                        record["last_alert_utc"] = sw._now_iso_utc()
+                    record["dorado_active"] = sw._compute_dorado_active_state(ready, streak, needed)
+                sw.set_virtual_clock(None)
+                self.assertEqual(list(param_sweep._alert_bars(bars, gate, persistence_bars)), expected, (gate, persistence_bars))
+
+    def test_score_record_ranks_every_grid_point(self):
+        bars = self._bars(120)
+        close = 100.0 + np.cumsum(np.random.default_rng(8).normal(0.0, 0.6, len(bars)))
+        candles = pd.DataFrame(
+            {"Open": close, "High": close + 0.5, "Low": close - 0.5, "Close": close},
+            index=pd.to_datetime(bars["bar"], utc=True).rename(None),
+        )
+        sign = np.where(bars["direction"] == "ALCISTA", 1.0, -1.0)
+        bars["tp_price"] = close + sign * 1.2
+        bars["sl_price"] = close - sign * 0.8
+        grid = param_sweep._resolve_grid(
+            {"min_confidence_score": [70, 80], "min_rr": [1.5], "min_mtf_confirmations": [1], "persistence_bars": [1, 2], "quality_window_bars": [4, 12]}
+        )
+        rows = param_sweep.score_record("k", bars, candles, grid, param_sweep._gate_points(grid))
+        table = param_sweep.rank_table(rows, min_resolved=1)
+
+        self.assertEqual(len(table), 8)
+        self.assertEqual(list(table["rank"]), list(range(1, 9)))
+        self.assertTrue((table["resolved"] <= table["alerts"]).all())
+        self.assertGreater(int(table["resolved"].max()), 0)
+        self.assertTrue(table["accuracy_pct"].iloc[0] >= table["accuracy_pct"].iloc[-1])
+
+    def test_run_sweep_over_recorded_candles(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            rng = np.random.default_rng(12)
+            periods = 3 * 96
+            close = 40000.0 + np.cumsum(rng.normal(0.0, 40.0, periods))
+            df = pd.DataFrame(
+                {
+                    "Open": close + rng.normal(0.0, 15.0, periods),
+                    "High": close + rng.uniform(1.0, 45.0, periods),
+                    "Low": close - rng.uniform(1.0, 45.0, periods),
+                    "Close": close,
+                    "Volume": rng.uniform(10.0, 50.0, periods),
+                },
+                index=pd.date_range("2024-02-01", periods=periods, freq="15min", tz="UTC"),
+            )
+            CandleStore(Path(tmp), max_rows=10**6).save("binance", "BTCUSDT", "15m", df)
+            cfg = {"auto_multi_interval": True, "scan_intervals": ["15m"], "crypto_symbols": ["BTC"], "scan_gold": False}
+            grid = {"min_confidence_score": [60, 85], "min_rr": [1.2], "min_mtf_confirmations": [1, 2], "persistence_bars": [1], "quality_window_bars": [12]}
+
+            table = param_sweep.run_sweep(cfg, Path(tmp), grid=grid, start="2024-02-03 00:00", end="2024-02-03 03:00", workers=1)
+
+        self.assertEqual(list(table.columns), list(param_sweep.SWEEP_COLUMNS))
+        self.assertEqual(set(table["record_key"]), {"Cripto|BTC|BTC-USD|15m"})
+        self.assertEqual(sorted(zip(table["min_confidence_score"], table["min_mtf_confirmations"])), [(60, 1), (60, 2), (85, 1), (85, 2)])
+        self.assertIsNone(sw._VIRTUAL_NOW)
+        self.assertEqual(sw._apply_precision_filters.__name__, "_apply_precision_filters")
+
+
+if __name__ == "__main__":
+    unittest.main()
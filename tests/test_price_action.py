@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import price_action
+from frames import random_ohlcv
+
+
+class PriceActionScanTests(unittest.TestCase):
+    def test_full_history_scan_has_no_lookahead(self):
+        df = random_ohlcv(160, seed=2)
+        df.iloc[40, df.columns.get_loc("High")] = np.nan
+        scan = price_action.scan_price_action(df)
+        scores = price_action.scores_for_direction(scan, "ALCISTA")
+
+        seen = set()
+        for pos in range(len(df)):
+            expected = price_action.price_action_at(price_action.scan_price_action(df.iloc[: pos + 1]), -1, "ALCISTA")
+            got = price_action.price_action_at(scan, pos, "ALCISTA")
+            self.assertEqual(got, expected, pos)
+            self.assertEqual(int(scores[pos]), expected["score"], pos)
+            seen.add(got["pattern"])
+
+        self.assertGreater(len(seen), 4)
+        self.assertEqual(price_action.price_action_at(scan, 1, "ALCISTA")["score"], 0)
+        for name, flags in scan["flags"].items():
+            self.assertEqual(flags.dtype, np.bool_, name)
+            self.assertEqual(len(flags), len(df))
+
+    def test_bias_against_direction_zeroes_score(self):
+        df = pd.DataFrame(
+            {
+                "Open": [10.0, 10.5, 10.1],
+                "High": [10.8, 11.0, 11.6],
+                "Low": [9.9, 10.0, 10.0],
+                "Close": [10.5, 10.2, 11.5],
+            }
+        )
+        scan = price_action.scan_price_action(df)
+
+        self.assertEqual(price_action.PATTERN_NAMES[scan["pattern"][-1]], "envolvente_alcista")
+        self.assertEqual(price_action.price_action_at(scan, -1, "ALCISTA")["score"], 10)
+        bearish = price_action.price_action_at(scan, -1, "BAJISTA")
+        self.assertFalse(bearish["aligned"])
+        self.assertEqual(bearish["score"], 0)
+        self.assertEqual(list(price_action.scores_for_direction(scan, "BAJISTA")), [0, 0, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
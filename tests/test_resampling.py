@@ -0,0 +1,66 @@
+import unittest
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import resampling
+
+
+class ResamplingTests(unittest.TestCase):
+    def _base_15m(self, start: str, periods: int) -> pd.DataFrame:
+        index = pd.date_range(start, periods=periods, freq="15min", tz="UTC")
+        close = [100.0 + i for i in range(periods)]
+        return pd.DataFrame(
+            {
+                "Open": [c - 0.5 for c in close],
+                "High": [c + 1.0 for c in close],
+                "Low": [c - 1.0 for c in close],
+                "Close": close,
+                "Volume": [1.0] * periods,
+            },
+            index=index,
+        )
+
+    def test_resample_aligns_to_epoch_and_drops_partial_head(self):
+        df = self._base_15m("2024-01-01 00:30", 10)  # 00:30 .. 02:45
+
+        out = resampling.resample_ohlcv(
+            df,
+            base_interval="15m",
+            target_interval="1h",
+            now=datetime(2024, 1, 2, tzinfo=timezone.utc),
+        )
+
+        self.assertEqual(list(out.index), list(pd.date_range("2024-01-01 01:00", periods=2, freq="1h", tz="UTC")))
+        first = out.iloc[0]
+        self.assertEqual(first["Open"], df.loc["2024-01-01 01:00", "Open"])
+        self.assertEqual(first["Close"], df.loc["2024-01-01 01:45", "Close"])
+        self.assertEqual(first["High"], df.loc["2024-01-01 01:00":"2024-01-01 01:45", "High"].max())
+        self.assertEqual(first["Volume"], 4.0)
+
+    def test_resample_keeps_forming_bucket_and_drops_stale_incomplete_one(self):
+        df = self._base_15m("2024-01-01 00:00", 6)  # 00:00 .. 01:15
+
+        forming = resampling.resample_ohlcv(
+            df,
+            base_interval="15m",
+            target_interval="1h",
+            now=datetime(2024, 1, 1, 1, 20, tzinfo=timezone.utc),
+        )
+        stale = resampling.resample_ohlcv(
+            df,
+            base_interval="15m",
+            target_interval="1h",
+            now=datetime(2024, 1, 1, 3, 0, tzinfo=timezone.utc),
+        )
+
+        self.assertEqual(len(forming), 2)
+        self.assertEqual(forming.index[-1], pd.Timestamp("2024-01-01 01:00", tz="UTC"))
+        self.assertEqual(len(stale), 1)
+        self.assertFalse(resampling.can_derive("1h", "15m"))
+        self.assertFalse(resampling.can_derive("1h", "1h"))
+        self.assertTrue(resampling.can_derive("1h", "4h"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytz
+
+import scanner_replay
+import scanner_worker as sw
+from candle_store import CandleStore
+
+
+class ScannerReplayTests(unittest.TestCase):
+    def _store_btc(self, root: Path, periods: int = 3 * 96) -> pd.DataFrame:
+        rng = np.random.default_rng(11)
+        close = 40000.0 + np.cumsum(rng.normal(0.0, 40.0, periods))
+        open_ = close + rng.normal(0.0, 15.0, periods)
+        df = pd.DataFrame(
+            {
+                "Open": open_,
+                "High": np.maximum(open_, close) + rng.uniform(1.0, 30.0, periods),
+                "Low": np.minimum(open_, close) - rng.uniform(1.0, 30.0, periods),
+                "Close": close,
+                "Volume": rng.uniform(10.0, 50.0, periods),
+            },
+            index=pd.date_range("2024-02-01", periods=periods, freq="15min", tz="UTC"),
+        )
+        CandleStore(root, max_rows=10**6).save("binance", "BTCUSDT", "15m", df)
+        return df
+
+    def _cfg(self):
+        return {
+            "auto_multi_interval": False,
+            "analysis_mode": "tendencial",
+            "interval": "15m",
+            "scan_crypto": True,
+            "crypto_symbols": ["BTC"],
+            "scan_gold": False,
+            "scan_structural_1d_4h": False,
+        }
+
+    def test_recorded_candles_serve_only_closed_bars_and_derive_missing_intervals(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            df = self._store_btc(Path(tmp))
+            candles = scanner_replay.RecordedCandles(Path(tmp), sw.TD_INTERVAL_MAP)
+            item = sw._build_watchlist(self._cfg())[0]
+
+            now = pytz.UTC.localize(datetime(2024, 2, 2, 10, 14))
+            served, source = candles.closed_until(item, "15m", now)
+            self.assertEqual(source, "binance")
+            self.assertEqual(served.index[-1], pd.Timestamp("2024-02-02 09:45", tz="UTC"))
+
+            hourly, _ = candles.closed_until(item, "1h", now)
+            self.assertEqual(hourly.index[-1], pd.Timestamp("2024-02-02 09:00", tz="UTC"))
+            self.assertEqual(float(hourly["High"].iloc[-1]), float(df.loc["2024-02-02 09:00":"2024-02-02 09:45", "High"].max()))
+
+    def test_replay_drives_one_cycle_per_bar_with_stubbed_notifications(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self._store_btc(Path(tmp))
+            send_email = sw._send_email_alert
+            state, report = scanner_replay.run_replay(
+                self._cfg(), Path(tmp), start="2024-02-03 00:00", end="2024-02-03 06:00", worker=sw
+            )
+
+            self.assertEqual(report["cycles"], 25)
+            self.assertEqual(report["records"], 25)
+            self.assertEqual(report["record_errors"], 0)
+            self.assertGreater(report["bars_per_sec"], 0)
+            self.assertIn("Cripto|BTC|BTC-USD|15m", state["symbols"])
+            self.assertEqual(state["symbols"]["Cripto|BTC|BTC-USD|15m"]["last_gate_bar_utc"], "2024-02-03T05:45:00Z")
+            self.assertIn("total", report["quality_totals"])
+            self.assertIs(sw._send_email_alert, send_email)
+            self.assertIsNone(sw._VIRTUAL_NOW)
+
+
+if __name__ == "__main__":
+    unittest.main()
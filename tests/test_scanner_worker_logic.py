@@ -1,20 +1,31 @@
 import json
 import os
 import tempfile
+import time
 import unittest
 from datetime import datetime, timedelta
 from pathlib import Path
 from types import SimpleNamespace
 from unittest.mock import patch
+import numpy as np
 
 import pandas as pd
 import pytz
 
 import analysis as an
 import scanner_worker as sw
+import streaming_indicators
 
 
 class ScannerWorkerLogicTests(unittest.TestCase):
+    def setUp(self):
+        # candle_store esta activo por defecto: cada test guarda velas en su propio directorio.
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        root_patch = patch.object(sw, "ROOT", Path(tmpdir.name))
+        root_patch.start()
+        self.addCleanup(root_patch.stop)
+
     def _ohlc_df(self, rows):
         return pd.DataFrame(rows, columns=["Open", "High", "Low", "Close"])
 
@@ -829,6 +840,615 @@ class ScannerWorkerLogicTests(unittest.TestCase):
         fetch_mock.assert_called_once_with("BTCUSDT", "15m", limit=500)
         yf_mock.assert_called_once_with("BTC-USD", periodo="5d", intervalo="15m")
 
+    def test_fetch_candles_cached_reuses_fetch_within_cycle(self):
+        item = sw.MarketItem(
+            market="Cripto",
+            label="BTC",
+            ticker="BTC-USD",
+            td_symbol="BTC/USD",
+            kind="crypto",
+            binance_symbol="BTCUSDT",
+        )
+        binance_df = pd.DataFrame(
+            {
+                "Open": [100.0, 101.0, 102.0],
+                "High": [101.0, 102.0, 103.0],
+                "Low": [99.5, 100.5, 101.5],
+                "Close": [100.8, 101.7, 102.6],
+                "Volume": [10.0, 12.0, 11.0],
+            },
+            index=pd.date_range("2024-01-01", periods=3, freq="4h", tz="UTC"),
+        )
+        fetch_cache = sw._new_fetch_cache()
+        cfg = {"resampling": {"enabled": False}}
+
+        with (
+            patch.object(sw, "fetch_klines", return_value=(binance_df, None)) as fetch_mock,
+            patch.object(sw, "obtener_datos") as yf_mock,
+        ):
+            first = sw._fetch_candles_cached(item, period="12mo", interval="4h", cfg=cfg, fetch_cache=fetch_cache)
+            second = sw._fetch_candles_cached(item, period="12mo", interval="4h", cfg=cfg, fetch_cache=fetch_cache)
+            third = sw._fetch_candles_cached(item, period="60d", interval="4h", cfg=cfg, fetch_cache=fetch_cache)
+            other = sw._fetch_candles_cached(item, period="12mo", interval="1d", cfg=cfg, fetch_cache=fetch_cache)
+
+        self.assertIs(first, second)
+        self.assertIs(first, third)
+        self.assertIsNot(first, other)
+        self.assertEqual(first["source"], "binance")
+        self.assertTrue(first["ready_ok"])
+        self.assertEqual(fetch_mock.call_count, 2)
+        yf_mock.assert_not_called()
+
+        stats = sw._fetch_cache_stats(fetch_cache)
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["hit_rate_pct"], 50.0)
+
+    def test_fetch_candles_cached_derives_higher_timeframe_from_base(self):
+        item = sw.MarketItem(
+            market="Cripto",
+            label="BTC",
+            ticker="BTC-USD",
+            td_symbol="BTC/USD",
+            kind="crypto",
+            binance_symbol="BTCUSDT",
+        )
+        base_df = pd.DataFrame(
+            {
+                "Open": [100.0] * 48,
+                "High": [101.0] * 48,
+                "Low": [99.0] * 48,
+                "Close": [100.5] * 48,
+                "Volume": [1.0] * 48,
+            },
+            index=pd.date_range("2024-01-01", periods=48, freq="15min", tz="UTC"),
+        )
+        cfg = {"resampling": {"enabled": True, "base_intervals": ["15m"], "min_rows": 10}}
+        fetch_cache = sw._new_fetch_cache()
+
+        with patch.object(sw, "_fetch_data", return_value=(base_df, "binance", "")) as fetch_mock:
+            base = sw._fetch_candles_cached(item, period="5d", interval="15m", cfg=cfg, fetch_cache=fetch_cache)
+            derived = sw._fetch_candles_cached(item, period="3mo", interval="1h", cfg=cfg, fetch_cache=fetch_cache)
+
+        fetch_mock.assert_called_once()
+        self.assertEqual(fetch_mock.call_args.kwargs["interval"], "15m")
+        self.assertEqual(base["source"], "binance")
+        self.assertEqual(derived["source"], "binance_resample_15m")
+        self.assertEqual(len(derived["df"]), 12)
+        self.assertTrue(derived["ready_ok"])
+
+    def test_fetch_candles_cached_derives_30m_and_4h_with_default_resampling(self):
+        item = sw.MarketItem(
+            market="Cripto",
+            label="BTC",
+            ticker="BTC-USD",
+            td_symbol="BTC/USD",
+            kind="crypto",
+            binance_symbol="BTCUSDT",
+        )
+        calls = []
+
+        def fetch_klines(symbol, interval, limit=500, start_time=None):
+            calls.append((interval, limit))
+            freq = {"15m": "15min", "1h": "1h", "1d": "1D"}[interval]
+            end = pd.Timestamp.now(tz="UTC").floor(freq)
+            return pd.DataFrame(
+                {"Open": 100.0, "High": 101.0, "Low": 99.0, "Close": 100.5, "Volume": 1.0},
+                index=pd.date_range(end=end, periods=limit, freq=freq),
+            ), None
+
+        cfg = {"resampling": sw._default_config()["resampling"], "candle_store": {"enabled": False}}
+        fetch_cache = sw._new_fetch_cache()
+        with patch.object(sw, "fetch_klines", side_effect=fetch_klines):
+            out = {
+                interval: sw._fetch_candles_cached(
+                    item, period=sw._period_for_interval(interval), interval=interval, cfg=cfg, fetch_cache=fetch_cache
+                )
+                for interval in ("15m", "30m", "1h", "4h", "1d")
+            }
+
+        self.assertEqual(calls, [("15m", 1000), ("1h", 1000), ("1d", 500)])
+        self.assertEqual(out["30m"]["source"], "binance_resample_15m")
+        self.assertEqual(out["4h"]["source"], "binance_resample_1h")
+        self.assertEqual(out["1d"]["source"], "binance")
+        self.assertGreaterEqual(len(out["4h"]["df_ready"]), 200)
+        # La base analizada conserva el recorte por temporalidad.
+        self.assertEqual(len(out["15m"]["df"]), 720)
+        self.assertEqual(sw._resolve_resampling_cfg({}), sw._resolve_resampling_cfg(cfg))
+
+    def test_resampled_forming_bucket_follows_virtual_clock(self):
+        item = sw.MarketItem(market="Cripto", label="BTC", ticker="BTC-USD", td_symbol="BTC/USD", kind="crypto", binance_symbol="BTCUSDT")
+        now = datetime(2024, 3, 1, 2, 30)
+
+        def fetch_klines(symbol, interval, limit=500, start_time=None):
+            return pd.DataFrame(
+                {"Open": 100.0, "High": 101.0, "Low": 99.0, "Close": 100.5, "Volume": 1.0},
+                index=pd.date_range(end=pd.Timestamp("2024-03-01 02:00", tz="UTC"), periods=limit, freq="1h"),
+            ), None
+
+        cfg = {"resampling": sw._default_config()["resampling"], "candle_store": {"enabled": False}}
+        sw.set_virtual_clock(now)
+        try:
+            with patch.object(sw, "fetch_klines", side_effect=fetch_klines):
+                out = sw._fetch_candles_cached(item, period="60d", interval="4h", cfg=cfg, fetch_cache=sw._new_fetch_cache())
+        finally:
+            sw.set_virtual_clock(None)
+
+        # El bucket 00:00-04:00 sigue abierto a las 02:30 virtuales: se conserva y se recorta como vela en formacion.
+        self.assertEqual(out["source"], "binance_resample_1h")
+        self.assertEqual(out["df"].index[-1], pd.Timestamp("2024-03-01 00:00", tz="UTC"))
+        self.assertTrue(out["open_candle_trimmed"])
+
+    def test_bar_close_scheduler_wakes_only_targets_whose_bar_closed(self):
+        start = datetime(2024, 1, 1, 0, 5, tzinfo=pytz.UTC).timestamp()
+        targets = [
+            {"mode": "tendencial", "interval": "15m", "key": "15m"},
+            {"mode": "tendencial", "interval": "4h", "key": "4h"},
+            {"mode": "estructural", "interval": "1D + 4H", "key": "1d_4h"},
+        ]
+        scheduler = sw.BarCloseScheduler(targets, grace_seconds=10, now=start)
+
+        self.assertEqual(scheduler.next_due(), start + 10 * 60 + 10)
+        self.assertEqual(scheduler.pop_due(start + 60), set())
+        self.assertEqual(scheduler.pop_due(start + 10 * 60 + 10), {"15m"})
+        self.assertEqual(scheduler.next_due(), start + 25 * 60 + 10)
+
+        four_hours_close = datetime(2024, 1, 1, 4, 0, 10, tzinfo=pytz.UTC).timestamp()
+        self.assertEqual(scheduler.pop_due(four_hours_close), {"15m", "4h", "1d_4h"})
+        self.assertEqual(scheduler.next_due(), four_hours_close + 15 * 60)
+        self.assertEqual(sw._resolve_scheduler_cfg({})["mode"], "bar_close")
+        self.assertEqual(sw._resolve_scheduler_cfg(sw._default_config())["mode"], "bar_close")
+        self.assertEqual(sw._resolve_scheduler_cfg({"scheduler": {"mode": "poll"}})["mode"], "poll")
+
+    def test_evaluate_record_estado_reuses_cache_when_last_closed_bar_unchanged(self):
+        item = sw.MarketItem(
+            market="Cripto",
+            label="BTC",
+            ticker="BTC-USD",
+            td_symbol="BTC/USD",
+            kind="crypto",
+            binance_symbol="BTCUSDT",
+        )
+        frame = pd.DataFrame(
+            {"Open": [1.0, 2.0], "High": [2.0, 3.0], "Low": [0.5, 1.5], "Close": [1.5, 2.5]},
+            index=pd.date_range("2024-01-01", periods=2, freq="15min", tz="UTC"),
+        )
+        changed = frame.copy()
+        changed.iloc[-1, changed.columns.get_loc("Close")] = 2.6
+        inputs = {"mode": "tendencial", "interval": "15m", "frames": [frame], "open_candle_trimmed": True, "source": "binance"}
+        changed_inputs = dict(inputs, frames=[changed])
+        record_key = "Cripto|BTC|BTC-USD|15m"
+
+        with (
+            patch.dict(sw._RECORD_EVAL_CACHE, {}, clear=True),
+            patch.object(sw, "_fetch_estado_inputs", side_effect=[(inputs, ""), (inputs, ""), (changed_inputs, "")]),
+            patch.object(sw, "_compute_estado_from_inputs", return_value=({"score": 1}, "binance", "", {"interval": "15m"})) as compute_mock,
+        ):
+            first = sw._evaluate_record_estado(item, {}, "tendencial", "15m", None, record_key, use_eval_cache=True)
+            sw._RECORD_EVAL_CACHE[record_key] = {
+                "bar_fp": first[4],
+                "estado": {"score": 1},
+                "source": "binance",
+                "ctx": {"interval": "15m"},
+            }
+            second = sw._evaluate_record_estado(item, {}, "tendencial", "15m", None, record_key, use_eval_cache=True)
+            third = sw._evaluate_record_estado(item, {}, "tendencial", "15m", None, record_key, use_eval_cache=True)
+
+        self.assertFalse(first[5])
+        self.assertTrue(second[5])
+        self.assertEqual(second[0], {"score": 1})
+        self.assertEqual(second[4], first[4])
+        self.assertFalse(third[5])
+        self.assertNotEqual(third[4], first[4])
+        self.assertEqual(compute_mock.call_count, 2)
+
+    def test_eval_cache_keys_on_global_quality_and_skips_partial_filters(self):
+        record = {"quality_stats": {"resolved": 3}}
+        resolved = {"quality_stats": {"resolved": 20, "wins": 15, "losses": 5, "accuracy_pct": 75.0}}
+        state = {"quality_epoch": 1, "symbols": {"A": record}}
+        base = sw._precision_fingerprint("bar", {"min_rr": 1.8}, record, state)
+        other_record_resolved = {"quality_epoch": 2, "symbols": {"A": record, "B": resolved}}
+
+        self.assertEqual(sw._precision_fingerprint("bar", {"min_rr": 1.8}, record, dict(state)), base)
+        self.assertNotEqual(sw._precision_fingerprint("bar", {"min_rr": 1.8}, record, other_record_resolved), base)
+        self.assertFalse(sw._precision_is_partial({"structural_error": "", "mtf": {"errors": 0}}))
+        self.assertTrue(sw._precision_is_partial({"structural_error": "structural_context_fetch_failed", "mtf": {}}))
+        self.assertTrue(sw._precision_is_partial({"structural_error": "", "mtf": {"errors": 1}}))
+        self.assertTrue(sw._eval_cache_enabled({"eval_cache": {"enabled": True}}))
+        self.assertTrue(sw._eval_cache_enabled({}))
+        self.assertFalse(sw._eval_cache_enabled({"eval_cache": {"enabled": False}}))
+        self.assertFalse(sw._eval_cache_enabled({"eval_cache": {"enabled": True}, "resource_profile": "render_512mb"}))
+
+    def test_compute_estados_parallel_dedupes_inflight_fetches(self):
+        items = [
+            sw.MarketItem(
+                market="Cripto",
+                label=label,
+                ticker=f"{label}-USD",
+                td_symbol=f"{label}/USD",
+                kind="crypto",
+                binance_symbol=f"{label}USDT",
+            )
+            for label in ("BTC", "ETH", "SOL")
+        ]
+        df = pd.DataFrame(
+            {"Open": [1.0, 1.0, 1.0], "High": [1.0, 1.0, 1.0], "Low": [1.0, 1.0, 1.0], "Close": [1.0, 1.0, 1.0]},
+            index=pd.date_range("2024-01-01", periods=3, freq="15min", tz="UTC"),
+        )
+        calls = []
+
+        def slow_fetch(item, period, interval, cfg=None):
+            calls.append((item.label, interval))
+            time.sleep(0.2)
+            return df, "binance", ""
+
+        def fake_estado(item, cfg, forced_mode=None, forced_interval=None, fetch_cache=None, record_key="", use_eval_cache=False):
+            candles = sw._fetch_candles_cached(item, period="5d", interval="15m", cfg=cfg, fetch_cache=fetch_cache)
+            return {"label": item.label, "target": forced_mode}, candles["source"], "", {}, "", False
+
+        tasks = []
+        for item in items:
+            tasks.append((f"{item.state_key}|15m", item, "tendencial", "15m"))
+            tasks.append((f"{item.state_key}|15m_bis", item, "tendencial", "15m"))
+
+        fetch_cache = sw._new_fetch_cache()
+        with (
+            patch.object(sw, "_fetch_data", side_effect=slow_fetch),
+            patch.object(sw, "_evaluate_record_estado", side_effect=fake_estado),
+        ):
+            started = time.perf_counter()
+            results = sw._compute_estados_parallel(
+                tasks, cfg={"resampling": {"enabled": False}}, fetch_cache=fetch_cache, max_workers=6
+            )
+            elapsed = time.perf_counter() - started
+
+        self.assertEqual(list(results.keys()), [task[0] for task in tasks])
+        self.assertEqual(results[tasks[2][0]][0]["label"], "ETH")
+        self.assertEqual(sorted(calls), [("BTC", "15m"), ("ETH", "15m"), ("SOL", "15m")])
+        self.assertLess(elapsed, 0.5)
+        stats = sw._fetch_cache_stats(fetch_cache)
+        self.assertEqual(stats["misses"], 3)
+        self.assertEqual(stats["hits"], 3)
+        self.assertTrue(sw._resolve_parallel_fetch_cfg({})["enabled"])
+        self.assertFalse(sw._resolve_parallel_fetch_cfg({"parallel_fetch": {"enabled": False}})["enabled"])
+
+    def test_compute_estados_parallel_prefetches_mtf_and_structural_context(self):
+        items = [
+            sw.MarketItem(market="Cripto", label=label, ticker=f"{label}-USD", td_symbol=f"{label}/USD", kind="crypto", binance_symbol=f"{label}USDT")
+            for label in ("BTC", "ETH")
+        ]
+        df = pd.DataFrame(
+            {"Open": [1.0, 1.0], "High": [1.0, 1.0], "Low": [1.0, 1.0], "Close": [1.0, 1.0]},
+            index=pd.date_range("2024-01-01", periods=2, freq="15min", tz="UTC"),
+        )
+        calls = []
+
+        def slow_fetch(item, period, interval, cfg=None):
+            calls.append((item.label, interval))
+            time.sleep(0.2)
+            return df, "binance", ""
+
+        def fake_estado(item, cfg, forced_mode=None, forced_interval=None, fetch_cache=None, record_key="", use_eval_cache=False):
+            candles = sw._fetch_candles_cached(item, period="5d", interval="15m", cfg=cfg, fetch_cache=fetch_cache)
+            return {"label": item.label}, candles["source"], "", {}, "", False
+
+        precision_cfg = sw._resolve_precision_cfg({})
+        tasks = [(f"{item.state_key}|15m", item, "tendencial", "15m") for item in items]
+        context = [spec for item in items for spec in sw._context_fetch_specs(item, "tendencial", "15m", precision_cfg)]
+        self.assertEqual([spec[2] for spec in context[:3]], ["1d", "4h", "1h"])
+        self.assertEqual(sw._context_fetch_specs(items[0], "estructural", "4h", precision_cfg), [])
+
+        fetch_cache = sw._new_fetch_cache()
+        cfg = {"resampling": {"enabled": False}}
+        with (
+            patch.object(sw, "_fetch_data", side_effect=slow_fetch),
+            patch.object(sw, "_evaluate_record_estado", side_effect=fake_estado),
+        ):
+            started = time.perf_counter()
+            sw._compute_estados_parallel(tasks, cfg=cfg, fetch_cache=fetch_cache, max_workers=8, context_fetches=context)
+            elapsed = time.perf_counter() - started
+            sw._fetch_structural_candles(items[1], cfg=cfg, fetch_cache=fetch_cache)
+
+        self.assertEqual(len(calls), 8)
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual(sw._fetch_cache_stats(fetch_cache)["misses"], 8)
+
+    def test_mtf_direction_reuses_streaming_indicator_engine(self):
+        item = sw.MarketItem(market="Cripto", label="BTC", ticker="BTC-USD", td_symbol="BTC/USD", kind="crypto", binance_symbol="BTCUSDT")
+        rng = np.random.default_rng(11)
+        close = 100.0 + np.cumsum(rng.normal(0.0, 1.0, 261))
+        full = pd.DataFrame(
+            {"Open": close, "High": close + 0.5, "Low": close - 0.5, "Close": close, "Volume": 1.0},
+            index=pd.date_range("2024-01-01", periods=261, freq="1h", tz="UTC"),
+        )
+        cfg = {"streaming_indicators": {"enabled": True, "snapshot_dir": ""}, "resampling": {"enabled": False}}
+
+        with (
+            patch.dict(streaming_indicators._ENGINES, {}, clear=True),
+            patch.object(sw, "_fetch_data", side_effect=[(full.iloc[:260], "binance", ""), (full, "binance", "")]),
+        ):
+            for _ in range(2):
+                res = sw._compute_interval_direction(
+                    item, "1h", cache={}, require_closed_candle=False, grace_seconds=10, cfg=cfg, fetch_cache=sw._new_fetch_cache()
+                )
+                self.assertTrue(res["ok"])
+            engine = streaming_indicators._ENGINES[sw._indicator_engine_key(item, "1h", "binance", sw._period_for_interval("1h"))]
+
+        # Una sola siembra completa; la segunda llamada solo procesa la vela nueva.
+        self.assertEqual((engine.incremental_bars, engine.reseeds), (1, 1))
+
+    def test_indicator_engine_key_separates_period_series(self):
+        item = sw.MarketItem(market="Cripto", label="BTC", ticker="BTC-USD", td_symbol="BTC/USD", kind="crypto", binance_symbol="BTCUSDT")
+        self.assertEqual(sw._indicator_engine_key(item, "4h", "binance", "60d"), sw._indicator_engine_key(item, "4h", "binance", "12mo"))
+        self.assertEqual(
+            sw._indicator_engine_key(item, "4h", "binance_resample_1h", "60d"),
+            sw._indicator_engine_key(item, "4h", "binance_resample_1h", "12mo"),
+        )
+        self.assertNotEqual(sw._indicator_engine_key(item, "4h", "yfinance", "60d"), sw._indicator_engine_key(item, "4h", "yfinance", "12mo"))
+        self.assertNotEqual(sw._indicator_engine_key(item, "4h", "binance", "12mo"), sw._indicator_engine_key(item, "4h", "yfinance", "12mo"))
+
+    def test_compute_estados_parallel_batches_indicators_across_symbols(self):
+        rng = np.random.default_rng(4)
+        index = pd.date_range("2024-01-01", periods=260, freq="15min", tz="UTC")
+        tasks = []
+        inputs_by_label = {}
+        for label in ("BTC", "ETH", "SOL"):
+            item = sw.MarketItem(
+                market="Cripto",
+                label=label,
+                ticker=f"{label}-USD",
+                td_symbol=f"{label}/USD",
+                kind="crypto",
+                binance_symbol=f"{label}USDT",
+            )
+            close = 100.0 + np.cumsum(rng.normal(0.0, 1.0, len(index)))
+            frame = pd.DataFrame(
+                {"Open": close, "High": close + 0.8, "Low": close - 0.8, "Close": close, "Volume": 1.0},
+                index=index,
+            )
+            inputs_by_label[label] = {"mode": "tendencial", "interval": "15m", "frames": [frame], "source": "binance"}
+            tasks.append((f"{item.state_key}|15m", item, "tendencial", "15m"))
+
+        def fake_inputs(item, cfg, forced_mode=None, forced_interval=None, fetch_cache=None):
+            return dict(inputs_by_label[item.label]), ""
+
+        cfg = {"indicator_kernel": "numpy", "streaming_indicators": {"enabled": False}}
+        batch_cfg = sw._resolve_batch_indicators_cfg(dict(cfg, batch_indicators={"enabled": True}))
+        stats = {}
+        with (
+            patch.object(sw, "_fetch_estado_inputs", side_effect=fake_inputs),
+            patch.object(sw, "calcular_indicadores_batch", wraps=sw.calcular_indicadores_batch) as batch_mock,
+        ):
+            batched = sw._compute_estados_parallel(tasks, cfg=cfg, fetch_cache={}, max_workers=3, batch_cfg=batch_cfg, stats=stats)
+            single = sw._compute_estados_parallel(tasks, cfg=cfg, fetch_cache={}, max_workers=3)
+
+        self.assertTrue(batch_cfg["enabled"])
+        self.assertIs(sw._indicator_kernel({}), sw.calcular_indicadores_np)
+        self.assertTrue(sw._resolve_streaming_indicators_cfg({})["enabled"])
+        self.assertIs(sw._indicator_kernel({"indicator_kernel": "pandas"}), sw.calcular_indicadores)
+        defaults = sw._default_config()
+        self.assertFalse(sw._resolve_batch_indicators_cfg(defaults)["enabled"])
+        defaults["batch_indicators"]["enabled"] = True
+        defaults["streaming_indicators"]["enabled"] = False
+        self.assertTrue(sw._resolve_batch_indicators_cfg(defaults)["enabled"])
+        self.assertEqual(batch_mock.call_count, 1)
+        self.assertEqual(stats["batched_frames"], 3)
+        for record_key, *_ in tasks:
+            estado, _, err, ctx, _, _ = batched[record_key]
+            self.assertEqual(err, "")
+            self.assertIn("ATR", ctx["df_ind"].columns)
+            for key in ("direccion_v13", "decision", "precio_alerta", "indice_alerta_utc"):
+                self.assertEqual(estado.get(key), single[record_key][0].get(key), key)
+
+    def test_fetch_data_serves_crypto_from_binance_feed_and_repairs_after_reconnect(self):
+        item = sw.MarketItem(
+            market="Cripto",
+            label="BTC",
+            ticker="BTC-USD",
+            td_symbol="BTC/USD",
+            kind="crypto",
+            binance_symbol="BTCUSDT",
+        )
+        seed_df = pd.DataFrame(
+            {
+                "Open": [100.0, 101.0],
+                "High": [101.0, 102.0],
+                "Low": [99.5, 100.5],
+                "Close": [100.8, 101.7],
+                "Volume": [10.0, 12.0],
+            },
+            index=pd.to_datetime([0, 900_000], unit="ms", utc=True),
+        )
+        rest_calls = []
+
+        def rest_fetch(symbol, interval, limit=500, start_time=None):
+            rest_calls.append((symbol, interval, start_time))
+            return seed_df, None
+
+        feed = sw.BinanceKlineFeed(["BTCUSDT"], ["15m"], rest_fetch=rest_fetch)
+        feed._set_connected(True)
+        kline = {"s": "BTCUSDT", "i": "15m", "t": 1_800_000, "o": "101.7", "h": "103", "l": "101", "c": "102.5", "v": "4", "x": False}
+
+        with (
+            patch.object(sw, "_BINANCE_FEED", feed),
+            patch.object(sw, "fetch_klines") as fetch_mock,
+        ):
+            first, source, err = sw._fetch_data(item=item, period="5d", interval="15m", cfg={})
+            feed.apply_kline(kline)
+            second, _, _ = sw._fetch_data(item=item, period="5d", interval="15m", cfg={})
+            feed._set_connected(False)
+            feed._set_connected(True)
+            sw._fetch_data(item=item, period="5d", interval="15m", cfg={})
+
+        fetch_mock.assert_not_called()
+        self.assertEqual(source, "binance")
+        self.assertEqual(err, "")
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 3)
+        self.assertEqual(float(second["Close"].iloc[-1]), 102.5)
+        self.assertEqual(rest_calls, [("BTCUSDT", "15m", None), ("BTCUSDT", "15m", 1_800_000)])
+        stats = feed.stats()
+        self.assertEqual(stats["rest_seeds"], 1)
+        self.assertEqual(stats["rest_repairs"], 1)
+        self.assertEqual(stats["reconnects"], 1)
+        self.assertTrue(sw._resolve_binance_stream_cfg({})["enabled"])
+        self.assertFalse(sw._resolve_binance_stream_cfg({"binance_stream": {"enabled": False}})["enabled"])
+
+    def test_binance_feed_repairs_from_last_bar_before_disconnect(self):
+        step = 900_000
+
+        def frame(opens):
+            return pd.DataFrame(
+                {"Open": 1.0, "High": 2.0, "Low": 0.5, "Close": [float(ms // step) for ms in opens], "Volume": 1.0},
+                index=pd.to_datetime(opens, unit="ms", utc=True),
+            )
+
+        rest_calls = []
+
+        def rest_fetch(symbol, interval, limit=500, start_time=None):
+            rest_calls.append(start_time)
+            if start_time is None:
+                return frame([0, step]), None
+            return frame([ms for ms in range(0, 6 * step, step) if ms >= start_time]), None
+
+        feed = sw.BinanceKlineFeed(["BTCUSDT"], ["15m"], rest_fetch=rest_fetch)
+        feed._set_connected(True)
+        self.assertEqual(len(feed.get_df("BTCUSDT", "15m")), 2)
+        feed._set_connected(False)
+        feed._set_connected(True)
+        # Llega una vela en vivo despues de reconectar y antes de que se pida el par.
+        feed.apply_kline({"s": "BTCUSDT", "i": "15m", "t": 5 * step, "o": "1", "h": "2", "l": "0.5", "c": "5", "v": "1", "x": False})
+        df = feed.get_df("BTCUSDT", "15m")
+
+        self.assertEqual(rest_calls, [None, step])
+        self.assertEqual([int(ts.timestamp() * 1000) for ts in df.index], list(range(0, 6 * step, step)))
+        self.assertEqual(feed.stats()["pending_repairs"], 0)
+
+    def test_binance_feed_pages_long_gaps_and_reseeds_when_too_long(self):
+        step = 900_000
+
+        def frame(opens):
+            return pd.DataFrame(
+                {"Open": 1.0, "High": 2.0, "Low": 0.5, "Close": [float(ms // step) for ms in opens], "Volume": 1.0},
+                index=pd.to_datetime(opens, unit="ms", utc=True),
+            )
+
+        now_bar = {"value": 1}
+        rest_calls = []
+
+        def rest_fetch(symbol, interval, limit=500, start_time=None):
+            rest_calls.append((limit, start_time))
+            last = now_bar["value"]
+            first = max(0, last - limit + 1) if start_time is None else start_time // step
+            return frame([i * step for i in range(first, min(last, first + limit - 1) + 1)]), None
+
+        feed = sw.BinanceKlineFeed(["BTCUSDT"], ["15m"], max_bars=200, rest_fetch=rest_fetch)
+        feed._set_connected(True)
+        self.assertEqual(len(feed.get_df("BTCUSDT", "15m", limit=100)), 2)
+        self.assertEqual(rest_calls, [(100, None)])
+
+        # Hueco de 150 velas: dos paginas de 100 hasta llegar a la vela en vivo.
+        feed._set_connected(False)
+        feed._set_connected(True)
+        now_bar["value"] = 151
+        feed.apply_kline({"s": "BTCUSDT", "i": "15m", "t": 151 * step, "o": "1", "h": "2", "l": "0.5", "c": "151", "v": "1", "x": False})
+        df = feed.get_df("BTCUSDT", "15m", limit=100)
+        self.assertEqual(rest_calls[1:], [(100, step), (100, 100 * step)])
+        self.assertEqual([int(ts.timestamp() * 1000) for ts in df.index], [i * step for i in range(0, 152)])
+
+        # Hueco mayor que max_bars: se descarta lo guardado y se siembra de nuevo.
+        feed._set_connected(False)
+        feed._set_connected(True)
+        now_bar["value"] = 1000
+        del rest_calls[:]
+        df = feed.get_df("BTCUSDT", "15m", limit=100)
+        self.assertEqual(rest_calls, [(100, 151 * step), (100, 250 * step), (100, None)])
+        self.assertEqual([int(ts.timestamp() * 1000) for ts in df.index], [i * step for i in range(901, 1001)])
+        self.assertEqual(feed.stats()["rest_reseeds"], 1)
+        self.assertEqual(feed.stats()["pending_repairs"], 0)
+
+        # Pedir mas velas que la siembra vuelve a sembrar con ese largo.
+        del rest_calls[:]
+        self.assertEqual(len(feed.get_df("BTCUSDT", "15m", limit=200)), 200)
+        self.assertEqual(rest_calls, [(200, None)])
+
+    def test_binance_feed_splits_streams_per_socket(self):
+        symbols = [f"S{i}USDT" for i in range(700)]
+        feed = sw.BinanceKlineFeed(symbols, ["15m", "1h"])
+        urls = feed.stream_urls()
+        self.assertEqual([len(url.split("streams=", 1)[1].split("/")) for url in urls], [1024, 376])
+
+        feed._set_connected(True, chunk=0)
+        self.assertFalse(feed.is_live())
+        feed._set_connected(True, chunk=1)
+        self.assertTrue(feed.is_live())
+        self.assertEqual(feed.stats()["connected_sockets"], 2)
+        self.assertEqual(feed.stats()["reconnects"], 0)
+
+    def test_stored_gap_bars_follows_virtual_clock(self):
+        stored = pd.DataFrame({"Close": [1.0]}, index=pd.to_datetime(["2024-01-01 00:00"], utc=True))
+        sw.set_virtual_clock(datetime(2024, 1, 1, 1, 0))
+        try:
+            self.assertEqual(sw._stored_gap_bars(stored, "15m"), 5)
+        finally:
+            sw.set_virtual_clock(None)
+
+    def test_fetch_data_with_candle_store_requests_only_new_bars(self):
+        item = sw.MarketItem(
+            market="Cripto",
+            label="BTC",
+            ticker="BTC-USD",
+            td_symbol="BTC/USD",
+            kind="crypto",
+            binance_symbol="BTCUSDT",
+        )
+        last_open = pd.Timestamp.now(tz="UTC").floor("15min") - pd.Timedelta(minutes=15)
+        full_df = pd.DataFrame(
+            {
+                "Open": [100.0, 101.0, 102.0],
+                "High": [101.0, 102.0, 103.0],
+                "Low": [99.5, 100.5, 101.5],
+                "Close": [100.8, 101.7, 102.2],
+                "Volume": [10.0, 12.0, 5.0],
+            },
+            index=pd.date_range(end=last_open, periods=3, freq="15min"),
+        )
+        fresh_df = pd.DataFrame(
+            {
+                "Open": [102.0, 102.6],
+                "High": [103.5, 103.0],
+                "Low": [101.5, 102.1],
+                "Close": [102.6, 102.9],
+                "Volume": [11.0, 2.0],
+            },
+            index=pd.date_range(start=last_open, periods=2, freq="15min"),
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cfg = {"candle_store": {"enabled": True, "dir": tmp, "max_rows": 1000}}
+            with (
+                patch.object(sw, "fetch_klines", side_effect=[(full_df, None), (fresh_df, None)]) as fetch_mock,
+                patch.object(sw, "obtener_datos") as yf_mock,
+            ):
+                first, source_first, _ = sw._fetch_data(item=item, period="5d", interval="15m", cfg=cfg)
+                second, source_second, _ = sw._fetch_data(item=item, period="5d", interval="15m", cfg=cfg)
+
+            stored = sw._candle_store_from_cfg(cfg).load("binance", "BTCUSDT", "15m")
+
+        self.assertEqual(source_first, "binance")
+        self.assertEqual(source_second, "binance")
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 4)
+        self.assertEqual(float(second.loc[last_open, "Close"]), 102.6)
+        self.assertEqual(len(stored), 4)
+        self.assertEqual(fetch_mock.call_args_list[0].kwargs, {"limit": 500})
+        self.assertEqual(
+            fetch_mock.call_args_list[1].kwargs,
+            {"limit": 500, "start_time": int(last_open.timestamp() * 1000)},
+        )
+        yf_mock.assert_not_called()
+
     def test_format_colombia_alert_time_uses_bogota_timezone(self):
         self.assertEqual(sw._format_colombia_alert_time("2026-03-28T19:35:00Z"), "2026-03-28 14:35")
 
@@ -1289,6 +1909,213 @@ class ScannerWorkerLogicTests(unittest.TestCase):
             else:
                 os.environ[key] = prev
 
+    def test_quality_rr_window_matches_history_rescan(self):
+        def rescan(history, bucket=""):
+            values = [
+                float(event["rr_estimado"])
+                for event in history
+                if (not bucket or event["setup_bucket"] == bucket)
+                and event["status"] in {"win", "loss", "timeout"}
+                and float(event["rr_estimado"]) > 0
+            ]
+            return (round(sum(values) / len(values), 3), len(values)) if values else (0.0, 0)
+
+        rng = np.random.default_rng(5)
+        record = {}
+        buckets = ["continuidad_alcista", "pullback_bajista", "sin_setup"]
+        for pos in range(400):
+            status = str(rng.choice(["win", "loss", "timeout"]))
+            event = {
+                "alert_id": f"a{pos}",
+                "status": status,
+                "closed_utc": f"2026-03-{1 + pos // 96:02d}T00:00:00Z",
+                "setup_bucket": buckets[pos % 3],
+                "rr_estimado": float(rng.choice([0.0, -1.0, round(float(rng.uniform(0.5, 3.5)), 4)])),
+            }
+            sw._append_quality_event(record, event)
+            sw._update_quality_stats(record, status, setup_bucket=event["setup_bucket"])
+            if pos % 37 == 0:
+                history = record["quality_history"]
+                metrics = sw._quality_metrics_from_record(record)
+                self.assertEqual((metrics["rr_avg"], metrics["rr_samples"]), rescan(history))
+                bucket_metrics = sw._quality_metrics_from_record(record, setup_bucket=buckets[0])
+                self.assertEqual((bucket_metrics["rr_avg"], bucket_metrics["rr_samples"]), rescan(history, buckets[0]))
+                stats = record["quality_stats_by_setup"][event["setup_bucket"]] if event["setup_bucket"] != "sin_setup" else record["quality_stats"]
+                expected = rescan(history, event["setup_bucket"]) if event["setup_bucket"] != "sin_setup" else rescan(history)
+                self.assertEqual((stats["rr_avg"], stats["rr_samples"]), expected)
+
+        self.assertEqual(len(record["quality_history"]), sw.QUALITY_HISTORY_LIMIT)
+        # Historial reemplazado por fuera (semilla, edicion manual): la ventana se reconstruye.
+        record["quality_history"] = record["quality_history"][:50]
+        self.assertEqual(sw._quality_metrics_from_record(record)["rr_samples"], rescan(record["quality_history"])[1])
+
+    def test_global_quality_aggregate_cached_until_outcome_lands(self):
+        state = {"quality_epoch": 0, "symbols": {"A": {"quality_stats": {"wins": 3, "losses": 1, "timeouts": 0}}}}
+        first = sw._aggregate_quality_stats(state)
+        state["symbols"]["A"]["quality_stats"]["wins"] = 9
+        self.assertEqual(sw._aggregate_quality_stats(state), first)
+        state["quality_epoch"] += 1
+        self.assertEqual(sw._aggregate_quality_stats(state)["wins"], 9)
+        uncached = {"symbols": {"A": {"quality_stats": {"wins": 1}}}}
+        self.assertEqual(sw._aggregate_quality_stats(uncached)["wins"], 1)
+
+    def test_global_quality_aggregate_keeps_running_sums_per_record(self):
+        state = {"quality_epoch": 0, "symbols": {}}
+        for pos in range(5):
+            record = {}
+            sw._append_quality_event(record, {"alert_id": f"a{pos}", "status": "win", "rr_estimado": 2.0})
+            sw._update_quality_stats(record, "win")
+            state["symbols"][f"K{pos}"] = record
+        self.assertEqual(sw._aggregate_quality_stats(state)["wins"], 5)
+
+        record = state["symbols"]["K2"]
+        sw._append_quality_event(record, {"alert_id": "b", "status": "loss", "rr_estimado": 1.0})
+        sw._update_quality_stats(record, "loss")
+        sw._bump_quality_epoch(state, "K2")
+        state["symbols"]["K5"] = {"quality_stats": {"wins": 1}}
+        del state["symbols"]["K0"]
+        with patch.object(sw, "_quality_contribution", wraps=sw._quality_contribution) as contribution:
+            running = sw._aggregate_quality_stats(state)
+        self.assertEqual(sorted(call.args[0] is record for call in contribution.call_args_list), [False, True])
+        self.assertEqual(running, sw._compute_aggregate_quality_stats(state["symbols"]))
+        self.assertEqual((running["wins"], running["losses"], running["rr_avg"]), (5, 1, 1.8))
+
+    def test_notify_dispatcher_resolver_defaults_match_default_config(self):
+        resolved = sw._resolve_notify_dispatcher_cfg({})
+        defaults = sw._default_config()["notification"]["dispatcher"]
+        self.assertTrue(resolved["enabled"])
+        self.assertEqual(resolved, {key: defaults[key] for key in resolved})
+        self.assertFalse(sw._resolve_notify_dispatcher_cfg({"notification": {"dispatcher": {"enabled": False}}})["enabled"])
+
+    def test_async_alert_delivery_keeps_free_daily_limit_and_writes_back(self):
+        item = sw.MarketItem(market="Cripto", label="BTC", ticker="BTC-USD", td_symbol="BTC/USD", kind="crypto")
+        users = [
+            {"id": "free1", "chat_id": "42", "email": "", "es_premium": False},
+            {"id": "vip1", "chat_id": "43", "email": "vip@example.com", "es_premium": True},
+        ]
+        state = {"symbols": {}}
+        telegram_calls = []
+        release = sw.threading.Event()
+
+        def fake_telegram(cfg, subject, body, chat_ids_override=None, item=None, priority=0):
+            telegram_calls.append((*(chat_ids_override or []), priority))
+            release.wait(5)
+            return True, ""
+
+        cfg = {"notification": {"dispatcher": {"enabled": True, "workers": 4}}}
+        sw._start_notify_dispatcher(cfg)
+        try:
+            with (
+                patch.object(sw, "_send_telegram_alert", side_effect=fake_telegram),
+                patch.object(sw, "_send_email_alert", return_value=(False, "SMTP no configurado")),
+                patch.object(sw, "_send_windows_toast", return_value=(True, "")) as toast,
+            ):
+                metrics = sw._new_cycle_metrics()
+                batches = []
+                # Dos registros del mismo mercado/temporalidad (p.ej. scan target forzado) en el mismo ciclo.
+                for record_key in ("Cripto|BTC|BTC-USD|15m", "Cripto|BTC|BTC-USD|15m_b"):
+                    state["symbols"][record_key] = {}
+                    batch = sw._build_alert_delivery(
+                        cfg,
+                        item,
+                        "BTC",
+                        "cuerpo",
+                        state=state,
+                        record=state["symbols"][record_key],
+                        record_key=record_key,
+                        target_key="15m",
+                        market_key="Cripto|BTC|15m",
+                        user_targets=users,
+                        telegram_broadcast_ids=["42", "99"],
+                        snapshot={"alert_id": record_key, "status": "open"},
+                    )
+                    self.assertIsNone(sw._dispatch_alert_delivery(state, batch, metrics))
+                    batches.append(batch)
+
+                self.assertEqual([u["user_id"] for u in batches[1].context["users"]], ["vip1"])
+                self.assertTrue(state["symbols"]["Cripto|BTC|BTC-USD|15m"]["last_notify"]["queued"])
+                release.set()
+                self.assertTrue(sw._NOTIFY_DISPATCHER.wait_idle(5))
+                self.assertEqual(sw._drain_notification_results(state, metrics), 2)
+        finally:
+            sw._stop_notify_dispatcher(timeout=5)
+            sw._FREE_ALERT_RESERVATIONS.clear()
+
+        first = state["symbols"]["Cripto|BTC|BTC-USD|15m"]
+        self.assertEqual(
+            first["last_notify"]["users"],
+            [
+                {"user_id": "free1", "premium": False, "ok": True, "error": ""},
+                {"user_id": "vip1", "premium": True, "ok": True, "error": "email: SMTP no configurado"},
+            ],
+        )
+        self.assertEqual(first["last_notify"]["telegram_broadcast"]["sent_to"], 1)
+        self.assertEqual(first["last_notify"]["windows"], {"ok": True, "error": ""})
+        self.assertEqual(first["open_alerts"][0]["alert_id"], "Cripto|BTC|BTC-USD|15m")
+        self.assertTrue(first["last_alert_utc"])
+        self.assertEqual(sorted(telegram_calls), [("42", 0), ("43", 1), ("43", 1), ("99", 0), ("99", 0)])
+        self.assertEqual(toast.call_count, 2)
+        self.assertFalse(sw._free_user_can_receive_market_alert(state, "free1", "Cripto|BTC|15m"))
+        self.assertEqual((metrics["alerts_sent"], metrics["notify_dispatcher"]["queued"]), (2, 2))
+        self.assertEqual(metrics["notifications"]["telegram"]["sent"], 5)
+        self.assertEqual(metrics["notifications"]["email"]["failed"], 2)
+
+    def test_telegram_photo_file_id_is_cached_per_symbol_and_invalidated(self):
+        item = sw.MarketItem(market="Cripto", label="BTC", ticker="BTC-USD", td_symbol="BTC/USD", kind="crypto")
+        sent_photos = []
+        issued = {"n": 0}
+        revoked = set()
+
+        def fake_post(cfg, url, payload, priority=0):
+            photo = payload["photo"]
+            sent_photos.append(photo)
+            if "://" not in photo and photo in revoked:
+                return SimpleNamespace(status_code=400, json=lambda: {"ok": False, "description": "wrong file identifier"})
+            if payload["caption"].startswith("<b"):
+                return SimpleNamespace(status_code=400, json=lambda: {"ok": False, "description": "can't parse entities"})
+            if "://" in photo:
+                issued["n"] += 1
+                photo = f"F{issued['n']}"
+            result = {"photo": [{"file_id": f"{photo}-thumb"}, {"file_id": photo}]}
+            return SimpleNamespace(status_code=200, json=lambda: {"ok": True, "result": result})
+
+        state = {}
+        sw._TELEGRAM_PHOTO_CACHE.clear()
+        sw._sync_telegram_photo_cache({}, reset_stats=True)
+        try:
+            with patch.dict(os.environ, {"TELEGRAM_BOT_TOKEN": "TEST"}), patch.object(sw, "_telegram_post", side_effect=fake_post):
+                send = lambda cfg: sw._send_telegram_alert(cfg, "BTC", "cuerpo", chat_ids_override=["42", "43"], item=item)
+                self.assertEqual(send({}), (True, ""))
+                url = sent_photos[0]
+                self.assertEqual(sent_photos, [url, "F1"])
+                sw._sync_telegram_photo_cache(state)
+                self.assertEqual(state[sw.TELEGRAM_PHOTO_FILE_IDS_KEY]["BTC"]["file_id"], "F1")
+
+                # Reinicio del worker: el cache vuelve desde el estado persistido.
+                sw._TELEGRAM_PHOTO_CACHE.clear()
+                sw._sync_telegram_photo_cache(state)
+                revoked.add("F1")
+                self.assertEqual(send({}), (True, ""))
+                self.assertEqual(sent_photos[2:], ["F1", url, "F2"])
+
+                custom = {"notification": {"telegram": {"coin_image_urls": {"BTC": "https://cdn.example/btc.png"}}}}
+                self.assertEqual(send(custom), (True, ""))
+                self.assertEqual(sent_photos[5:], ["https://cdn.example/btc.png", "F3"])
+
+                # Un 400 ajeno al file_id (caption mal formada) no lo invalida ni lo reenvia por URL.
+                bad_caption = sw._send_telegram_photo(custom, "TEST", "42", item, "https://cdn.example/btc.png", "<b", "HTML")
+                self.assertEqual(bad_caption, "HTTP 400")
+                self.assertEqual(sent_photos[7:], ["F3"])
+            stats = sw._sync_telegram_photo_cache(state, reset_stats=True)
+            after_reset = sw._sync_telegram_photo_cache(state)
+        finally:
+            sw._TELEGRAM_PHOTO_CACHE.clear()
+
+        self.assertEqual(state[sw.TELEGRAM_PHOTO_FILE_IDS_KEY]["BTC"]["file_id"], "F3")
+        self.assertEqual(state[sw.TELEGRAM_PHOTO_FILE_IDS_KEY]["BTC"]["url"], "https://cdn.example/btc.png")
+        self.assertEqual(stats["invalidated"], 1)
+        self.assertEqual((after_reset["entries"], after_reset["invalidated"], after_reset["uploads"]), (1, 0, 0))
+
     def test_compact_memory_sweep_calls_gc_and_trim(self):
         with (
             patch.object(sw.gc, "collect") as gc_collect,
@@ -0,0 +1,145 @@
+import os
+import smtplib
+import time
+import unittest
+from email.message import EmailMessage
+from unittest import mock
+
+import market_standin
+import scanner_worker as sw
+from notify_dispatcher import run_batch
+from smtp_transport import SmtpTransport
+
+
+def _message(to: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = "Alerta BTC"
+    msg["From"] = "bot@standin.test"
+    msg["To"] = to
+    msg.set_content("cuerpo")
+    return msg
+
+
+class _ScriptedSmtp:
+    """smtplib.SMTP de prueba: `send_message` levanta las excepciones de `failures` en orden."""
+
+    def __init__(self, failures, opened):
+        self.failures = failures
+        self.sent = []
+        opened.append(self)
+
+    def ehlo(self):
+        return 250, b"ok"
+
+    def login(self, user, password):
+        return 235, b"ok"
+
+    def noop(self):
+        return 250, b"ok"
+
+    def send_message(self, msg):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append(msg["To"])
+
+    def quit(self):
+        return 221, b"bye"
+
+
+class SmtpTransportTests(unittest.TestCase):
+    def tearDown(self):
+        sw._close_smtp_transport()
+
+    def test_batch_reuses_one_authenticated_session_then_closes_when_idle(self):
+        with market_standin.SmtpStandIn() as server:
+            transport = SmtpTransport(server.host, server.port, server.user, server.password, idle_timeout_sec=0.2)
+            for pos in range(5):
+                transport.send(_message(f"user{pos}@test.dev"))
+            busy = transport.stats()
+            time.sleep(0.5)
+            idle = transport.stats()
+            counts = server.snapshot()
+            recipients = [message["to"] for message in server.messages]
+
+        self.assertEqual((counts["connections"], counts["logins"], counts["messages"]), (1, 1, 5))
+        self.assertEqual(recipients, [[f"user{pos}@test.dev"] for pos in range(5)])
+        self.assertEqual((busy["sent"], busy["reused"], busy["open"]), (5, 4, 1))
+        self.assertEqual((idle["idle_closed"], idle["open"]), (1, 0))
+
+    def test_reconnects_when_server_drops_the_session(self):
+        with market_standin.SmtpStandIn(drop_after=2) as server:
+            transport = SmtpTransport(server.host, server.port, server.user, server.password)
+            for pos in range(5):
+                transport.send(_message(f"user{pos}@test.dev"))
+            transport.close()
+            counts = server.snapshot()
+
+        self.assertEqual((counts["connections"], counts["messages"]), (3, 5))
+        self.assertEqual((transport.stats()["reconnects"], transport.stats()["failed"]), (2, 0))
+
+    def test_disconnect_while_sending_is_not_retried_but_421_at_mail_is(self):
+        opened = []
+        failures = [smtplib.SMTPServerDisconnected("Connection unexpectedly closed")]
+        factory = lambda host, port, timeout: _ScriptedSmtp(failures, opened)
+        transport = SmtpTransport("smtp.test", 25, "bot", "clave", smtp_factory=factory)
+        # El corte pudo ocurrir tras aceptar el DATA: reenviar podria duplicar el correo.
+        with self.assertRaises(smtplib.SMTPServerDisconnected):
+            transport.send(_message("user0@test.dev"))
+        self.assertEqual((len(opened), transport.stats()["failed"], transport.stats()["reconnects"]), (1, 1, 0))
+
+        failures.append(smtplib.SMTPSenderRefused(421, b"Too many messages", "bot@standin.test"))
+        transport.send(_message("user1@test.dev"))
+        transport.close()
+
+        self.assertEqual([smtp.sent for smtp in opened], [[], [], ["user1@test.dev"]])
+        self.assertEqual((transport.stats()["sent"], transport.stats()["reconnects"]), (1, 1))
+
+    def test_bad_credentials_are_not_retried(self):
+        with market_standin.SmtpStandIn() as server:
+            transport = SmtpTransport(server.host, server.port, server.user, "otra")
+            with self.assertRaises(smtplib.SMTPAuthenticationError):
+                transport.send(_message("user0@test.dev"))
+            counts = server.snapshot()
+
+        # smtplib prueba PLAIN y luego LOGIN en la misma conexion; no se abre otra.
+        self.assertEqual((counts["connections"], counts["logins"]), (1, 0))
+        self.assertEqual(transport.stats()["failed"], 1)
+
+    def test_worker_premium_emails_share_a_session(self):
+        cfg = {
+            "notification": {
+                "telegram": {"enabled": False},
+                "windows": {"enabled": False},
+                "email": {"session": {"enabled": True}},
+            }
+        }
+        item = sw.MarketItem(market="Cripto", label="BTC", ticker="BTC-USD", td_symbol="BTC/USD", kind="crypto")
+        users = [{"id": f"u{pos}", "chat_id": "", "email": f"u{pos}@test.dev", "es_premium": True} for pos in range(3)]
+        with market_standin.SmtpStandIn() as server:
+            env = {"SMTP_HOST": server.host, "SMTP_PORT": str(server.port), "SMTP_USER": server.user, "SMTP_PASSWORD": server.password}
+            with mock.patch.dict(os.environ, env):
+                batch = sw._build_alert_delivery(
+                    cfg,
+                    item,
+                    "Alerta",
+                    "cuerpo",
+                    state={},
+                    record={},
+                    record_key="Cripto|BTC|BTC-USD|15m",
+                    target_key="15m",
+                    market_key="Cripto|BTC",
+                    user_targets=users,
+                    telegram_broadcast_ids=[],
+                )
+                run_batch(batch)
+            counts = server.snapshot()
+
+        self.assertEqual([(job.channel, job.ok) for job in batch.jobs], [("email", True)] * 3)
+        self.assertEqual((counts["connections"], counts["logins"], counts["messages"]), (1, 1, 3))
+        self.assertEqual(sw._SMTP_TRANSPORT[1].stats()["reused"], 2)
+        self.assertTrue(sw._resolve_smtp_session_cfg({})["enabled"])
+        self.assertFalse(sw._resolve_smtp_session_cfg({"notification": {"email": {"session": {"enabled": False}}}})["enabled"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import json
+import os
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import scanner_worker as sw
+import state_journal
+from state_journal import StateJournal, journal_path_for, read_state, write_json_atomic
+
+
+def _state() -> dict:
+    return {
+        "symbols": {
+            f"Cripto|SYM{pos}|SYM{pos}-USD|15m": {
+                "last_checked_utc": "2026-03-10T15:00:00Z",
+                "quality_history": [{"alert_id": f"h{pos}", "status": "win"}],
+            }
+            for pos in range(4)
+        },
+        "free_daily_market_alerts": {},
+        sw.TELEGRAM_LAST_UPDATE_ID_KEY: 3,
+    }
+
+
+class StateJournalTests(unittest.TestCase):
+    def test_atomic_write_keeps_previous_file_on_failure(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "state.json"
+            write_json_atomic(path, {"ok": 1})
+            with mock.patch.object(state_journal.os, "replace", side_effect=OSError("disk full")):
+                with self.assertRaises(OSError):
+                    write_json_atomic(path, {"ok": 2})
+            self.assertEqual(json.loads(path.read_text(encoding="utf-8")), {"ok": 1})
+            self.assertEqual([p.name for p in Path(tmpdir).iterdir()], ["state.json"])
+
+    @unittest.skipIf(os.name == "nt", "permisos POSIX")
+    def test_atomic_write_keeps_file_mode(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "state.json"
+            umask = os.umask(0o022)
+            try:
+                write_json_atomic(path, {"ok": 1})
+                self.assertEqual(stat.S_IMODE(path.stat().st_mode), 0o644)
+                path.chmod(0o640)
+                write_json_atomic(path, {"ok": 2})
+            finally:
+                os.umask(umask)
+            self.assertEqual(stat.S_IMODE(path.stat().st_mode), 0o640)
+
+    def test_journal_appends_only_changed_records_and_replays(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "scanner_state.json"
+            journal = StateJournal(path)
+            state = _state()
+            self.assertTrue(journal.save(state)["compacted"])
+            self.assertEqual(journal.save(state)["bytes_written"], 0)
+
+            key = "Cripto|SYM1|SYM1-USD|15m"
+            state["symbols"][key]["quality_history"].append({"alert_id": "h-new", "status": "loss"})
+            del state["symbols"]["Cripto|SYM3|SYM3-USD|15m"]
+            state[sw.TELEGRAM_LAST_UPDATE_ID_KEY] = 4
+            stats = journal.save(state)
+            self.assertEqual((stats["records_written"], stats["records_deleted"], stats["compacted"]), (1, 1, False))
+
+            entry = json.loads(journal_path_for(path).read_text(encoding="utf-8"))
+            self.assertEqual(list(entry["records"]), [key])
+            self.assertEqual(entry["top"], {sw.TELEGRAM_LAST_UPDATE_ID_KEY: 4})
+            self.assertEqual(len(json.loads(path.read_text(encoding="utf-8"))["symbols"]), 4)
+
+            # Un corte a mitad de la ultima linea no invalida el resto del journal.
+            with journal_path_for(path).open("a", encoding="utf-8") as handle:
+                handle.write('{"records": {"Cripto|SYM0')
+            with self.assertLogs(level="WARNING"):
+                self.assertEqual(read_state(path), state)
+            reloaded = StateJournal(path)
+            with self.assertLogs(level="WARNING"):
+                self.assertEqual(reloaded.load(), state)
+            self.assertEqual(reloaded.save(state)["bytes_written"], 0)
+
+    def test_compaction_rewrites_snapshot_and_clears_journal(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "scanner_state.json"
+            journal = StateJournal(path, compact_every=3)
+            state = _state()
+            journal.save(state)
+            compacted = []
+            for step in range(3):
+                state["symbols"]["Cripto|SYM0|SYM0-USD|15m"]["last_checked_utc"] = f"2026-03-10T15:{15 * (step + 1)}:00Z"
+                compacted.append(journal.save(state)["compacted"])
+
+            self.assertEqual(compacted, [False, False, True])
+            self.assertEqual(journal_path_for(path).stat().st_size, 0)
+            self.assertEqual(json.loads(path.read_text(encoding="utf-8")), state)
+
+    def test_worker_reports_save_bytes_and_latency_in_health(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state_path = Path(tmpdir) / "scanner_state.json"
+            store = sw._open_state_store({"state_store": {"backend": "journal"}}, state_path)
+            state = sw.load_state(state_path, store)
+            state["symbols"] = _state()["symbols"]
+            stats = sw.save_state(state_path, state, store)
+            plain = sw.save_state(state_path, state)
+
+        self.assertEqual(stats["backend"], "journal")
+        self.assertGreater(stats["bytes_written"], 0)
+        self.assertEqual(plain["backend"], "json")
+        metrics = sw._new_cycle_metrics()
+        metrics["state_store"] = stats
+        health = sw._update_health_from_cycle(health=sw._default_health_state(), cycle_metrics=metrics, cycle_ok=True, cycle_error="")
+        self.assertEqual(health["counters"]["state_bytes_written"], stats["bytes_written"])
+        self.assertEqual(health["latency_ms"]["state_save"]["count"], 1)
+        self.assertEqual(health["last_cycle"]["state_store"]["backend"], "journal")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+import scanner_worker as sw
+from state_store import StateStore, read_records, read_state
+
+
+def _state(records: int = 3) -> dict:
+    symbols = {}
+    for pos in range(records):
+        key = f"Cripto|SYM{pos}|SYM{pos}-USD|15m"
+        symbols[key] = {
+            "last_checked_utc": "2026-03-10T15:00:00Z",
+            "quality_stats": {"resolved": pos, "wins": pos},
+            "open_alerts": [{"alert_id": f"a{pos}", "status": "open", "direction": "ALCISTA", "opened_utc": "2026-03-10T15:00:00Z"}],
+            "open_alert_count": 1,
+            "quality_history": [{"alert_id": f"h{pos}-{n}", "status": "win", "closed_utc": "2026-03-09T10:00:00Z"} for n in range(pos)],
+        }
+    symbols["Cripto|OLD|OLD-USD"] = {"last_direction": "NEUTRAL"}
+    return {
+        "symbols": symbols,
+        "free_daily_market_alerts": {"u1": {"Cripto": "2026-03-10"}},
+        sw.TELEGRAM_USER_CHAT_LINKS_KEY: {"u1": {"chat_id": "42", "linked_utc": "2026-03-01T00:00:00Z"}},
+        sw.TELEGRAM_AUTO_CHAT_IDS_KEY: ["42"],
+        sw.TELEGRAM_LAST_UPDATE_ID_KEY: 7,
+    }
+
+
+class StateStoreTests(unittest.TestCase):
+    def test_round_trip_and_incremental_writes(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "state.sqlite3"
+            state = _state()
+            with StateStore(path) as store:
+                first = store.save(state)
+                self.assertEqual(first["records_written"], 4)
+                self.assertEqual(store.save(state)["records_written"], 0)
+
+                key = "Cripto|SYM1|SYM1-USD|15m"
+                state["symbols"][key]["quality_history"].append({"alert_id": "new", "status": "loss"})
+                del state["symbols"]["Cripto|OLD|OLD-USD"]
+                state["free_daily_market_alerts"]["u2"] = {"Oro": "2026-03-10"}
+                stats = store.save(state)
+                self.assertEqual((stats["records_written"], stats["records_deleted"]), (1, 1))
+
+            loaded = read_state(path)
+            self.assertEqual(loaded, state)
+            self.assertNotIn("open_alerts", loaded["symbols"].get("Cripto|OLD|OLD-USD", {}))
+            panel = read_records(path, fields=("open_alerts",))
+            self.assertEqual(set(panel), set(state["symbols"]))
+            self.assertFalse(any("quality_history" in record for record in panel.values()))
+            self.assertEqual(read_records(Path(tmpdir) / "missing.sqlite3"), {})
+
+            with StateStore(path, readonly=True) as reader:
+                self.assertEqual(len(reader.open_alerts()), 3)
+                self.assertEqual(reader.quality_events(key, limit=1)[0]["alert_id"], "new")
+                self.assertEqual(list(reader.records([key])), [key])
+                light = reader.records([key], fields=("open_alerts",))[key]
+                self.assertEqual(light["open_alerts"], state["symbols"][key]["open_alerts"])
+                self.assertNotIn("quality_history", light)
+                with self.assertRaises(RuntimeError):
+                    reader.save(state)
+
+    def test_reader_sees_committed_state_while_writer_is_open(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "state.sqlite3"
+            writer = StateStore(path)
+            try:
+                state = _state(2)
+                writer.save(state)
+                mode = sqlite3.connect(str(path)).execute("PRAGMA journal_mode").fetchone()[0]
+                self.assertEqual(mode, "wal")
+                with StateStore(path, readonly=True) as reader:
+                    state["symbols"]["Cripto|SYM0|SYM0-USD|15m"]["last_checked_utc"] = "2026-03-10T15:15:00Z"
+                    writer.save(state)
+                    record = reader.records(["Cripto|SYM0|SYM0-USD|15m"])["Cripto|SYM0|SYM0-USD|15m"]
+                    self.assertEqual(record["last_checked_utc"], "2026-03-10T15:15:00Z")
+            finally:
+                writer.close()
+
+    def test_worker_imports_json_state_on_first_sqlite_run(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            state_path = Path(tmpdir) / "scanner_state.json"
+            state_path.write_text(json.dumps(_state()), encoding="utf-8")
+            cfg = {"state_store": {"backend": "sqlite"}}
+
+            store = sw._open_state_store(cfg, state_path)
+            self.assertEqual(store.path, state_path.with_suffix(".sqlite3"))
+            state = sw.load_state(state_path, store)
+            sw.save_state(state_path, state, store)
+            store.close()
+            # La importacion es una sola vez: con la base ya poblada el JSON no se vuelve a leer.
+            state_path.write_text(json.dumps({"symbols": {}}), encoding="utf-8")
+
+            store = sw._open_state_store(cfg, state_path)
+            reloaded = sw.load_state(state_path, store)
+            store.close()
+
+            self.assertEqual(reloaded, state)
+            self.assertIsNone(sw._open_state_store({}, state_path))
+            self.assertIsNone(sw._open_state_store(sw._default_config(), state_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
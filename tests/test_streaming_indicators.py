@@ -0,0 +1,80 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import analysis
+import streaming_indicators
+from frames import random_ohlcv
+
+
+class StreamingIndicatorsTests(unittest.TestCase):
+    def _assert_matches_batch(self, out: pd.DataFrame, data: pd.DataFrame) -> None:
+        expected = analysis.calcular_indicadores(data)
+        self.assertEqual(list(out.index), list(expected.index))
+        for col in ("EMA_20", "EMA_50", "EMA_200", "RSI", "BBL", "BBM", "BBU"):
+            got = pd.to_numeric(out[col], errors="coerce").to_numpy(dtype="float64")
+            ref = pd.to_numeric(expected[col], errors="coerce").to_numpy(dtype="float64")
+            np.testing.assert_allclose(got, ref, rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=col)
+        self.assertAlmostEqual(analysis._atr14(out), analysis._atr14(data.copy()), places=9)
+
+    def test_incremental_updates_match_full_recompute(self):
+        df = random_ohlcv(320)
+        engine = streaming_indicators.StreamingIndicators(max_rows=1000)
+        engine.apply(df.iloc[:260])
+
+        for end in range(261, len(df) + 1):
+            forming = df.iloc[:end].copy()
+            forming.iloc[-1, forming.columns.get_loc("Close")] += 0.5  # vela aun abierta
+            engine.apply(forming)
+            out = engine.apply(df.iloc[:end])
+
+        self._assert_matches_batch(out, df)
+        self.assertEqual(engine.reseeds, 1)
+        self.assertEqual(engine.incremental_bars, len(df) - 260)
+
+    def test_closed_only_commits_each_bar_once(self):
+        df = random_ohlcv(300, seed=5)
+        engine = streaming_indicators.StreamingIndicators()
+        engine.apply(df.iloc[:260], closed_only=True)
+
+        for end in range(261, len(df) + 1):
+            out = engine.apply(df.iloc[:end], closed_only=True)
+            self.assertEqual(engine._rows_index[-1], df.index[end - 1])
+
+        self._assert_matches_batch(out, df)
+        self.assertEqual(engine.reseeds, 1)
+        self.assertEqual(engine.incremental_bars, len(df) - 260)
+
+        # Repetir el mismo frame cerrado no recalcula nada.
+        self._assert_matches_batch(engine.apply(df, closed_only=True), df)
+        self.assertEqual((engine.reseeds, engine.incremental_bars), (1, len(df) - 260))
+
+    def test_revised_bar_reseeds_and_snapshot_resumes(self):
+        df = random_ohlcv(300, seed=11)
+        engine = streaming_indicators.StreamingIndicators()
+        engine.apply(df.iloc[:280])
+
+        revised = df.iloc[:285].copy()
+        revised.iloc[270, revised.columns.get_loc("Close")] += 3.0
+        self._assert_matches_batch(engine.apply(revised), revised)
+        self.assertEqual(engine.reseeds, 2)
+
+        engine = streaming_indicators.StreamingIndicators()
+        engine.apply(df.iloc[:290])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "ind.npz"
+            engine.save(path)
+            restored = streaming_indicators.StreamingIndicators()
+            self.assertTrue(restored.load(path))
+
+        out = restored.apply(df.iloc[:300])
+        self.assertEqual(restored.reseeds, 0)
+        self.assertEqual(restored.incremental_bars, 10)
+        self._assert_matches_batch(out, df.iloc[:300])
+
+
+if __name__ == "__main__":
+    unittest.main()
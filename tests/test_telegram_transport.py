@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import market_standin
+import scanner_worker as sw
+from telegram_transport import TelegramRateLimited, TelegramTransport, TokenBucket
+
+
+class TelegramTransportTests(unittest.TestCase):
+    def tearDown(self):
+        sw._apply_endpoints_cfg({})
+        sw._TELEGRAM_TRANSPORT = None
+
+    def test_token_bucket_refills_and_honors_block(self):
+        bucket = TokenBucket(2.0, burst=1.0, now=100.0)
+        self.assertEqual(bucket.wait_time(100.0), 0.0)
+        bucket.consume(100.0)
+        self.assertAlmostEqual(bucket.wait_time(100.0), 0.5)
+        self.assertEqual(bucket.wait_time(100.5), 0.0)
+        bucket.block(103.0)
+        self.assertAlmostEqual(bucket.wait_time(101.0), 2.0)
+
+    def test_paced_sends_stay_under_standin_limits(self):
+        with market_standin.MarketStandIn(rate_limit_per_sec=40, telegram_chat_per_sec=10) as standin:
+            transport = TelegramTransport(global_per_sec=30, chat_per_sec=8, max_wait_sec=5)
+            url = f"{standin.rest_url}/botTEST/sendMessage"
+            codes = []
+
+            def send(chat_id):
+                codes.append(transport.post(url, {"chat_id": chat_id, "text": "hola"}, chat_id=chat_id).status_code)
+
+            threads = [threading.Thread(target=send, args=(chat,)) for chat in ["42"] * 4 + [str(100 + n) for n in range(8)]]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+            stats = standin.snapshot()["telegram"]
+
+        self.assertEqual(codes, [200] * 12)
+        self.assertEqual(stats["rate_limited"], 0)
+        self.assertEqual(transport.stats()["sent"], 12)
+        self.assertGreaterEqual(transport.stats()["deferred"], 3)
+
+    def test_retry_after_is_honored_then_dropped_past_max_wait(self):
+        with market_standin.MarketStandIn(telegram_chat_per_sec=1) as standin:
+            url = f"{standin.rest_url}/botTEST/sendMessage"
+            # Sin pacing local por chat: el segundo envio recibe 429 retry_after=1 y se reintenta.
+            transport = TelegramTransport(global_per_sec=0, chat_per_sec=0, max_wait_sec=5)
+            started = time.monotonic()
+            replies = [transport.post(url, {"chat_id": "42", "text": "x"}, chat_id="42") for _ in range(2)]
+            elapsed = time.monotonic() - started
+
+            impatient = TelegramTransport(global_per_sec=0, chat_per_sec=0, max_wait_sec=0.2)
+            with self.assertRaises(TelegramRateLimited):
+                impatient.post(url, {"chat_id": "42", "text": "x"}, chat_id="42")
+
+        self.assertEqual([reply.status_code for reply in replies], [200, 200])
+        self.assertGreaterEqual(elapsed, 0.9)
+        self.assertEqual((transport.stats()["retried_429"], transport.stats()["deferred"]), (1, 1))
+        self.assertEqual(impatient.stats()["dropped"], 1)
+
+    def test_premium_takes_the_global_slot_first(self):
+        order = []
+
+        def fake_post(url, data=None, timeout=None):
+            order.append(data["chat_id"])
+            return SimpleNamespace(status_code=200)
+
+        transport = TelegramTransport(global_per_sec=5, chat_per_sec=0, max_wait_sec=5, post=fake_post)
+        for pos in range(5):
+            transport.post("u", {"chat_id": f"warm{pos}"}, chat_id=f"warm{pos}")
+
+        threads = []
+        for chat_id, priority in (("free1", 0), ("free2", 0), ("vip", 1)):
+            thread = threading.Thread(target=transport.post, args=("u", {"chat_id": chat_id}, chat_id, priority))
+            thread.start()
+            threads.append(thread)
+            deadline = time.monotonic() + 2
+            while transport.stats()["waiting"] < len(threads) and time.monotonic() < deadline:
+                time.sleep(0.005)
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(order[5:], ["vip", "free1", "free2"])
+
+    def test_idle_chat_buckets_are_evicted(self):
+        def fake_post(url, data=None, timeout=None):
+            return SimpleNamespace(status_code=200)
+
+        transport = TelegramTransport(global_per_sec=0, chat_per_sec=1000, post=fake_post, idle_evict_sec=0)
+        for pos in range(5):
+            transport.post("u", {}, chat_id=str(pos))
+        transport._penalize("-99", 5.0)
+        time.sleep(0.01)
+        with transport._cond:
+            transport._chat_bucket("x")
+
+        stats = transport.stats()
+        self.assertEqual(sorted(transport._chats), ["-99", "x"])
+        self.assertEqual((stats["chats"], stats["chats_evicted"]), (2, 5))
+        self.assertEqual(transport._chat_users, {})
+
+    def test_worker_sender_uses_configured_transport(self):
+        cfg = {"notification": {"telegram": {"rate_limit": {"enabled": True, "chat_per_sec": 4}}}}
+        with market_standin.MarketStandIn(telegram_chat_per_sec=5) as standin:
+            sw._apply_endpoints_cfg({"endpoints": standin.endpoints()})
+            with mock.patch.dict(os.environ, {"TELEGRAM_BOT_TOKEN": "TEST"}):
+                results = [sw._send_telegram_alert(cfg, "BTC", "cuerpo", chat_ids_override=["42"]) for _ in range(3)]
+            stats = standin.snapshot()["telegram"]
+
+        self.assertEqual(results, [(True, "")] * 3)
+        self.assertEqual(stats["rate_limited"], 0)
+        self.assertIs(sw._telegram_transport(cfg), sw._TELEGRAM_TRANSPORT[1])
+        self.assertEqual(sw._TELEGRAM_TRANSPORT[1].stats()["sent"], 3)
+        self.assertIsNotNone(sw._telegram_transport({}))
+        self.assertIsNone(sw._telegram_transport({"notification": {"telegram": {"rate_limit": {"enabled": False}}}}))
+
+
+if __name__ == "__main__":
+    unittest.main()